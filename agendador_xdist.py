@@ -0,0 +1,143 @@
+import os
+import time
+import statistics
+from pathlib import Path
+from typing import Dict, Optional
+
+import pytest
+
+from helpers_arquivos import trava_arquivo, ler_json, gravar_json_atomico
+from orcamento_execucao import orcamento, carregar_prioridades, PRIORIDADE_PADRAO
+from ondas_execucao import ondas_ativas, espera_onda_s
+
+# Durações por teste (nodeid) de execuções anteriores, fora da pasta com timestamp
+DURACOES_PATH = Path(os.getenv("DURACOES_PATH", "") or (Path("reports") / "duracoes.json"))
+AGENDADOR_DURACAO_ATIVO = os.getenv("AGENDADOR_DURACAO", "true").lower() in ("1", "true", "yes", "on")
+
+# Média móvel: peso da execução mais recente
+PESO_RECENTE = 0.5
+
+# Testes sem histórico: usa a mediana dos conhecidos (ou este valor se não houver nenhum)
+DURACAO_DESCONHECIDA_S = float(os.getenv("DURACAO_DESCONHECIDA_S", "60") or "60")
+
+try:
+    from xdist.scheduler import LoadScheduling
+except Exception:  # xdist ausente: apenas a coleta de durações fica ativa
+    LoadScheduling = object
+
+
+def carregar_duracoes(caminho: Path = DURACOES_PATH) -> Dict[str, float]:
+    dados = ler_json(caminho, {}) or {}
+    return {nodeid: float(v.get("media", 0)) for nodeid, v in (dados.get("testes") or {}).items()}
+
+
+class AgendamentoPorDuracao(LoadScheduling):
+    """
+    Igual ao LoadScheduling do xdist, mas a fila é ordenada do teste mais longo para o mais curto
+    (pelo histórico) e cada worker recebe um teste por vez: quem fica livre pega o próximo mais longo.
+    Assim o teste de pagamento/matriz não sobra para o fim num único worker.
+    Com orçamento de tempo (RUN_BUDGET_MIN) ou em ondas (ONDAS=1), a prioridade vem antes da duração:
+    smoke primeiro, e nenhum worker recebe regressão antes de todo o smoke ter sido distribuído
+    (a barreira que segura a regressão até o smoke terminar fica no worker, ver ondas_execucao).
+    """
+
+    def __init__(self, config, log=None, duracoes: Optional[Dict[str, float]] = None):
+        super().__init__(config, log)
+        self.duracoes = duracoes if duracoes is not None else carregar_duracoes()
+        conhecidas = [d for d in self.duracoes.values() if d > 0]
+        self.duracao_padrao = statistics.median(conhecidas) if conhecidas else DURACAO_DESCONHECIDA_S
+
+    def estimar(self, nodeid: str) -> float:
+        return self.duracoes.get(nodeid) or self.duracao_padrao
+
+    def check_schedule(self, node, duration: float = 0) -> None:
+        if node.shutting_down:
+            return
+        if self.pending:
+            # O worker do xdist só executa um item quando já conhece o próximo: mantém 2 na fila dele
+            faltam = 2 - len(self.node2pending[node])
+            if faltam > 0:
+                self._send_tests(node, faltam)
+        else:
+            node.shutdown()
+        self.log("num items waiting for node:", len(self.pending))
+
+    def schedule(self) -> None:
+        assert self.collection_is_completed
+
+        if self.collection is not None:
+            for node in self.nodes:
+                self.check_schedule(node)
+            return
+
+        if not self._check_nodes_have_same_collection():
+            self.log("**Different tests collected, aborting run**")
+            return
+
+        self.collection = next(iter(self.node2collection.values()))
+        # Mais longo primeiro (LPT); empate mantém a ordem de coleta
+        prioridades = carregar_prioridades() if orcamento().ativo or ondas_ativas() else {}
+        self.pending[:] = sorted(
+            range(len(self.collection)),
+            key=lambda i: (prioridades.get(self.collection[i], PRIORIDADE_PADRAO), -self.estimar(self.collection[i])),
+        )
+        if not self.collection:
+            return
+
+        # Duas rodadas de um teste por worker: os mais longos começam em workers diferentes
+        for _ in range(2):
+            for node in self.nodes:
+                self._send_tests(node, 1)
+
+        if not self.pending:
+            for node in self.nodes:
+                node.shutdown()
+
+
+class ColetorDuracoes:
+    """
+    Soma setup+call+teardown por teste (no controlador) e mescla no histórico ao final.
+    A espera na barreira das ondas sai da conta: é fila, não custo do teste.
+    """
+
+    def __init__(self, config, caminho: Path = DURACOES_PATH):
+        self.config = config
+        self.caminho = caminho
+        self.medidas: Dict[str, float] = {}
+
+    def pytest_runtest_logreport(self, report):
+        duracao = max(0.0, float(getattr(report, "duration", 0) or 0) - espera_onda_s(report))
+        self.medidas[report.nodeid] = self.medidas.get(report.nodeid, 0.0) + duracao
+
+    @pytest.hookimpl(optionalhook=True)
+    def pytest_xdist_make_scheduler(self, config, log):
+        if not AGENDADOR_DURACAO_ATIVO or config.getoption("dist", "no") != "load":
+            return None
+        return AgendamentoPorDuracao(config, log)
+
+    def pytest_sessionfinish(self, session):
+        if not self.medidas:
+            return
+        try:
+            with trava_arquivo(self.caminho):
+                dados = ler_json(self.caminho, {}) or {}
+                testes = dados.setdefault("testes", {})
+                for nodeid, duracao in self.medidas.items():
+                    atual = testes.get(nodeid)
+                    if atual:
+                        atual["media"] = PESO_RECENTE * duracao + (1 - PESO_RECENTE) * float(atual.get("media", duracao))
+                        atual["n"] = int(atual.get("n", 0)) + 1
+                    else:
+                        atual = testes[nodeid] = {"media": duracao, "n": 1}
+                    atual["ultima"] = duracao
+                    atual["instante"] = time.time()
+                gravar_json_atomico(self.caminho, dados)
+        except Exception as e:
+            print(f"[AVISO] Falha ao salvar durações dos testes: {e}")
+
+
+def registrar_agendador(config) -> None:
+    """Registra o coletor/agendador no controlador (nos workers do xdist não faz nada)."""
+    if hasattr(config, "workerinput"):
+        return
+    config.pluginmanager.register(ColetorDuracoes(config), "agendador_duracoes")
@@ -1,21 +1,364 @@
-import os, shutil
+"""
+Retenção e compactação de reports/ (+ limpeza de caches do Python).
+
+    python clean_caches.py                       # apaga reports/ (menos o estado persistente) e __pycache__/.pytest_cache/*.pyc
+    python clean_caches.py --tudo                # idem, apagando também o estado persistente (histórico, durações, caches aprendidos)
+    python clean_caches.py --retencao            # mantém as últimas RETENCAO_EXECUCOES, compacta as antigas e gera o índice
+    python clean_caches.py --manter 10 --max-gb 5   # (implica --retencao)
+    python clean_caches.py --retencao --caches   # retenção + remoção dos caches do Python
+    python clean_caches.py --simular             # só mostra o que faria
+
+Compactar uma execução = remover vídeos, manter trace.zip só dos testes que falharam e recomprimir os PNGs.
+O índice (reports/indice.html e indice.json) lista as execuções com o resumo dos resultados.
+"""
+import os
+import re
+import sys
+import html
+import time
+import zlib
+import shutil
+import struct
+import argparse
 from pathlib import Path
+from typing import Dict, List, Optional
+
+from helpers_arquivos import ler_json, gravar_json_atomico
+from construir_relatorio import resultados_por_teste, RELATORIO_FLUXO_HTML
+
+REPORTS = Path("reports")
+RETENCAO_EXECUCOES = int(os.getenv("RETENCAO_EXECUCOES", "20") or "20")
+RETENCAO_MAX_GB = float(os.getenv("RETENCAO_MAX_GB", "0") or "0")
+# Execuções mais recentes que ficam intactas (as demais retidas são compactadas)
+COMPACTAR_APOS = int(os.getenv("COMPACTAR_APOS", "5") or "5")
+
+PASTA_EXECUCAO_REGEX = re.compile(r"^\d{4}-\d{2}-\d{2}_\d{2}-\d{2}-\d{2}$")
+RESUMO_EXECUCAO = "resumo_execucao.json"
+INDICE_JSON = "indice.json"
+INDICE_HTML = "indice.html"
+
+# Caches do Python; a varredura não desce nestas pastas (nem nas de caches já removidas)
+CACHES = {"__pycache__", ".pytest_cache"}
+PASTAS_IGNORADAS = {".git", "venv", ".venv", "env", "node_modules", "reports", "test-results", ".idea", ".vscode"}
 
-root = Path(".").resolve()
-targets = ["__pycache__", ".pytest_cache", "reports"]
+PNG_ASSINATURA = b"\x89PNG\r\n\x1a\n"
 
-for path in root.rglob("*"):
-    if path.is_dir() and path.name in targets:
+# Estado persistente entre execuções em reports/ (modo incremental, histórico/tendências, agendamento
+# por duração, estratégias e grafo aprendidos): a limpeza padrão não apaga; só --tudo
+ESTADO_PERSISTENTE = {
+    "estado_execucao.sqlite", "historico.sqlite", "duracoes.json", "estrategias_cache.json", "jornada_grafo.json",
+}
+
+
+# -----------------------------------------------------------------------------
+# Varredura
+# -----------------------------------------------------------------------------
+
+def execucoes(base: Path = REPORTS) -> List[Path]:
+    """Pastas reports/<timestamp>, da mais recente para a mais antiga (só o primeiro nível é listado)."""
+    try:
+        with os.scandir(base) as it:
+            nomes = [e.name for e in it if e.is_dir(follow_symlinks=False) and PASTA_EXECUCAO_REGEX.match(e.name)]
+    except FileNotFoundError:
+        return []
+    return [base / n for n in sorted(nomes, reverse=True)]
+
+
+def tamanho_pasta(pasta: Path) -> int:
+    total = 0
+    pilha = [str(pasta)]
+    while pilha:
         try:
-            shutil.rmtree(path, ignore_errors=True)
-            print(f"Removido: {path}")
-        except Exception as e:
-            print(f"Falha ao remover {path}: {e}")
+            with os.scandir(pilha.pop()) as it:
+                for e in it:
+                    if e.is_dir(follow_symlinks=False):
+                        pilha.append(e.path)
+                    elif e.is_file(follow_symlinks=False):
+                        total += e.stat(follow_symlinks=False).st_size
+        except OSError:
+            pass
+    return total
+
+
+def _chave_teste(texto: str) -> str:
+    """Normaliza nodeid / nome da pasta do Playwright (slug do nodeid) para comparação."""
+    return re.sub(r"[^a-z0-9]+", "", texto.lower())
+
+
+# -----------------------------------------------------------------------------
+# Resumo por execução
+# -----------------------------------------------------------------------------
+
+def _resumo_junit(pasta: Path) -> Dict[str, int]:
+    try:
+        import xml.etree.ElementTree as ET
+        raiz = ET.parse(pasta / "junit.xml").getroot()
+        suites = [raiz] if raiz.tag == "testsuite" else list(raiz)
+        contagem = {"passed": 0, "failed": 0, "erro": 0, "skipped": 0}
+        for s in suites:
+            total = int(s.get("tests", 0))
+            falhas, erros, pulados = int(s.get("failures", 0)), int(s.get("errors", 0)), int(s.get("skipped", 0))
+            contagem["failed"] += falhas
+            contagem["erro"] += erros
+            contagem["skipped"] += pulados
+            contagem["passed"] += max(0, total - falhas - erros - pulados)
+        return contagem
+    except Exception:
+        return {}
+
+
+def resumo_execucao(pasta: Path, recalcular: bool = False) -> Dict:
+    """
+    Contagem por resultado, navegadores e testes com falha (do fluxo; na falta dele, do junit.xml).
+    Execuções compactadas não mudam mais: o resumo gravado nelas é reaproveitado.
+    """
+    cache = ler_json(pasta / RESUMO_EXECUCAO, None)
+    if cache and cache.get("compactado") and not recalcular:
+        return cache
+    resumo = {"execucao": pasta.name, "resultados": {}, "navegadores": [], "falhas": [],
+              "compactado": bool(cache and cache.get("compactado"))}
+    testes = resultados_por_teste(pasta) if (pasta / "fluxo").is_dir() else {}
+    if testes:
+        for t in testes.values():
+            resumo["resultados"][t["resultado"]] = resumo["resultados"].get(t["resultado"], 0) + 1
+            if t["resultado"] in ("failed", "erro", "em andamento"):
+                resumo["falhas"].append(t["teste"])
+        resumo["navegadores"] = sorted({t["navegador"] for t in testes.values() if t["navegador"]})
+    else:
+        resumo["resultados"] = _resumo_junit(pasta)
+    resumo["bytes"] = tamanho_pasta(pasta)
+    return resumo
+
+
+# -----------------------------------------------------------------------------
+# Compactação
+# -----------------------------------------------------------------------------
+
+def recomprimir_png(caminho: Path) -> int:
+    """Reescreve os dados (IDAT) com zlib nível 9, sem dependências. Retorna bytes economizados."""
+    try:
+        dados = caminho.read_bytes()
+        if not dados.startswith(PNG_ASSINATURA):
+            return 0
+        pos, chunks, idat = len(PNG_ASSINATURA), [], []
+        while pos + 8 <= len(dados):
+            tamanho, tipo = struct.unpack(">I4s", dados[pos:pos + 8])
+            corpo = dados[pos + 8:pos + 8 + tamanho]
+            pos += 12 + tamanho
+            if tipo == b"IDAT":
+                idat.append(corpo)
+                if len(idat) == 1:
+                    chunks.append((b"IDAT", None))
+            else:
+                chunks.append((tipo, corpo))
+            if tipo == b"IEND":
+                break
+        novo_idat = zlib.compress(zlib.decompress(b"".join(idat)), 9)
+        saida = [PNG_ASSINATURA]
+        for tipo, corpo in chunks:
+            corpo = novo_idat if corpo is None else corpo
+            saida.append(struct.pack(">I4s", len(corpo), tipo) + corpo + struct.pack(">I", zlib.crc32(tipo + corpo) & 0xFFFFFFFF))
+        novo = b"".join(saida)
+        if len(novo) >= len(dados):
+            return 0
+        tmp = caminho.with_name(caminho.name + ".tmp")
+        tmp.write_bytes(novo)
+        os.replace(tmp, caminho)
+        return len(dados) - len(novo)
+    except Exception:
+        return 0
+
+
+def compactar_execucao(pasta: Path, resumo: Dict, simular: bool = False) -> int:
+    """Remove vídeos, traces de testes que passaram e recomprime PNGs. Retorna bytes liberados."""
+    falhas = {_chave_teste(n) for n in resumo.get("falhas", [])}
 
-for ext in (".pyc", ".pyo"):
-    for f in root.rglob(f"*{ext}"):
+    def _teste_falhou(pasta_teste: str) -> bool:
+        chave = _chave_teste(pasta_teste)
+        return any(chave.startswith(f) or f.startswith(chave) for f in falhas)
+
+    liberados = 0
+    for atual, dirs, arquivos in os.walk(pasta):
+        dirs[:] = [d for d in dirs if d != "fluxo"]
+        rel = Path(atual).relative_to(pasta).parts
+        pasta_teste = rel[0] if rel else ""
+        for nome in arquivos:
+            caminho = Path(atual) / nome
+            remover = nome.endswith(".webm") or (nome.endswith("trace.zip") and not _teste_falhou(pasta_teste))
+            try:
+                if remover:
+                    liberados += caminho.stat().st_size
+                    if not simular:
+                        caminho.unlink()
+                elif nome.endswith(".png") and not simular:
+                    liberados += recomprimir_png(caminho)
+            except OSError:
+                pass
+    return liberados
+
+
+# -----------------------------------------------------------------------------
+# Índice
+# -----------------------------------------------------------------------------
+
+def gravar_indice(resumos: List[Dict], base: Path = REPORTS) -> Path:
+    gravar_json_atomico(base / INDICE_JSON, {"gerado_em": time.time(), "execucoes": resumos})
+    linhas = []
+    for r in resumos:
+        res = r.get("resultados") or {}
+        relatorios = " ".join(
+            f"<a href='{html.escape(r['execucao'])}/{nome}'>{nome}</a>"
+            for nome in (RELATORIO_FLUXO_HTML, "relatorio_renault.html") if (base / r["execucao"] / nome).exists()
+        )
+        falhas = "".join(f"<li>{html.escape(f)}</li>" for f in r.get("falhas", [])[:20])
+        linhas.append(
+            f"<tr><td>{html.escape(r['execucao'])}</td><td>{res.get('passed', 0)}</td>"
+            f"<td>{res.get('failed', 0) + res.get('erro', 0)}</td><td>{res.get('skipped', 0)}</td>"
+            f"<td>{html.escape(', '.join(r.get('navegadores', [])))}</td><td>{r.get('bytes', 0) / 1e6:.1f}</td>"
+            f"<td>{'sim' if r.get('compactado') else ''}</td><td>{relatorios}"
+            f"{f'<details><summary>Falhas</summary><ul>{falhas}</ul></details>' if falhas else ''}</td></tr>"
+        )
+    destino = base / INDICE_HTML
+    destino.write_text(
+        "<html><head><meta charset='utf-8'><title>Execuções</title><style>body{font-family:sans-serif}"
+        "table{border-collapse:collapse;width:100%}td,th{padding:6px;border-bottom:1px solid #eee;text-align:left;vertical-align:top}"
+        "</style></head><body><h1>Execuções</h1><table><tr><th>Execução</th><th>✅</th><th>❌</th><th>⏭️</th>"
+        "<th>Navegadores</th><th>MB</th><th>Compactada</th><th>Relatórios</th></tr>" + "".join(linhas) + "</table></body></html>",
+        encoding="utf-8",
+    )
+    return destino
+
+
+# -----------------------------------------------------------------------------
+# Caches do Python
+# -----------------------------------------------------------------------------
+
+def limpar_caches(raiz: Path, simular: bool = False) -> None:
+    """os.walk com poda: não desce em .git, venv, reports etc. nem dentro das pastas removidas."""
+    for atual, dirs, arquivos in os.walk(raiz):
+        for d in [d for d in dirs if d in CACHES]:
+            alvo = Path(atual) / d
+            print(f"Removido: {alvo}")
+            if not simular:
+                shutil.rmtree(alvo, ignore_errors=True)
+        dirs[:] = [d for d in dirs if d not in CACHES and d not in PASTAS_IGNORADAS]
+        for nome in arquivos:
+            if nome.endswith((".pyc", ".pyo")):
+                alvo = Path(atual) / nome
+                try:
+                    if not simular:
+                        alvo.unlink()
+                    print(f"Removido arquivo: {alvo}")
+                except Exception as e:
+                    print(f"Falha ao remover {alvo}: {e}")
+
+
+def _estado_persistente(nome: str) -> bool:
+    """Arquivo de estado ou seus auxiliares (-wal/-shm do SQLite, .lock das travas, .tmp das gravações)."""
+    return any(nome == e or nome.startswith(e + "-") or nome.startswith(e + ".") for e in ESTADO_PERSISTENTE)
+
+
+def apagar_reports(base: Path = REPORTS, manter_estado: bool = True, simular: bool = False) -> None:
+    """Apaga reports/; com manter_estado, preserva os arquivos de ESTADO_PERSISTENTE na raiz."""
+    if not manter_estado:
+        print(f"Removido: {base}")
+        if not simular:
+            shutil.rmtree(base, ignore_errors=True)
+        return
+    try:
+        with os.scandir(base) as it:
+            entradas = [(e.name, e.is_dir(follow_symlinks=False)) for e in it]
+    except FileNotFoundError:
+        return
+    for nome, eh_pasta in entradas:
+        if not eh_pasta and _estado_persistente(nome):
+            continue
+        alvo = base / nome
+        print(f"Removido: {alvo}")
+        if simular:
+            continue
+        if eh_pasta:
+            shutil.rmtree(alvo, ignore_errors=True)
+            continue
         try:
-            f.unlink()
-            print(f"Removido arquivo: {f}")
-        except Exception as e:
-            print(f"Falha ao remover {f}: {e}")
\ No newline at end of file
+            alvo.unlink()
+        except OSError as e:
+            print(f"Falha ao remover {alvo}: {e}")
+
+
+# -----------------------------------------------------------------------------
+# Retenção
+# -----------------------------------------------------------------------------
+
+def aplicar_retencao(base: Path = REPORTS, manter: int = RETENCAO_EXECUCOES, max_gb: float = RETENCAO_MAX_GB,
+                     compactar_apos: int = COMPACTAR_APOS, simular: bool = False) -> List[Dict]:
+    """
+    Mantém as `manter` execuções mais recentes (e, com max_gb, apaga as mais antigas até caber);
+    compacta as retidas além das `compactar_apos` mais recentes. A mais recente nunca é apagada.
+    """
+    inicio = time.time()
+    pastas = execucoes(base)
+    retidas, removidas = pastas[:max(1, manter)], pastas[max(1, manter):]
+    for pasta in removidas:
+        print(f"[INFO] Removendo execução antiga: {pasta.name}")
+        if not simular:
+            shutil.rmtree(pasta, ignore_errors=True)
+
+    resumos = []
+    for i, pasta in enumerate(retidas):
+        resumo = resumo_execucao(pasta)
+        if i >= compactar_apos and not resumo.get("compactado"):
+            liberados = compactar_execucao(pasta, resumo, simular)
+            print(f"[INFO] Execução {pasta.name} compactada ({liberados / 1e6:.1f} MB liberados).")
+            if not simular:
+                resumo["compactado"] = True
+                resumo["bytes"] = tamanho_pasta(pasta)
+        if not simular:
+            gravar_json_atomico(pasta / RESUMO_EXECUCAO, resumo)
+        resumos.append(resumo)
+
+    if max_gb > 0:
+        limite = int(max_gb * 1024 ** 3)
+        while len(resumos) > 1 and sum(r.get("bytes", 0) for r in resumos) > limite:
+            r = resumos.pop()
+            print(f"[INFO] Removendo execução {r['execucao']} (limite de {max_gb} GB).")
+            if not simular:
+                shutil.rmtree(base / r["execucao"], ignore_errors=True)
+
+    if not simular and base.is_dir():
+        gravar_indice(resumos, base)
+    print(f"[INFO] Retenção: {len(resumos)} execuções mantidas, {len(pastas) - len(resumos)} removidas "
+          f"em {time.time() - inicio:.2f}s.")
+    return resumos
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Retenção/compactação de reports/ e limpeza de caches.")
+    parser.add_argument("--retencao", action="store_true",
+                        help="em vez de apagar reports/, mantém as execuções recentes e compacta as antigas")
+    parser.add_argument("--manter", type=int, default=None, help=f"execuções mais recentes mantidas (padrão {RETENCAO_EXECUCOES}; implica --retencao)")
+    parser.add_argument("--max-gb", type=float, default=None, help="tamanho máximo de reports/ (0 = sem limite; implica --retencao)")
+    parser.add_argument("--compactar-apos", type=int, default=None, help=f"execuções recentes mantidas intactas (padrão {COMPACTAR_APOS}; implica --retencao)")
+    parser.add_argument("--caches", action="store_true", help="com --retencao, remove também __pycache__/.pytest_cache/*.pyc")
+    parser.add_argument("--tudo", action="store_true",
+                        help="apaga reports/ inteiro, inclusive o estado persistente, e os caches (sem --tudo o estado é mantido)")
+    parser.add_argument("--simular", action="store_true", help="só mostra o que seria feito")
+    args = parser.parse_args(argv)
+
+    retencao = not args.tudo and (args.retencao or any(v is not None for v in (args.manter, args.max_gb, args.compactar_apos)))
+    raiz = Path(".").resolve()
+    if retencao:
+        aplicar_retencao(raiz / REPORTS,
+                         RETENCAO_EXECUCOES if args.manter is None else args.manter,
+                         RETENCAO_MAX_GB if args.max_gb is None else args.max_gb,
+                         COMPACTAR_APOS if args.compactar_apos is None else args.compactar_apos,
+                         args.simular)
+    else:
+        apagar_reports(raiz / REPORTS, manter_estado=not args.tudo, simular=args.simular)
+    if args.caches or not retencao:
+        limpar_caches(raiz, args.simular)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
@@ -0,0 +1,107 @@
+import os
+import time
+import errno
+import shutil
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+
+# Pastas de teste processadas em paralelo (I/O de metadados; vídeos/traces não são copiados)
+COLETA_PARALELISMO = int(os.getenv("COLETA_PARALELISMO", "8") or "8")
+
+
+def _novo_resumo() -> Dict[str, int]:
+    return {"arquivos": 0, "bytes": 0, "renomeados": 0, "hardlinks": 0, "copiados": 0, "erros": 0}
+
+
+def _somar(total: Dict[str, int], parcial: Dict[str, int]) -> None:
+    for k, v in parcial.items():
+        total[k] = total.get(k, 0) + v
+
+
+def _transferir_arquivo(origem: Path, destino: Path, resumo: Dict[str, int]) -> None:
+    """
+    Rename atômico (mesmo disco); se não der (arquivo aberto no Windows), hardlink; só então cópia.
+    Confere o tamanho no destino.
+    """
+    tamanho = origem.stat().st_size
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        os.replace(origem, destino)
+        resumo["renomeados"] += 1
+    except OSError as e:
+        try:
+            if e.errno == errno.EXDEV:
+                raise
+            if destino.exists():
+                destino.unlink()
+            os.link(origem, destino)
+            resumo["hardlinks"] += 1
+        except OSError:
+            shutil.copy2(origem, destino)
+            resumo["copiados"] += 1
+    if destino.stat().st_size != tamanho:
+        print(f"[AVISO] Tamanho divergente após coletar {destino} ({destino.stat().st_size} != {tamanho})")
+        resumo["erros"] += 1
+        return
+    resumo["arquivos"] += 1
+    resumo["bytes"] += tamanho
+
+
+def _coletar_pasta(pasta: Path, destino: Path) -> Dict[str, int]:
+    resumo = _novo_resumo()
+    try:
+        if not destino.exists():
+            # Pasta inteira de uma vez: um único rename, independente do tamanho dos vídeos/traces
+            arquivos = [(p, p.stat().st_size) for p in pasta.rglob("*") if p.is_file()]
+            try:
+                os.replace(pasta, destino)
+                for p, tamanho in arquivos:
+                    alvo = destino / p.relative_to(pasta)
+                    if alvo.stat().st_size != tamanho:
+                        print(f"[AVISO] Tamanho divergente após coletar {alvo}")
+                        resumo["erros"] += 1
+                        continue
+                    resumo["arquivos"] += 1
+                    resumo["renomeados"] += 1
+                    resumo["bytes"] += tamanho
+                return resumo
+            except OSError:
+                pass  # outro disco/arquivo em uso: segue arquivo a arquivo
+        # Destino já existe: mescla, substituindo (garante o trace.zip mais recente)
+        for arquivo in pasta.rglob("*"):
+            if arquivo.is_file():
+                try:
+                    _transferir_arquivo(arquivo, destino / arquivo.relative_to(pasta), resumo)
+                except Exception as e:
+                    print(f"[AVISO] Falha ao coletar {arquivo}: {e}")
+                    resumo["erros"] += 1
+        shutil.rmtree(pasta, ignore_errors=True)
+    except Exception as e:
+        print(f"[AVISO] Falha ao coletar {pasta}: {e}")
+        resumo["erros"] += 1
+    return resumo
+
+
+def coletar_artefatos(origem: Path, destino: Path, paralelismo: Optional[int] = None) -> Dict[str, int]:
+    """
+    Move as pastas de teste de `origem` (ex.: test-results/) para `destino` (reports/<ts>/),
+    uma pasta por thread. Retorna o resumo (arquivos, bytes, renomeados, hardlinks, copiados, erros).
+    """
+    inicio = time.time()
+    total = _novo_resumo()
+    origem, destino = Path(origem), Path(destino)
+    if not origem.is_dir():
+        return total
+    pastas = [p for p in origem.iterdir() if p.is_dir() and not p.name.startswith(".")]
+    if not pastas:
+        return total
+    destino.mkdir(parents=True, exist_ok=True)
+    with ThreadPoolExecutor(max_workers=max(1, min(paralelismo or COLETA_PARALELISMO, len(pastas)))) as pool:
+        for parcial in pool.map(lambda p: _coletar_pasta(p, destino / p.name), pastas):
+            _somar(total, parcial)
+    total["segundos"] = time.time() - inicio
+    print(f"[INFO] Artefatos coletados: {total['arquivos']} arquivos, {total['bytes'] / 1e6:.1f} MB "
+          f"em {total['segundos']:.2f}s (renomeados {total['renomeados']}, hardlinks {total['hardlinks']}, "
+          f"copiados {total['copiados']}, erros {total['erros']})")
+    return total
@@ -4,8 +4,27 @@ import shutil
 import html as _html
 from pathlib import Path
 import datetime
+from collections import deque
 import pytest
 import pytest_html
+from helpers_frames import rastreador_frames
+from helpers_contexto import preparar_consentimento_e_geo
+from helpers_catalogo import catalogo_site, CATALOGO_ATIVO
+from stub_mapas import instalar_stub_mapas, STUB_MAPAS
+from vigia_fatal import vigia_fatal
+from orcamento_execucao import orcamento, marcar_inicio, priorizar_itens, MOTIVO_ORCAMENTO
+from ondas_execucao import definir_ondas, ondas_ativas, aguardar_onda, controle_ondas
+from helpers_console import (
+    CONSOLE_CAPTURA, instalar_captura_console, coletar_captura_console, formatar_item_console, gravar_log_gzip
+)
+from helpers_estrategias import cache_estrategias, resumo_taxa_acerto, id_execucao
+from navegador_jornada import custos_arestas
+from agendador_xdist import registrar_agendador
+from coletor_artefatos import coletar_artefatos
+from fluxo_resultados import configurar_fluxo, fluxo_resultados, EVENTO_TESTE, EVENTO_LOG
+from construir_relatorio import construir as construir_relatorio_fluxo
+from historico_execucoes import registrar_execucao
+from snapshot_jornada import limpar_snapshots
 
 # -----------------------------------------------------------------------------
 # 1. GERENCIAMENTO DE DIRETÓRIOS (RESTAURANDO O PADRÃO ANTIGO)
@@ -49,6 +68,16 @@ def _ensure_dir_exists(p: Path, retries: int = 5, delay: float = 0.2) -> Path:
 def reports_dir(pytestconfig):
     return _get_reports_root(pytestconfig)
 
+@pytest.fixture(scope="session", autouse=True)
+def delete_output_dir():
+    """
+    Substitui a fixture do pytest-playwright que apaga o --output no início da sessão de cada worker.
+    Aqui o --output é a pasta da execução (nova a cada execução) e guarda os arquivos compartilhados
+    pelos workers desde que o catálogo passou a morar nela: catalogo.json, fluxo/*.jsonl, evidencias/,
+    estado da matriz, prioridades, barreira das ondas e disjuntor. A fixture original apagava tudo
+    isso no primeiro teste de cada worker, inclusive o que os outros workers já tinham gravado.
+    """
+
 def pytest_configure(config):
     """
     Configura caminhos do relatório HTML e Output do Playwright, além de variáveis de execução.
@@ -56,6 +85,16 @@ def pytest_configure(config):
     """
     root = _get_reports_root(config)
 
+    # Início do orçamento de tempo (RUN_BUDGET_MIN) herdado pelos workers
+    marcar_inicio()
+
+    # Distribuição do xdist pelo histórico de durações (mais longos primeiro)
+    registrar_agendador(config)
+
+    # Fluxo append-only de resultados/logs/evidências deste processo (reports/<ts>/fluxo/<processo>.jsonl)
+    workerinput = getattr(config, "workerinput", None)
+    configurar_fluxo(root, workerinput["workerid"] if workerinput else "controlador")
+
     # Armazena caminhos/coletores globais no config
     setattr(config, "_reports_dir", str(root))
     setattr(config, "_skip_count", 0)
@@ -94,6 +133,27 @@ def pytest_configure(config):
     if not junit_path or not str(junit_path).startswith(str(root)):
         config.option.junitxml = str(root / "junit.xml")
 
+def pytest_sessionstart(session):
+    """Ondas (ONDAS=1) só valem sob xdist com REPORTS_DIR; decidido com os plugins já configurados."""
+    definir_ondas(session.config)
+
+@pytest.hookimpl(trylast=True)
+def pytest_collection_modifyitems(config, items):
+    """Com orçamento de tempo ou em ondas, os testes smoke vão para o início da fila (após o -m/-k)."""
+    if orcamento().ativo or ondas_ativas():
+        priorizar_itens(items)
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_runtest_setup(item):
+    """
+    Orçamento esgotado: o teste é pulado e relatado como não executado, sem abrir navegador.
+    Em ondas, o teste de regressão espera aqui a onda smoke terminar.
+    """
+    if orcamento().esgotado():
+        pytest.skip(MOTIVO_ORCAMENTO)
+    if ondas_ativas():
+        aguardar_onda(item)
+
 def pytest_html_report_title(report):
     report.title = "Relatório Unificado Renault"
 
@@ -111,6 +171,11 @@ def pytest_runtest_makereport(item, call):
     outcome = yield
     rep = outcome.get_result()
     setattr(item, "rep_" + rep.when, rep)
+
+    # Navegador do item (parametrizado pelo pytest-playwright) segue no report até o controlador
+    navegador = getattr(getattr(item, "callspec", None), "params", {}).get("browser_name")
+    if navegador and ("navegador", navegador) not in rep.user_properties:
+        rep.user_properties.append(("navegador", navegador))
     
     # Mescla extras acumulados em item.extras no rep_call (padrão da pasta antiga)
     if rep.when == "call":
@@ -133,81 +198,150 @@ def pytest_runtest_makereport(item, call):
 # 3. CAPTURA DE LOGS E DETALHES VISUAIS
 # -----------------------------------------------------------------------------
 
+# Modo completo: linhas de log mantidas em memória para o HTML (o arquivo em logs/ e o fluxo recebem todas)
+LOG_HTML_MAX_LINHAS = 200
+
+def _anexar_logs_html(request, logs):
+    """Anexa as linhas ao HTML (rep_call quando já existe; senão item.extras)."""
+    escaped = _html.escape("\n".join(logs))
+    html = f'<details><summary>Logs</summary><pre>{escaped}</pre></details>'
+    if hasattr(request.node, "rep_call"):
+        extra = getattr(request.node.rep_call, "extra", [])
+        extra.append(pytest_html.extras.html(html))
+        request.node.rep_call.extra = extra
+    else:
+        if not hasattr(request.node, "extras"):
+            request.node.extras = []
+        request.node.extras.append(pytest_html.extras.html(html))
+
+def _teste_falhou(request) -> bool:
+    return any(getattr(getattr(request.node, f"rep_{fase}", None), "failed", False) for fase in ("setup", "call"))
+
 @pytest.fixture(autouse=True)
 def _attach_logs_extras(request, page, reports_dir: Path):
-    """Captura logs do console do browser e anexa ao relatório."""
-    logs = []
-    page.on("console", lambda msg: logs.append(f"[console] {msg.text}"))
-    page.on("pageerror", lambda err: logs.append(f"[error] {err}"))
+    """
+    Captura console/pageerror do browser conforme CONSOLE_CAPTURA (amostrado, completo ou desligado).
+    """
+    if CONSOLE_CAPTURA == "desligado":
+        yield
+    elif CONSOLE_CAPTURA == "completo":
+        yield from _logs_completos(request, page, reports_dir)
+    else:
+        yield from _logs_amostrados(request, page, reports_dir)
+
+def _logs_amostrados(request, page, reports_dir: Path):
+    """
+    Filtro por nível e agrupamento de repetidas acontecem no navegador; o buffer é lido uma vez
+    no teardown e o limite por teste vale para todos os frames somados. Log completo (.txt.gz, com
+    cada ocorrência sem agrupar) só é gravado quando o teste falha.
+    """
+    try:
+        instalar_captura_console(page)
+    except Exception:
+        pass
 
     yield
 
-    if logs:
-        # Salva log na pasta correta (logs/) dentro do report_root
-        log_file = reports_dir / "logs" / f"{request.node.name}.txt"
+    captura = coletar_captura_console(page)
+    if not captura["itens"]:
+        return
+    nodeid = request.node.nodeid
+    fluxo = fluxo_resultados()
+    linhas = []
+    for item in captura["itens"]:
+        texto = formatar_item_console(item)
+        linhas.append(texto)
+        fluxo.emitir(EVENTO_LOG, teste=nodeid, texto=texto, nivel=item.get("nivel"), repeticoes=item.get("n", 1))
+
+    resumo = (f"{captura['total']} mensagens, {len(captura['itens'])} distintas"
+              + (f", {captura['descartadas']} descartadas pelo limite" if captura["descartadas"] else ""))
+    if _teste_falhou(request):
+        try:
+            destino = gravar_log_gzip(reports_dir / "logs" / f"{request.node.name}.txt.gz", captura)
+            resumo += f" | log completo em logs/{destino.name}"
+        except Exception as e:
+            print(f"[AVISO] Falha ao gravar log do console: {e}")
+    _anexar_logs_html(request, [resumo] + linhas)
+
+def _logs_completos(request, page, reports_dir: Path):
+    """
+    Captura logs do console do browser: cada linha vai direto para logs/<teste>.txt e para o fluxo
+    de resultados; em memória fica só o final (LOG_HTML_MAX_LINHAS) para anexar ao relatório.
+    """
+    fluxo = fluxo_resultados()
+    nodeid = request.node.nodeid
+    log_file = reports_dir / "logs" / f"{request.node.name}.txt"
+    ultimas = deque(maxlen=LOG_HTML_MAX_LINHAS)
+    estado = {"total": 0, "arquivo": None}
+
+    def _registrar(texto: str):
+        estado["total"] += 1
+        ultimas.append(texto)
+        fluxo.emitir(EVENTO_LOG, teste=nodeid, texto=texto)
         try:
-            _ensure_dir_exists(log_file.parent)
-            with open(log_file, "w", encoding="utf-8") as f:
-                f.write("\n".join(logs))
+            if estado["arquivo"] is None:
+                _ensure_dir_exists(log_file.parent)
+                estado["arquivo"] = open(log_file, "w", encoding="utf-8")
+            estado["arquivo"].write(texto + "\n")
+            estado["arquivo"].flush()
         except Exception:
             pass
 
-        # Anexa ao HTML (compatível com estrutura antiga)
-        if hasattr(request.node, "rep_call"):
-            extra = getattr(request.node.rep_call, "extra", [])
-            escaped = _html.escape("\n".join(logs))
-            html = f'<details><summary>Logs</summary><pre>{escaped}</pre></details>'
-            extra.append(pytest_html.extras.html(html))
-            request.node.rep_call.extra = extra
-        else:
-            # Fallback: adiciona em item.extras se rep_call não existir
-            if not hasattr(request.node, "extras"):
-                request.node.extras = []
-            escaped = _html.escape("\n".join(logs))
-            html = f'<details><summary>Logs</summary><pre>{escaped}</pre></details>'
-            request.node.extras.append(pytest_html.extras.html(html))
+    page.on("console", lambda msg: _registrar(f"[console] {msg.text}"))
+    page.on("pageerror", lambda err: _registrar(f"[error] {err}"))
 
-# Fixture global para consentimento e geolocalização (antes da navegação)
+    yield
+
+    if estado["arquivo"] is not None:
+        try:
+            estado["arquivo"].close()
+        except Exception:
+            pass
+
+    if estado["total"]:
+        logs = list(ultimas)
+        omitidas = estado["total"] - len(logs)
+        if omitidas > 0:
+            logs.insert(0, f"... {omitidas} linhas anteriores em logs/{log_file.name}")
+        _anexar_logs_html(request, logs)
+
+# Fixture global para indexar frames por papel desde o início do teste
 @pytest.fixture(autouse=True)
-def _consent_and_geo(page):
-    try:
-        # Permissões e geolocalização fixa (SP)
-        page.context.grant_permissions(["geolocation"])  # type: ignore[attr-defined]
-        page.context.set_geolocation({"latitude": -23.55052, "longitude": -46.633308})  # type: ignore[attr-defined]
-    except Exception:
-        pass
+def _rastreador_frames(page):
+    """Assina frameattached/framenavigated/framedetached antes da primeira navegação."""
+    rastreador_frames(page)
 
-    # Injeta consentimento no init script (antes de qualquer script da página)
-    try:
-        page.add_init_script(
-            """
-            (() => {
-              try {
-                localStorage.setItem('REN_ACCEPTED_TRUST', JSON.stringify([
-                  'web-analysis','content-preferences','marketing','social-media'
-                ]));
-                localStorage.setItem('REN_BYPASS', 'true');
-                // Local opcional para reduzir efeitos de geolocalização
-                localStorage.setItem('REN_LOCATION', JSON.stringify({
-                  city: { name: 'São Paulo', location: { latitude: -23.55, longitude: -46.63 } }
-                }));
-              } catch(e) {}
-            })();
-            """
-        )
-    except Exception:
-        pass
+# Fixture global para capturar o catálogo (JSON da própria loja) desde o primeiro carregamento
+@pytest.fixture(autouse=True)
+def _catalogo_site(page):
+    """
+    Assina o evento 'response' antes da primeira navegação (desligável via CATALOGO_ATIVO=false)
+    e grava no teardown, de uma vez, o que o teste descobriu.
+    """
+    catalogo = catalogo_site(page) if CATALOGO_ATIVO else None
+    yield
+    if catalogo is not None:
+        catalogo.salvar_pendente()
 
-    # Cookie opcional para reforçar bypass
-    try:
-        page.context.add_cookies([{
-            "name": "REN_BYPASS", "value": "true",
-            "domain": "loja.renault.com.br", "path": "/",
-            "expires": int(time.time()) + 86400*180,
-            "sameSite": "Lax", "httpOnly": False, "secure": True,
-        }])
-    except Exception:
-        pass
+# Fixture global para servir SDK/tiles de mapa por stub (STUB_MAPAS=1)
+@pytest.fixture(autouse=True)
+def _stub_mapas(page, request):
+    """Mapa falso instantâneo na concessionária; testes @pytest.mark.mapa_real carregam o mapa de verdade."""
+    if STUB_MAPAS and request.node.get_closest_marker("mapa_real") is None:
+        instalar_stub_mapas(page)
+
+# Fixture global para o vigia de estado fatal (antes dos timeouts padrão, que ele acompanha)
+@pytest.fixture(autouse=True)
+def _vigia_fatal(page):
+    """Erro HTTP no documento, página de erro, rajada de pageerror ou crash encerram as esperas na hora (VIGIA_FATAL=false desliga)."""
+    vigia_fatal(page)
+
+# Fixture global para consentimento e geolocalização (antes da navegação)
+@pytest.fixture(autouse=True)
+def _consent_and_geo(page):
+    # Permissões, geolocalização fixa (SP), consentimento no init script e cookie de bypass
+    # (mesma preparação dos contextos novos abertos pelos testes, ver helpers_contexto)
+    preparar_consentimento_e_geo(page)
 
     # Remoção best-effort de overlays modais residuais
     try:
@@ -234,10 +368,50 @@ def browser_context_args(browser_context_args):
 
 @pytest.fixture(scope="function", autouse=True)
 def setup_timeouts(page):
-    page.set_default_timeout(45000)
-    page.set_default_navigation_timeout(60000)
+    # Encolhem à medida que o orçamento da execução (RUN_BUDGET_MIN) é consumido
+    page.set_default_timeout(orcamento().timeout_ms(45000))
+    page.set_default_navigation_timeout(orcamento().timeout_ms(60000))
     yield
 
+# Resultado por navegador (agregado no controlador a partir dos reports dos workers)
+_RESULTADOS_NAVEGADOR = {}
+# Testes pulados por falta de orçamento de tempo (nodeids, no controlador)
+_NAO_EXECUTADOS_ORCAMENTO = []
+
+def _navegador_do_report(report) -> str:
+    return dict(getattr(report, "user_properties", []) or []).get("navegador", "")
+
+def pytest_runtest_logreport(report):
+    navegador = _navegador_do_report(report)
+    # Cada fase vai para o fluxo assim que termina (só o controlador grava, para não duplicar)
+    fluxo = fluxo_resultados()
+    if fluxo.origem == "controlador":
+        detalhe = str(report.longrepr)[-4000:] if report.longrepr else ""
+        fluxo.emitir(EVENTO_TESTE, teste=report.nodeid, quando=report.when, resultado=report.outcome,
+                     duracao=report.duration, navegador=navegador, detalhe=detalhe)
+        # Ondas: o controlador libera a regressão quando o último teste smoke termina
+        if ondas_ativas():
+            controle_ondas().registrar(report)
+    if report.skipped and MOTIVO_ORCAMENTO in str(report.longrepr):
+        _NAO_EXECUTADOS_ORCAMENTO.append(report.nodeid)
+    if not navegador:
+        return
+    # Um resultado por teste: o call, ou o setup quando ele falha/pula; falha no teardown conta como erro
+    if report.when == "call" or (report.when == "setup" and report.outcome != "passed"):
+        resultado = report.outcome
+    elif report.when == "teardown" and report.failed:
+        resultado = "erro"
+    else:
+        return
+    contagem = _RESULTADOS_NAVEGADOR.setdefault(navegador, {})
+    contagem[resultado] = contagem.get(resultado, 0) + 1
+
+def pytest_html_results_table_header(cells):
+    cells.insert(2, '<th class="sortable" data-column-type="navegador">Navegador</th>')
+
+def pytest_html_results_table_row(report, cells):
+    cells.insert(2, f"<td>{_html.escape(_navegador_do_report(report))}</td>")
+
 def pytest_html_results_summary(prefix, summary, postfix):
     """Resumo no topo do HTML - mantém estrutura da pasta antiga."""
     try:
@@ -255,11 +429,85 @@ def pytest_html_results_summary(prefix, summary, postfix):
     if skips > 0:
         prefix.extend([pytest_html.extras.html(f"<p>⚠️ Skips: {skips} testes pulados.</p>")])
 
+    # Orçamento de tempo: o que ficou de fora aparece no topo, não se perde entre os skips
+    if orcamento().ativo:
+        itens = "".join(f"<li>{_html.escape(n)}</li>" for n in _NAO_EXECUTADOS_ORCAMENTO)
+        prefix.extend([pytest_html.extras.html(
+            f"<details><summary>⏳ Orçamento: {_html.escape(orcamento().resumo())} | "
+            f"{len(_NAO_EXECUTADOS_ORCAMENTO)} teste(s) {MOTIVO_ORCAMENTO}</summary><ul>{itens}</ul></details>"
+        )])
+
+    # Execução em ondas: smoke e regressão com resultado e duração próprios
+    ondas = controle_ondas().linhas_resumo() if ondas_ativas() else []
+    if ondas:
+        linhas_ondas = "".join(
+            f"<tr><td>{_html.escape(o['onda'])}</td><td>{o['passou']}</td><td>{o['falhou']}</td>"
+            f"<td>{o['pulado']}</td><td>{o['duracao_s'] / 60:.1f} min</td></tr>"
+            for o in ondas
+        )
+        prefix.extend([pytest_html.extras.html(
+            "<details open><summary>Resultado por onda</summary><table>"
+            "<tr><th>Onda</th><th>Passou</th><th>Falhou</th><th>Pulado</th><th>Duração</th></tr>"
+            f"{linhas_ondas}</table></details>"
+        )])
+
+    # Resultado agrupado por navegador (execução com BROWSER=chromium,firefox,webkit)
+    if _RESULTADOS_NAVEGADOR:
+        linhas_nav = "".join(
+            f"<tr><td>{_html.escape(nav)}</td><td>{c.get('passed', 0)}</td><td>{c.get('failed', 0)}</td>"
+            f"<td>{c.get('skipped', 0)}</td><td>{c.get('erro', 0)}</td></tr>"
+            for nav, c in sorted(_RESULTADOS_NAVEGADOR.items())
+        )
+        prefix.extend([pytest_html.extras.html(
+            "<details open><summary>Resultado por navegador</summary><table>"
+            "<tr><th>Navegador</th><th>Passou</th><th>Falhou</th><th>Pulado</th><th>Erro (teardown)</th></tr>"
+            f"{linhas_nav}</table></details>"
+        )])
+
+    # Taxa de acerto do cache de estratégias nesta execução
+    linhas = resumo_taxa_acerto(execucao=id_execucao())
+    if linhas:
+        itens = "".join(f"<li>{_html.escape(l)}</li>" for l in linhas)
+        prefix.extend([pytest_html.extras.html(f"<details><summary>Cache de estratégias</summary><ul>{itens}</ul></details>")])
+
+def pytest_terminal_summary(terminalreporter, exitstatus, config):
+    """Exibe resultado por navegador e a taxa de acerto do cache de estratégias (apenas no processo principal)."""
+    if hasattr(config, "workerinput"):
+        return
+    if ondas_ativas():
+        terminalreporter.write_sep("-", "resultado por onda")
+        for o in controle_ondas().linhas_resumo():
+            terminalreporter.write_line(f"{o['onda']}: passou={o['passou']} | falhou={o['falhou']} | "
+                                        f"pulado={o['pulado']} | {o['duracao_s'] / 60:.1f} min")
+    if _NAO_EXECUTADOS_ORCAMENTO:
+        terminalreporter.write_sep("-", f"{len(_NAO_EXECUTADOS_ORCAMENTO)} teste(s) {MOTIVO_ORCAMENTO}")
+        for nodeid in _NAO_EXECUTADOS_ORCAMENTO:
+            terminalreporter.write_line(nodeid)
+    if len(_RESULTADOS_NAVEGADOR) > 1:
+        terminalreporter.write_sep("-", "resultado por navegador")
+        for nav, c in sorted(_RESULTADOS_NAVEGADOR.items()):
+            terminalreporter.write_line(f"{nav}: " + " | ".join(f"{k}={v}" for k, v in sorted(c.items())))
+    linhas = resumo_taxa_acerto(execucao=id_execucao())
+    if linhas:
+        terminalreporter.write_sep("-", "cache de estratégias")
+        for l in linhas:
+            terminalreporter.write_line(l)
+
 def pytest_sessionfinish(session, exitstatus):
     """
     Hook executado ao final da sessão de testes.
     Garante que os arquivos de relatório sejam gerados/movidos para o local correto.
     """
+    # Persiste o aprendizado do cache de estratégias e dos custos da jornada deste processo (workers e principal)
+    try:
+        cache_estrategias().salvar()
+    except Exception:
+        pass
+    try:
+        custos_arestas().salvar()
+    except Exception:
+        pass
+
     try:
         config = session.config
         root_str = getattr(config, "_reports_dir", "")
@@ -293,30 +541,28 @@ def pytest_sessionfinish(session, exitstatus):
             except Exception:
                 pass
         
+        # --collect-only e sessões sem testes não geram relatório do fluxo nem entram no histórico
+        # (diluiriam p50/p95 e a taxa de flip e quebrariam "falhando desde")
+        executou_testes = bool(session.testscollected) and not config.option.collectonly
+
+        # Relatório montado a partir do fluxo (também disponível via: python construir_relatorio.py)
+        try:
+            fluxo_resultados().fechar()
+            if executou_testes:
+                construir_relatorio_fluxo(root)
+        except Exception as e:
+            print(f"[AVISO] Falha ao montar relatório do fluxo: {e}")
+
+        # Histórico entre execuções (reports/historico.sqlite) e relatório de tendências
+        if executou_testes:
+            registrar_execucao(root)
+
+        # Snapshots da jornada carregam cookies de sessão: não sobrevivem à execução
+        limpar_snapshots()
+
         # 3. Verifica se há pasta test-results na raiz e move conteúdo para reports
-        # Isso garante que vídeos, screenshots e trace.zip sejam coletados
-        test_results_root = Path("test-results")
-        if test_results_root.exists() and test_results_root.is_dir():
-            try:
-                # Move todas as pastas de testes para dentro do report_root
-                for item in test_results_root.iterdir():
-                    if item.is_dir() and not item.name.startswith('.'):
-                        target_dir = root / item.name
-                        if target_dir.exists():
-                            # Se já existe, mescla o conteúdo (especialmente para trace.zip, vídeos, screenshots)
-                            for file in item.rglob("*"):
-                                if file.is_file():
-                                    rel_path = file.relative_to(item)
-                                    target_file = target_dir / rel_path
-                                    target_file.parent.mkdir(parents=True, exist_ok=True)
-                                    # Sempre copia, substituindo se existir (garante que trace.zip seja atualizado)
-                                    shutil.copy2(file, target_file)
-                        else:
-                            # Move a pasta inteira
-                            shutil.move(str(item), str(target_dir))
-            except Exception:
-                # Não falha o teste se não conseguir mover
-                pass
+        # Isso garante que vídeos, screenshots e trace.zip sejam coletados (rename/hardlink, sem copiar bytes)
+        coletar_artefatos(Path("test-results"), root)
         
         # 4. Garante que os arquivos principais existam (mesmo que vazios, para indicar que o teste rodou)
         if not target_html.exists():
@@ -0,0 +1,162 @@
+"""
+Monta relatório HTML + JUnit a partir do fluxo de resultados (reports/<timestamp>/fluxo/*.jsonl).
+
+Roda automaticamente ao final da sessão (conftest) e também pode ser chamado a qualquer momento,
+inclusive com a execução em andamento ou depois de ela ter sido interrompida:
+
+    python construir_relatorio.py                      # última pasta em reports/
+    python construir_relatorio.py reports/2025-01-01_10-00-00
+"""
+import sys
+import html
+import datetime
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from fluxo_resultados import ler_eventos, EVENTO_TESTE, EVENTO_CELULA, EVENTO_LOG, EVENTO_EVIDENCIA
+
+RELATORIO_FLUXO_HTML = "relatorio_fluxo.html"
+RELATORIO_FLUXO_JUNIT = "junit_fluxo.xml"
+
+# Linhas de log exibidas por teste no HTML (o arquivo em logs/ continua completo)
+LOG_LINHAS_HTML = 200
+
+CABECALHO_MATRIZ = ["Modelo", "Versão", "Seleção", "Inicial", "Cores", "Rodas", "Interior", "Concessionária", "Resultado"]
+
+ICONES = {"passed": "✅", "failed": "❌", "skipped": "⏭️", "erro": "💥", "em andamento": "⏳"}
+
+
+def _ultima_pasta(base: Path = Path("reports")) -> Optional[Path]:
+    pastas = [p for p in base.glob("*") if p.is_dir() and (p / "fluxo").is_dir()]
+    return max(pastas, key=lambda p: p.stat().st_mtime) if pastas else None
+
+
+def resultados_por_teste(raiz: Path) -> Dict[str, Dict]:
+    """
+    Um resultado por teste: call (ou setup quando falha/pula); falha no teardown vira erro.
+    Teste com setup registrado e sem resultado final aparece como 'em andamento' (execução interrompida).
+    """
+    testes: Dict[str, Dict] = {}
+    for ev in ler_eventos(raiz, tipo=EVENTO_TESTE):
+        t = testes.setdefault(ev["teste"], {"teste": ev["teste"], "navegador": ev.get("navegador", ""),
+                                            "resultado": "em andamento", "duracao": 0.0, "detalhe": ""})
+        t["duracao"] += float(ev.get("duracao") or 0)
+        quando, resultado = ev.get("quando"), ev.get("resultado")
+        if quando == "call" or (quando == "setup" and resultado != "passed"):
+            t["resultado"] = resultado
+            t["detalhe"] = ev.get("detalhe") or ""
+        elif quando == "teardown" and resultado == "failed":
+            t["resultado"] = "erro"
+            t["detalhe"] = ev.get("detalhe") or ""
+    return testes
+
+
+def construir_html(raiz: Path) -> Path:
+    raiz = Path(raiz)
+    testes = resultados_por_teste(raiz)
+    evidencias: Dict[str, List[Dict]] = {}
+    for ev in ler_eventos(raiz, tipo=EVENTO_EVIDENCIA):
+        evidencias.setdefault(ev["teste"], []).append(ev)
+    logs: Dict[str, List[str]] = {}
+    for ev in ler_eventos(raiz, tipo=EVENTO_LOG):
+        linhas = logs.setdefault(ev["teste"], [])
+        linhas.append(ev.get("texto", ""))
+        if len(linhas) > LOG_LINHAS_HTML:
+            del linhas[0]
+    celulas: Dict[str, List[Dict]] = {}
+    for ev in ler_eventos(raiz, tipo=EVENTO_CELULA):
+        celulas.setdefault(ev["teste"], []).append(ev)
+
+    por_navegador: Dict[str, List[Dict]] = {}
+    for nodeid in sorted(set(testes) | set(celulas) | set(evidencias)):
+        t = testes.get(nodeid) or {"teste": nodeid, "navegador": "", "resultado": "em andamento", "duracao": 0.0, "detalhe": ""}
+        if not t["navegador"] and celulas.get(nodeid):
+            t["navegador"] = celulas[nodeid][0].get("navegador", "")
+        por_navegador.setdefault(t["navegador"] or "-", []).append(t)
+
+    partes = [
+        "<html><head><meta charset='utf-8'><title>Relatório (fluxo de resultados)</title>",
+        "<style>body{font-family:sans-serif}table{border-collapse:collapse;width:100%}"
+        "td,th{padding:6px;border-bottom:1px solid #eee;text-align:left;vertical-align:top}"
+        "pre{white-space:pre-wrap;max-height:400px;overflow:auto;background:#f7f7f7}</style></head><body>",
+        f"<h1>Relatório (fluxo de resultados)</h1><p>Pasta: {html.escape(str(raiz))} | "
+        f"Gerado em: {datetime.datetime.now():%Y-%m-%d %H:%M:%S}</p>",
+    ]
+    for navegador, lista in sorted(por_navegador.items()):
+        contagem: Dict[str, int] = {}
+        for t in lista:
+            contagem[t["resultado"]] = contagem.get(t["resultado"], 0) + 1
+        resumo = " | ".join(f"{ICONES.get(k, '')} {k}: {v}" for k, v in sorted(contagem.items()))
+        partes.append(f"<h2>Navegador: {html.escape(navegador)}</h2><p>{resumo}</p><table>"
+                      "<tr><th>Resultado</th><th>Teste</th><th>Duração (s)</th><th>Detalhes</th></tr>")
+        for t in lista:
+            nodeid = t["teste"]
+            detalhes = []
+            if t["detalhe"]:
+                detalhes.append(f"<details><summary>Erro</summary><pre>{html.escape(t['detalhe'])}</pre></details>")
+            if celulas.get(nodeid):
+                ths = "".join(f"<th>{h}</th>" for h in CABECALHO_MATRIZ)
+                trs = "".join("<tr>" + "".join(f"<td>{html.escape(str(c))}</td>" for c in ev.get("colunas", [])) + "</tr>" for ev in celulas[nodeid])
+                detalhes.append(f"<details open><summary>📋 Matriz ({len(celulas[nodeid])} células)</summary><table><tr>{ths}</tr>{trs}</table></details>")
+            if evidencias.get(nodeid):
+                links = "".join(f"<li><a href='{html.escape(ev['caminho'])}' target='_blank'>{html.escape(ev.get('titulo', ''))}</a></li>"
+                                for ev in evidencias[nodeid])
+                detalhes.append(f"<details><summary>Evidências ({len(evidencias[nodeid])})</summary><ul>{links}</ul></details>")
+            if logs.get(nodeid):
+                detalhes.append(f"<details><summary>Logs (últimas {len(logs[nodeid])} linhas)</summary><pre>{html.escape(chr(10).join(logs[nodeid]))}</pre></details>")
+            partes.append(f"<tr><td>{ICONES.get(t['resultado'], '')} {html.escape(t['resultado'])}</td><td>{html.escape(nodeid)}</td>"
+                          f"<td>{t['duracao']:.1f}</td><td>{''.join(detalhes)}</td></tr>")
+        partes.append("</table>")
+    partes.append("</body></html>")
+
+    destino = raiz / RELATORIO_FLUXO_HTML
+    destino.write_text("".join(partes), encoding="utf-8")
+    return destino
+
+
+def construir_junit(raiz: Path) -> Path:
+    raiz = Path(raiz)
+    testes = resultados_por_teste(raiz)
+    suite = ET.Element("testsuite", name="renault-fluxo", tests=str(len(testes)))
+    falhas = erros = pulados = 0
+    for nodeid, t in sorted(testes.items()):
+        arquivo, _, nome = nodeid.partition("::")
+        caso = ET.SubElement(suite, "testcase", classname=arquivo.replace("/", ".").removesuffix(".py"),
+                             name=nome or nodeid, time=f"{t['duracao']:.3f}")
+        if t["navegador"]:
+            props = ET.SubElement(caso, "properties")
+            ET.SubElement(props, "property", name="navegador", value=t["navegador"])
+        if t["resultado"] == "failed":
+            falhas += 1
+            ET.SubElement(caso, "failure", message=(t["detalhe"].splitlines() or [""])[-1][:300]).text = t["detalhe"]
+        elif t["resultado"] in ("erro", "em andamento"):
+            erros += 1
+            ET.SubElement(caso, "error", message=t["resultado"]).text = t["detalhe"]
+        elif t["resultado"] == "skipped":
+            pulados += 1
+            ET.SubElement(caso, "skipped", message=t["detalhe"][:300])
+    suite.set("failures", str(falhas))
+    suite.set("errors", str(erros))
+    suite.set("skipped", str(pulados))
+    destino = raiz / RELATORIO_FLUXO_JUNIT
+    ET.ElementTree(suite).write(destino, encoding="utf-8", xml_declaration=True)
+    return destino
+
+
+def construir(raiz: Path) -> List[Path]:
+    return [construir_html(raiz), construir_junit(raiz)]
+
+
+def main(argv: List[str]) -> int:
+    raiz = Path(argv[0]) if argv else _ultima_pasta()
+    if not raiz or not (raiz / "fluxo").is_dir():
+        print("[ERRO] Nenhuma pasta com fluxo de resultados encontrada (informe reports/<timestamp>).")
+        return 1
+    for caminho in construir(raiz):
+        print(f"[INFO] Gerado: {caminho}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
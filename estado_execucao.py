@@ -0,0 +1,148 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+from pathlib import Path
+from typing import Optional
+
+# Estado persistente da matriz entre execuções (fora da pasta com timestamp)
+ESTADO_EXECUCAO_DB = Path(os.getenv("ESTADO_EXECUCAO_DB", "") or (Path("reports") / "estado_execucao.sqlite"))
+
+# Modo da execução, definido pelo run_tests.py e herdado pelos workers: "completo" | "incremental"
+MODO_EXECUCAO = os.getenv("MATRIZ_MODO", "completo").lower()
+
+# No modo incremental, força uma execução completa a cada N execuções
+INCREMENTAL_COMPLETO_A_CADA = int(os.getenv("INCREMENTAL_COMPLETO_A_CADA", "7") or "7")
+
+STATUS_PASSOU = "passou"
+STATUS_FALHOU = "falhou"
+STATUS_BUG_CONHECIDO = "bug_conhecido"
+STATUS_FLAKY = "flaky"  # passou só na retentativa: o modo incremental executa de novo
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS celulas (
+    modelo TEXT NOT NULL,
+    versao TEXT NOT NULL,
+    navegador TEXT NOT NULL,
+    status TEXT NOT NULL,
+    impressao TEXT NOT NULL,
+    execucao TEXT NOT NULL,
+    instante REAL NOT NULL,
+    PRIMARY KEY (modelo, versao, navegador)
+);
+CREATE TABLE IF NOT EXISTS execucoes (
+    id TEXT PRIMARY KEY,
+    modo TEXT NOT NULL,
+    inicio REAL NOT NULL
+);
+"""
+
+
+def _conectar(caminho: Path = ESTADO_EXECUCAO_DB) -> sqlite3.Connection:
+    """Conexão curta por operação; timeout alto porque os workers do xdist gravam em paralelo."""
+    caminho = Path(caminho)
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(caminho), timeout=30)
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+    except sqlite3.DatabaseError:
+        pass
+    conn.executescript(ESQUEMA)
+    return conn
+
+
+def impressao_modelo(catalogo, slug: str, build: str = "") -> str:
+    """
+    Impressão digital do modelo: nomes das versões, cores, rodas e interiores do catálogo
+    + build do configurador. Só nomes (ordenados, sem repetição): preço e ordem dependem de
+    qual resposta chegou primeiro. Calcule uma vez por modelo e use o mesmo valor para
+    decidir e para registrar.
+    """
+    partes = {"build": build or ""}
+    if catalogo is not None and slug:
+        for categoria in ("versoes", "cores", "rodas", "interiores"):
+            partes[categoria] = sorted({i.get("nome") or "" for i in catalogo.itens(slug, categoria)})
+    bruto = json.dumps(partes, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(bruto.encode("utf-8")).hexdigest()[:16]
+
+
+def decidir_modo(incremental: bool, completo_a_cada: int = INCREMENTAL_COMPLETO_A_CADA,
+                 caminho: Path = ESTADO_EXECUCAO_DB) -> str:
+    """
+    Chamado uma vez pelo run_tests.py (antes dos workers): decide o modo da execução.
+    Incremental só quando pedido, houver histórico e a última completa foi há menos de N execuções
+    da matriz (a execução só entra na contagem quando o teste da matriz roda, ver EstadoExecucao.iniciar).
+    """
+    modo = "completo"
+    if not incremental:
+        return modo
+    try:
+        with _conectar(caminho) as conn:
+            linhas = conn.execute("SELECT modo FROM execucoes ORDER BY inicio DESC").fetchall()
+            desde_completa = next((i for i, (m,) in enumerate(linhas) if m == "completo"), None)
+            if desde_completa is not None and desde_completa + 1 < max(completo_a_cada, 1):
+                modo = "incremental"
+    except Exception as e:
+        print(f"[AVISO] Estado de execução indisponível, seguindo com execução completa: {e}")
+        modo = "completo"
+    return modo
+
+
+class EstadoExecucao:
+    """Consulta/registro do resultado por célula (modelo × versão × navegador)."""
+
+    def __init__(self, execucao: str, navegador: str, modo: str = MODO_EXECUCAO, caminho: Path = ESTADO_EXECUCAO_DB):
+        self.execucao = execucao
+        self.navegador = navegador or "chromium"
+        self.modo = modo
+        self.caminho = caminho
+
+    @property
+    def incremental(self) -> bool:
+        return self.modo == "incremental"
+
+    def iniciar(self) -> None:
+        """Registra a execução quando a matriz de fato roda (execuções -m smoke / -k sem a matriz não contam)."""
+        try:
+            with _conectar(self.caminho) as conn:
+                conn.execute(
+                    "INSERT OR IGNORE INTO execucoes (id, modo, inicio) VALUES (?, ?, ?)",
+                    (self.execucao, self.modo, time.time()),
+                )
+        except Exception as e:
+            print(f"[AVISO] Falha ao registrar execução da matriz: {e}")
+
+    def _anterior(self, modelo: str, versao: str) -> Optional[tuple]:
+        try:
+            with _conectar(self.caminho) as conn:
+                return conn.execute(
+                    "SELECT status, impressao FROM celulas WHERE modelo=? AND versao=? AND navegador=?",
+                    (modelo, versao, self.navegador),
+                ).fetchone()
+        except Exception:
+            return None
+
+    def deve_executar(self, modelo: str, versao: str, impressao: str) -> bool:
+        """Executa se o modo for completo, a célula for nova, tiver falhado ou a impressão mudou."""
+        if not self.incremental or not modelo:
+            return True
+        anterior = self._anterior(modelo, versao)
+        return anterior is None or anterior[0] != STATUS_PASSOU or anterior[1] != impressao
+
+    def deve_executar_modelo(self, modelo: str, qtd_versoes: int, impressao: str) -> bool:
+        """Verdadeiro se alguma versão do modelo precisar ser executada (permite pular a navegação)."""
+        return any(self.deve_executar(modelo, f"#{v}", impressao) for v in range(qtd_versoes)) or qtd_versoes <= 0
+
+    def registrar(self, modelo: str, versao: str, status: str, impressao: str) -> None:
+        if not modelo:
+            return
+        try:
+            with _conectar(self.caminho) as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO celulas (modelo, versao, navegador, status, impressao, execucao, instante) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (modelo, versao, self.navegador, status, impressao, self.execucao, time.time()),
+                )
+        except Exception as e:
+            print(f"[AVISO] Falha ao registrar estado da célula {modelo} {versao}: {e}")
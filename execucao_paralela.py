@@ -0,0 +1,83 @@
+import asyncio
+import os
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+
+# Vários BrowserContexts simultâneos dentro de um worker. A API sync do Playwright (a do teste)
+# não é concorrente nem thread-safe, então os contextos rodam na API async, num navegador próprio,
+# numa thread dedicada com seu event loop.
+PARALELO_CONTEXTOS = int(os.getenv("PARALELO_CONTEXTOS", "4") or "4")
+PARALELO_ITEM_TIMEOUT_S = float(os.getenv("PARALELO_ITEM_TIMEOUT_S", "120") or "120")
+
+
+def executar_contextos_paralelos(
+    navegador: str,
+    itens: Sequence[Any],
+    trabalho: Callable[[Any, Any], Awaitable[Optional[Dict]]],
+    context_args: Optional[Dict] = None,
+    args_do_item: Optional[Callable[[Any], Dict]] = None,
+    launch_args: Optional[Dict] = None,
+    preparar: Optional[Callable[[Any], Awaitable[None]]] = None,
+    concorrencia: int = PARALELO_CONTEXTOS,
+    timeout_item_s: float = PARALELO_ITEM_TIMEOUT_S,
+) -> List[Dict]:
+    """
+    Executa `await trabalho(page, item)` para cada item, cada um numa page de um BrowserContext
+    novo (context_args + args_do_item(item), ex.: geolocation/storage_state), com até `concorrencia`
+    contextos abertos ao mesmo tempo. `preparar(contexto)` roda antes de abrir a page.
+    Retorna, na ordem dos itens, o dict devolvido pelo trabalho + duracao_ms (e erro, se falhou);
+    a falha de um item não interrompe os demais.
+    """
+    saida: Dict[str, Any] = {}
+
+    async def _principal() -> List[Dict]:
+        from playwright.async_api import async_playwright
+
+        async with async_playwright() as p:
+            browser = await getattr(p, navegador).launch(**(launch_args or {}))
+            sem = asyncio.Semaphore(max(1, concorrencia))
+
+            async def _um(item) -> Dict:
+                async with sem:
+                    t0 = time.time()
+                    contexto = None
+                    try:
+                        contexto = await browser.new_context(**{**(context_args or {}), **(args_do_item(item) if args_do_item else {})})
+                        if preparar:
+                            await preparar(contexto)
+                        page = await contexto.new_page()
+                        r = dict(await asyncio.wait_for(trabalho(page, item), timeout=timeout_item_s) or {})
+                    except asyncio.TimeoutError:
+                        r = {"erro": f"Tempo esgotado ({timeout_item_s:.0f}s)"}
+                    except Exception as e:
+                        r = {"erro": f"{type(e).__name__}: {e}"}
+                    finally:
+                        if contexto is not None:
+                            try:
+                                await contexto.close()
+                            except Exception:
+                                pass
+                    r.setdefault("duracao_ms", int((time.time() - t0) * 1000))
+                    return r
+
+            try:
+                return list(await asyncio.gather(*[_um(i) for i in itens]))
+            finally:
+                try:
+                    await browser.close()
+                except Exception:
+                    pass
+
+    def _alvo():
+        try:
+            saida["resultados"] = asyncio.run(_principal())
+        except BaseException as e:
+            saida["erro"] = e
+
+    t = threading.Thread(target=_alvo, name="execucao-paralela", daemon=True)
+    t.start()
+    t.join()
+    if "erro" in saida:
+        raise saida["erro"]
+    return saida["resultados"]
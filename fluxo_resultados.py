@@ -0,0 +1,197 @@
+import os
+import re
+import html
+import json
+import time
+import queue
+import threading
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+import pytest_html
+
+# Fluxo append-only por processo (worker do xdist ou controlador) dentro de reports/<timestamp>/
+PASTA_FLUXO = "fluxo"
+PASTA_EVIDENCIAS = "evidencias"
+
+# Tipos de evento gravados no fluxo
+EVENTO_TESTE = "teste"          # resultado de cada fase (emitido pelo controlador)
+EVENTO_CELULA = "celula"        # linha da matriz modelo × versão
+EVENTO_LOG = "log"              # console/pageerror do navegador
+EVENTO_EVIDENCIA = "evidencia"  # screenshot salvo em disco (referenciado pelo caminho)
+EVENTO_ETAPA = "etapa"          # progresso (modelo/versão/etapa atual) para o painel ao vivo
+
+# Fila dos eventos não bloqueantes; cheia = descarta (progresso não pode atrasar o teste)
+FILA_NAO_BLOQUEANTE_MAX = 1000
+
+
+def _slug(texto: str, limite: int = 80) -> str:
+    return re.sub(r"[^A-Za-z0-9._-]+", "_", texto or "").strip("_")[:limite] or "sem_nome"
+
+
+class FluxoResultados:
+    """
+    Grava eventos em <raiz>/fluxo/<origem>.jsonl à medida que acontecem (uma linha JSON por evento,
+    com flush imediato). Nada fica acumulado em memória e, se a execução for interrompida,
+    o que já foi gravado continua legível pelo construir_relatorio.py.
+    """
+
+    def __init__(self, raiz: Path, origem: str):
+        self.raiz = Path(raiz)
+        self.origem = origem
+        self.caminho = self.raiz / PASTA_FLUXO / f"{_slug(origem)}.jsonl"
+        self._arquivo = None
+        self._trava = threading.Lock()
+        self._seq_evidencia = 0
+        self._fila: Optional[queue.Queue] = None
+
+    def emitir(self, tipo: str, **dados) -> None:
+        registro = {"tipo": tipo, "instante": time.time(), "origem": self.origem}
+        registro.update(dados)
+        linha = json.dumps(registro, ensure_ascii=False, default=str)
+        try:
+            with self._trava:
+                if self._arquivo is None:
+                    self.caminho.parent.mkdir(parents=True, exist_ok=True)
+                    self._arquivo = open(self.caminho, "a", encoding="utf-8")
+                self._arquivo.write(linha + "\n")
+                self._arquivo.flush()
+        except Exception as e:
+            print(f"[AVISO] Falha ao gravar no fluxo de resultados: {e}")
+
+    def emitir_sem_bloquear(self, tipo: str, **dados) -> None:
+        """
+        Como emitir(), mas a escrita acontece numa thread: o chamador só enfileira (descarta se a
+        fila estiver cheia). Para eventos de progresso, que não podem atrasar os workers.
+        """
+        if self._fila is None:
+            self._fila = queue.Queue(maxsize=FILA_NAO_BLOQUEANTE_MAX)
+            threading.Thread(target=self._escrever_fila, name="fluxo-resultados", daemon=True).start()
+        dados["instante"] = time.time()
+        try:
+            self._fila.put_nowait((tipo, dados))
+        except queue.Full:
+            pass
+
+    def _escrever_fila(self) -> None:
+        while True:
+            tipo, dados = self._fila.get()
+            # 'instante' dos dados (momento do enfileiramento) prevalece sobre o da escrita
+            self.emitir(tipo, **dados)
+            self._fila.task_done()
+
+    def ler(self, tipo: Optional[str] = None, teste: Optional[str] = None) -> List[Dict]:
+        """Eventos já gravados por este processo (ex.: linhas da matriz do teste atual)."""
+        return list(ler_eventos(self.raiz, tipo=tipo, teste=teste, arquivos=[self.caminho]))
+
+    def proximo_seq_evidencia(self) -> int:
+        self._seq_evidencia += 1
+        return self._seq_evidencia
+
+    def fechar(self) -> None:
+        if self._fila is not None:
+            self._fila.join()
+        with self._trava:
+            if self._arquivo is not None:
+                try:
+                    self._arquivo.close()
+                except Exception:
+                    pass
+                self._arquivo = None
+
+
+_FLUXO: Optional[FluxoResultados] = None
+
+
+def configurar_fluxo(raiz: Path, origem: str) -> FluxoResultados:
+    """Chamado pelo conftest (pytest_configure) com a pasta da execução e o id do processo."""
+    global _FLUXO
+    if _FLUXO is not None:
+        _FLUXO.fechar()
+    _FLUXO = FluxoResultados(raiz, origem)
+    return _FLUXO
+
+
+def fluxo_resultados() -> FluxoResultados:
+    global _FLUXO
+    if _FLUXO is None:
+        raiz = Path(os.getenv("REPORTS_DIR", "") or (Path("reports") / "local"))
+        _FLUXO = FluxoResultados(raiz, f"pid{os.getpid()}")
+    return _FLUXO
+
+
+def ler_eventos(raiz: Path, tipo: Optional[str] = None, teste: Optional[str] = None,
+                arquivos: Optional[List[Path]] = None) -> Iterator[Dict]:
+    """
+    Lê os eventos de todos os processos (ou dos arquivos informados), um a um.
+    Linha truncada (processo morto no meio da escrita) é ignorada.
+    """
+    if arquivos is None:
+        arquivos = sorted((Path(raiz) / PASTA_FLUXO).glob("*.jsonl"))
+    for arquivo in arquivos:
+        try:
+            with open(arquivo, "r", encoding="utf-8") as f:
+                for linha in f:
+                    try:
+                        evento = json.loads(linha)
+                    except ValueError:
+                        continue
+                    if tipo and evento.get("tipo") != tipo:
+                        continue
+                    if teste and evento.get("teste") != teste:
+                        continue
+                    yield evento
+        except FileNotFoundError:
+            continue
+
+
+def marcar_etapa(request, etapa: str, **info) -> None:
+    """Progresso do teste (ex.: modelo, versao, navegador) para o painel ao vivo; nunca bloqueia."""
+    try:
+        fluxo_resultados().emitir_sem_bloquear(EVENTO_ETAPA, teste=request.node.nodeid, etapa=etapa, **info)
+    except Exception:
+        pass
+
+
+def _registrar_evidencia(request, titulo: str, gravar) -> Path:
+    fluxo = fluxo_resultados()
+    nodeid = request.node.nodeid
+    relativo = Path(PASTA_EVIDENCIAS) / _slug(nodeid, 120) / f"{fluxo.proximo_seq_evidencia():03d}_{_slug(titulo)}.png"
+    destino = fluxo.raiz / relativo
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    gravar(destino)
+    fluxo.emitir(EVENTO_EVIDENCIA, teste=nodeid, titulo=titulo, caminho=relativo.as_posix())
+
+    trecho = (
+        f"<details><summary>{html.escape(titulo)}</summary><a href='{relativo.as_posix()}' target='_blank'>"
+        f"<img src='{relativo.as_posix()}' loading='lazy' style='max-width:640px;border:1px solid #ccc'/></a></details>"
+    )
+    # item.extras é mesclado no rep_call pelo hook pytest_runtest_makereport do conftest
+    if not hasattr(request.node, "extras"):
+        request.node.extras = []
+    request.node.extras.append(pytest_html.extras.html(trecho))
+    return destino
+
+
+def anexar_evidencia(request, page_or_frame, titulo: str) -> Optional[Path]:
+    """
+    Salva screenshot em <raiz>/evidencias/<teste>/NNN_<titulo>.png, registra a referência no fluxo
+    e anexa ao HTML apenas o link (sem base64 em memória). Retorna o caminho salvo.
+    """
+    try:
+        page = page_or_frame if hasattr(page_or_frame, "screenshot") else getattr(page_or_frame, "page", None)
+        if not page:
+            return None
+        return _registrar_evidencia(request, titulo, lambda destino: page.screenshot(path=str(destino), full_page=False))
+    except Exception:
+        return None
+
+
+def anexar_evidencia_png(request, png: bytes, titulo: str) -> Optional[Path]:
+    """anexar_evidencia() para um screenshot já capturado (ex.: por um contexto da API async)."""
+    if not png:
+        return None
+    try:
+        return _registrar_evidencia(request, titulo, lambda destino: destino.write_bytes(png))
+    except Exception:
+        return None
@@ -0,0 +1,70 @@
+import os
+import json
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+# Trava considerada órfã (processo morto) depois deste tempo
+TRAVA_ORFA_S = 30
+
+
+@contextmanager
+def trava_arquivo(caminho: Path, timeout_s: float = 10.0, intervalo_s: float = 0.05, orfa_s: float = TRAVA_ORFA_S):
+    """
+    Trava exclusiva entre processos (workers do xdist e execuções simultâneas) baseada em
+    criação atômica de '<arquivo>.lock'. Portável (Windows/Linux), sem dependências.
+    Se não conseguir a trava no tempo limite, segue sem ela (best-effort).
+    - orfa_s: idade a partir da qual a trava é considerada de processo morto (aumente para seções longas)
+    """
+    trava = Path(str(caminho) + ".lock")
+    try:
+        trava.parent.mkdir(parents=True, exist_ok=True)
+    except Exception:
+        pass
+    obtida = False
+    fim = time.time() + timeout_s
+    while True:
+        try:
+            fd = os.open(str(trava), os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            os.close(fd)
+            obtida = True
+            break
+        except FileExistsError:
+            try:
+                if time.time() - trava.stat().st_mtime > orfa_s:
+                    trava.unlink()
+                    continue
+            except Exception:
+                pass
+            if time.time() > fim:
+                break
+            time.sleep(intervalo_s)
+        except Exception:
+            break
+    try:
+        yield obtida
+    finally:
+        if obtida:
+            try:
+                trava.unlink()
+            except Exception:
+                pass
+
+
+def ler_json(caminho: Path, padrao=None):
+    """Lê JSON tolerando arquivo inexistente/corrompido (retorna `padrao`)."""
+    try:
+        with open(caminho, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception:
+        return padrao
+
+
+def gravar_json_atomico(caminho: Path, dados) -> None:
+    """Grava JSON via arquivo temporário + os.replace (leitores nunca veem arquivo pela metade)."""
+    caminho = Path(caminho)
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    tmp = caminho.with_name(f"{caminho.name}.{os.getpid()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(dados, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, caminho)
@@ -0,0 +1,347 @@
+import os
+import re
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+from playwright.sync_api import Page
+
+from helpers_arquivos import trava_arquivo, ler_json, gravar_json_atomico
+from helpers_estrategias import build_do_site
+from helpers_frames import frame_por_papel
+
+# Catálogo descoberto a partir do JSON que a própria SPA baixa (modelos, versões, cores, rodas,
+# interiores e preços). Compartilhado entre workers da mesma execução em REPORTS_DIR/catalogo.json.
+CATALOGO_ATIVO = os.getenv("CATALOGO_ATIVO", "true").lower() in ("1", "true", "yes", "on")
+CATALOGO_VALIDAR_PRECOS = os.getenv("CATALOGO_VALIDAR_PRECOS", "true").lower() in ("1", "true", "yes", "on")
+# Divergência de preço só avisa e fica registrada (REPORTS_DIR/divergencias_preco.json);
+# CATALOGO_FALHAR_PRECOS=true faz o teste falhar
+CATALOGO_FALHAR_PRECOS = os.getenv("CATALOGO_FALHAR_PRECOS", "false").lower() in ("1", "true", "yes", "on")
+
+# Respostas maiores que isso não são inspecionadas (bundles, mapas, etc.)
+TAMANHO_MAX_RESPOSTA = 3 * 1024 * 1024
+
+# Só respostas fetch/xhr com URL de API/catálogo são lidas (o resto nem é parseado);
+# ajuste CATALOGO_URL_REGEX se a loja mudar o endereço do feed
+URL_CATALOGO_REGEX = re.compile(
+    os.getenv("CATALOGO_URL_REGEX", "")
+    or r"/api/|graphql|/_next/data/|catalog|vehicle|veicul|model|version|vers[aã]o|versoes|price|pre[cç]o|offer|oferta|\.json(\?|$)",
+    re.I,
+)
+TIPOS_RECURSO_CATALOGO = ("fetch", "xhr")
+
+URL_IGNORADA_REGEX = re.compile(r"google|gstatic|facebook|doubleclick|analytics|hotjar|clarity|3dv\.renault\.com|\.js(\?|$)", re.I)
+SLUG_CONFIGURADOR_REGEX = re.compile(r"/configurador/([a-z0-9][a-z0-9-]*)/", re.I)
+
+# Chaves que identificam listas de cada categoria no JSON
+CATEGORIAS = {
+    "versoes": re.compile(r"^(versions?|versoes|versao|trims?|grades?|finishes)$", re.I),
+    "cores": re.compile(r"^(colou?rs?|cores|paints?|pinturas?)$", re.I),
+    "rodas": re.compile(r"^(wheels?|rodas|rims?)$", re.I),
+    "interiores": re.compile(r"^(interiors?|interiores|upholster(y|ies)|estofamentos?|bancos)$", re.I),
+}
+CHAVE_NOME_REGEX = re.compile(r"^(name|nome|label|title|titulo|description|descricao|displayName|commercialName)$", re.I)
+CHAVE_PRECO_REGEX = re.compile(r"(price|preco|preço|valor|amount)", re.I)
+PRECO_UI_REGEX = re.compile(r"R\$\s*(\d{1,3}(?:\.\d{3})+|\d+)(?:,(\d{2}))?")
+
+# Diferença tolerada (R$) entre preço exibido e preço do catálogo
+TOLERANCIA_PRECO = 1.0
+
+# Descoberta compartilhada (home + catálogo): quanto esperar por quem já está descobrindo
+DESCOBERTA_TIMEOUT_S = int(os.getenv("DESCOBERTA_TIMEOUT_S", "180") or "180")
+
+
+def _caminho_catalogo() -> Optional[Path]:
+    """Arquivo do catálogo da execução atual (None fora do run_tests.py: catálogo só em memória)."""
+    base = os.getenv("REPORTS_DIR")
+    return Path(base) / "catalogo.json" if base else None
+
+
+def _nome(item: dict) -> Optional[str]:
+    for k, v in item.items():
+        if CHAVE_NOME_REGEX.match(k) and isinstance(v, str) and v.strip():
+            return v.strip()
+    return None
+
+
+def _preco(item: dict) -> Optional[float]:
+    """Primeiro valor numérico em chave de preço (aceita {'price': {'value': 123}})."""
+    for k, v in item.items():
+        if not CHAVE_PRECO_REGEX.search(k):
+            continue
+        if isinstance(v, dict):
+            v = next((x for x in v.values() if isinstance(x, (int, float)) and not isinstance(x, bool)), None)
+        if isinstance(v, str):
+            try:
+                v = float(v.replace(".", "").replace(",", ".")) if "," in v else float(v)
+            except ValueError:
+                v = None
+        if isinstance(v, (int, float)) and not isinstance(v, bool) and v > 0:
+            return float(v)
+    return None
+
+
+def extrair_catalogo(dados) -> Dict[str, object]:
+    """
+    Varre um JSON qualquer procurando listas de versões/cores/rodas/interiores (pela chave)
+    e slugs de modelos (links /configurador/<slug>/). Heurístico: o formato da API não é fixo.
+    """
+    achado = {"modelos": set(), "versoes": [], "cores": [], "rodas": [], "interiores": []}
+
+    def visitar(no, profundidade=0):
+        if profundidade > 12:
+            return
+        if isinstance(no, dict):
+            for k, v in no.items():
+                if isinstance(v, list) and v and all(isinstance(i, dict) for i in v):
+                    for categoria, rx in CATEGORIAS.items():
+                        if rx.match(k):
+                            for item in v:
+                                nome = _nome(item)
+                                if nome:
+                                    achado[categoria].append({"nome": nome, "preco": _preco(item)})
+                visitar(v, profundidade + 1)
+        elif isinstance(no, list):
+            for i in no:
+                visitar(i, profundidade + 1)
+        elif isinstance(no, str) and "/configurador/" in no:
+            for slug in SLUG_CONFIGURADOR_REGEX.findall(no):
+                achado["modelos"].add(slug.lower())
+
+    visitar(dados)
+    return achado
+
+
+def _mesclar(destino: List[dict], novos: List[dict]) -> bool:
+    """Une listas por nome; preço conhecido prevalece sobre desconhecido."""
+    por_nome = {i["nome"]: i for i in destino}
+    mudou = False
+    for item in novos:
+        atual = por_nome.get(item["nome"])
+        if atual is None:
+            destino.append(dict(item))
+            por_nome[item["nome"]] = destino[-1]
+            mudou = True
+        elif atual.get("preco") is None and item.get("preco") is not None:
+            atual["preco"] = item["preco"]
+            mudou = True
+    return mudou
+
+
+class CatalogoSite:
+    """
+    Captura (via evento 'response') o JSON que a loja já baixa e monta o catálogo:
+    {"modelos": {slug: {"versoes": [...], "cores": [...], "rodas": [...], "interiores": [...]}}, "fontes": [...]}
+    Dados sem modelo identificável (nem pela URL do frame/página, nem pela URL da resposta) só contribuem slugs.
+    As mudanças ficam em memória e são gravadas em lote no teardown (ou ao fechar a página).
+    """
+
+    def __init__(self, page: Page):
+        self.page = page
+        self.caminho = _caminho_catalogo()
+        self.dados = {"modelos": {}, "fontes": []}
+        self._pendente = False
+        self._lidas = set()
+        self.recarregar()
+        page.on("response", self._ao_responder)
+        page.on("close", lambda _: self.salvar_pendente())
+
+    def recarregar(self) -> None:
+        """Incorpora o que outros workers/navegadores já gravaram no catálogo da execução."""
+        disco = ler_json(self.caminho, None) if self.caminho else None
+        if isinstance(disco, dict):
+            self._incorporar(disco)
+
+    def _incorporar(self, disco: dict) -> None:
+        for slug, cats in (disco.get("modelos") or {}).items():
+            modelo = self.dados["modelos"].setdefault(slug, {})
+            for categoria, itens in (cats or {}).items():
+                _mesclar(modelo.setdefault(categoria, []), itens)
+        fontes = self.dados.setdefault("fontes", [])
+        fontes.extend(u for u in disco.get("fontes") or [] if u not in fontes)
+        for chave, valor in disco.items():
+            self.dados.setdefault(chave, valor)
+
+    def _ao_responder(self, response) -> None:
+        try:
+            url = response.url or ""
+            if response.status != 200 or url in self._lidas or URL_IGNORADA_REGEX.search(url):
+                return
+            if not URL_CATALOGO_REGEX.search(url) or response.request.resource_type not in TIPOS_RECURSO_CATALOGO:
+                return
+            if "json" not in (response.headers.get("content-type") or "").lower():
+                return
+            if int(response.headers.get("content-length") or 0) > TAMANHO_MAX_RESPOSTA:
+                return
+            self._lidas.add(url)
+            achado = extrair_catalogo(response.json())
+            # Frame que pediu o JSON (o configurador pode estar num iframe), depois página e a própria URL
+            slug = slug_modelo(getattr(response.frame, "url", "")) or slug_da_pagina(self.page) or slug_modelo(url)
+            self.ingerir(url, achado, slug)
+        except Exception:
+            pass
+
+    def ingerir(self, url: str, achado: Dict[str, object], slug: Optional[str]) -> None:
+        mudou = False
+        modelos = self.dados.setdefault("modelos", {})
+        for s in achado.get("modelos") or []:
+            if s not in modelos:
+                modelos[s] = {}
+                mudou = True
+        if slug:
+            modelo = modelos.setdefault(slug, {})
+            for categoria in CATEGORIAS:
+                if achado.get(categoria):
+                    mudou |= _mesclar(modelo.setdefault(categoria, []), achado[categoria])
+        if mudou:
+            fontes = self.dados.setdefault("fontes", [])
+            if url not in fontes:
+                fontes.append(url)
+            self._pendente = True
+
+    def salvar_pendente(self) -> None:
+        """Grava as mudanças acumuladas desde a última gravação (chamado no teardown)."""
+        if self._pendente:
+            self.salvar()
+
+    def salvar(self) -> None:
+        """Mescla no arquivo da execução (outros workers podem ter descoberto outros modelos)."""
+        if not self.caminho:
+            return
+        try:
+            with trava_arquivo(self.caminho):
+                self._incorporar(ler_json(self.caminho, {}) or {})
+                gravar_json_atomico(self.caminho, self.dados)
+            self._pendente = False
+        except Exception as e:
+            print(f"[AVISO] Falha ao salvar catálogo: {e}")
+
+    # -------------------------------------------------------------------------
+    # Consulta
+    # -------------------------------------------------------------------------
+
+    def modelos(self) -> List[str]:
+        return sorted(self.dados.get("modelos") or {})
+
+    @property
+    def build(self) -> Optional[str]:
+        """Build do site registrado pela descoberta compartilhada."""
+        return self.dados.get("build")
+
+    def itens(self, slug: str, categoria: str) -> List[dict]:
+        return list(((self.dados.get("modelos") or {}).get((slug or "").lower()) or {}).get(categoria) or [])
+
+    def qtd_versoes(self, slug: str) -> int:
+        """Quantidade de versões conhecidas do modelo (0 = catálogo não sabe)."""
+        return len(self.itens(slug, "versoes"))
+
+    def precos(self, slug: str) -> List[float]:
+        return [i["preco"] for i in self.itens(slug, "versoes") if i.get("preco")]
+
+
+def catalogo_site(page: Page) -> CatalogoSite:
+    """Retorna (criando na primeira chamada) o catálogo associado à página."""
+    catalogo = getattr(page, "_catalogo_site", None)
+    if catalogo is None:
+        catalogo = CatalogoSite(page)
+        setattr(page, "_catalogo_site", catalogo)
+    return catalogo
+
+
+def descoberta_compartilhada(page: Page, descobrir: Callable[[], None]) -> bool:
+    """
+    Executa `descobrir` (ex.: abrir e rolar a home) uma única vez por execução, entre todos os
+    workers e navegadores. Quem chega depois espera a trava e reaproveita modelos + build do catálogo.
+    Retorna True se esta chamada fez a descoberta.
+    """
+    catalogo = catalogo_site(page)
+    if not catalogo.caminho:
+        descobrir()
+        catalogo.dados["build"] = build_do_site(page)
+        return True
+    trava = Path(str(catalogo.caminho) + ".descoberta")
+    with trava_arquivo(trava, timeout_s=DESCOBERTA_TIMEOUT_S, intervalo_s=0.5, orfa_s=DESCOBERTA_TIMEOUT_S):
+        catalogo.recarregar()
+        if catalogo.build:
+            # Já descoberto por outro worker/navegador (sem modelos no JSON, cada um recai na home)
+            print(f"[INFO] Descoberta reaproveitada do catálogo da execução ({len(catalogo.modelos())} modelos).")
+            return False
+        descobrir()
+        catalogo.dados["build"] = build_do_site(page)
+        catalogo.salvar()
+        return True
+
+
+def slug_modelo(url: str) -> Optional[str]:
+    m = SLUG_CONFIGURADOR_REGEX.search(url or "")
+    return m.group(1).lower() if m else None
+
+
+def slug_da_pagina(page: Page) -> Optional[str]:
+    """Modelo atual pela URL da página ou, com o configurador em iframe, pela URL do frame dele."""
+    slug = slug_modelo(page.url)
+    if slug:
+        return slug
+    frame = frame_por_papel(page, "configurador")
+    if frame is not None:
+        return slug_modelo(frame.url)
+    try:
+        return next((s for s in (slug_modelo(f.url) for f in page.frames) if s), None)
+    except Exception:
+        return None
+
+
+def precos_na_tela(texto: str) -> List[float]:
+    """Valores 'R$ 109.990' / 'R$ 109.990,00' encontrados no texto."""
+    valores = []
+    for inteiro, centavos in PRECO_UI_REGEX.findall(texto or ""):
+        try:
+            valores.append(float(inteiro.replace(".", "")) + (int(centavos) / 100.0 if centavos else 0.0))
+        except ValueError:
+            pass
+    return valores
+
+
+def preco_confere(valor_ui: float, valor_catalogo: float) -> bool:
+    """Compara tolerando catálogo em centavos."""
+    return any(abs(valor_ui - v) <= TOLERANCIA_PRECO for v in (valor_catalogo, valor_catalogo / 100.0))
+
+
+def divergencias_preco(page: Page, ctx) -> Optional[List[float]]:
+    """
+    Confronta os preços exibidos com os do catálogo do modelo atual.
+    Retorna None quando não há base de comparação (catálogo sem preços ou tela sem preços);
+    senão a lista de preços da tela (vazia = algum preço conferiu com o catálogo).
+    """
+    esperados = catalogo_site(page).precos(slug_da_pagina(page))
+    if not esperados:
+        return None
+    try:
+        tela = precos_na_tela(ctx.evaluate("() => document.body.innerText || ''"))
+    except Exception:
+        return None
+    if not tela:
+        return None
+    if any(preco_confere(v, e) for v in tela for e in esperados):
+        return []
+    return tela
+
+
+def registrar_divergencia_preco(page: Page, contexto: str, tela: List[float]) -> str:
+    """
+    Registra a divergência em REPORTS_DIR/divergencias_preco.json (compartilhado entre workers)
+    e devolve a mensagem de aviso. Fora do run_tests.py só monta a mensagem.
+    """
+    slug = slug_da_pagina(page)
+    esperados = catalogo_site(page).precos(slug)
+    mensagem = f"[{contexto}] Preços exibidos não conferem com o catálogo. Tela: {tela[:5]} | Catálogo: {esperados[:5]}"
+    base = os.getenv("REPORTS_DIR")
+    if base:
+        caminho = Path(base) / "divergencias_preco.json"
+        registro = {"contexto": contexto, "modelo": slug, "url": page.url, "tela": tela[:5], "catalogo": esperados[:5]}
+        try:
+            with trava_arquivo(caminho):
+                registros = ler_json(caminho, []) or []
+                registros.append(registro)
+                gravar_json_atomico(caminho, registros)
+        except Exception as e:
+            print(f"[AVISO] Falha ao registrar divergência de preço: {e}")
+    return mensagem
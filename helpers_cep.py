@@ -0,0 +1,285 @@
+import os
+import re
+import json
+import time
+from pathlib import Path
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+from playwright.sync_api import Page
+
+from helpers_arquivos import trava_arquivo, ler_json, gravar_json_atomico
+
+# Busca de concessionárias por CEP.
+# - observar (padrão): aprende qual requisição a página faz na busca, guarda a resposta por CEP
+#   e, nas células seguintes, preenche o campo de uma vez e espera só por essa resposta
+# - replay: além disso, serve a resposta do cache via page.route (sem ir à rede)
+# - desligado: sem cache; espera a lista aparecer
+# Compartilhado entre workers da mesma execução em REPORTS_DIR/cache_cep.json.
+CEP_CACHE_MODO = (os.getenv("CEP_CACHE_MODO", "observar") or "observar").strip().lower()
+CEP_RESPOSTA_TIMEOUT_MS = int(os.getenv("CEP_RESPOSTA_TIMEOUT_MS", "8000"))
+CEP_LISTA_TIMEOUT_MS = int(os.getenv("CEP_LISTA_TIMEOUT_MS", "5000"))
+# Quanto esperar a lista vir sozinha (geolocalização/CEP padrão) antes de decidir digitar o CEP
+CEP_LISTA_AUTOMATICA_TIMEOUT_MS = int(os.getenv("CEP_LISTA_AUTOMATICA_TIMEOUT_MS", "3000"))
+
+# Enquanto o endpoint não foi aprendido: XHR/fetch JSON cuja URL parece a busca de dealers
+CEP_API_REGEX = re.compile(os.getenv("CEP_API_REGEX", "") or r"dealer|concession|store-?locator|lojas|pontos?-de-venda", re.I)
+
+SELETOR_CEP = 'input[placeholder*="CEP" i], input[name*="cep" i], input[type="search"]'
+SELETOR_LISTA = '[id^="button-"] , [data-testid*="dealer-card"], [class*="dealer"], [class*="store-list"], li:has-text("km")'
+BOTAO_BUSCAR_REGEX = re.compile(r"Buscar|Procurar|Pesquisar|OK|Confirmar|Aplicar|Ir", re.I)
+
+CACHE_CEP_ARQUIVO = "cache_cep.json"
+
+
+def _digitos(cep: str) -> str:
+    return re.sub(r"\D", "", cep or "")
+
+
+def lista_de_dealers(corpo: str) -> bool:
+    """Corpo JSON contém uma lista de objetos (a lista de concessionárias), no topo ou em até 3 níveis."""
+    try:
+        dados = json.loads(corpo)
+    except (TypeError, ValueError):
+        return False
+
+    def _procurar(no, profundidade=0) -> bool:
+        if isinstance(no, list):
+            return bool(no) and all(isinstance(i, dict) for i in no)
+        if isinstance(no, dict) and profundidade < 3:
+            return any(_procurar(v, profundidade + 1) for v in no.values())
+        return False
+    return _procurar(dados)
+
+
+def _endpoint(url: str) -> str:
+    """URL sem query/fragmento (o mesmo endpoint atende CEPs diferentes)."""
+    p = urlsplit(url or "")
+    return f"{p.scheme}://{p.netloc}{p.path}"
+
+
+class CacheBuscaCep:
+    """
+    Endpoint aprendido + respostas por CEP (url, método, corpo da requisição, status, content-type, corpo).
+    Sem REPORTS_DIR (fora do run_tests.py) fica só em memória.
+    """
+
+    def __init__(self):
+        base = os.getenv("REPORTS_DIR")
+        self.caminho: Optional[Path] = Path(base) / CACHE_CEP_ARQUIVO if base else None
+        self.dados: Dict = {}
+        self.recarregar()
+
+    def recarregar(self) -> None:
+        if self.caminho:
+            self.dados = ler_json(self.caminho, {}) or {}
+
+    @property
+    def endpoint(self) -> Optional[str]:
+        return self.dados.get("endpoint")
+
+    def resposta(self, cep: str) -> Optional[Dict]:
+        return (self.dados.get("respostas") or {}).get(_digitos(cep))
+
+    def resposta_da_requisicao(self, request) -> Optional[Dict]:
+        """Entrada gravada para exatamente esta requisição (mesma URL, método e corpo)."""
+        try:
+            chave = (request.url, request.method, request.post_data or "")
+        except Exception:
+            return None
+        for entrada in (self.dados.get("respostas") or {}).values():
+            if (entrada.get("url"), entrada.get("metodo"), entrada.get("post") or "") == chave:
+                return entrada
+        return None
+
+    def guardar(self, cep: str, response) -> None:
+        """Aprende o endpoint e guarda a resposta, só se o corpo tiver o formato de uma lista de dealers."""
+        try:
+            entrada = {
+                "url": response.url,
+                "metodo": response.request.method,
+                "post": response.request.post_data or "",
+                "status": response.status,
+                "content_type": response.headers.get("content-type") or "application/json",
+                "corpo": response.text(),
+            }
+        except Exception as e:
+            print(f"[AVISO] Resposta da busca por CEP não pôde ser lida: {e}")
+            return
+        if not lista_de_dealers(entrada["corpo"]):
+            print(f"[AVISO] Resposta de {_endpoint(response.url)} não tem lista de concessionárias; não aprendida")
+            return
+        self.dados["endpoint"] = _endpoint(response.url)
+        self.dados.setdefault("respostas", {})[_digitos(cep)] = entrada
+        if not self.caminho:
+            return
+        try:
+            with trava_arquivo(self.caminho):
+                dados = ler_json(self.caminho, {}) or {}
+                dados["endpoint"] = self.dados["endpoint"]
+                dados.setdefault("respostas", {})[_digitos(cep)] = entrada
+                gravar_json_atomico(self.caminho, dados)
+                self.dados = dados
+        except Exception as e:
+            print(f"[AVISO] Falha ao salvar cache de CEP: {e}")
+
+
+    def descartar(self, cep: str) -> None:
+        """Remove a resposta do CEP (replay que não trouxe a lista não pode se repetir)."""
+        (self.dados.get("respostas") or {}).pop(_digitos(cep), None)
+        if not self.caminho:
+            return
+        try:
+            with trava_arquivo(self.caminho):
+                dados = ler_json(self.caminho, {}) or {}
+                if (dados.get("respostas") or {}).pop(_digitos(cep), None) is not None:
+                    gravar_json_atomico(self.caminho, dados)
+                self.dados = dados
+        except Exception as e:
+            print(f"[AVISO] Falha ao descartar CEP {cep} do cache: {e}")
+
+
+_CACHE: Optional[CacheBuscaCep] = None
+
+
+def cache_busca_cep() -> CacheBuscaCep:
+    """Cache carregado uma vez por processo (relido a cada busca para ver o que outros workers gravaram)."""
+    global _CACHE
+    if _CACHE is None:
+        _CACHE = CacheBuscaCep()
+    return _CACHE
+
+
+def instalar_replay_cep(page: Page, cache: Optional[CacheBuscaCep] = None) -> None:
+    """Serve do cache as requisições de busca já vistas; o resto segue para a rede."""
+    if getattr(page, "_replay_cep", False):
+        return
+    cache = cache or cache_busca_cep()
+
+    def _do_endpoint(url: str) -> bool:
+        return bool(cache.endpoint) and _endpoint(url) == cache.endpoint
+
+    def _servir(route):
+        entrada = cache.resposta_da_requisicao(route.request)
+        if entrada is None:
+            route.continue_()
+            return
+        route.fulfill(status=entrada.get("status") or 200, content_type=entrada.get("content_type"), body=entrada.get("corpo") or "")
+
+    try:
+        page.route(_do_endpoint, _servir)
+        setattr(page, "_replay_cep", True)
+    except Exception as e:
+        print(f"[AVISO] Replay da busca por CEP não instalado: {e}")
+
+
+def predicado_busca_cep(cache: Optional[CacheBuscaCep] = None):
+    """Predicado de expect_response para a resposta da busca (serve para a API sync e a async)."""
+    cache = cache or cache_busca_cep()
+
+    def _casa(response) -> bool:
+        try:
+            if response.request.resource_type not in ("xhr", "fetch"):
+                return False
+            if cache.endpoint:
+                return _endpoint(response.url) == cache.endpoint
+            return bool(CEP_API_REGEX.search(response.url)) and "json" in (response.headers.get("content-type") or "").lower()
+        except Exception:
+            return False
+    return _casa
+
+
+def _preencher_e_enviar(ctx, campo, cep: str, botao_regex: re.Pattern) -> None:
+    campo.click(force=True)
+    campo.fill(cep)
+    # Máscaras que só reagem a teclado: digita de uma vez (sem delay) se o fill não pegou
+    try:
+        if _digitos(campo.input_value()) != _digitos(cep):
+            campo.fill("")
+            campo.type(cep)
+    except Exception:
+        pass
+
+    try:
+        btn = ctx.get_by_role("button", name=botao_regex).first
+        if btn.count() > 0 and btn.is_visible():
+            btn.click(force=True, timeout=3000)
+            return
+    except Exception:
+        pass
+    campo.press("Enter")
+
+
+def lista_concessionarias_visivel(ctx) -> bool:
+    try:
+        lista = ctx.locator(SELETOR_LISTA)
+        return lista.count() > 0 and lista.first.is_visible()
+    except Exception:
+        return False
+
+
+def aguardar_lista_concessionarias(ctx, timeout_ms: int = CEP_LISTA_AUTOMATICA_TIMEOUT_MS) -> bool:
+    """Espera (limitada) a lista aparecer sozinha; True se ficou visível."""
+    try:
+        ctx.locator(SELETOR_LISTA).first.wait_for(state="visible", timeout=timeout_ms)
+        return True
+    except Exception:
+        return lista_concessionarias_visivel(ctx)
+
+
+def buscar_concessionarias_por_cep(ctx, page: Page, cep: str = "01001-000", botao_regex: re.Pattern = BOTAO_BUSCAR_REGEX) -> bool:
+    """
+    Busca concessionárias pelo CEP quando a lista não veio sozinha.
+    Preenche o campo de uma vez, envia e espera a resposta da busca (aprendida na primeira célula)
+    em vez de digitação com delay + networkidle + sleep. Retorna True se a lista ficou visível.
+    """
+    if lista_concessionarias_visivel(ctx):
+        return True
+    try:
+        campo = ctx.locator(SELETOR_CEP).first
+        if not (campo.count() > 0 and campo.is_visible()):
+            return False
+    except Exception:
+        return False
+
+    t0 = time.time()
+    servido_do_cache = False
+    try:
+        if CEP_CACHE_MODO == "desligado":
+            _preencher_e_enviar(ctx, campo, cep, botao_regex)
+            try:
+                page.wait_for_load_state("networkidle", timeout=CEP_LISTA_TIMEOUT_MS)
+            except Exception:
+                pass
+        else:
+            cache = cache_busca_cep()
+            cache.recarregar()
+            if CEP_CACHE_MODO == "replay":
+                instalar_replay_cep(page, cache)
+            ja_em_cache = cache.resposta(cep) is not None
+            resposta = None
+            try:
+                with page.expect_response(predicado_busca_cep(cache), timeout=CEP_RESPOSTA_TIMEOUT_MS) as info:
+                    _preencher_e_enviar(ctx, campo, cep, botao_regex)
+                resposta = info.value
+            except Exception:
+                pass
+            ms = int((time.time() - t0) * 1000)
+            if resposta is None:
+                print(f"[AVISO] Busca por CEP {cep}: resposta da busca não observada em {ms} ms; aguardando a lista")
+            else:
+                if not ja_em_cache and resposta.ok:
+                    cache.guardar(cep, resposta)
+                servido_do_cache = ja_em_cache and CEP_CACHE_MODO == "replay"
+                origem = "cache" if servido_do_cache else "rede"
+                print(f"[INFO] Busca por CEP {cep}: {_endpoint(resposta.url)} em {ms} ms ({origem})")
+    except Exception as e:
+        print(f"[AVISO] Falha na busca por CEP {cep}: {e}")
+
+    try:
+        ctx.locator(SELETOR_LISTA).first.wait_for(state="visible", timeout=CEP_LISTA_TIMEOUT_MS)
+        return True
+    except Exception:
+        if servido_do_cache:
+            print(f"[AVISO] Replay do CEP {cep} não trouxe a lista; resposta descartada do cache")
+            cache_busca_cep().descartar(cep)
+        return False
@@ -1,12 +1,28 @@
+import os
 import re
 import time
-from typing import Optional
+from typing import Callable, Dict, Optional
 from playwright.sync_api import Page
 
+from helpers_cep import buscar_concessionarias_por_cep
+from navegador_jornada import navegar_jornada
+
 # Regex amplo padrão para reconhecer URLs de Concessionária (pode ser sobrescrito via parâmetro)
 DEFAULT_URL_CONCESSIONARIA_REGEX = re.compile(r"/configurador/.+/concessionaria|/concessionari(a|as)|/dealers|/lojas|/ponto-de-venda|/r-pass/pre-venda/concessionaria", re.I)
 
 
+def chegar_na_concessionaria(page: Page, m_idx: int, aceitar_cookies: Optional[Callable[[Page], None]] = None) -> None:
+    """
+    Percorre o configurador uma única vez (modelo m_idx, primeira versão) até a concessionária.
+    Sem `aceitar_cookies`, o banner fica a cargo do navegador da jornada (aceito antes do CTA).
+    """
+    page.goto("/", wait_until="domcontentloaded", timeout=45000)
+    if aceitar_cookies:
+        aceitar_cookies(page)
+    estado = navegar_jornada(page, "concessionaria", modelo=m_idx)
+    assert estado == "concessionaria", f"Não chegou à Concessionária (parou em '{estado}'). URL: {page.url}"
+
+
 def esperar_concessionaria(page: Page, ctx=None, timeout_ms: int = 30000, url_regex: Optional[re.Pattern] = None) -> bool:
     """
     Aguarda sinais de Concessionária de forma robusta:
@@ -61,55 +77,11 @@ def esperar_concessionaria(page: Page, ctx=None, timeout_ms: int = 30000, url_re
 
 def inserir_cep_robusto(ctx, page: Page, cep_busca: str = "01001-000") -> None:
     """
-    Preenche CEP com robustez:
-    - Tenta localizar input por placeholder/name/type=search
-    - Pressiona Enter e/ou clica botão de Buscar/Aplicar quando existir
-    - Aguarda pequeno intervalo e quiet network
+    Preenche CEP quando a lista de dealers não veio sozinha (ver helpers_cep):
+    - Campo preenchido de uma vez, Enter ou botão Buscar/Aplicar
+    - Espera só pela resposta da busca (aprendida e guardada por CEP na sessão), não por networkidle + sleep
     """
-    try:
-        # Se já há lista/elementos de dealers visíveis, não força CEP
-        try:
-            lista = ctx.locator('[id^="button-"] , [data-testid*="dealer-card"], [class*="dealer"], [class*="store-list"], li:has-text("km")')
-            if lista.count() > 0 and lista.first.is_visible():
-                return
-        except Exception:
-            pass
-
-        cep_input = ctx.locator('input[placeholder*="CEP" i], input[name*="cep" i], input[type="search"]').first
-        if not (cep_input and cep_input.count() > 0 and cep_input.is_visible()):
-            return
-
-        cep_input.click(force=True)
-        try:
-            cep_input.fill("")
-        except Exception:
-            pass
-        cep_input.type(cep_busca, delay=60)
-        page.wait_for_timeout(300)
-
-        # Tenta botão Buscar/Aplicar
-        clicado = False
-        try:
-            btn_buscar = ctx.get_by_role("button", name=re.compile(r"Buscar|Procurar|Pesquisar|OK|Confirmar|Aplicar|Ir", re.I)).first
-            if btn_buscar and btn_buscar.count() > 0 and btn_buscar.is_visible():
-                try:
-                    btn_buscar.click(force=True, timeout=3000)
-                    clicado = True
-                except Exception:
-                    pass
-        except Exception:
-            pass
-
-        if not clicado:
-            cep_input.press("Enter")
-
-        try:
-            page.wait_for_load_state("networkidle", timeout=5000)
-        except Exception:
-            pass
-        page.wait_for_timeout(1200)
-    except Exception:
-        pass
+    buscar_concessionarias_por_cep(ctx, page, cep_busca)
 
 
 def dealer_esta_selecionado(ctx) -> bool:
@@ -144,134 +116,240 @@ def esta_em_concessionaria(ctx) -> bool:
     return False
 
 
-def selecionar_concessionaria_robusta(ctx, page: Page, tempo_ms: int = 45000) -> bool:
+# Motor da lista de concessionárias: uma avaliação in-page varre os cards renderizados
+# (lista virtualizada/lazy-load), marca os candidatos com data-lista-conc e mede o container.
+ATRIBUTO_LISTA = "data-lista-conc"
+CONCESSIONARIA_MAX_SCROLLS = int(os.getenv("CONCESSIONARIA_MAX_SCROLLS", "25"))
+CONCESSIONARIA_MAX_CLIQUES = int(os.getenv("CONCESSIONARIA_MAX_CLIQUES", "6"))
+CONCESSIONARIA_ESPERA_SELECAO_MS = int(os.getenv("CONCESSIONARIA_ESPERA_SELECAO_MS", "1500"))
+CONCESSIONARIA_ESPERA_CARGA_MS = int(os.getenv("CONCESSIONARIA_ESPERA_CARGA_MS", "1500"))
+ALTURA_ITEM_PADRAO = 120
+
+# Mesmos sinais de dealer_esta_selecionado(), em JS (para wait_for_function e para a varredura)
+JS_DEALER_SELECIONADO = """
+() => {
+  const visivel = (el) => {
+    const st = window.getComputedStyle(el);
+    if (st.visibility === 'hidden' || st.display === 'none') return false;
+    const r = el.getBoundingClientRect();
+    return r.width > 0 && r.height > 0;
+  };
+  for (const b of document.querySelectorAll('button, [role="button"]')) {
+    if (/selecionad[oa]/i.test(b.innerText || b.textContent || '') && visivel(b)) return true;
+  }
+  for (const e of document.querySelectorAll('[aria-pressed="true"], [aria-selected="true"], .is-selected, .selected')) {
+    if (visivel(e)) return true;
+  }
+  return false;
+}
+"""
+
+JS_VARRER_LISTA = """
+(atrib) => {
+  const normal = (s) => (s || '').replace(/\\s+/g, ' ').trim();
+  const visivel = (el) => {
+    const st = window.getComputedStyle(el);
+    if (st.visibility === 'hidden' || st.display === 'none') return false;
+    const r = el.getBoundingClientRect();
+    return r.width > 0 && r.height > 0;
+  };
+  const SEL_CARD = '[data-testid*="dealer" i], [class*="dealer-card"], li';
+  const ehCard = (el) => el.tagName !== 'LI' || /\\bkm\\b/i.test(el.textContent || '');
+  const marcadoSelecionado = (el) => !!el.closest('[aria-pressed="true"], [aria-selected="true"], .is-selected, .selected');
+  const rolavel = (el) => {
+    const oy = window.getComputedStyle(el).overflowY;
+    return /(auto|scroll|overlay)/.test(oy) && el.scrollHeight > el.clientHeight + 2;
+  };
+
+  document.querySelectorAll('[' + atrib + ']').forEach((e) => e.removeAttribute(atrib));
+
+  // Botões "Selecionar/Selecione" ainda não selecionados, na ordem do documento
+  const botoes = Array.from(document.querySelectorAll(
+    'button, [role="button"], [data-testid*="select" i], [data-testid*="selecionar" i]'
+  )).filter((b) => {
+    const txt = normal(b.innerText || b.textContent);
+    const porTexto = /selecion(ar|e)\\b/i.test(txt);
+    const porTestid = /select|selecionar/i.test(b.getAttribute('data-testid') || '');
+    return (porTexto || porTestid) && !/selecionad[oa]/i.test(txt) && !marcadoSelecionado(b) && visivel(b);
+  });
+  const cards = Array.from(document.querySelectorAll(SEL_CARD)).filter((c) => ehCard(c) && visivel(c));
+
+  const candidatos = [];
+  const cardDe = (el) => {
+    const c = el.closest(SEL_CARD);
+    return c && ehCard(c) ? c : el.parentElement || el;
+  };
+  botoes.forEach((b) => {
+    candidatos.push({ tipo: 'botao', el: b, chave: 'botao:' + normal(cardDe(b).textContent).slice(0, 120) });
+  });
+  // Card inteiro só para cards sem botão (e não selecionados)
+  cards.forEach((c) => {
+    if (botoes.some((b) => c.contains(b))) return;
+    if (marcadoSelecionado(c) || /selecionad[oa]/i.test(c.textContent || '')) return;
+    candidatos.push({ tipo: 'card', el: c, chave: 'card:' + normal(c.textContent).slice(0, 120) });
+  });
+
+  // Container de scroll: primeiro ancestral rolável do primeiro card/botão (senão, a janela)
+  const ancora = cards[0] || botoes[0];
+  let container = null;
+  for (let el = ancora ? ancora.parentElement : null; el && el !== document.body; el = el.parentElement) {
+    if (rolavel(el)) { container = el; break; }
+  }
+  const janela = !container;
+  container = container || document.scrollingElement || document.documentElement;
+  container.setAttribute(atrib, 'container');
+
+  // Altura observada do item: mediana dos cards (ou distância entre botões)
+  let alturas = cards.map((c) => c.getBoundingClientRect().height).filter((h) => h > 0);
+  if (!alturas.length && botoes.length > 1) {
+    const tops = botoes.map((b) => b.getBoundingClientRect().top).sort((a, b) => a - b);
+    alturas = tops.slice(1).map((t, i) => t - tops[i]).filter((h) => h > 0);
+  }
+  alturas.sort((a, b) => a - b);
+  const alturaItem = alturas.length ? alturas[Math.floor(alturas.length / 2)] : 0;
+
+  const alturaVisivel = janela ? window.innerHeight : container.clientHeight;
+  return {
+    candidatos: candidatos.map((c, i) => {
+      c.el.setAttribute(atrib, String(i));
+      return { indice: i, tipo: c.tipo, chave: c.chave };
+    }),
+    cards: cards.length,
+    altura_item: Math.round(alturaItem),
+    janela,
+    scroll_top: Math.round(container.scrollTop),
+    altura_visivel: alturaVisivel,
+    altura_total: container.scrollHeight,
+    fim: container.scrollTop + alturaVisivel >= container.scrollHeight - 2,
+    selecionado: (__SELECIONADO__)(),
+  };
+}
+""".replace("__SELECIONADO__", JS_DEALER_SELECIONADO.strip())
+
+# Rola o container marcado e espera dois frames (a lista virtualizada renderiza no scroll)
+JS_ROLAR_LISTA = """
+([atrib, passo]) => {
+  const c = document.querySelector('[' + atrib + '="container"]') || document.scrollingElement || document.documentElement;
+  const antes = c.scrollTop;
+  c.scrollTo({ top: antes + passo, behavior: 'instant' });
+  return new Promise((ok) => requestAnimationFrame(() => requestAnimationFrame(() => ok({
+    antes: Math.round(antes), depois: Math.round(c.scrollTop), altura_total: c.scrollHeight,
+  }))));
+}
+"""
+
+JS_LISTA_CRESCEU = """
+([atrib, altura]) => {
+  const c = document.querySelector('[' + atrib + '="container"]') || document.scrollingElement || document.documentElement;
+  return c.scrollHeight > altura;
+}
+"""
+
+
+def varrer_lista_concessionarias(ctx) -> Dict:
     """
-    Seleciona uma concessionária com estratégias robustas:
-    - Variações de botão "Selecionar" (role, texto, data-testid)
-    - Scroll incremental para listas virtualizadas/lazy-load
-    - Clique via JS e fallback force
-    - Clique no card inteiro quando necessário
-    - Confirmação por dealer_esta_selecionado()
+    Uma avaliação in-page: candidatos clicáveis (botões 'Selecionar' e, sem botão, o card),
+    container de scroll, altura observada do item, fim da lista e se já há dealer selecionado.
+    Os candidatos ficam marcados com data-lista-conc="<indice>" até a próxima varredura.
     """
-    t_end = time.time() + (tempo_ms / 1000.0)
+    try:
+        return ctx.evaluate(JS_VARRER_LISTA, ATRIBUTO_LISTA) or {}
+    except Exception as e:
+        return {"erro": str(e), "candidatos": []}
 
-    if not esta_em_concessionaria(ctx):
-        return False
 
-    def coletar_botoes():
-        candidatos = []
-        try:
-            loc = ctx.get_by_role("button", name=re.compile(r"Selecion(ar|e|ado)", re.I))
-            total = min(loc.count(), 20)
-            for i in range(total):
-                cand = loc.nth(i)
-                try:
-                    if cand.is_visible():
-                        candidatos.append(cand)
-                except Exception:
-                    continue
-        except Exception:
-            pass
-        try:
-            loc = ctx.locator('button:has-text("Selecionar")')
-            total = min(loc.count(), 20)
-            for i in range(total):
-                cand = loc.nth(i)
-                try:
-                    if cand.is_visible():
-                        candidatos.append(cand)
-                except Exception:
-                    continue
-        except Exception:
-            pass
+def _passo_scroll(varredura: Dict) -> int:
+    """Rola uma 'página' de itens inteiros (janela menos um item), para não pular nenhum card."""
+    altura = varredura.get("altura_item") or ALTURA_ITEM_PADRAO
+    janela = varredura.get("altura_visivel") or 0
+    return int(max(altura, (janela // altura - 1) * altura))
+
+
+def _clicar_candidato(ctx, indice: int) -> bool:
+    alvo = ctx.locator(f'[{ATRIBUTO_LISTA}="{indice}"]').first
+    try:
+        alvo.evaluate("el => el.click()")
+        return True
+    except Exception:
         try:
-            loc = ctx.locator('[data-testid*="select" i], [data-testid*="selecionar" i]')
-            total = min(loc.count(), 20)
-            for i in range(total):
-                cand = loc.nth(i)
-                try:
-                    if cand.is_visible():
-                        candidatos.append(cand)
-                except Exception:
-                    continue
+            alvo.click(force=True, timeout=3000)
+            return True
         except Exception:
-            pass
-        return candidatos
+            return False
+
+
+def _aguardar_selecao(ctx, timeout_ms: int) -> bool:
+    try:
+        ctx.wait_for_function(JS_DEALER_SELECIONADO, timeout=max(timeout_ms, 1))
+        return True
+    except Exception:
+        return dealer_esta_selecionado(ctx)
 
-    ultimo_qtd = -1
-    scrolls_sem_mudar = 0
 
-    while time.time() < t_end:
+def _aguardar_carga(ctx, altura_total: int, timeout_ms: int) -> bool:
+    """No fim da lista, dá uma chance ao lazy-load de acrescentar itens."""
+    try:
+        ctx.wait_for_function(JS_LISTA_CRESCEU, arg=[ATRIBUTO_LISTA, altura_total], timeout=max(timeout_ms, 1))
+        return True
+    except Exception:
+        return False
+
+
+def selecionar_concessionaria_robusta(ctx, page: Page, tempo_ms: int = 45000) -> bool:
+    """
+    Seleciona uma concessionária percorrendo a lista (virtualizada/lazy-load) pelo próprio container:
+    - Cada passo é uma única varredura in-page (varrer_lista_concessionarias)
+    - Clica no primeiro candidato não tentado (botão 'Selecionar'; card inteiro se não houver botão)
+      e espera o sinal de selecionado por evento (wait_for_function), não por sleep fixo
+    - Sem candidatos, rola o container pela altura observada dos itens; para no fim da lista
+    - Custo limitado por tempo_ms, CONCESSIONARIA_MAX_SCROLLS e CONCESSIONARIA_MAX_CLIQUES, e logado ao final
+    """
+    t0 = time.time()
+    t_end = t0 + (tempo_ms / 1000.0)
+    custo = {"varreduras": 0, "scrolls": 0, "cliques": 0}
+
+    def _restante_ms() -> int:
+        return int((t_end - time.time()) * 1000)
+
+    def _fim(ok: bool, motivo: str) -> bool:
+        ms = int((time.time() - t0) * 1000)
+        print(f"[INFO] Concessionária {'selecionada' if ok else 'não selecionada'} em {ms} ms ({motivo}; "
+              f"{custo['varreduras']} varreduras, {custo['scrolls']} scrolls, {custo['cliques']} cliques)")
+        return ok
+
+    if not esta_em_concessionaria(ctx):
+        return False
+
+    tentados = set()
+    while _restante_ms() > 0:
+        varredura = varrer_lista_concessionarias(ctx)
+        custo["varreduras"] += 1
+        if varredura.get("selecionado"):
+            return _fim(True, "já selecionada" if not custo["cliques"] else "selecionada")
+
+        pendentes = [c for c in varredura.get("candidatos", []) if c.get("chave") not in tentados]
+        # Botões antes de cards (a varredura já devolve nessa ordem)
+        if pendentes:
+            if custo["cliques"] >= CONCESSIONARIA_MAX_CLIQUES:
+                return _fim(dealer_esta_selecionado(ctx), "limite de cliques")
+            cand = pendentes[0]
+            tentados.add(cand.get("chave"))
+            if _clicar_candidato(ctx, cand["indice"]):
+                custo["cliques"] += 1
+                if _aguardar_selecao(ctx, min(CONCESSIONARIA_ESPERA_SELECAO_MS, _restante_ms())):
+                    return _fim(True, f"selecionada via {cand.get('tipo')}")
+            continue
+
+        if custo["scrolls"] >= CONCESSIONARIA_MAX_SCROLLS:
+            return _fim(dealer_esta_selecionado(ctx), "limite de scrolls")
         try:
-            if dealer_esta_selecionado(ctx):
-                return True
+            rolagem = ctx.evaluate(JS_ROLAR_LISTA, [ATRIBUTO_LISTA, _passo_scroll(varredura)]) or {}
         except Exception:
-            pass
-
-        botoes = coletar_botoes()
-        if botoes:
-            for btn in botoes[:6]:
-                try:
-                    txt = (btn.text_content() or "").strip().lower()
-                except Exception:
-                    txt = ""
-                if "selecionado" in txt:
-                    continue
-                try:
-                    btn.scroll_into_view_if_needed()
-                except Exception:
-                    pass
-
-                clicou = False
-                try:
-                    btn.evaluate("el => el.click()")
-                    clicou = True
-                except Exception:
-                    try:
-                        btn.click(force=True)
-                        clicou = True
-                    except Exception:
-                        pass
-
-                if clicou:
-                    page.wait_for_timeout(1000)
-                    if dealer_esta_selecionado(ctx):
-                        return True
-
-            # Fallback: clicar card do último botão
-            try:
-                card = btn.locator("xpath=ancestor-or-self::*[self::*[@data-testid][1] or self::li or self::div][1]").first  # type: ignore[name-defined]
-                if card and card.is_visible():
-                    try:
-                        card.click(force=True)
-                        page.wait_for_timeout(800)
-                        if dealer_esta_selecionado(ctx):
-                            return True
-                    except Exception:
-                        pass
-            except Exception:
-                pass
-        else:
-            # Scroll para materializar mais itens
-            try:
-                ctx.evaluate("() => { window.scrollBy(0, 900); }")
-            except Exception:
-                pass
-            page.wait_for_timeout(600)
-
-            qtd = len(coletar_botoes())
-            if qtd == ultimo_qtd:
-                scrolls_sem_mudar += 1
-                try:
-                    ctx.evaluate("() => { window.scrollTo(0, 0); }")
-                except Exception:
-                    pass
-                page.wait_for_timeout(400)
-            else:
-                ultimo_qtd = qtd
-                scrolls_sem_mudar = 0
-
-            if scrolls_sem_mudar > 20:
-                break
-
-    return dealer_esta_selecionado(ctx)
+            rolagem = {}
+        custo["scrolls"] += 1
+        if rolagem.get("depois") == rolagem.get("antes"):
+            if not _aguardar_carga(ctx, rolagem.get("altura_total") or varredura.get("altura_total") or 0,
+                                   min(CONCESSIONARIA_ESPERA_CARGA_MS, _restante_ms())):
+                return _fim(dealer_esta_selecionado(ctx), "fim da lista")
+
+    return _fim(dealer_esta_selecionado(ctx), "tempo esgotado")
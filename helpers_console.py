@@ -0,0 +1,171 @@
+import os
+import json
+import gzip
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List
+from playwright.sync_api import Page
+
+# Modo de captura do console/pageerror:
+#   amostrado (padrão): filtra por nível no próprio navegador, agrupa mensagens repetidas e limita o volume
+#   completo: uma callback Python por mensagem (comportamento antigo; logs/<teste>.txt sempre)
+#   desligado: não captura
+CONSOLE_CAPTURA = (os.getenv("CONSOLE_CAPTURA", "amostrado") or "amostrado").lower()
+CONSOLE_NIVEIS = [n.strip().lower() for n in os.getenv("CONSOLE_NIVEIS", "error,warning").split(",") if n.strip()]
+# Mensagens distintas mantidas por teste (as mais antigas saem primeiro); o navegador aplica o
+# limite por frame e a coleta reaplica no total do teste, somando todos os frames
+CONSOLE_MAX_POR_TESTE = int(os.getenv("CONSOLE_MAX_POR_TESTE", "200") or "200")
+# Ocorrências brutas (sem agrupar) guardadas para o log completo de teste que falhou
+CONSOLE_MAX_BRUTO_POR_TESTE = int(os.getenv("CONSOLE_MAX_BRUTO_POR_TESTE", "2000") or "2000")
+CONSOLE_MAX_CARACTERES = 2000
+
+# Roda antes dos scripts da página (em cada frame). O buffer sobrevive às navegações do mesmo
+# frame via sessionStorage e só atravessa o protocolo uma vez, na coleta ao final do teste.
+JS_CAPTURA_CONSOLE = r"""
+(function (cfg) {
+  if (window.__capturaConsole) return;
+  const chave = '__capturaConsole:' + (window.top === window ? 'top' : 'frame:' + (window.name || location.pathname));
+  const estado = { itens: new Map(), total: 0, descartadas: 0, bruto: [], brutoDescartadas: 0 };
+  try {
+    const salvo = JSON.parse(sessionStorage.getItem(chave) || 'null');
+    if (salvo) {
+      estado.total = salvo.total || 0;
+      estado.descartadas = salvo.descartadas || 0;
+      estado.bruto = salvo.bruto || [];
+      estado.brutoDescartadas = salvo.brutoDescartadas || 0;
+      for (const it of salvo.itens || []) estado.itens.set(it.nivel + '|' + it.texto, it);
+    }
+  } catch (e) {}
+
+  const registrar = (nivel, texto) => {
+    try {
+      texto = String(texto).slice(0, cfg.maxCaracteres);
+      estado.total++;
+      // Ocorrência bruta (sem agrupar), para o log completo de teste que falhar
+      estado.bruto.push({ nivel, texto, url: location.href, instante: Date.now() });
+      if (estado.bruto.length > cfg.maxBruto) { estado.bruto.shift(); estado.brutoDescartadas++; }
+      const k = nivel + '|' + texto;
+      const it = estado.itens.get(k);
+      if (it) { it.n++; it.ultimo = Date.now(); return; }
+      if (estado.itens.size >= cfg.max) {
+        const antiga = estado.itens.keys().next().value;
+        estado.descartadas += estado.itens.get(antiga).n;
+        estado.itens.delete(antiga);
+      }
+      estado.itens.set(k, { nivel, texto, n: 1, url: location.href, primeiro: Date.now(), ultimo: Date.now() });
+    } catch (e) {}
+  };
+
+  const formatar = (args) => Array.from(args).map((a) => {
+    try {
+      if (typeof a === 'string') return a;
+      if (a instanceof Error) return a.stack || a.message;
+      return JSON.stringify(a);
+    } catch (e) { return String(a); }
+  }).join(' ');
+
+  const metodos = { error: 'error', warning: 'warn', info: 'info', log: 'log', debug: 'debug' };
+  for (const nivel of cfg.niveis) {
+    const m = metodos[nivel];
+    if (!m || typeof console[m] !== 'function') continue;
+    const original = console[m];
+    console[m] = function () { registrar(nivel, formatar(arguments)); return original.apply(this, arguments); };
+  }
+  window.addEventListener('error', (ev) => {
+    if (ev instanceof ErrorEvent) registrar('pageerror', (ev.error && ev.error.stack) || ev.message || 'erro');
+  }, true);
+  window.addEventListener('unhandledrejection', (ev) => {
+    const r = ev.reason;
+    registrar('pageerror', 'Unhandled rejection: ' + ((r && r.stack) || String(r)));
+  });
+
+  const exportar = () => ({
+    itens: Array.from(estado.itens.values()), total: estado.total, descartadas: estado.descartadas,
+    bruto: estado.bruto, brutoDescartadas: estado.brutoDescartadas,
+  });
+  window.addEventListener('pagehide', () => {
+    try { sessionStorage.setItem(chave, JSON.stringify(exportar())); }
+    catch (e) {
+      // Sem espaço no sessionStorage: preserva ao menos o resumo agrupado
+      try { sessionStorage.setItem(chave, JSON.stringify(Object.assign(exportar(), { bruto: [] }))); } catch (e2) {}
+    }
+  });
+  Object.defineProperty(window, '__capturaConsole', { value: { exportar }, enumerable: false });
+})
+"""
+
+
+def instalar_captura_console(page: Page, niveis: List[str] = None, maximo: int = None) -> None:
+    """Registra o init script de captura (chamar antes da primeira navegação)."""
+    cfg = {
+        "niveis": niveis if niveis is not None else CONSOLE_NIVEIS,
+        "max": maximo or CONSOLE_MAX_POR_TESTE,
+        "maxBruto": CONSOLE_MAX_BRUTO_POR_TESTE,
+        "maxCaracteres": CONSOLE_MAX_CARACTERES,
+    }
+    page.add_init_script(f"{JS_CAPTURA_CONSOLE}({json.dumps(cfg)});")
+
+
+def coletar_captura_console(page: Page, maximo: int = None, maximo_bruto: int = None) -> Dict:
+    """
+    Lê o buffer de cada frame (um evaluate por frame), une as mensagens repetidas e reaplica os
+    limites no total do teste (o navegador só limita por frame).
+    Retorna {"itens": [...ordenados por primeira ocorrência], "total": n, "descartadas": n,
+             "bruto": [...ocorrências em ordem cronológica], "bruto_descartadas": n}.
+    """
+    maximo = maximo or CONSOLE_MAX_POR_TESTE
+    maximo_bruto = maximo_bruto or CONSOLE_MAX_BRUTO_POR_TESTE
+    unidos: Dict[tuple, Dict] = {}
+    bruto: List[Dict] = []
+    total = descartadas = bruto_descartadas = 0
+    for frame in list(page.frames):
+        try:
+            dados = frame.evaluate("() => window.__capturaConsole ? window.__capturaConsole.exportar() : null")
+        except Exception:
+            continue
+        if not dados:
+            continue
+        total += int(dados.get("total") or 0)
+        descartadas += int(dados.get("descartadas") or 0)
+        bruto_descartadas += int(dados.get("brutoDescartadas") or 0)
+        bruto.extend(dados.get("bruto") or [])
+        for it in dados.get("itens") or []:
+            chave = (it.get("nivel"), it.get("texto"))
+            atual = unidos.get(chave)
+            if atual is None:
+                unidos[chave] = dict(it)
+            else:
+                atual["n"] = int(atual.get("n", 1)) + int(it.get("n", 1))
+                atual["primeiro"] = min(atual.get("primeiro") or 0, it.get("primeiro") or 0)
+                atual["ultimo"] = max(atual.get("ultimo") or 0, it.get("ultimo") or 0)
+    itens = sorted(unidos.values(), key=lambda i: i.get("primeiro") or 0)
+    if len(itens) > maximo:
+        # Limite por teste: saem as mais antigas, como no buffer de cada frame
+        descartadas += sum(int(i.get("n") or 1) for i in itens[:-maximo])
+        itens = itens[-maximo:]
+    bruto.sort(key=lambda i: i.get("instante") or 0)
+    if len(bruto) > maximo_bruto:
+        bruto_descartadas += len(bruto) - maximo_bruto
+        bruto = bruto[-maximo_bruto:]
+    return {"itens": itens, "total": total, "descartadas": descartadas,
+            "bruto": bruto, "bruto_descartadas": bruto_descartadas}
+
+
+def formatar_item_console(item: Dict) -> str:
+    n = int(item.get("n") or 1)
+    return f"[{item.get('nivel')}] {item.get('texto')}" + (f" (x{n})" if n > 1 else "")
+
+
+def gravar_log_gzip(destino: Path, captura: Dict) -> Path:
+    """Log completo do teste: cada ocorrência, sem agrupar, em ordem cronológica (com URL/instante), em .txt.gz."""
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    bruto = captura.get("bruto") or []
+    with gzip.open(destino, "wt", encoding="utf-8") as f:
+        f.write(f"# {captura['total']} mensagens, {len(captura['itens'])} distintas; "
+                f"{len(bruto)} ocorrências abaixo"
+                + (f" ({captura.get('bruto_descartadas', 0)} mais antigas descartadas pelo limite)"
+                   if captura.get("bruto_descartadas") else "") + "\n")
+        for item in bruto:
+            instante = datetime.fromtimestamp((item.get("instante") or 0) / 1000.0).strftime("%H:%M:%S.%f")[:-3]
+            f.write(f"{instante}\t[{item.get('nivel')}] {item.get('texto')}\t{item.get('url', '')}\n")
+    return destino
@@ -0,0 +1,105 @@
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+from playwright.sync_api import Browser, Page
+
+from helpers_frames import rastreador_frames
+from helpers_catalogo import catalogo_site, CATALOGO_ATIVO
+from stub_mapas import instalar_stub_mapas, instalar_stub_mapas_async, STUB_MAPAS
+from vigia_fatal import vigia_fatal
+
+# Geolocalização fixa (São Paulo) usada pelos testes
+GEO_SP = {"latitude": -23.55052, "longitude": -46.633308}
+
+# Consentimento/bypass gravados antes de qualquer script da página
+JS_CONSENTIMENTO = """
+(() => {
+  try {
+    localStorage.setItem('REN_ACCEPTED_TRUST', JSON.stringify([
+      'web-analysis','content-preferences','marketing','social-media'
+    ]));
+    localStorage.setItem('REN_BYPASS', 'true');
+    // Local opcional para reduzir efeitos de geolocalização
+    localStorage.setItem('REN_LOCATION', JSON.stringify({
+      city: { name: 'São Paulo', location: { latitude: -23.55, longitude: -46.63 } }
+    }));
+  } catch(e) {}
+})();
+"""
+
+
+def _cookie_bypass() -> Dict:
+    return {
+        "name": "REN_BYPASS", "value": "true",
+        "domain": "loja.renault.com.br", "path": "/",
+        "expires": int(time.time()) + 86400*180,
+        "sameSite": "Lax", "httpOnly": False, "secure": True,
+    }
+
+
+def preparar_consentimento_e_geo(alvo) -> None:
+    """
+    Permissão + geolocalização, init script de consentimento e cookie de bypass.
+    `alvo` pode ser a Page (init script só nela) ou o BrowserContext (todas as páginas).
+    """
+    contexto = getattr(alvo, "context", alvo)
+    try:
+        contexto.grant_permissions(["geolocation"])
+        contexto.set_geolocation(GEO_SP)
+    except Exception:
+        pass
+
+    try:
+        alvo.add_init_script(JS_CONSENTIMENTO)
+    except Exception:
+        pass
+
+    # Cookie opcional para reforçar bypass
+    try:
+        contexto.add_cookies([_cookie_bypass()])
+    except Exception:
+        pass
+
+
+async def preparar_contexto_async(contexto) -> None:
+    """preparar_consentimento_e_geo() para contextos da API async (geolocalização/permissão vêm nos context args)."""
+    try:
+        await contexto.add_init_script(JS_CONSENTIMENTO)
+    except Exception:
+        pass
+    try:
+        await contexto.add_cookies([_cookie_bypass()])
+    except Exception:
+        pass
+    if STUB_MAPAS:
+        await instalar_stub_mapas_async(contexto)
+
+
+def instrumentar_pagina(page: Page, timeout_ms: int = 25000, navegacao_ms: int = 45000) -> Page:
+    """O que as fixtures autouse do conftest fazem na page do teste, para páginas criadas à mão."""
+    vigia_fatal(page)
+    page.set_default_timeout(timeout_ms)
+    page.set_default_navigation_timeout(navegacao_ms)
+    rastreador_frames(page)
+    if CATALOGO_ATIVO:
+        catalogo_site(page)
+    return page
+
+
+@contextmanager
+def contexto_novo(browser: Browser, context_args: Optional[Dict] = None, **kwargs) -> Iterator[Page]:
+    """
+    Página em um BrowserContext novo (sem cookies/estado da tentativa anterior), com o mesmo
+    viewport/locale/geolocalização do conftest. O contexto é fechado na saída.
+    """
+    contexto = browser.new_context(**{**(context_args or {}), **kwargs})
+    try:
+        preparar_consentimento_e_geo(contexto)
+        if STUB_MAPAS:
+            instalar_stub_mapas(contexto)
+        yield instrumentar_pagina(contexto.new_page())
+    finally:
+        try:
+            contexto.close()
+        except Exception:
+            pass
@@ -0,0 +1,257 @@
+import os
+import re
+import time
+import atexit
+import hashlib
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from helpers_arquivos import trava_arquivo, ler_json, gravar_json_atomico
+
+# Cache persistente compartilhado entre workers e execuções (fora da pasta com timestamp)
+CACHE_ESTRATEGIAS_PATH = Path(os.getenv("ESTRATEGIAS_CACHE", "") or (Path("reports") / "estrategias_cache.json"))
+CACHE_ESTRATEGIAS_ATIVO = os.getenv("ESTRATEGIAS_CACHE_ATIVO", "true").lower() in ("1", "true", "yes", "on")
+
+# Execuções mantidas no histórico de taxa de acerto
+EXECUCOES_ESTATISTICA = 20
+
+# Score por estratégia: sucesso puxa para 1, falha decai pela metade
+FATOR_DECAIMENTO = 0.5
+SCORE_DESCONHECIDA = 0.25
+
+TIPOS_PAGINA = [
+    ("pagamento", re.compile(r"/pagamento|/payment|metodo-de-pagamento|forma-de-pagamento|checkout", re.I)),
+    ("concessionaria", re.compile(r"/concessionari(a|as)|/dealers|/lojas|/ponto-de-venda", re.I)),
+    ("sessao", re.compile(r"/sessao/", re.I)),
+    ("resumo", re.compile(r"/resumo|/summary", re.I)),
+    ("versoes", re.compile(r"/versoes", re.I)),
+    ("design", re.compile(r"/(design|cores|rodas|interior)", re.I)),
+    ("jornada", re.compile(r"/jornada-de-reserva", re.I)),
+]
+
+# Identidade do build: buildId do Next.js, meta de versão ou o script de entrada do HTML.
+# Chunks carregados sob demanda (webpack marca com data-webpack) ficam de fora: a lista deles
+# muda dentro do mesmo deploy e partiria a chave do cache.
+JS_BUILD_SITE = """
+() => {
+  try {
+    if (window.__NEXT_DATA__ && window.__NEXT_DATA__.buildId) return 'next:' + window.__NEXT_DATA__.buildId;
+  } catch (e) {}
+  const meta = document.querySelector(
+    'meta[name="build-id" i], meta[name="build" i], meta[name="app-version" i], meta[name="version" i]'
+  );
+  if (meta && meta.content) return 'meta:' + meta.content.trim();
+  const srcs = Array.from(document.querySelectorAll('script[src]:not([data-webpack])'))
+    .map(s => (s.getAttribute('src') || '').replace(/[?#].*$/, ''))
+    .filter(Boolean);
+  const entrada = srcs.find(s => /(^|\\/)(main|app|index|entry|bundle)[._-]/i.test(s))
+    || srcs.find(s => /[._-][0-9a-f]{6,}[._-]/i.test(s));
+  return entrada ? 'entrada:' + entrada : '';
+}
+"""
+
+
+def id_execucao() -> str:
+    """Identificador da execução atual (nome da pasta reports/<timestamp> definida pelo run_tests.py)."""
+    return Path(os.getenv("REPORTS_DIR", "") or "local").name
+
+
+def tipo_pagina(ctx) -> str:
+    """Classifica a página/frame pela URL (pagamento, concessionaria, versoes, design...)."""
+    url = getattr(ctx, "url", "") or ""
+    for nome, rx in TIPOS_PAGINA:
+        if rx.search(url):
+            return nome
+    return "outro"
+
+
+def build_do_site(ctx) -> str:
+    """
+    Identifica o build do site (buildId do Next.js, meta de versão ou hash do script de entrada).
+    Memorizado no próprio ctx para não reavaliar a cada chamada.
+    """
+    build = getattr(ctx, "_build_site", None)
+    if build:
+        return build
+    bruto = ""
+    try:
+        bruto = ctx.evaluate(JS_BUILD_SITE) or ""
+    except Exception:
+        pass
+    build = hashlib.sha1(bruto.encode("utf-8")).hexdigest()[:12] if bruto else "desconhecido"
+    try:
+        setattr(ctx, "_build_site", build)
+    except Exception:
+        pass
+    return build
+
+
+class CacheEstrategias:
+    """
+    Aprende qual estratégia de cada helper funciona neste build do site.
+    Chave: (helper, tipo de página, hash do build). Eventos ficam em memória e são
+    mesclados no JSON compartilhado (sob trava) ao final da sessão de cada worker.
+    """
+
+    def __init__(self, caminho: Path = CACHE_ESTRATEGIAS_PATH):
+        self.caminho = Path(caminho)
+        self._dados = None
+        self._eventos: List[Tuple[str, str, bool, float]] = []
+        self._estatisticas: Dict[str, Dict[str, int]] = {}
+
+    def _carregar(self) -> dict:
+        if self._dados is None:
+            self._dados = ler_json(self.caminho, {}) or {}
+            self._dados.setdefault("entradas", {})
+            self._dados.setdefault("estatisticas", {})
+        return self._dados
+
+    @staticmethod
+    def _aplicar(entradas: dict, chave: str, estrategia: str, sucesso: bool, instante: float) -> None:
+        est = entradas.setdefault(chave, {}).setdefault(
+            estrategia, {"score": SCORE_DESCONHECIDA, "sucessos": 0, "falhas": 0, "falhas_seguidas": 0}
+        )
+        if sucesso:
+            est["score"] = est["score"] * FATOR_DECAIMENTO + (1 - FATOR_DECAIMENTO)
+            est["sucessos"] += 1
+            est["falhas_seguidas"] = 0
+        else:
+            est["score"] = est["score"] * FATOR_DECAIMENTO
+            est["falhas"] += 1
+            est["falhas_seguidas"] += 1
+        est["ultimo"] = instante
+
+    def ordenar(self, chave: str, nomes: Sequence[str]) -> List[str]:
+        """Ordena as estratégias pelo score aprendido (empate mantém a ordem original)."""
+        conhecidas = self._carregar()["entradas"].get(chave, {})
+        return sorted(nomes, key=lambda n: -conhecidas.get(n, {}).get("score", SCORE_DESCONHECIDA))
+
+    def tem_preferencia(self, chave: str) -> bool:
+        conhecidas = self._carregar()["entradas"].get(chave, {})
+        return any(v.get("score", 0) > SCORE_DESCONHECIDA for v in conhecidas.values())
+
+    def registrar(self, chave: str, estrategia: str, sucesso: bool) -> None:
+        instante = time.time()
+        self._aplicar(self._carregar()["entradas"], chave, estrategia, sucesso, instante)
+        self._eventos.append((chave, estrategia, sucesso, instante))
+
+    def contar(self, helper: str, com_preferencia: bool, acerto: bool) -> None:
+        st = self._estatisticas.setdefault(helper, {"chamadas": 0, "com_preferencia": 0, "acertos": 0})
+        st["chamadas"] += 1
+        st["com_preferencia"] += int(com_preferencia)
+        st["acertos"] += int(acerto)
+
+    def salvar(self) -> None:
+        """Mescla os eventos deste processo no arquivo compartilhado."""
+        if not self._eventos and not self._estatisticas:
+            return
+        try:
+            with trava_arquivo(self.caminho):
+                dados = ler_json(self.caminho, {}) or {}
+                entradas = dados.setdefault("entradas", {})
+                for chave, estrategia, sucesso, instante in self._eventos:
+                    self._aplicar(entradas, chave, estrategia, sucesso, instante)
+                por_execucao = dados.setdefault("por_execucao", {})
+                destinos = [dados.setdefault("estatisticas", {}), por_execucao.setdefault(id_execucao(), {})]
+                for estat in destinos:
+                    for helper, st in self._estatisticas.items():
+                        acumulado = estat.setdefault(helper, {"chamadas": 0, "com_preferencia": 0, "acertos": 0})
+                        for k, v in st.items():
+                            acumulado[k] = acumulado.get(k, 0) + v
+                for antiga in sorted(por_execucao)[:-EXECUCOES_ESTATISTICA]:
+                    por_execucao.pop(antiga, None)
+                gravar_json_atomico(self.caminho, dados)
+                self._dados = dados
+            self._eventos = []
+            self._estatisticas = {}
+        except Exception as e:
+            print(f"[AVISO] Falha ao salvar cache de estratégias: {e}")
+
+
+_CACHE: Optional[CacheEstrategias] = None
+
+
+def cache_estrategias() -> CacheEstrategias:
+    global _CACHE
+    if _CACHE is None:
+        _CACHE = CacheEstrategias()
+        atexit.register(_CACHE.salvar)
+    return _CACHE
+
+
+def _executar(fn: Callable, confirmar: Optional[Callable]):
+    """Resultado da estratégia, ou None se falhou, levantou exceção ou o efeito não foi confirmado."""
+    try:
+        resultado = fn()
+        if resultado and confirmar is not None and not confirmar(resultado):
+            return None
+        return resultado
+    except Exception:
+        return None
+
+
+def executar_estrategias(helper: str, ctx, estrategias: Sequence[Tuple[str, Callable]], pagina: Optional[str] = None,
+                         confirmar: Optional[Callable] = None, genericas: Sequence[str] = ()):
+    """
+    Executa as estratégias na ordem aprendida até a primeira que retornar valor "truthy".
+    - estrategias: lista de (nome, fn); fn() retorna o resultado (ou None/False quando não se aplica)
+    - confirmar(resultado): verifica o efeito (radio marcado, etapa seguinte...); sem confirmação
+      a estratégia conta como falha e a próxima é tentada
+    - genericas: estratégias "pega-tudo" (clicam em qualquer coisa que case); rodam por último e
+      ficam fora do aprendizado, como o fallback de radiogroup de _coletar_opcoes
+    - Exceção na estratégia conta como falha
+    - Estratégias tentadas antes da vencedora decaem; a vencedora sobe; se nenhuma vence, todas decaem
+    Retorna (nome_vencedora, resultado) ou (None, None).
+    """
+    por_nome = dict(estrategias)
+    aprendidas = [nome for nome, _ in estrategias if nome not in genericas]
+    extras = [nome for nome, _ in estrategias if nome in genericas]
+
+    if not CACHE_ESTRATEGIAS_ATIVO:
+        for nome in aprendidas + extras:
+            resultado = _executar(por_nome[nome], confirmar)
+            if resultado:
+                return nome, resultado
+        return None, None
+
+    cache = cache_estrategias()
+    chave = f"{helper}|{pagina or tipo_pagina(ctx)}|{build_do_site(ctx)}"
+    ordem = cache.ordenar(chave, aprendidas)
+    com_preferencia = cache.tem_preferencia(chave)
+
+    tentadas = []
+    for nome in ordem:
+        resultado = _executar(por_nome[nome], confirmar)
+        if resultado:
+            for falhou in tentadas:
+                cache.registrar(chave, falhou, False)
+            cache.registrar(chave, nome, True)
+            cache.contar(helper, com_preferencia, acerto=(nome == ordem[0] and com_preferencia))
+            return nome, resultado
+        tentadas.append(nome)
+    for falhou in tentadas:
+        cache.registrar(chave, falhou, False)
+    if tentadas:
+        cache.contar(helper, com_preferencia, acerto=False)
+    for nome in extras:
+        resultado = _executar(por_nome[nome], confirmar)
+        if resultado:
+            return nome, resultado
+    return None, None
+
+
+def resumo_taxa_acerto(caminho: Path = CACHE_ESTRATEGIAS_PATH, execucao: Optional[str] = None) -> List[str]:
+    """
+    Linhas com a taxa de acerto por helper (lidas do arquivo compartilhado).
+    Com `execucao`, considera apenas a execução informada; senão, o acumulado.
+    """
+    dados = ler_json(caminho, {}) or {}
+    estat = (dados.get("por_execucao") or {}).get(execucao, {}) if execucao else dados.get("estatisticas")
+    linhas = []
+    for helper, st in sorted((estat or {}).items()):
+        chamadas = st.get("chamadas", 0)
+        com_pref = st.get("com_preferencia", 0)
+        acertos = st.get("acertos", 0)
+        taxa = (100.0 * acertos / com_pref) if com_pref else 0.0
+        linhas.append(f"{helper}: {acertos}/{com_pref} acertos na 1ª tentativa ({taxa:.0f}%) | chamadas: {chamadas}")
+    return linhas
@@ -0,0 +1,155 @@
+import re
+import time
+from typing import Callable, Dict, List, Optional
+from playwright.sync_api import Page
+
+# Papéis de frame reconhecidos pelo rastreador (regex aplicado à URL do frame)
+URL_CONFIGURADOR_REGEX = re.compile(r"/configurador/", re.I)
+URL_PAGAMENTO_REGEX = re.compile(r"/pagamento|/payment|metodo-de-pagamento|forma-de-pagamento|checkout", re.I)
+URL_SESSAO_REGEX = re.compile(r"/sessao/", re.I)
+URL_MAPAS_REGEX = re.compile(r"google\.[^/]+/maps|maps\.googleapis\.com|maps\.gstatic\.com|openstreetmap|mapbox|leaflet", re.I)
+
+PAPEIS_FRAME = {
+    "configurador": URL_CONFIGURADOR_REGEX,
+    "pagamento": URL_PAGAMENTO_REGEX,
+    "sessao": URL_SESSAO_REGEX,
+    "mapas": URL_MAPAS_REGEX,
+}
+
+# Resultado negativo da sonda de UI de pagamento vale por pouco tempo (SPA pode renderizar depois)
+TTL_SONDA_NEGATIVA_S = 1.5
+# Positivo também expira: o configurador é SPA e troca de tela sem navegar o frame
+TTL_SONDA_POSITIVA_S = 5.0
+
+
+class RastreadorFrames:
+    """
+    Mantém um índice de frames por papel (configurador, pagamento, sessão, mapas),
+    atualizado pelos eventos frameattached/framenavigated/framedetached da página.
+    A consulta de contexto deixa de varrer page.frames a cada chamada.
+    """
+
+    def __init__(self, page: Page):
+        self.page = page
+        self._seq = 0
+        self._ordem: Dict[object, int] = {}
+        self._indice: Dict[str, Dict[object, int]] = {papel: {} for papel in PAPEIS_FRAME}
+        # Cache da sonda de UI de pagamento: frame -> (resultado, instante)
+        self._sonda_pagamento: Dict[object, tuple] = {}
+
+        page.on("frameattached", self._classificar)
+        page.on("framenavigated", self._classificar)
+        page.on("framedetached", self._remover)
+
+        # Frames já existentes (inclui o main frame, que não dispara frameattached)
+        try:
+            for f in page.frames:
+                self._classificar(f)
+        except Exception:
+            pass
+
+    # -------------------------------------------------------------------------
+    # Eventos
+    # -------------------------------------------------------------------------
+
+    def _classificar(self, frame) -> None:
+        try:
+            if frame not in self._ordem:
+                self._ordem[frame] = self._seq
+                self._seq += 1
+            url = getattr(frame, "url", "") or ""
+            seq = self._ordem[frame]
+            for papel, rx in PAPEIS_FRAME.items():
+                if rx.search(url):
+                    self._indice[papel][frame] = seq
+                else:
+                    self._indice[papel].pop(frame, None)
+            # Navegação invalida qualquer sonda de UI feita no documento anterior
+            self._sonda_pagamento.pop(frame, None)
+        except Exception:
+            pass
+
+    def _remover(self, frame) -> None:
+        self._ordem.pop(frame, None)
+        self._sonda_pagamento.pop(frame, None)
+        for frames in self._indice.values():
+            frames.pop(frame, None)
+
+    # -------------------------------------------------------------------------
+    # Consulta
+    # -------------------------------------------------------------------------
+
+    def frames(self, papel: str) -> List:
+        """Frames do papel, na ordem em que foram vistos (mesma ordem de page.frames)."""
+        indice = self._indice.get(papel, {})
+        return sorted(indice, key=indice.get)
+
+    def frame(self, papel: str):
+        """Primeiro frame do papel ou None."""
+        indice = self._indice.get(papel, {})
+        if not indice:
+            return None
+        return min(indice, key=indice.get)
+
+    def ctx_configurador(self):
+        """Equivalente a _get_configurator_ctx: frame /configurador/ ou a própria page."""
+        return self.frame("configurador") or self.page
+
+    def _tem_ui(self, frame, sonda: Callable) -> bool:
+        agora = time.time()
+        cache = self._sonda_pagamento.get(frame)
+        if cache:
+            resultado, instante = cache
+            ttl = TTL_SONDA_POSITIVA_S if resultado else TTL_SONDA_NEGATIVA_S
+            if (agora - instante) < ttl:
+                return resultado
+        try:
+            resultado = bool(sonda(frame))
+        except Exception:
+            resultado = False
+        self._sonda_pagamento[frame] = (resultado, agora)
+        return resultado
+
+    def ctx_pagamento(self, tem_ui_pagamento: Callable):
+        """
+        Equivalente a _resolver_ctx_pagamento:
+        - Prefere frame com URL de pagamento e UI encontrada
+        - Depois, qualquer frame com UI de pagamento (frames de mapas são ignorados)
+        - Fallback: contexto do configurador
+        A sonda de UI é memorizada por frame até a próxima navegação dele ou até expirar o TTL.
+        """
+        candidatos_url = self.frames("pagamento")
+        for f in candidatos_url:
+            if self._tem_ui(f, tem_ui_pagamento):
+                return f
+        mapas = self._indice["mapas"]
+        for f in sorted(self._ordem, key=self._ordem.get):
+            if f in mapas or f in candidatos_url:
+                continue
+            if self._tem_ui(f, tem_ui_pagamento):
+                return f
+        return self.ctx_configurador()
+
+
+def rastreador_frames(page: Page) -> RastreadorFrames:
+    """Retorna (criando na primeira chamada) o rastreador de frames associado à página."""
+    rastreador = getattr(page, "_rastreador_frames", None)
+    if rastreador is None:
+        rastreador = RastreadorFrames(page)
+        setattr(page, "_rastreador_frames", rastreador)
+    return rastreador
+
+
+def get_configurator_ctx(page: Page):
+    """Frame do configurador quando existir; senão a própria page (consulta O(1) no índice)."""
+    return rastreador_frames(page).ctx_configurador()
+
+
+def resolver_ctx_pagamento(page: Page, tem_ui_pagamento: Callable):
+    """Contexto da tela de pagamento, usando o índice de frames e a sonda memorizada."""
+    return rastreador_frames(page).ctx_pagamento(tem_ui_pagamento)
+
+
+def frame_por_papel(page: Page, papel: str) -> Optional[object]:
+    """Primeiro frame rastreado com o papel informado (configurador|pagamento|sessao|mapas)."""
+    return rastreador_frames(page).frame(papel)
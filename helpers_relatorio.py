@@ -0,0 +1,33 @@
+import html
+from typing import Iterable, List
+
+import pytest_html
+
+# Tabelas de resultado (matriz, pagamento, cobertura) anexadas ao relatorio_renault.html
+ESTILO_TH = "padding:6px;border-bottom:1px solid #ccc;text-align:left"
+ESTILO_TD = "padding:6px;border-bottom:1px solid #eee"
+ESTILO_RESUMO = "margin:10px 0;padding:10px;background:#f0f0f0"
+
+
+def tabela_html(titulo: str, cabecalho: List[str], linhas: Iterable[list], resumo: str = "") -> str:
+    """Tabela recolhível; título, cabeçalho, células e resumo são escapados (textos vêm da página)."""
+    th = "".join(f"<th style='{ESTILO_TH}'>{html.escape(str(h))}</th>" for h in cabecalho)
+    trs = "".join(
+        "<tr>" + "".join(f"<td style='{ESTILO_TD}'>{html.escape(str(c))}</td>" for c in linha) + "</tr>"
+        for linha in linhas
+    )
+    stats = f"<div style='{ESTILO_RESUMO}'>{html.escape(resumo)}</div>" if resumo else ""
+    return (f"<details open><summary>{html.escape(titulo)}</summary>{stats}"
+            f"<table style='width:100%;border-collapse:collapse'><thead><tr>{th}</tr></thead><tbody>{trs}</tbody></table></details>")
+
+
+def anexar_tabela_html(request, titulo: str, cabecalho: List[str], linhas: Iterable[list], resumo: str = "") -> None:
+    """Anexa a tabela ao relatório HTML do teste (dentro do teste via item.extras, depois dele via rep_call)."""
+    extra = pytest_html.extras.html(tabela_html(titulo, cabecalho, linhas, resumo))
+    if hasattr(request.node, "rep_call"):
+        request.node.rep_call.extra = getattr(request.node.rep_call, "extra", []) + [extra]
+        return
+    # item.extras é mesclado no rep_call pelo hook pytest_runtest_makereport do conftest
+    if not hasattr(request.node, "extras"):
+        request.node.extras = []
+    request.node.extras.append(extra)
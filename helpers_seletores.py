@@ -0,0 +1,264 @@
+import re
+from typing import Dict, List, Optional, Sequence, Union
+
+# Candidato: CSS (aceita também 'text=...' e ':has-text("...")' do Playwright),
+# papel ARIA + nome, ou texto (regex/substring). Construídos por css(), por_role(), por_texto().
+Candidato = Union[str, Dict]
+
+HAS_TEXT_REGEX = re.compile(r"""^(?P<base>.*?):has-text\((?P<q>['"])(?P<txt>.*?)(?P=q)\)$""", re.S)
+
+JS_RESOLVER_SELETORES = """
+(cands) => {
+  const normal = (s) => (s || '').replace(/\\s+/g, ' ').trim();
+  const casa = (m, s) => {
+    if (!m) return true;
+    s = normal(s);
+    if (m.regex !== undefined) return new RegExp(m.regex, m.flags).test(s);
+    return s.toLowerCase().includes(m.substr.toLowerCase());
+  };
+  const visivel = (el) => {
+    const st = window.getComputedStyle(el);
+    if (st.visibility === 'hidden') return false;
+    const r = el.getBoundingClientRect();
+    return r.width > 0 && r.height > 0;
+  };
+  const naArvoreA11y = (el) => {
+    if (el.closest('[aria-hidden="true"]')) return false;
+    return typeof el.checkVisibility === 'function' ? el.checkVisibility() : true;
+  };
+  const ROLE_SEL = {
+    button: 'button, [role="button"], input[type="button"], input[type="submit"], input[type="reset"], summary',
+    link: 'a[href], area[href], [role="link"]',
+    heading: 'h1, h2, h3, h4, h5, h6, [role="heading"]',
+    radio: 'input[type="radio"], [role="radio"]',
+    checkbox: 'input[type="checkbox"], [role="checkbox"]',
+    tab: '[role="tab"]',
+    option: 'option, [role="option"]',
+    combobox: 'select, [role="combobox"]',
+    textbox: 'input:not([type]), input[type="text"], input[type="email"], input[type="search"], input[type="tel"], textarea, [role="textbox"]',
+  };
+  const nomeAcessivel = (el) => {
+    const lbl = el.getAttribute('aria-label');
+    if (lbl && normal(lbl)) return normal(lbl);
+    const ids = el.getAttribute('aria-labelledby');
+    if (ids) {
+      const t = normal(ids.split(/\\s+/).map(id => {
+        const n = document.getElementById(id); return n ? n.textContent : '';
+      }).join(' '));
+      if (t) return t;
+    }
+    if (el.labels && el.labels.length) return normal(Array.from(el.labels).map(l => l.textContent).join(' '));
+    if (el.tagName === 'INPUT' && /^(button|submit|reset)$/i.test(el.type)) return normal(el.value);
+    return normal(el.innerText || el.textContent) || normal(el.getAttribute('title') || el.getAttribute('alt'));
+  };
+  const porTexto = (m) => {
+    // Elemento mais interno cujo texto casa (mesma ideia do get_by_text)
+    const out = [];
+    const walker = document.createTreeWalker(document.body || document.documentElement, NodeFilter.SHOW_ELEMENT);
+    let el = walker.currentNode;
+    while (el) {
+      if (!/^(SCRIPT|STYLE|NOSCRIPT|TEMPLATE)$/.test(el.tagName) && casa(m, el.textContent)) {
+        const filhoCasa = Array.from(el.children).some(c => casa(m, c.textContent));
+        if (!filhoCasa) out.push(el);
+      }
+      el = walker.nextNode();
+    }
+    return out;
+  };
+  const ordemDocumento = (a, b) => (a === b ? 0 : (a.compareDocumentPosition(b) & Node.DOCUMENT_POSITION_FOLLOWING ? -1 : 1));
+
+  return cands.map((c) => {
+    let els = [];
+    try {
+      if (c.tipo === 'css') {
+        const conj = new Set();
+        for (const p of c.partes) {
+          let achados = p.css ? Array.from(document.querySelectorAll(p.css)) : porTexto(p.texto);
+          if (p.css && p.texto) achados = achados.filter(e => casa(p.texto, e.innerText || e.textContent));
+          achados.forEach(e => conj.add(e));
+        }
+        els = Array.from(conj);
+        if (c.partes.length > 1) els.sort(ordemDocumento);
+      } else if (c.tipo === 'role') {
+        const sel = ROLE_SEL[c.role] || `[role="${c.role}"]`;
+        els = Array.from(document.querySelectorAll(sel)).filter(naArvoreA11y);
+        if (c.nome) els = els.filter(e => casa(c.nome, nomeAcessivel(e)));
+      } else if (c.tipo === 'texto') {
+        els = porTexto(c.texto);
+      }
+    } catch (e) {
+      return { suportado: false, erro: String(e), total: 0, visiveis: 0, primeiro_visivel: -1 };
+    }
+    let visiveis = 0, primeiro = -1;
+    els.forEach((e, i) => { if (visivel(e)) { visiveis++; if (primeiro < 0) primeiro = i; } });
+    return { suportado: true, total: els.length, visiveis, primeiro_visivel: primeiro };
+  });
+}
+"""
+
+
+def css(seletor: str) -> Dict:
+    return {"css": seletor}
+
+
+def por_role(role: str, name=None) -> Dict:
+    return {"role": role, "name": name}
+
+
+def por_texto(texto) -> Dict:
+    return {"texto": texto}
+
+
+def _matcher(valor) -> Optional[Dict]:
+    """Converte str/regex Python para o formato do JS (substring case-insensitive ou RegExp)."""
+    if valor is None:
+        return None
+    if isinstance(valor, re.Pattern):
+        flags = "i" if valor.flags & re.I else ""
+        flags += "s" if valor.flags & re.S else ""
+        return {"regex": valor.pattern, "flags": flags}
+    return {"substr": str(valor)}
+
+
+def _dividir_virgulas(seletor: str) -> List[str]:
+    """Divide uma lista de seletores CSS nas vírgulas de nível superior (fora de aspas/parênteses)."""
+    partes, atual, prof, aspas = [], [], 0, None
+    for ch in seletor:
+        if aspas:
+            if ch == aspas:
+                aspas = None
+        elif ch in "\"'":
+            aspas = ch
+        elif ch in "([":
+            prof += 1
+        elif ch in ")]":
+            prof -= 1
+        elif ch == "," and prof == 0:
+            partes.append("".join(atual).strip())
+            atual = []
+            continue
+        atual.append(ch)
+    partes.append("".join(atual).strip())
+    return [p for p in partes if p]
+
+
+def _normalizar(cand: Candidato) -> Optional[Dict]:
+    """Candidato no formato do JS, ou None quando só o Playwright sabe resolvê-lo (fallback)."""
+    if isinstance(cand, str):
+        cand = css(cand)
+    if "role" in cand:
+        return {"tipo": "role", "role": cand["role"], "nome": _matcher(cand.get("name"))}
+    if "texto" in cand:
+        return {"tipo": "texto", "texto": _matcher(cand["texto"])}
+    partes = []
+    for parte in _dividir_virgulas(cand["css"]):
+        if parte.startswith("text="):
+            partes.append({"css": None, "texto": _matcher(parte[len("text="):].strip("\"'"))})
+            continue
+        m = HAS_TEXT_REGEX.match(parte)
+        if m:
+            base = m.group("base").strip() or "*"
+            if ":has-text(" in base or ":has(" in base:
+                return None
+            partes.append({"css": base, "texto": _matcher(m.group("txt"))})
+            continue
+        if ":has-text(" in parte or ">>" in parte or parte.startswith(("role=", "xpath=", "internal:")):
+            return None
+        partes.append({"css": parte, "texto": None})
+    return {"tipo": "css", "partes": partes}
+
+
+def _locator(ctx, cand: Candidato):
+    """Locator Playwright equivalente ao candidato (para clicar/esperar no vencedor)."""
+    if isinstance(cand, str):
+        return ctx.locator(cand)
+    if "role" in cand:
+        if cand.get("name") is None:
+            return ctx.get_by_role(cand["role"])
+        return ctx.get_by_role(cand["role"], name=cand["name"])
+    if "texto" in cand:
+        return ctx.get_by_text(cand["texto"])
+    return ctx.locator(cand["css"])
+
+
+def _estatistica_fallback(ctx, cand: Candidato) -> Dict:
+    """Resolve via Playwright os candidatos que o JS não entende (ex.: :has(), encadeamentos)."""
+    try:
+        loc = _locator(ctx, cand)
+        total = loc.count()
+        visivel = total > 0 and loc.first.is_visible()
+        return {"suportado": False, "total": total, "visiveis": int(visivel), "primeiro_visivel": 0 if visivel else -1}
+    except Exception as e:
+        return {"suportado": False, "erro": str(e), "total": 0, "visiveis": 0, "primeiro_visivel": -1}
+
+
+class ResultadoSeletores:
+    """
+    Resultado da resolução em lote.
+    - primeiro: (ctx, índice do candidato) do primeiro candidato que casou, ou None
+    - estatisticas: por frame, lista com {candidato, total, visiveis, primeiro_visivel, suportado}
+    """
+
+    def __init__(self, candidatos: Sequence[Candidato]):
+        self.candidatos = list(candidatos)
+        self.primeiro = None
+        self.estatisticas: List[Dict] = []
+
+    def __bool__(self) -> bool:
+        return self.primeiro is not None
+
+    @property
+    def total(self) -> int:
+        """Quantidade de elementos do candidato vencedor."""
+        if not self.primeiro:
+            return 0
+        ctx, idx = self.primeiro
+        for st in self.estatisticas:
+            if st["ctx"] is ctx:
+                return st["candidatos"][idx]["total"]
+        return 0
+
+    def locator(self):
+        """Locator do candidato vencedor (no frame onde casou)."""
+        if not self.primeiro:
+            return None
+        ctx, idx = self.primeiro
+        return _locator(ctx, self.candidatos[idx])
+
+
+def resolver_seletores(ctx, candidatos: Sequence[Candidato], exigir_visivel: bool = True, frames: Optional[Sequence] = None) -> ResultadoSeletores:
+    """
+    Avalia vários seletores candidatos numa única chamada in-page por frame (em vez de
+    .count()/.is_visible() um a um) e retorna o primeiro que casa, na ordem dada, com as
+    estatísticas completas de todos.
+    - exigir_visivel: o vencedor precisa ter ao menos um elemento visível (senão basta existir)
+    - frames: lista de frames a avaliar (padrão: apenas o ctx)
+    """
+    resultado = ResultadoSeletores(candidatos)
+    normalizados = [_normalizar(c) for c in candidatos]
+    suportados = [n for n in normalizados if n is not None]
+
+    for alvo in (list(frames) if frames else [ctx]):
+        stats_js: List[Dict] = []
+        if suportados:
+            try:
+                stats_js = alvo.evaluate(JS_RESOLVER_SELETORES, suportados) or []
+            except Exception as e:
+                stats_js = [{"suportado": False, "erro": str(e), "total": 0, "visiveis": 0, "primeiro_visivel": -1}] * len(suportados)
+        it = iter(stats_js)
+        por_candidato = []
+        for cand, norm in zip(candidatos, normalizados):
+            st = next(it, None) if norm is not None else None
+            if st is None or (not st.get("suportado") and "erro" in st and norm is not None):
+                st = _estatistica_fallback(alvo, cand)
+            por_candidato.append(dict(st, candidato=cand))
+        resultado.estatisticas.append({"ctx": alvo, "candidatos": por_candidato})
+
+    # Prioridade: ordem dos candidatos; em empate, ordem dos frames
+    for idx in range(len(candidatos)):
+        for st in resultado.estatisticas:
+            c = st["candidatos"][idx]
+            if (c["visiveis"] if exigir_visivel else c["total"]) > 0:
+                resultado.primeiro = (st["ctx"], idx)
+                return resultado
+    return resultado
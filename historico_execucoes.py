@@ -0,0 +1,294 @@
+"""
+Histórico de execuções (SQLite) e relatório de tendências.
+
+Ao final de cada sessão o conftest ingere o fluxo de resultados da execução (testes, células da matriz
+e duração de cada etapa) em reports/historico.sqlite e regenera reports/tendencias.html. Também pode
+ser chamado à mão, por exemplo para carregar execuções antigas:
+
+    python historico_execucoes.py                          # todas as pastas de reports/ com fluxo
+    python historico_execucoes.py reports/2025-01-01_10-00-00
+"""
+import os
+import sys
+import html
+import math
+import time
+import sqlite3
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from fluxo_resultados import ler_eventos, EVENTO_TESTE, EVENTO_CELULA
+from construir_relatorio import resultados_por_teste
+
+HISTORICO_DB = Path(os.getenv("HISTORICO_DB", "") or (Path("reports") / "historico.sqlite"))
+TENDENCIAS_HTML = Path(os.getenv("TENDENCIAS_HTML", "") or (Path("reports") / "tendencias.html"))
+
+# Execuções recentes comparadas com o histórico para destacar lentidão
+JANELA_RECENTE = 5
+
+ETAPAS_MATRIZ = ["sel_versao", "inicial", "cores", "rodas", "interior", "concessionaria"]
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS execucoes (
+    id TEXT PRIMARY KEY,
+    inicio REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS testes (
+    execucao TEXT NOT NULL,
+    teste TEXT NOT NULL,
+    navegador TEXT NOT NULL,
+    resultado TEXT NOT NULL,
+    duracao REAL NOT NULL,
+    reexecucoes INTEGER NOT NULL,
+    PRIMARY KEY (execucao, teste)
+);
+CREATE TABLE IF NOT EXISTS celulas (
+    execucao TEXT NOT NULL,
+    teste TEXT NOT NULL,
+    navegador TEXT NOT NULL,
+    modelo TEXT NOT NULL,
+    versao TEXT NOT NULL,
+    status TEXT NOT NULL,
+    instante REAL NOT NULL,
+    PRIMARY KEY (execucao, teste, modelo, versao)
+);
+CREATE TABLE IF NOT EXISTS etapas (
+    execucao TEXT NOT NULL,
+    teste TEXT NOT NULL,
+    navegador TEXT NOT NULL,
+    modelo TEXT NOT NULL,
+    versao TEXT NOT NULL,
+    etapa TEXT NOT NULL,
+    status TEXT NOT NULL,
+    duracao REAL NOT NULL,
+    tentativa INTEGER NOT NULL DEFAULT 1
+);
+CREATE INDEX IF NOT EXISTS idx_etapas_celula ON etapas (modelo, versao, etapa);
+CREATE INDEX IF NOT EXISTS idx_celulas_celula ON celulas (modelo, versao, navegador);
+"""
+
+
+def _conectar(caminho: Path = HISTORICO_DB) -> sqlite3.Connection:
+    caminho = Path(caminho)
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(caminho), timeout=30)
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+    except sqlite3.DatabaseError:
+        pass
+    conn.executescript(ESQUEMA)
+    # Bancos anteriores à duração por tentativa
+    colunas = {linha[1] for linha in conn.execute("PRAGMA table_info(etapas)")}
+    if "tentativa" not in colunas:
+        conn.execute("ALTER TABLE etapas ADD COLUMN tentativa INTEGER NOT NULL DEFAULT 1")
+    return conn
+
+
+def status_coluna(texto: str) -> str:
+    """Badge da matriz -> status ('ok', 'falha', 'bug_conhecido', 'nao_executado')."""
+    texto = str(texto or "")
+    if "❌" in texto:
+        return "falha"
+    if "⚠️" in texto:
+        return "bug_conhecido"
+    if "✅" in texto:
+        return "ok"
+    return "nao_executado"
+
+
+def status_celula(colunas: List[str]) -> str:
+    """Status da célula pelas colunas das etapas; 'flaky' quando a coluna Resultado indica retentativa."""
+    colunas = colunas or []
+    if len(colunas) > 2 + len(ETAPAS_MATRIZ) and "🔁" in str(colunas[2 + len(ETAPAS_MATRIZ)]):
+        return "flaky"
+    estados = [status_coluna(c) for c in colunas[2:2 + len(ETAPAS_MATRIZ)]]
+    for status in ("falha", "bug_conhecido", "nao_executado"):
+        if status in estados:
+            return status
+    return "ok" if estados else "nao_executado"
+
+
+def percentil(valores: List[float], p: float) -> Optional[float]:
+    """Percentil por posição mais próxima (sem numpy)."""
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    return ordenados[max(0, min(len(ordenados), math.ceil(p / 100.0 * len(ordenados))) - 1)]
+
+
+def ingerir_execucao(raiz: Path, caminho: Path = HISTORICO_DB) -> int:
+    """Grava (ou regrava) a execução reports/<ts> no histórico. Retorna o número de células."""
+    raiz = Path(raiz)
+    execucao = raiz.name
+    testes = resultados_por_teste(raiz)
+    reexecucoes: Dict[str, int] = {}
+    instantes = []
+    for ev in ler_eventos(raiz, tipo=EVENTO_TESTE):
+        instantes.append(float(ev.get("instante") or 0))
+        if ev.get("resultado") == "rerun":
+            reexecucoes[ev["teste"]] = reexecucoes.get(ev["teste"], 0) + 1
+    celulas = list(ler_eventos(raiz, tipo=EVENTO_CELULA))
+    if not testes and not celulas:
+        # Execução vazia (nada rodou): não entra no histórico
+        return 0
+
+    with _conectar(caminho) as conn:
+        for tabela in ("testes", "celulas", "etapas"):
+            conn.execute(f"DELETE FROM {tabela} WHERE execucao=?", (execucao,))
+        conn.execute("INSERT OR REPLACE INTO execucoes (id, inicio) VALUES (?, ?)",
+                     (execucao, min(instantes) if instantes else raiz.stat().st_mtime))
+        conn.executemany(
+            "INSERT OR REPLACE INTO testes (execucao, teste, navegador, resultado, duracao, reexecucoes) VALUES (?, ?, ?, ?, ?, ?)",
+            [(execucao, t["teste"], t["navegador"] or "", t["resultado"], t["duracao"], reexecucoes.get(t["teste"], 0))
+             for t in testes.values()],
+        )
+        for ev in celulas:
+            colunas = ev.get("colunas") or []
+            modelo, versao = str(ev.get("modelo") or colunas[0]), str(ev.get("versao") or colunas[1])
+            conn.execute(
+                "INSERT OR REPLACE INTO celulas (execucao, teste, navegador, modelo, versao, status, instante) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (execucao, ev.get("teste", ""), ev.get("navegador") or "", modelo, versao, status_celula(colunas),
+                 float(ev.get("instante") or 0)),
+            )
+            # Duração medida pelo próprio teste, uma linha por tentativa (retentativas não se somam)
+            for tentativa, etapas in enumerate(ev.get("duracoes") or [], start=1):
+                for etapa in ETAPAS_MATRIZ:
+                    if etapa not in etapas:
+                        continue
+                    duracao, ok = etapas[etapa]
+                    conn.execute(
+                        "INSERT INTO etapas (execucao, teste, navegador, modelo, versao, etapa, status, duracao, tentativa) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        (execucao, ev.get("teste", ""), ev.get("navegador") or "", modelo, versao, etapa,
+                         "ok" if ok else "falha", float(duracao), tentativa),
+                    )
+    return len(celulas)
+
+
+# -----------------------------------------------------------------------------
+# Tendências
+# -----------------------------------------------------------------------------
+
+def tendencias(caminho: Path = HISTORICO_DB) -> Dict:
+    """
+    Por modelo/versão/navegador: p50/p95 por etapa (todas as execuções e as JANELA_RECENTE últimas),
+    taxa de instabilidade (trocas ok<->falha entre execuções seguidas; 'flaky' conta como ok) e desde
+    quando está falhando.
+    Por teste: taxa de reexecução (flaky = passou depois de reexecutado).
+    """
+    with _conectar(caminho) as conn:
+        ordem = [r[0] for r in conn.execute("SELECT id FROM execucoes ORDER BY inicio")]
+        posicao = {e: i for i, e in enumerate(ordem)}
+        recentes = set(ordem[-JANELA_RECENTE:])
+        celulas: Dict[tuple, Dict] = {}
+        for execucao, navegador, modelo, versao, status in conn.execute(
+                "SELECT execucao, navegador, modelo, versao, status FROM celulas"):
+            c = celulas.setdefault((modelo, versao, navegador), {"historico": [], "etapas": {}})
+            c["historico"].append((posicao.get(execucao, -1), execucao, status))
+        for execucao, navegador, modelo, versao, etapa, duracao in conn.execute(
+                "SELECT execucao, navegador, modelo, versao, etapa, duracao FROM etapas"):
+            c = celulas.setdefault((modelo, versao, navegador), {"historico": [], "etapas": {}})
+            e = c["etapas"].setdefault(etapa, {"todas": [], "recentes": []})
+            e["todas"].append(duracao)
+            if execucao in recentes:
+                e["recentes"].append(duracao)
+        testes = [
+            {"teste": t, "execucoes": n, "flaky": f, "falhas": x}
+            for t, n, f, x in conn.execute(
+                "SELECT teste, COUNT(*), SUM(CASE WHEN reexecucoes > 0 AND resultado = 'passed' THEN 1 ELSE 0 END), "
+                "SUM(CASE WHEN resultado IN ('failed', 'erro') THEN 1 ELSE 0 END) FROM testes GROUP BY teste ORDER BY teste")
+        ]
+
+    linhas = []
+    for (modelo, versao, navegador), c in sorted(celulas.items()):
+        historico = [(p, e, s) for p, e, s in sorted(c["historico"]) if s != "nao_executado"]
+        passou = lambda status: status in ("ok", "flaky")
+        trocas = sum(1 for a, b in zip(historico, historico[1:]) if passou(a[2]) != passou(b[2]))
+        falhando_desde = None
+        for _, execucao, status in reversed(historico):
+            if passou(status):
+                break
+            falhando_desde = execucao
+        linhas.append({
+            "modelo": modelo, "versao": versao, "navegador": navegador, "execucoes": len(historico),
+            "instabilidade": trocas / (len(historico) - 1) if len(historico) > 1 else 0.0,
+            "ultimo_status": historico[-1][2] if historico else "nao_executado",
+            "falhando_desde": falhando_desde,
+            "nova_falha": bool(falhando_desde and ordem and falhando_desde == ordem[-1]),
+            "etapas": {
+                etapa: {"p50": percentil(d["todas"], 50), "p95": percentil(d["todas"], 95),
+                        "p50_recente": percentil(d["recentes"], 50)}
+                for etapa, d in c["etapas"].items()
+            },
+        })
+    return {"execucoes": ordem, "celulas": linhas, "testes": testes}
+
+
+def _fmt(valor: Optional[float]) -> str:
+    return "" if valor is None else f"{valor:.1f}"
+
+
+def gerar_tendencias(destino: Path = TENDENCIAS_HTML, caminho: Path = HISTORICO_DB) -> Path:
+    dados = tendencias(caminho)
+    cab_etapas = "".join(f"<th>{e}<br><small>p50 / p95 / p50 últimas {JANELA_RECENTE}</small></th>" for e in ETAPAS_MATRIZ)
+    linhas = []
+    for c in dados["celulas"]:
+        tds = []
+        for etapa in ETAPAS_MATRIZ:
+            e = c["etapas"].get(etapa)
+            if not e:
+                tds.append("<td></td>")
+                continue
+            # Destaca etapa que ficou mais de 50% mais lenta nas execuções recentes
+            lenta = e["p50_recente"] is not None and e["p50"] and e["p50_recente"] > 1.5 * e["p50"]
+            estilo = " style='background:#fde2e2'" if lenta else ""
+            tds.append(f"<td{estilo}>{_fmt(e['p50'])} / {_fmt(e['p95'])} / {_fmt(e['p50_recente'])}</td>")
+        desde = html.escape(c["falhando_desde"] or "")
+        if c["nova_falha"]:
+            desde = f"<b>🆕 {desde}</b>"
+        linhas.append(
+            f"<tr><td>{html.escape(c['modelo'])}</td><td>{html.escape(c['versao'])}</td><td>{html.escape(c['navegador'])}</td>"
+            f"<td>{c['execucoes']}</td><td>{c['instabilidade'] * 100:.0f}%</td><td>{html.escape(c['ultimo_status'])}</td>"
+            f"<td>{desde}</td>{''.join(tds)}</tr>"
+        )
+    linhas_testes = "".join(
+        f"<tr><td>{html.escape(t['teste'])}</td><td>{t['execucoes']}</td><td>{(t['flaky'] or 0) / t['execucoes'] * 100:.0f}%</td>"
+        f"<td>{(t['falhas'] or 0) / t['execucoes'] * 100:.0f}%</td></tr>"
+        for t in dados["testes"] if t["execucoes"]
+    )
+    destino = Path(destino)
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    destino.write_text(
+        "<html><head><meta charset='utf-8'><title>Tendências</title><style>body{font-family:sans-serif}"
+        "table{border-collapse:collapse;width:100%;margin-bottom:24px}td,th{padding:6px;border-bottom:1px solid #eee;text-align:left;vertical-align:top}"
+        f"</style></head><body><h1>Tendências ({len(dados['execucoes'])} execuções)</h1>"
+        "<h2>Matriz (duração por etapa em segundos)</h2><table><tr><th>Modelo</th><th>Versão</th><th>Navegador</th>"
+        "<th>Execuções</th><th>Instabilidade</th><th>Último</th><th>Falhando desde</th>" + cab_etapas + "</tr>"
+        + "".join(linhas) + "</table><h2>Testes</h2><table><tr><th>Teste</th><th>Execuções</th>"
+        "<th>Flaky (passou após reexecução)</th><th>Falhas</th></tr>" + linhas_testes + "</table></body></html>",
+        encoding="utf-8",
+    )
+    return destino
+
+
+def registrar_execucao(raiz: Path) -> None:
+    """Chamado no pytest_sessionfinish do controlador: ingere a execução e regenera as tendências."""
+    try:
+        inicio = time.time()
+        n = ingerir_execucao(raiz)
+        destino = gerar_tendencias()
+        print(f"[INFO] Histórico atualizado ({n} células) em {time.time() - inicio:.2f}s: {destino}")
+    except Exception as e:
+        print(f"[AVISO] Falha ao atualizar histórico de execuções: {e}")
+
+
+def main(argv: List[str]) -> int:
+    pastas = [Path(a) for a in argv] or sorted(p for p in Path("reports").glob("*") if (p / "fluxo").is_dir())
+    for pasta in pastas:
+        print(f"[INFO] {pasta}: {ingerir_execucao(pasta)} células")
+    print(f"[INFO] Gerado: {gerar_tendencias()}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
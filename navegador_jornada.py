@@ -0,0 +1,475 @@
+import os
+import re
+import time
+import heapq
+import atexit
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+from playwright.sync_api import Page
+
+from helpers_arquivos import trava_arquivo, ler_json, gravar_json_atomico
+from helpers_frames import get_configurator_ctx
+from fluxo_resultados import marcar_etapa
+from vigia_fatal import EstadoFatalPagina, tolerar_erros_documento, vigia_fatal
+
+# Navegação da jornada como máquina de estados.
+# - Estados: etapas da jornada (home, jornada, versoes, design, concessionaria, pagamento, resumo),
+#   detectadas pela URL da página e dos frames (e, sem URL própria, por uma sonda de UI)
+# - Arestas: transições conhecidas (CTA, botão, aba, URL direta) com custo médio e taxa de sucesso
+#   medidos e persistidos entre execuções
+# - O caminho é o de menor custo esperado (Dijkstra: custo / taxa de sucesso) e a espera pelo
+#   próximo estado é pelo evento framenavigated, sem sleeps fixos; aresta que falha sai do grafo
+#   nesta navegação e o caminho é recalculado a partir do estado atual
+GRAFO_JORNADA_PATH = Path(os.getenv("JORNADA_GRAFO_CACHE", "") or (Path("reports") / "jornada_grafo.json"))
+JORNADA_ESPERA_ARESTA_MS = int(os.getenv("JORNADA_ESPERA_ARESTA_MS", "15000") or "15000")
+JORNADA_MAX_SUBETAPAS = int(os.getenv("JORNADA_MAX_SUBETAPAS", "6") or "6")
+# Modelo aberto por URL direta quando nenhum CTA da home leva ao configurador
+JORNADA_MODELO_PADRAO = os.getenv("JORNADA_MODELO_PADRAO", "kardian") or "kardian"
+
+# Peso da medição nova no custo médio; taxa de sucesso sobe/decai como o score de helpers_estrategias
+FATOR_MEDIA_CUSTO = 0.3
+FATOR_DECAIMENTO = 0.5
+TAXA_DESCONHECIDA = 0.5
+TAXA_MINIMA = 0.05
+# Fatia de espera por framenavigated entre uma sonda de UI e outra
+FATIA_ESPERA_MS = 1000
+
+CTA_CONFIGURE_RESERVA_REGEX = re.compile(r"(configure\s*e\s*reserve|configure|monte\s*o\s*seu|monte|reservar)", re.I)
+BOTAO_INICIAR_REGEX = re.compile(r"Iniciar|Configurar", re.I)
+BOTAO_VERSAO_REGEX = re.compile(r"Configurar|Selecionar|Escolher", re.I)
+BOTAO_AVANCAR_REGEX = re.compile(r"Avan[cç]ar|Continuar|Pr[oó]ximo|Prosseguir|Ir para|Concession[aá]ria", re.I)
+BOTAO_PAGAMENTO_REGEX = re.compile(r"Pagamento|Ir para pagamento|Continuar|Avan[cç]ar|Finalizar|Pr[oó]ximo", re.I)
+
+# Ordem da jornada; na detecção, a etapa mais avançada encontrada vence
+ORDEM_ESTADOS = ["home", "jornada", "versoes", "design", "concessionaria", "pagamento", "resumo"]
+ESTADOS_URL = [
+    ("resumo", re.compile(r"/resumo|/summary", re.I)),
+    ("pagamento", re.compile(r"/pagamento|/payment|metodo-de-pagamento|forma-de-pagamento|checkout", re.I)),
+    ("concessionaria", re.compile(r"/configurador/.+/concessionaria|/concessionari(a|as)|/dealers|/lojas|/ponto-de-venda|/r-pass/pre-venda/concessionaria", re.I)),
+    ("design", re.compile(r"/configurador/.+/(design|cores|rodas|interior|opcionais|acessorios)", re.I)),
+    ("versoes", re.compile(r"/configurador/.+/versoes", re.I)),
+    ("jornada", re.compile(r"/jornada-de-reserva", re.I)),
+]
+DESCONHECIDO = "desconhecido"
+
+
+def estado_da_url(url: str, principal: bool = True) -> Optional[str]:
+    """Etapa indicada pela URL; a home só vale para o frame principal."""
+    for nome, rx in ESTADOS_URL:
+        if rx.search(url or ""):
+            return nome
+    partes = urlsplit(url or "")
+    if principal and partes.scheme.startswith("http") and partes.path in ("", "/"):
+        return "home"
+    return None
+
+
+def _posicao(estado: str) -> int:
+    return ORDEM_ESTADOS.index(estado) if estado in ORDEM_ESTADOS else -1
+
+
+def _visivel(loc) -> bool:
+    try:
+        return loc.count() > 0 and loc.is_visible()
+    except Exception:
+        return False
+
+
+def sonda_concessionaria(page: Page) -> bool:
+    """Concessionária renderizada sem URL própria (SPA/iframe): heading ou lista de dealers."""
+    ctx = get_configurator_ctx(page)
+    return (_visivel(ctx.get_by_role("heading", name=re.compile(r"Concession[aá]ria|Dealer|Loja", re.I)).first)
+            or _visivel(ctx.locator('[data-testid*="dealer"], li:has-text("km")').first))
+
+
+SONDAS_PADRAO: Dict[str, Callable[[Page], bool]] = {"concessionaria": sonda_concessionaria}
+
+
+# =============================
+# Arestas (transições conhecidas)
+# =============================
+
+class Aresta:
+    """
+    Transição origem → destino. `acao(nav)` executa a transição e retorna False quando não se
+    aplica (botão ausente, URL sem modelo); a chegada é conferida pelo navegador.
+    custo_ms/taxa são os valores iniciais até haver medição; `direta` marca saltos por URL, que
+    testes de CTA desligam (a URL chegaria à etapa mesmo com o botão quebrado).
+    """
+
+    def __init__(self, nome: str, origem: str, destino: str, acao: Callable[["NavegadorJornada"], bool],
+                 custo_ms: float = 3000, taxa: float = TAXA_DESCONHECIDA, direta: bool = False):
+        self.nome = nome
+        self.origem = origem
+        self.destino = destino
+        self.acao = acao
+        self.custo_ms = custo_ms
+        self.taxa = taxa
+        self.direta = direta
+
+    @property
+    def chave(self) -> str:
+        return f"{self.origem}>{self.destino}:{self.nome}"
+
+
+def _clicar(loc, timeout_ms: int = 8000) -> bool:
+    if not _visivel(loc):
+        return False
+    try:
+        loc.scroll_into_view_if_needed(timeout=3000)
+    except Exception:
+        pass
+    try:
+        loc.click(timeout=timeout_ms)
+    except Exception:
+        loc.evaluate("el => el.click()")
+    return True
+
+
+def _ir_para_home(nav: "NavegadorJornada") -> bool:
+    nav.page.goto("/", wait_until="domcontentloaded", timeout=45000)
+    return True
+
+
+def _cta_configurar(nav: "NavegadorJornada") -> bool:
+    page = nav.page
+    _clicar(page.locator("#onetrust-accept-btn-handler").first, 3000)
+    alvos = page.locator("button, a").filter(has_text=nav.cta_regex)
+    try:
+        alvos.first.wait_for(state="visible", timeout=20000)
+    except Exception:
+        return False
+    alvo = alvos.nth(min(nav.modelo, alvos.count() - 1))
+    try:
+        alvo.scroll_into_view_if_needed(timeout=3000)
+    except Exception:
+        pass
+    alvo.click(force=True, timeout=8000)
+    return True
+
+
+def _link_configurador(nav: "NavegadorJornada") -> bool:
+    return _clicar(nav.page.locator('a[href*="/configurador/"]').nth(nav.modelo))
+
+
+def _url_configurador(nav: "NavegadorJornada") -> bool:
+    return _goto_primeiro(nav, [f"/configurador/{JORNADA_MODELO_PADRAO}/versoes"], "versoes")
+
+
+def _botao_iniciar(nav: "NavegadorJornada") -> bool:
+    return _clicar(nav.page.get_by_role("button", name=BOTAO_INICIAR_REGEX).first)
+
+
+def _botao_versao(nav: "NavegadorJornada") -> bool:
+    ctx = nav.ctx()
+    btns = ctx.get_by_role("button", name=BOTAO_VERSAO_REGEX)
+    validos = []
+    for i in range(btns.count()):
+        txt = btns.nth(i).inner_text() or ""
+        if "Hand Talk" not in txt and "Acessibilidade" not in txt:
+            validos.append(i)
+    if not validos:
+        return False
+    return _clicar(btns.nth(validos[min(nav.versao, len(validos) - 1)]), 10000)
+
+
+def _card_versao(nav: "NavegadorJornada") -> bool:
+    cards = nav.ctx().locator('[data-testid*="versao"], [data-testid*="version"], [class*="versao"], [class*="version"]')
+    if cards.count() <= nav.versao:
+        return False
+    card = cards.nth(nav.versao)
+    interno = card.locator('button, a, [role="button"]').first
+    return _clicar(interno if _visivel(interno) else card, 10000)
+
+
+def _avancar_subetapas(nav: "NavegadorJornada") -> bool:
+    """Design → cores → rodas → interior...: clica Avançar e espera a URL do configurador mudar, até sair do design."""
+    clicou = False
+    for _ in range(JORNADA_MAX_SUBETAPAS):
+        ctx = nav.ctx()
+        btn = ctx.get_by_role("button", name=BOTAO_AVANCAR_REGEX).first
+        if not _visivel(btn):
+            break
+        antes = ctx.url
+        btn.click(timeout=8000)
+        clicou = True
+        try:
+            ctx.wait_for_url(lambda u: u != antes, timeout=8000)
+        except Exception:
+            pass
+        if nav.detectar() != "design":
+            break
+    return clicou
+
+
+def _aba_concessionaria(nav: "NavegadorJornada") -> bool:
+    return _clicar(nav.ctx().get_by_role("tab", name=re.compile(r"Concession[aá]ria", re.I)).first, 5000)
+
+
+def _destinos_url(page: Page, sufixos: List[str]) -> List[str]:
+    """URLs da etapa no mesmo modelo do configurador atual (página ou frame)."""
+    urls = [page.url] + [f.url for f in page.frames]
+    for url in urls:
+        m = re.search(r"^(https?://[^/]+)(/r-pass/pre-venda)?/configurador/([^/]+)/", url or "", re.I)
+        if m:
+            origem, prefixo, modelo = m.group(1), m.group(2) or "", m.group(3)
+            return [f"{origem}{prefixo}/configurador/{modelo}/{s}/" for s in sufixos]
+    return []
+
+
+def _goto_primeiro(nav: "NavegadorJornada", destinos: List[str], estado: str) -> bool:
+    tentou, anterior = False, nav.detectar()
+    for destino in destinos:
+        try:
+            # URL adivinhada: 404 num candidato não é estado fatal da página
+            with tolerar_erros_documento(nav.page):
+                nav.page.goto(destino, wait_until="domcontentloaded", timeout=20000)
+            tentou = True
+            if nav.aguardar_saida(anterior, 5000) == estado:
+                return True
+        except EstadoFatalPagina:
+            raise
+        except Exception as e:
+            print(f"[DEBUG] URL direta {destino} falhou: {e}")
+    return tentou
+
+
+def _url_concessionaria(nav: "NavegadorJornada") -> bool:
+    return _goto_primeiro(nav, _destinos_url(nav.page, ["concessionaria"]), "concessionaria")
+
+
+def _botao_pagamento(nav: "NavegadorJornada") -> bool:
+    btn = nav.ctx().get_by_role("button", name=BOTAO_PAGAMENTO_REGEX).last
+    return _clicar(btn, 10000)
+
+
+def _url_pagamento(nav: "NavegadorJornada") -> bool:
+    return _goto_primeiro(nav, _destinos_url(nav.page, ["metodo-de-pagamento", "pagamento", "checkout"]), "pagamento")
+
+
+ARESTAS: List[Aresta] = [
+    Aresta("url_home", DESCONHECIDO, "home", _ir_para_home, custo_ms=4000, taxa=0.9),
+    Aresta("cta_configurar", "home", "jornada", _cta_configurar, custo_ms=5000, taxa=0.8),
+    Aresta("link_configurador", "home", "versoes", _link_configurador, custo_ms=6000, taxa=0.4),
+    Aresta("url_configurador", "home", "versoes", _url_configurador, custo_ms=8000, taxa=0.3, direta=True),
+    Aresta("botao_iniciar", "jornada", "versoes", _botao_iniciar, custo_ms=4000, taxa=0.8),
+    Aresta("botao_versao", "versoes", "design", _botao_versao, custo_ms=4000, taxa=0.8),
+    Aresta("card_versao", "versoes", "design", _card_versao, custo_ms=5000, taxa=0.4),
+    Aresta("botao_avancar", "design", "concessionaria", _avancar_subetapas, custo_ms=6000, taxa=0.7),
+    Aresta("aba_concessionaria", "design", "concessionaria", _aba_concessionaria, custo_ms=4000, taxa=0.3),
+    Aresta("url_concessionaria", "design", "concessionaria", _url_concessionaria, custo_ms=9000, taxa=0.4, direta=True),
+    Aresta("botao_pagamento", "concessionaria", "pagamento", _botao_pagamento, custo_ms=4000, taxa=0.7),
+    Aresta("url_pagamento", "concessionaria", "pagamento", _url_pagamento, custo_ms=10000, taxa=0.3, direta=True),
+]
+
+
+# =============================
+# Custos medidos (persistidos)
+# =============================
+
+class CustosArestas:
+    """
+    Custo médio (ms) e taxa de sucesso por aresta, compartilhados entre workers e execuções.
+    Medições ficam em memória e são mescladas no JSON (sob trava) ao final da sessão de cada worker.
+    """
+
+    def __init__(self, caminho: Path = GRAFO_JORNADA_PATH):
+        self.caminho = Path(caminho)
+        self._dados: Optional[Dict] = None
+        self._eventos: List[Tuple[str, bool, float]] = []
+
+    def _carregar(self) -> Dict:
+        if self._dados is None:
+            self._dados = (ler_json(self.caminho, {}) or {}).get("arestas") or {}
+        return self._dados
+
+    @staticmethod
+    def _aplicar(arestas: Dict, chave: str, sucesso: bool, ms: float) -> None:
+        a = arestas.setdefault(chave, {"taxa": TAXA_DESCONHECIDA, "sucessos": 0, "falhas": 0})
+        if sucesso:
+            a["custo_ms"] = ms if "custo_ms" not in a else a["custo_ms"] * (1 - FATOR_MEDIA_CUSTO) + ms * FATOR_MEDIA_CUSTO
+            a["taxa"] = a["taxa"] * FATOR_DECAIMENTO + (1 - FATOR_DECAIMENTO)
+            a["sucessos"] += 1
+        else:
+            a["taxa"] = a["taxa"] * FATOR_DECAIMENTO
+            a["falhas"] += 1
+
+    def custo_esperado(self, aresta: Aresta) -> float:
+        """Custo médio dividido pela taxa de sucesso: aresta barata mas instável fica cara."""
+        medido = self._carregar().get(aresta.chave) or {}
+        custo = medido.get("custo_ms", aresta.custo_ms)
+        taxa = medido.get("taxa", aresta.taxa)
+        return custo / max(taxa, TAXA_MINIMA)
+
+    def registrar(self, aresta: Aresta, sucesso: bool, ms: float) -> None:
+        self._aplicar(self._carregar(), aresta.chave, sucesso, ms)
+        self._eventos.append((aresta.chave, sucesso, ms))
+
+    def salvar(self) -> None:
+        if not self._eventos:
+            return
+        try:
+            with trava_arquivo(self.caminho):
+                dados = ler_json(self.caminho, {}) or {}
+                arestas = dados.setdefault("arestas", {})
+                for chave, sucesso, ms in self._eventos:
+                    self._aplicar(arestas, chave, sucesso, ms)
+                gravar_json_atomico(self.caminho, dados)
+                self._dados = arestas
+            self._eventos = []
+        except Exception as e:
+            print(f"[AVISO] Falha ao salvar custos da jornada: {e}")
+
+
+_CUSTOS: Optional[CustosArestas] = None
+
+
+def custos_arestas() -> CustosArestas:
+    global _CUSTOS
+    if _CUSTOS is None:
+        _CUSTOS = CustosArestas()
+        atexit.register(_CUSTOS.salvar)
+    return _CUSTOS
+
+
+def menor_caminho(origem: str, destino: str, arestas: List[Aresta], custo: Callable[[Aresta], float]) -> List[Aresta]:
+    """Dijkstra sobre os estados; retorna as arestas do caminho (vazio se não houver)."""
+    fila = [(0.0, 0, origem, [])]
+    visitados = set()
+    seq = 1
+    while fila:
+        acumulado, _, estado, caminho = heapq.heappop(fila)
+        if estado == destino:
+            return caminho
+        if estado in visitados:
+            continue
+        visitados.add(estado)
+        for a in arestas:
+            if a.origem == estado and a.destino not in visitados:
+                heapq.heappush(fila, (acumulado + custo(a), seq, a.destino, caminho + [a]))
+                seq += 1
+    return []
+
+
+# =============================
+# Navegador
+# =============================
+
+class NavegadorJornada:
+    """
+    Leva a página até uma etapa da jornada pelo caminho mais barato e registra o percurso
+    (estado, aresta, tempo) em self.percurso. modelo/versao escolhem o CTA da home e o card de versão.
+    """
+
+    def __init__(self, page: Page, modelo: int = 0, versao: int = 0, cta_regex: re.Pattern = CTA_CONFIGURE_RESERVA_REGEX,
+                 sondas: Optional[Dict[str, Callable[[Page], bool]]] = None, request=None,
+                 url_direta: bool = True, arestas: Optional[List[Aresta]] = None):
+        self.page = page
+        self.modelo = modelo
+        self.versao = versao
+        self.cta_regex = cta_regex
+        self.sondas = SONDAS_PADRAO if sondas is None else sondas
+        self.request = request
+        self.arestas = [a for a in (arestas if arestas is not None else ARESTAS) if url_direta or not a.direta]
+        self.custos = custos_arestas()
+        self.percurso: List[Dict] = []
+
+    def ctx(self):
+        return get_configurator_ctx(self.page)
+
+    def detectar(self) -> str:
+        """Etapa mais avançada indicada pelas URLs da página/frames ou, acima dela, por uma sonda de UI."""
+        melhor = None
+        try:
+            principal = self.page.main_frame
+            for f in self.page.frames:
+                estado = estado_da_url(f.url, principal=(f == principal))
+                if estado and _posicao(estado) > _posicao(melhor):
+                    melhor = estado
+        except Exception:
+            pass
+        # Sondas de UI só dentro do configurador (a home também fala em concessionária)
+        for estado, sonda in self.sondas.items():
+            if _posicao(melhor) >= _posicao("versoes") and _posicao(estado) > _posicao(melhor):
+                try:
+                    if sonda(self.page):
+                        melhor = estado
+                except Exception:
+                    pass
+        return melhor or DESCONHECIDO
+
+    def aguardar_saida(self, origem: str, timeout_ms: int) -> str:
+        """Espera (por framenavigated, com sonda a cada fatia) o estado deixar `origem`; retorna o estado atual."""
+        fim = time.time() + timeout_ms / 1000.0
+        principal = self.page.main_frame
+        vigia = vigia_fatal(self.page)
+
+        def _mudou(frame) -> bool:
+            return estado_da_url(frame.url, principal=(frame == principal)) not in (None, origem)
+
+        while True:
+            estado = self.detectar()
+            restante_ms = (fim - time.time()) * 1000
+            if (estado != origem and estado != DESCONHECIDO) or restante_ms <= 0:
+                return estado
+            if vigia is not None:
+                vigia.verificar()
+            try:
+                self.page.wait_for_event("framenavigated", predicate=_mudou, timeout=min(restante_ms, FATIA_ESPERA_MS))
+            except Exception:
+                pass
+
+    def _executar(self, aresta: Aresta) -> str:
+        t0 = time.time()
+        try:
+            agiu = aresta.acao(self)
+        except EstadoFatalPagina:
+            # Página quebrada não diz nada sobre a aresta: sem registrar custo/taxa
+            raise
+        except Exception as e:
+            print(f"[DEBUG] Aresta {aresta.chave} falhou: {e}")
+            agiu = False
+        estado = self.aguardar_saida(aresta.origem, JORNADA_ESPERA_ARESTA_MS) if agiu else self.detectar()
+        ms = (time.time() - t0) * 1000
+        # Chegar ao destino ou além dele (ex.: CTA que pula a jornada e cai em versões) conta como sucesso
+        ok = _posicao(estado) >= _posicao(aresta.destino)
+        self.custos.registrar(aresta, ok, ms)
+        self.percurso.append({"origem": aresta.origem, "aresta": aresta.nome, "estado": estado, "ms": int(ms), "ok": ok})
+        print(f"[DEBUG] Jornada: {aresta.origem} --{aresta.nome}--> {estado} em {ms / 1000:.1f}s{'' if ok else ' (falhou)'}")
+        if ok and self.request is not None:
+            marcar_etapa(self.request, estado)
+        return estado
+
+    def navegar(self, destino: str, timeout_s: float = 90) -> str:
+        """Vai até `destino`; retorna o estado final (igual a destino em caso de sucesso, ou a etapa em que parou)."""
+        t0 = time.time()
+        descartadas = set()
+        estado = self.detectar()
+        if estado == DESCONHECIDO and (self.page.url or "").startswith("http"):
+            # Página do site ainda sem etapa reconhecível (SPA renderizando): espera antes de voltar à home
+            estado = self.aguardar_saida(DESCONHECIDO, JORNADA_ESPERA_ARESTA_MS)
+        while estado != destino and _posicao(estado) <= _posicao(destino) and time.time() - t0 < timeout_s:
+            disponiveis = [a for a in self.arestas if a.chave not in descartadas]
+            caminho = menor_caminho(estado, destino, disponiveis, self.custos.custo_esperado)
+            if not caminho:
+                print(f"[AVISO] Jornada: nenhuma transição restante de '{estado}' até '{destino}'")
+                break
+            aresta = caminho[0]
+            novo = self._executar(aresta)
+            if _posicao(novo) < _posicao(aresta.destino):
+                descartadas.add(aresta.chave)
+            estado = novo
+        self._registrar_percurso(destino, estado, time.time() - t0)
+        return estado
+
+    def _registrar_percurso(self, destino: str, estado: str, duracao_s: float) -> None:
+        passos = " → ".join(f"{p['estado']} [{p['aresta']} {p['ms'] / 1000:.1f}s{'' if p['ok'] else ' ✗'}]" for p in self.percurso)
+        inicio = self.percurso[0]["origem"] if self.percurso else estado
+        nivel = "INFO" if estado == destino else "AVISO"
+        print(f"[{nivel}] Jornada até '{destino}': {inicio} → {passos or estado} ({duracao_s:.1f}s)")
+
+
+def navegar_jornada(page: Page, destino: str, timeout_s: float = 90, **kwargs) -> str:
+    """Atalho: NavegadorJornada(page, **kwargs).navegar(destino, timeout_s)."""
+    return NavegadorJornada(page, **kwargs).navegar(destino, timeout_s)
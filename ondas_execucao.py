@@ -0,0 +1,176 @@
+import os
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import pytest
+
+from helpers_arquivos import ler_json, gravar_json_atomico
+from orcamento_execucao import prioridade_item, carregar_prioridades, PRIORIDADE_SMOKE
+
+# Execução em ondas numa única sessão (run_tests.py --ondas / ONDAS=1): os testes smoke rodam
+# primeiro em todos os workers; os de regressão esperam, já no worker, a onda smoke terminar
+# (barreira liberada pelo controlador) e reaproveitam navegadores, catálogo e caches aquecidos.
+# Com ONDAS_FAIL_FAST=1, falha no smoke fecha a barreira e a regressão é relatada como não executada.
+# A barreira mora em REPORTS_DIR e é liberada pelo controlador do xdist: sem os dois, ONDAS=1 é
+# ignorado (ver ondas_ativas), senão a regressão esperaria ONDAS_ESPERA_MAX_S por nada.
+ONDAS_ATIVAS = os.getenv("ONDAS", "").lower() in ("1", "true", "yes", "on")
+ONDAS_FAIL_FAST = os.getenv("ONDAS_FAIL_FAST", "").lower() in ("1", "true", "yes", "on")
+# Proteção contra controlador interrompido: a regressão segue depois deste tempo de espera
+ONDAS_ESPERA_MAX_S = float(os.getenv("ONDAS_ESPERA_MAX_S", "3600") or "3600")
+
+ONDA_SMOKE = "smoke"
+ONDA_REGRESSAO = "regressao"
+ONDAS = (ONDA_SMOKE, ONDA_REGRESSAO)
+ONDAS_ARQUIVO = "ondas.json"
+MOTIVO_SMOKE_FALHOU = "não executado (smoke falhou)"
+
+INTERVALO_BARREIRA_S = 0.5
+# Tempo parado na barreira, em user_properties do teste (descontado das durações do agendador)
+PROPRIEDADE_ESPERA = "espera_onda_s"
+
+_EFETIVAS: Optional[bool] = None
+
+
+def definir_ondas(config) -> bool:
+    """
+    Decide uma vez por processo (no pytest_sessionstart, com o xdist já configurado) se as ondas valem:
+    ONDAS=1, sob xdist (worker ou controlador distribuído) e com REPORTS_DIR compartilhado.
+    """
+    global _EFETIVAS
+    sob_xdist = hasattr(config, "workerinput") or config.pluginmanager.has_plugin("dsession")
+    _EFETIVAS = ONDAS_ATIVAS and sob_xdist and bool(os.getenv("REPORTS_DIR"))
+    if ONDAS_ATIVAS and not _EFETIVAS and not hasattr(config, "workerinput"):
+        print("[AVISO] ONDAS=1 ignorado: as ondas exigem xdist (-n) e REPORTS_DIR (use run_tests.py --ondas).")
+    return _EFETIVAS
+
+
+def ondas_ativas() -> bool:
+    return bool(_EFETIVAS)
+
+
+def onda_do_item(item) -> str:
+    return ONDA_SMOKE if prioridade_item(item) == PRIORIDADE_SMOKE else ONDA_REGRESSAO
+
+
+def _caminho() -> Path:
+    return Path(os.getenv("REPORTS_DIR", "")) / ONDAS_ARQUIVO
+
+
+def _ler_barreira() -> Dict:
+    return ler_json(_caminho(), {}) or {}
+
+
+def _gravar_barreira(dados: Dict) -> None:
+    try:
+        gravar_json_atomico(_caminho(), dados)
+    except Exception as e:
+        print(f"[AVISO] Falha ao gravar a barreira das ondas: {e}")
+
+
+class ControleOndas:
+    """
+    No controlador: acompanha os reports e libera a onda de regressão quando todos os testes smoke
+    terminaram (teardown recebido); também soma resultado e duração de cada onda para o resumo.
+    """
+
+    def __init__(self):
+        self.smoke: Optional[set] = None
+        self.concluidos: set = set()
+        self.falhas_smoke: List[str] = []
+        self.liberada = False
+        self.contagem: Dict[str, Dict[str, int]] = {onda: {} for onda in ONDAS}
+        self.inicio: Dict[str, float] = {}
+        self.fim: Dict[str, float] = {}
+
+    def _onda(self, nodeid: str) -> str:
+        if self.smoke is None:
+            # Mapa publicado pelos workers na coleta (antes do primeiro teste); sem ele, nada é liberado
+            prioridades = carregar_prioridades()
+            if prioridades:
+                self.smoke = {n for n, p in prioridades.items() if p == PRIORIDADE_SMOKE}
+        return ONDA_SMOKE if self.smoke and nodeid in self.smoke else ONDA_REGRESSAO
+
+    def registrar(self, report) -> None:
+        onda = self._onda(report.nodeid)
+        agora = time.time()
+        self.inicio.setdefault(onda, agora)
+        self.fim[onda] = agora
+        if report.when == "call" or (report.when == "setup" and report.outcome != "passed"):
+            contagem = self.contagem[onda]
+            contagem[report.outcome] = contagem.get(report.outcome, 0) + 1
+        if onda == ONDA_SMOKE and report.failed:
+            self.falhas_smoke.append(f"{report.nodeid} ({report.when})")
+        if onda == ONDA_SMOKE and report.when == "teardown":
+            self.concluidos.add(report.nodeid)
+        if not self.liberada and self.smoke is not None and self.concluidos >= self.smoke:
+            self._liberar()
+
+    def _liberar(self) -> None:
+        self.liberada = True
+        bloqueada = ONDAS_FAIL_FAST and bool(self.falhas_smoke)
+        _gravar_barreira({"smoke_concluida": True, "bloqueada": bloqueada, "falhas_smoke": self.falhas_smoke[:20],
+                          "instante": time.time()})
+        if bloqueada:
+            print(f"[AVISO] Onda smoke com {len(self.falhas_smoke)} falha(s) e ONDAS_FAIL_FAST=1: "
+                  f"regressão não será executada.")
+        else:
+            print(f"[INFO] Onda smoke concluída ({len(self.smoke)} teste(s)); regressão liberada.")
+
+    def linhas_resumo(self) -> List[Dict]:
+        linhas = []
+        for onda in ONDAS:
+            if onda not in self.inicio:
+                continue
+            c = self.contagem[onda]
+            linhas.append({"onda": onda, "passou": c.get("passed", 0), "falhou": c.get("failed", 0),
+                           "pulado": c.get("skipped", 0), "duracao_s": self.fim[onda] - self.inicio[onda]})
+        return linhas
+
+
+_CONTROLE: Optional[ControleOndas] = None
+
+
+def controle_ondas() -> ControleOndas:
+    global _CONTROLE
+    if _CONTROLE is None:
+        _CONTROLE = ControleOndas()
+    return _CONTROLE
+
+
+def aguardar_onda(item) -> None:
+    """
+    No worker, antes do setup de um teste de regressão: espera a onda smoke terminar.
+    Barreira fechada pelo fail-fast pula o teste como não executado. O tempo de espera fica em
+    user_properties para não inflar a duração do teste no histórico do agendador.
+    """
+    if onda_do_item(item) == ONDA_SMOKE:
+        return
+    if not any(p == PRIORIDADE_SMOKE for p in carregar_prioridades().values()):
+        return
+    inicio = time.time()
+    fim = inicio + ONDAS_ESPERA_MAX_S
+    avisou = False
+    try:
+        while True:
+            barreira = _ler_barreira()
+            if barreira.get("smoke_concluida"):
+                if barreira.get("bloqueada"):
+                    pytest.skip(MOTIVO_SMOKE_FALHOU)
+                return
+            if time.time() > fim:
+                print(f"[AVISO] Onda smoke não concluída em {ONDAS_ESPERA_MAX_S:.0f}s; seguindo com a regressão.")
+                return
+            if not avisou:
+                print(f"[INFO] {item.nodeid} aguardando o fim da onda smoke.")
+                avisou = True
+            time.sleep(INTERVALO_BARREIRA_S)
+    finally:
+        item.user_properties.append((PROPRIEDADE_ESPERA, time.time() - inicio))
+
+
+def espera_onda_s(report) -> float:
+    """Tempo que o teste passou na barreira (só conta no report do setup, onde a espera acontece)."""
+    if report.when != "setup":
+        return 0.0
+    return float(dict(getattr(report, "user_properties", []) or []).get(PROPRIEDADE_ESPERA, 0.0) or 0.0)
@@ -0,0 +1,155 @@
+import os
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+from playwright.sync_api import Page
+
+from helpers_arquivos import ler_json, gravar_json_atomico
+from vigia_fatal import vigia_fatal
+
+# Orçamento de tempo da execução inteira (RUN_BUDGET_MIN, 0 = sem orçamento), contado a partir de
+# RUN_INICIO_EPOCH (gravado pelo run_tests.py ou pelo controlador, herdado pelos workers do xdist).
+# - Timeouts padrão encolhem à medida que o orçamento é consumido (fator 1.0 até metade do tempo,
+#   depois proporcional ao que resta, nunca abaixo de ORCAMENTO_FATOR_MINIMO)
+# - Cada célula da matriz recebe um prazo (parcela justa do tempo restante pelas células pendentes)
+#   que limita também as esperas com timeout explícito
+# - Testes smoke entram primeiro na fila; o que não couber é relatado como "não executado (orçamento)"
+RUN_BUDGET_MIN = float(os.getenv("RUN_BUDGET_MIN", "0") or "0")
+ORCAMENTO_RESERVA_S = float(os.getenv("ORCAMENTO_RESERVA_S", "60") or "60")
+ORCAMENTO_FATOR_MINIMO = float(os.getenv("ORCAMENTO_FATOR_MINIMO", "0.3") or "0.3")
+ORCAMENTO_CELULA_MIN_S = float(os.getenv("ORCAMENTO_CELULA_MIN_S", "60") or "60")
+ORCAMENTO_TIMEOUT_MINIMO_MS = 5000
+
+VAR_INICIO = "RUN_INICIO_EPOCH"
+MOTIVO_ORCAMENTO = "não executado (orçamento)"
+
+# Prioridade dos testes na fila (menor primeiro); o agendador do xdist lê o mapa gravado pelos workers
+PRIORIDADE_SMOKE = 0
+PRIORIDADE_PADRAO = 1
+PRIORIDADES_ARQUIVO = "prioridades.json"
+
+
+class OrcamentoExecucao:
+    def __init__(self, minutos: float = RUN_BUDGET_MIN, inicio: Optional[float] = None):
+        self.total_s = max(0.0, minutos) * 60
+        self.inicio = inicio if inicio is not None else float(os.getenv(VAR_INICIO, "") or time.time())
+
+    @property
+    def ativo(self) -> bool:
+        return self.total_s > 0
+
+    def restante_s(self) -> float:
+        """Tempo até o fim do orçamento, já descontada a reserva para relatórios/teardown."""
+        if not self.ativo:
+            return float("inf")
+        return self.total_s - (time.time() - self.inicio) - ORCAMENTO_RESERVA_S
+
+    def esgotado(self) -> bool:
+        return self.restante_s() <= 0
+
+    def fator(self) -> float:
+        if not self.ativo:
+            return 1.0
+        fracao = max(0.0, self.restante_s()) / self.total_s
+        return 1.0 if fracao >= 0.5 else max(ORCAMENTO_FATOR_MINIMO, fracao / 0.5)
+
+    def timeout_ms(self, base_ms: float) -> int:
+        """Timeout padrão escalado pelo orçamento (base_ms sem orçamento)."""
+        if not self.ativo:
+            return int(base_ms)
+        escalado = max(min(base_ms, ORCAMENTO_TIMEOUT_MINIMO_MS), base_ms * self.fator())
+        return int(max(1000, min(escalado, self.restante_s() * 1000)))
+
+    def prazo_celula_s(self, pendentes: int) -> float:
+        """Parcela do tempo restante para a próxima célula (pendentes = ela + as que faltam no teste)."""
+        restante = max(0.0, self.restante_s())
+        return min(restante, max(ORCAMENTO_CELULA_MIN_S, restante / max(1, pendentes)))
+
+    def resumo(self) -> str:
+        usado_min = (time.time() - self.inicio) / 60
+        return f"{usado_min:.1f} de {self.total_s / 60:.0f} min (fator de timeout {self.fator():.2f})"
+
+
+_ORCAMENTO: Optional[OrcamentoExecucao] = None
+
+
+def orcamento() -> OrcamentoExecucao:
+    """Orçamento do processo (o início vem de RUN_INICIO_EPOCH, igual em todos os workers)."""
+    global _ORCAMENTO
+    if _ORCAMENTO is None:
+        _ORCAMENTO = OrcamentoExecucao()
+    return _ORCAMENTO
+
+
+def marcar_inicio() -> None:
+    """Fixa o início da execução para os workers (no-op se o run_tests.py já fixou)."""
+    os.environ.setdefault(VAR_INICIO, str(time.time()))
+
+
+@contextmanager
+def prazo_celula(page: Page, pendentes: int, timeout_ms: float = 25000, navegacao_ms: float = 45000) -> Iterator[Optional[float]]:
+    """
+    Prazo da célula: timeouts padrão limitados pelo que resta da parcela dela e esperas da página
+    (inclusive com timeout explícito) cortadas no prazo pelo vigia. Sem orçamento, não faz nada.
+    Ao sair, os timeouts anteriores voltam (a Page não os expõe: vêm do vigia ou, sem ele,
+    de timeout_ms/navegacao_ms, os padrões do teste).
+    """
+    orc = orcamento()
+    if not orc.ativo:
+        yield None
+        return
+    vigia = vigia_fatal(page)
+    anterior_ms = vigia.timeout_padrao_ms if vigia is not None else timeout_ms
+    anterior_navegacao_ms = vigia.timeout_navegacao_ms if vigia is not None else navegacao_ms
+    prazo_s = orc.prazo_celula_s(pendentes)
+    prazo = time.time() + prazo_s
+    page.set_default_timeout(max(1000, min(orc.timeout_ms(timeout_ms), prazo_s * 1000)))
+    page.set_default_navigation_timeout(max(1000, min(orc.timeout_ms(navegacao_ms), prazo_s * 1000)))
+    if vigia is not None:
+        vigia.prazo = prazo
+    try:
+        yield prazo
+    finally:
+        if vigia is not None:
+            vigia.prazo = None
+        try:
+            page.set_default_timeout(anterior_ms)
+            page.set_default_navigation_timeout(anterior_navegacao_ms)
+        except Exception:
+            pass
+
+
+# -----------------------------------------------------------------------------
+# Prioridade (smoke primeiro)
+# -----------------------------------------------------------------------------
+
+def prioridade_item(item) -> int:
+    return PRIORIDADE_SMOKE if item.get_closest_marker("smoke") is not None else PRIORIDADE_PADRAO
+
+
+# Mapa nodeid -> prioridade deste processo (execução sem xdist ou sem REPORTS_DIR)
+_PRIORIDADES: Dict[str, int] = {}
+
+
+def priorizar_itens(items: List) -> None:
+    """Ordena os itens coletados (smoke primeiro, ordem estável) e publica o mapa para o agendador."""
+    items.sort(key=prioridade_item)
+    _PRIORIDADES.clear()
+    _PRIORIDADES.update({i.nodeid: prioridade_item(i) for i in items})
+    base = os.getenv("REPORTS_DIR")
+    if not base:
+        return
+    try:
+        # Todos os workers coletam o mesmo conjunto: gravação atômica, conteúdo idêntico
+        gravar_json_atomico(Path(base) / PRIORIDADES_ARQUIVO, _PRIORIDADES)
+    except Exception as e:
+        print(f"[AVISO] Falha ao gravar prioridades dos testes: {e}")
+
+
+def carregar_prioridades() -> Dict[str, int]:
+    """Mapa deste processo (se coletou) ou o publicado pelos workers (controlador do xdist)."""
+    if _PRIORIDADES:
+        return _PRIORIDADES
+    base = os.getenv("REPORTS_DIR")
+    return (ler_json(Path(base) / PRIORIDADES_ARQUIVO, {}) or {}) if base else {}
@@ -0,0 +1,197 @@
+import json
+import time
+import threading
+from pathlib import Path
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Dict, Optional
+from urllib.parse import unquote
+
+from fluxo_resultados import (
+    PASTA_FLUXO, PASTA_EVIDENCIAS,
+    EVENTO_TESTE, EVENTO_CELULA, EVENTO_EVIDENCIA, EVENTO_ETAPA,
+)
+
+# Etapas concluídas mantidas por worker (com o tempo gasto em cada uma)
+ETAPAS_POR_WORKER = 8
+
+PAGINA_HTML = """<!doctype html>
+<html><head><meta charset="utf-8"><title>Painel de progresso</title>
+<style>
+body{font-family:sans-serif;margin:16px} table{border-collapse:collapse;width:100%}
+td,th{padding:6px;border-bottom:1px solid #eee;text-align:left;vertical-align:top}
+img{max-width:320px;border:1px solid #ccc} .ok{color:#080} .falha{color:#c00}
+</style></head><body>
+<h1>Painel de progresso</h1>
+<p id="resumo">carregando...</p>
+<table><thead><tr><th>Worker</th><th>Teste</th><th>Modelo / Versão</th><th>Etapa atual</th>
+<th>Etapas anteriores</th><th>Último screenshot</th></tr></thead><tbody id="workers"></tbody></table>
+<script>
+const esc = (s) => String(s == null ? '' : s).replace(/[&<>"']/g, c => ({'&':'&amp;','<':'&lt;','>':'&gt;','"':'&quot;',"'":'&#39;'}[c]));
+async function atualizar() {
+  try {
+    const r = await fetch('estado'); const e = await r.json();
+    const t = e.testes, c = e.celulas;
+    document.getElementById('resumo').innerHTML =
+      `Decorrido: ${Math.round(e.decorrido_s)}s | Testes: <span class="ok">${t.passed||0} ok</span>, ` +
+      `<span class="falha">${t.failed||0} falhas</span>, ${t.skipped||0} pulados | ` +
+      `Células: <span class="ok">${c.ok} ok</span>, <span class="falha">${c.falha} falhas</span>, ${c.outras} outras`;
+    document.getElementById('workers').innerHTML = Object.entries(e.workers).map(([w, s]) => `<tr>
+      <td>${esc(w)}</td><td>${esc(s.teste)}<br><small>${esc(s.navegador)}</small></td>
+      <td>${esc(s.modelo)} ${esc(s.versao)}</td>
+      <td><b>${esc(s.etapa)}</b><br><small>${s.etapa_desde ? Math.round(e.agora - s.etapa_desde) + 's' : ''}</small></td>
+      <td><small>${(s.etapas || []).map(x => esc(x.etapa) + ': ' + x.duracao_s.toFixed(1) + 's').join('<br>')}</small></td>
+      <td>${s.screenshot ? `<a href="${esc(s.screenshot)}" target="_blank"><img src="${esc(s.screenshot)}"></a>` : ''}</td>
+    </tr>`).join('');
+  } catch (err) {}
+}
+atualizar(); setInterval(atualizar, 2000);
+</script></body></html>
+"""
+
+
+class EstadoPainel:
+    """
+    Estado ao vivo montado lendo os fluxos (reports/<ts>/fluxo/*.jsonl) de forma incremental:
+    a cada consulta só as linhas novas de cada arquivo são processadas.
+    """
+
+    def __init__(self, raiz: Path):
+        self.raiz = Path(raiz)
+        self.inicio = time.time()
+        self._posicoes: Dict[Path, int] = {}
+        self._trava = threading.Lock()
+        self.workers: Dict[str, Dict] = {}
+        self.testes: Dict[str, str] = {}
+        self.celulas = {"ok": 0, "falha": 0, "outras": 0}
+
+    def _worker(self, origem: str) -> Dict:
+        return self.workers.setdefault(origem, {"teste": "", "navegador": "", "modelo": "", "versao": "",
+                                                "etapa": "", "etapa_desde": None, "etapas": [], "screenshot": ""})
+
+    def _fechar_etapa(self, w: Dict, instante: float) -> None:
+        if w["etapa"] and w["etapa_desde"]:
+            w["etapas"].append({"etapa": w["etapa"], "duracao_s": max(0.0, instante - w["etapa_desde"])})
+            del w["etapas"][:-ETAPAS_POR_WORKER]
+
+    def _aplicar(self, ev: Dict) -> None:
+        tipo, instante = ev.get("tipo"), float(ev.get("instante") or time.time())
+        if tipo == EVENTO_TESTE:
+            quando, resultado = ev.get("quando"), ev.get("resultado")
+            if quando == "call" or (quando == "setup" and resultado != "passed"):
+                self.testes[ev.get("teste", "")] = resultado
+            return
+        w = self._worker(ev.get("origem", "?"))
+        if tipo == EVENTO_ETAPA:
+            # Etapas são gravadas pela thread do fluxo: podem chegar depois de um evento síncrono mais novo
+            if w["etapa_desde"] and instante < w["etapa_desde"]:
+                return
+            self._fechar_etapa(w, instante)
+            if ev.get("teste") != w["teste"]:
+                w["etapas"] = []
+            w["teste"] = ev.get("teste", "")
+            for chave in ("navegador", "modelo", "versao"):
+                if ev.get(chave) is not None:
+                    w[chave] = ev[chave]
+            w["etapa"], w["etapa_desde"] = ev.get("etapa", ""), instante
+        elif tipo == EVENTO_CELULA:
+            self._fechar_etapa(w, instante)
+            w["etapa"], w["etapa_desde"] = "célula concluída", instante
+            colunas = " ".join(str(c) for c in (ev.get("colunas") or [])[2:])
+            if "❌" in colunas:
+                self.celulas["falha"] += 1
+            elif "✅" in colunas and "⚠️" not in colunas and "⏭️" not in colunas:
+                self.celulas["ok"] += 1
+            else:
+                self.celulas["outras"] += 1
+        elif tipo == EVENTO_EVIDENCIA:
+            w["screenshot"] = ev.get("caminho", "")
+
+    def atualizar(self) -> None:
+        with self._trava:
+            for arquivo in sorted((self.raiz / PASTA_FLUXO).glob("*.jsonl")):
+                pos = self._posicoes.get(arquivo, 0)
+                try:
+                    with open(arquivo, "rb") as f:
+                        f.seek(pos)
+                        bloco = f.read()
+                except Exception:
+                    continue
+                # Só processa linhas completas; a última pode estar sendo escrita
+                fim = bloco.rfind(b"\n")
+                if fim < 0:
+                    continue
+                for linha in bloco[:fim].splitlines():
+                    try:
+                        self._aplicar(json.loads(linha.decode("utf-8")))
+                    except Exception:
+                        pass
+                self._posicoes[arquivo] = pos + fim + 1
+
+    def como_dict(self) -> Dict:
+        self.atualizar()
+        contagem: Dict[str, int] = {}
+        for resultado in self.testes.values():
+            contagem[resultado] = contagem.get(resultado, 0) + 1
+        agora = time.time()
+        return {"agora": agora, "decorrido_s": agora - self.inicio, "testes": contagem,
+                "celulas": dict(self.celulas), "workers": self.workers}
+
+
+def _handler(estado: EstadoPainel):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _responder(self, codigo: int, tipo: str, corpo: bytes):
+            self.send_response(codigo)
+            self.send_header("Content-Type", tipo)
+            self.send_header("Content-Length", str(len(corpo)))
+            self.send_header("Cache-Control", "no-store")
+            self.end_headers()
+            self.wfile.write(corpo)
+
+        def do_GET(self):
+            caminho = unquote(self.path.split("?", 1)[0]).lstrip("/")
+            if caminho in ("", "index.html"):
+                return self._responder(200, "text/html; charset=utf-8", PAGINA_HTML.encode("utf-8"))
+            if caminho == "estado":
+                corpo = json.dumps(estado.como_dict(), ensure_ascii=False, default=str).encode("utf-8")
+                return self._responder(200, "application/json; charset=utf-8", corpo)
+            if caminho.startswith(PASTA_EVIDENCIAS + "/") and caminho.endswith(".png"):
+                arquivo = (estado.raiz / caminho).resolve()
+                base = (estado.raiz / PASTA_EVIDENCIAS).resolve()
+                if base in arquivo.parents and arquivo.is_file():
+                    return self._responder(200, "image/png", arquivo.read_bytes())
+            return self._responder(404, "text/plain; charset=utf-8", b"nao encontrado")
+
+    return Handler
+
+
+class PainelProgresso:
+    """Servidor HTTP local (thread daemon) com o progresso ao vivo da execução."""
+
+    def __init__(self, raiz: Path, porta: int = 8765, host: str = "127.0.0.1"):
+        self.estado = EstadoPainel(raiz)
+        self.servidor: Optional[ThreadingHTTPServer] = None
+        self.porta = porta
+        self.host = host
+
+    def iniciar(self) -> Optional[str]:
+        try:
+            self.servidor = ThreadingHTTPServer((self.host, self.porta), _handler(self.estado))
+            self.servidor.daemon_threads = True
+            threading.Thread(target=self.servidor.serve_forever, name="painel-progresso", daemon=True).start()
+            return f"http://{self.host}:{self.servidor.server_address[1]}/"
+        except Exception as e:
+            print(f"[AVISO] Painel de progresso não iniciado: {e}")
+            self.servidor = None
+            return None
+
+    def parar(self) -> None:
+        if self.servidor is not None:
+            try:
+                self.servidor.shutdown()
+                self.servidor.server_close()
+            except Exception:
+                pass
+            self.servidor = None
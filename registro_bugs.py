@@ -0,0 +1,178 @@
+import os
+import re
+import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from helpers_arquivos import trava_arquivo, ler_json, gravar_json_atomico
+
+try:
+    import yaml  # opcional: registro em .yaml/.yml
+except Exception:
+    yaml = None
+
+# Registro de bugs conhecidos (JSON; YAML se o PyYAML estiver instalado)
+BUGS_CONHECIDOS_PATH = Path(os.getenv("BUGS_CONHECIDOS", "") or (Path(__file__).resolve().parent / "bugs_conhecidos.json"))
+
+# Políticas por entrada
+POLITICA_PULAR = "pular"              # não executa a célula: já entra na matriz como bug conhecido
+POLITICA_CLASSIFICAR = "classificar"  # executa; falha que casa com a mensagem vira bug conhecido
+POLITICA_SONDAR = "sondar"            # executa uma vez por execução (sem retentativa); se reproduzir, as demais são puladas
+ALIASES_POLITICA = {"skip-fast": POLITICA_PULAR, "run-and-classify": POLITICA_CLASSIFICAR, "probe-once": POLITICA_SONDAR}
+
+SONDAS_ARQUIVO = "sondas_bugs.json"
+SONDA_EM_ANDAMENTO = "em_andamento"
+
+
+# Campos da célula que aceitam {"regex": "..."} no lugar do valor exato
+CAMPOS_CELULA = ("modelo", "versao", "etapa", "navegador")
+
+
+def _casa(valor: str, padrao) -> bool:
+    """Igualdade sem diferenciar maiúsculas; {"regex": "KWID"} casa por busca (ex.: KWID e KWID-E-TECH)."""
+    if padrao in (None, "", "*"):
+        return True
+    if isinstance(padrao, dict):
+        return re.search(padrao.get("regex") or "", str(valor or ""), re.I) is not None
+    return str(valor or "").strip().lower() == str(padrao).strip().lower()
+
+
+def _casa_versao(versao: str, padrao) -> bool:
+    """Aceita '#1' e '1' como a mesma versão."""
+    if padrao in (None, "", "*") or isinstance(padrao, dict):
+        return _casa(versao, padrao)
+    return str(versao or "").lstrip("#").strip() == str(padrao).lstrip("#").strip()
+
+
+def _carregar(caminho: Path) -> List[Dict]:
+    if caminho.suffix.lower() in (".yaml", ".yml"):
+        if yaml is None:
+            print(f"[AVISO] PyYAML não instalado; registro de bugs {caminho} ignorado.")
+            return []
+        try:
+            with open(caminho, "r", encoding="utf-8") as f:
+                dados = yaml.safe_load(f) or {}
+        except FileNotFoundError:
+            return []
+    else:
+        dados = ler_json(caminho, {}) or {}
+    return list(dados.get("bugs") or []) if isinstance(dados, dict) else list(dados or [])
+
+
+class RegistroBugs:
+    """
+    Bugs conhecidos por modelo/versão/etapa/navegador com padrão de mensagem e data de expiração.
+    Cada campo da célula é um valor exato ou {"regex": "..."}.
+    Entrada expirada deixa de valer (a célula volta a falhar normalmente) e gera aviso para revisão.
+    """
+
+    def __init__(self, caminho: Path = BUGS_CONHECIDOS_PATH, hoje: Optional[datetime.date] = None):
+        self.caminho = Path(caminho)
+        self.hoje = hoje or datetime.date.today()
+        self.bugs: List[Dict] = []
+        self._sondas: Dict[str, object] = {}
+        for i, bug in enumerate(_carregar(self.caminho)):
+            bug = dict(bug)
+            bug.setdefault("id", f"bug{i}")
+            bug["politica"] = ALIASES_POLITICA.get(bug.get("politica"), bug.get("politica") or POLITICA_CLASSIFICAR)
+            expira = bug.get("expira")
+            try:
+                if expira and datetime.date.fromisoformat(str(expira)) < self.hoje:
+                    print(f"[AVISO] Bug conhecido '{bug['id']}' expirou em {expira}; revise o registro {self.caminho.name}.")
+                    continue
+            except ValueError:
+                print(f"[AVISO] Data de expiração inválida no bug '{bug['id']}': {expira}")
+            try:
+                bug["_regex"] = re.compile(bug.get("mensagem") or ".*", re.I | re.S)
+                for campo in CAMPOS_CELULA:
+                    if isinstance(bug.get(campo), dict):
+                        re.compile(bug[campo].get("regex") or "")
+            except re.error as e:
+                print(f"[AVISO] Padrão inválido no bug '{bug['id']}': {e}")
+                continue
+            self.bugs.append(bug)
+
+    def _da_celula(self, modelo: str, versao: str, navegador: str = "") -> List[Dict]:
+        return [b for b in self.bugs
+                if _casa(modelo, b.get("modelo")) and _casa_versao(versao, b.get("versao")) and _casa(navegador, b.get("navegador"))]
+
+    @staticmethod
+    def explica(bug: Dict, etapa: str, erro: str) -> bool:
+        return _casa(etapa, bug.get("etapa")) and bool(bug["_regex"].search(erro or ""))
+
+    def classificar(self, modelo: str, versao: str, etapa: str, erro: str, navegador: str = "") -> Optional[Dict]:
+        """Entrada que explica a falha (etapa + mensagem), ou None se for erro real."""
+        for bug in self._da_celula(modelo, versao, navegador):
+            if self.explica(bug, etapa, erro):
+                return bug
+        return None
+
+    def decidir(self, modelo: str, versao: str, navegador: str = "") -> Tuple[str, Optional[Dict]]:
+        """
+        Política a aplicar antes de executar a célula: (POLITICA_PULAR, bug), (POLITICA_SONDAR, bug)
+        ou (POLITICA_CLASSIFICAR, None) para executar normalmente.
+        """
+        for bug in self._da_celula(modelo, versao, navegador):
+            if bug["politica"] == POLITICA_PULAR:
+                return POLITICA_PULAR, bug
+            if bug["politica"] == POLITICA_SONDAR:
+                sonda = self._reservar_sonda(bug["id"])
+                if sonda is None:
+                    return POLITICA_SONDAR, bug
+                if sonda is True:
+                    return POLITICA_PULAR, bug
+        return POLITICA_CLASSIFICAR, None
+
+    # -------------------------------------------------------------------------
+    # Sonda (uma execução da célula por rodada, compartilhada entre workers/navegadores)
+    # -------------------------------------------------------------------------
+
+    def _caminho_sondas(self) -> Optional[Path]:
+        base = os.getenv("REPORTS_DIR")
+        return Path(base) / SONDAS_ARQUIVO if base else None
+
+    def _reservar_sonda(self, bug_id: str):
+        """None = esta célula é a sonda; True = bug reproduziu; False/em andamento = executa normalmente."""
+        caminho = self._caminho_sondas()
+        if caminho is None:
+            if bug_id not in self._sondas:
+                self._sondas[bug_id] = SONDA_EM_ANDAMENTO
+                return None
+            return self._sondas[bug_id] is True
+        with trava_arquivo(caminho):
+            sondas = ler_json(caminho, {}) or {}
+            if bug_id not in sondas:
+                sondas[bug_id] = SONDA_EM_ANDAMENTO
+                gravar_json_atomico(caminho, sondas)
+                return None
+        return sondas[bug_id] is True
+
+    def registrar_sonda(self, bug: Dict, reproduziu: bool) -> None:
+        if not reproduziu:
+            print(f"[AVISO] Bug conhecido '{bug['id']}' não reproduziu na sonda: pode ter sido corrigido (revise o registro).")
+        caminho = self._caminho_sondas()
+        if caminho is None:
+            self._sondas[bug["id"]] = reproduziu
+            return
+        try:
+            with trava_arquivo(caminho):
+                sondas = ler_json(caminho, {}) or {}
+                sondas[bug["id"]] = reproduziu
+                gravar_json_atomico(caminho, sondas)
+        except Exception as e:
+            print(f"[AVISO] Falha ao registrar sonda do bug '{bug['id']}': {e}")
+
+
+_REGISTRO: Optional[RegistroBugs] = None
+
+
+def registro_bugs() -> RegistroBugs:
+    """Registro carregado uma vez por processo."""
+    global _REGISTRO
+    if _REGISTRO is None:
+        _REGISTRO = RegistroBugs()
+    return _REGISTRO
+
+
+def bug_conhecido(modelo: str, versao: str, etapa: str, erro: str, navegador: str = "") -> bool:
+    return registro_bugs().classificar(modelo, versao, etapa, erro, navegador) is not None
@@ -4,8 +4,14 @@ import shutil
 from datetime import datetime
 from pathlib import Path
 import pytest
+from estado_execucao import decidir_modo
+from painel_progresso import PainelProgresso
+from orcamento_execucao import marcar_inicio, RUN_BUDGET_MIN, MOTIVO_ORCAMENTO
 
 def main():
+    # 0. INÍCIO DO ORÇAMENTO DE TEMPO (RUN_BUDGET_MIN conta desde aqui, inclusive a inicialização)
+    marcar_inicio()
+
     # 1. DEFINE O DIRETÓRIO ÚNICO PARA ESSA EXECUÇÃO
     # Gera o timestamp uma única vez aqui no script principal
     ts = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
@@ -20,8 +26,18 @@ def main():
 
     print(f"--- Configurando Relatórios em: {report_root} ---")
 
+    # 3. MODO DA MATRIZ (INCREMENTAL=1 reexecuta só células novas, alteradas ou que falharam;
+    #    uma execução completa é forçada a cada INCREMENTAL_COMPLETO_A_CADA execuções)
+    incremental = os.getenv("INCREMENTAL", "").lower() in ("1", "true", "yes", "on")
+    modo = decidir_modo(incremental)
+    os.environ["MATRIZ_MODO"] = modo
+    print(f"--- Modo da matriz: {modo} ---")
+    if RUN_BUDGET_MIN > 0:
+        print(f"--- Orçamento de tempo: {RUN_BUDGET_MIN:.0f} min (smoke primeiro; o que não couber sai como '{MOTIVO_ORCAMENTO}') ---")
+
     # Configurações do Ambiente
-    browser = os.getenv("BROWSER", "chromium")
+    # BROWSER aceita lista: "chromium,firefox,webkit" -> um --browser por navegador, mesmo pool do xdist
+    browsers = [b.strip() for b in os.getenv("BROWSER", "chromium").split(",") if b.strip()] or ["chromium"]
     base_url = os.getenv("BASE_URL", "https://loja.renault.com.br/")
     headed = os.getenv("HEADED", "").lower() in ("1", "true", "yes", "on")
     workers_env = os.getenv("WORKERS")
@@ -33,11 +49,24 @@ def main():
 
     extra_args = sys.argv[1:]
 
+    # Painel ao vivo (--painel ou PAINEL=1): lê os fluxos dos workers, não interfere na execução
+    painel_ativo = "--painel" in extra_args or os.getenv("PAINEL", "").lower() in ("1", "true", "yes", "on")
+    extra_args = [a for a in extra_args if a != "--painel"]
+
+    # Ondas (--ondas ou ONDAS=1): smoke e regressão numa única sessão, smoke primeiro em todos os
+    # workers; ONDAS_FAIL_FAST=1 não executa a regressão se o smoke falhar
+    ondas = "--ondas" in extra_args or os.getenv("ONDAS", "").lower() in ("1", "true", "yes", "on")
+    extra_args = [a for a in extra_args if a != "--ondas"]
+    if ondas:
+        os.environ["ONDAS"] = "1"
+        if "-m" not in extra_args:
+            extra_args += ["-m", "smoke or regressao"]
+        print(f"--- Ondas: smoke -> regressão{' (fail-fast)' if os.getenv('ONDAS_FAIL_FAST', '').lower() in ('1', 'true', 'yes', 'on') else ''} ---")
+
     args = [
         "-q",
         # Removido --maxfail=1 para permitir mapear todas as falhas antes de encerrar
         "-n", workers_arg,
-        "--browser", browser,
         "--base-url", base_url,
         
         # ONDE SALVAR:
@@ -52,13 +81,27 @@ def main():
         "--tracing=on",    # Gera trace.zip sempre (CUIDADO: arquivos grandes)
     ]
 
+    for browser in browsers:
+        args += ["--browser", browser]
+
     if headed:
         args.append("--headed")
 
     args += extra_args
 
+    painel = None
+    if painel_ativo:
+        painel = PainelProgresso(report_root, porta=int(os.getenv("PAINEL_PORTA", "8765") or "8765"))
+        url = painel.iniciar()
+        if url:
+            print(f"--- Painel de progresso: {url} ---")
+
     # Executa
-    code = pytest.main(args)
+    try:
+        code = pytest.main(args)
+    finally:
+        if painel:
+            painel.parar()
 
     # Copia o HTML para a raiz (opcional)
     try:
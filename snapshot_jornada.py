@@ -0,0 +1,311 @@
+import os
+import re
+import json
+import time
+import uuid
+import shutil
+import hashlib
+import tempfile
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+from playwright.sync_api import Page
+
+from helpers_arquivos import trava_arquivo, ler_json, gravar_json_atomico
+
+# Snapshot do estado da jornada numa etapa (URL + cookies + localStorage + sessionStorage + IndexedDB),
+# para os testes seguintes começarem direto nela em vez de refazer home → configurador → ... .
+# Vale para a execução atual; sem REPORTS_DIR fica só em memória. Como carrega cookies de sessão, não
+# fica em REPORTS_DIR (enviado como artefato do CI): vai para SNAPSHOT_DIR (padrão: pasta temporária do
+# sistema), numa subpasta por execução que o controlador apaga no fim da sessão (limpar_snapshots).
+SNAPSHOT_JORNADA = os.getenv("SNAPSHOT_JORNADA", "true").lower() in ("1", "true", "yes", "on")
+SNAPSHOT_MAX_REGISTROS_IDB = int(os.getenv("SNAPSHOT_MAX_REGISTROS_IDB", "5000") or "5000")
+
+# Página vazia servida por route na origem, para gravar storage/IndexedDB antes do app carregar
+CAMINHO_PREPARO = "/__snapshot_jornada__"
+
+JS_SESSION_STORAGE = "() => [location.origin, Object.assign({}, sessionStorage)]"
+
+JS_EXPORTAR_IDB = """
+async (limite) => {
+  if (!window.indexedDB || typeof indexedDB.databases !== 'function') return [];
+  const req = (r) => new Promise((ok, erro) => { r.onsuccess = () => ok(r.result); r.onerror = () => erro(r.error); });
+  const saida = [];
+  let total = 0;
+  for (const info of await indexedDB.databases()) {
+    if (!info.name) continue;
+    let db;
+    try { db = await req(indexedDB.open(info.name)); } catch (e) { continue; }
+    const banco = { nome: info.name, versao: db.version, stores: [] };
+    for (const nome of Array.from(db.objectStoreNames)) {
+      try {
+        const st = db.transaction(nome, 'readonly').objectStore(nome);
+        const indices = Array.from(st.indexNames).map((n) => {
+          const i = st.index(n);
+          return { nome: n, keyPath: i.keyPath, unique: i.unique, multiEntry: i.multiEntry };
+        });
+        const chaves = await req(st.getAllKeys());
+        const valores = await req(st.getAll());
+        total += valores.length;
+        if (total > limite) break;
+        banco.stores.push({ nome, keyPath: st.keyPath, autoIncrement: st.autoIncrement, indices, chaves, valores });
+      } catch (e) {}
+    }
+    db.close();
+    saida.push(banco);
+  }
+  return saida;
+}
+"""
+
+JS_IMPORTAR_IDB = """
+async (bancos) => {
+  const req = (r) => new Promise((ok, erro) => { r.onsuccess = () => ok(r.result); r.onerror = () => erro(r.error); });
+  for (const b of bancos) {
+    await new Promise((ok) => { const d = indexedDB.deleteDatabase(b.nome); d.onsuccess = d.onerror = d.onblocked = () => ok(); });
+    const abrir = indexedDB.open(b.nome, b.versao);
+    abrir.onupgradeneeded = () => {
+      for (const s of b.stores) {
+        const st = abrir.result.createObjectStore(s.nome, { keyPath: s.keyPath, autoIncrement: s.autoIncrement });
+        for (const i of s.indices) st.createIndex(i.nome, i.keyPath, { unique: i.unique, multiEntry: i.multiEntry });
+      }
+    };
+    const db = await req(abrir);
+    for (const s of b.stores) {
+      const tx = db.transaction(s.nome, 'readwrite');
+      const st = tx.objectStore(s.nome);
+      s.valores.forEach((v, i) => { if (s.keyPath === null) st.put(v, s.chaves[i]); else st.put(v); });
+      await new Promise((ok) => { tx.oncomplete = tx.onerror = tx.onabort = () => ok(); });
+    }
+    db.close();
+  }
+}
+"""
+
+JS_PREPARAR_ORIGEM = """
+async (d) => {
+  for (const k in d.local) localStorage.setItem(k, d.local[k]);
+  for (const k in d.sessao) sessionStorage.setItem(k, d.sessao[k]);
+  if (d.bancos.length) await (__IMPORTAR_IDB__)(d.bancos);
+}
+""".replace("__IMPORTAR_IDB__", JS_IMPORTAR_IDB.strip())
+
+# Aplicado uma vez por origem nesta aba (marca no próprio sessionStorage), antes dos scripts da página
+JS_RESTAURAR_STORAGE = """
+((dados) => {
+  try {
+    if (sessionStorage.getItem('__snapshot_jornada') === dados.id) return;
+    const origem = location.origin;
+    const ls = dados.local_storage[origem] || {};
+    for (const k in ls) localStorage.setItem(k, ls[k]);
+    const ss = dados.session_storage[origem] || {};
+    for (const k in ss) sessionStorage.setItem(k, ss[k]);
+    sessionStorage.setItem('__snapshot_jornada', dados.id);
+  } catch (e) {}
+})
+"""
+
+_MEMORIA: Dict[str, Dict] = {}
+
+
+def _navegador(page: Page) -> str:
+    try:
+        return page.context.browser.browser_type.name
+    except Exception:
+        return "chromium"
+
+
+def _chave(etapa: str, navegador: str) -> str:
+    return re.sub(r"[^\w-]+", "_", f"{etapa}_{navegador}")
+
+
+def pasta_snapshots() -> Optional[Path]:
+    """Pasta dos snapshots da execução atual (fora de REPORTS_DIR), compartilhada pelos workers."""
+    base = os.getenv("REPORTS_DIR")
+    if not base:
+        return None
+    execucao = hashlib.sha1(str(Path(base).resolve()).encode("utf-8")).hexdigest()[:12]
+    return Path(os.getenv("SNAPSHOT_DIR", "") or tempfile.gettempdir()) / f"snapshots_jornada_{execucao}"
+
+
+def _caminho(etapa: str, navegador: str) -> Optional[Path]:
+    pasta = pasta_snapshots()
+    return pasta / f"{_chave(etapa, navegador)}.json" if pasta else None
+
+
+def limpar_snapshots() -> None:
+    """Apaga os snapshots da execução (chamado pelo controlador no fim da sessão)."""
+    _MEMORIA.clear()
+    pasta = pasta_snapshots()
+    if pasta and pasta.exists():
+        shutil.rmtree(pasta, ignore_errors=True)
+
+
+def capturar_snapshot(page: Page, etapa: str) -> Dict:
+    """Estado atual da página: URL, storage_state (cookies + localStorage) e, por origem de frame, sessionStorage e IndexedDB."""
+    sessao, idb = {}, {}
+    for frame in page.frames:
+        try:
+            origem, itens = frame.evaluate(JS_SESSION_STORAGE)
+        except Exception:
+            continue
+        if not origem or origem == "null" or origem in sessao:
+            continue
+        sessao[origem] = itens or {}
+        try:
+            bancos = frame.evaluate(JS_EXPORTAR_IDB, SNAPSHOT_MAX_REGISTROS_IDB) or []
+            if bancos:
+                idb[origem] = bancos
+        except Exception:
+            pass
+    return {
+        "id": uuid.uuid4().hex,
+        "etapa": etapa,
+        "navegador": _navegador(page),
+        "criado_em": time.time(),
+        "url": page.url,
+        "storage_state": page.context.storage_state(),
+        "session_storage": sessao,
+        "indexed_db": idb,
+    }
+
+
+def salvar_snapshot(page: Page, etapa: str) -> Optional[Dict]:
+    """Captura e guarda o snapshot da etapa (o mais recente vence)."""
+    if not SNAPSHOT_JORNADA:
+        return None
+    try:
+        snapshot = capturar_snapshot(page, etapa)
+    except Exception as e:
+        print(f"[AVISO] Snapshot da etapa '{etapa}' não capturado: {e}")
+        return None
+    caminho = _caminho(etapa, snapshot["navegador"])
+    if caminho is None:
+        _MEMORIA[_chave(etapa, snapshot["navegador"])] = snapshot
+    else:
+        try:
+            with trava_arquivo(caminho):
+                gravar_json_atomico(caminho, snapshot)
+        except Exception as e:
+            print(f"[AVISO] Falha ao gravar snapshot da etapa '{etapa}': {e}")
+            return None
+    print(f"[INFO] Snapshot da etapa '{etapa}' salvo ({len(snapshot['storage_state'].get('cookies') or [])} cookies, "
+          f"{len(snapshot['session_storage'])} origem(ns), IndexedDB em {len(snapshot['indexed_db'])})")
+    return snapshot
+
+
+def carregar_snapshot(etapa: str, navegador: str) -> Optional[Dict]:
+    if not SNAPSHOT_JORNADA:
+        return None
+    caminho = _caminho(etapa, navegador)
+    if caminho is None:
+        return _MEMORIA.get(_chave(etapa, navegador))
+    return ler_json(caminho, None)
+
+
+def descartar_snapshot(etapa: str, navegador: str) -> None:
+    """Snapshot que não levou à etapa (sessão expirada, build novo) é descartado; o próximo teste refaz o caminho."""
+    caminho = _caminho(etapa, navegador)
+    if caminho is None:
+        _MEMORIA.pop(_chave(etapa, navegador), None)
+        return
+    try:
+        with trava_arquivo(caminho):
+            caminho.unlink()
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        print(f"[AVISO] Falha ao descartar snapshot da etapa '{etapa}': {e}")
+
+
+def script_restauracao(snapshot: Dict) -> str:
+    """
+    Init script que repõe localStorage/sessionStorage do snapshot em cada origem (uma vez por aba).
+    Para contextos novos (junto com args_contexto); na page do teste use restaurar_snapshot().
+    """
+    dados = {"id": snapshot.get("id"), "local_storage": _local_storage(snapshot), "session_storage": snapshot.get("session_storage") or {}}
+    return f"{JS_RESTAURAR_STORAGE}({json.dumps(dados, ensure_ascii=False)});"
+
+
+def _local_storage(snapshot: Dict) -> Dict[str, Dict]:
+    return {o.get("origin"): {i["name"]: i["value"] for i in (o.get("localStorage") or [])}
+            for o in (snapshot.get("storage_state") or {}).get("origins") or []}
+
+
+def args_contexto(snapshot: Dict) -> Dict:
+    """Argumentos de browser.new_context para um contexto novo já com cookies + localStorage do snapshot."""
+    return {"storage_state": snapshot.get("storage_state") or {}}
+
+
+def _dados_origens(snapshot: Dict) -> List[Tuple[str, Dict]]:
+    """(origem, {local, sessao, bancos}) de cada origem http com algo a restaurar."""
+    local, sessao, idb = _local_storage(snapshot), snapshot.get("session_storage") or {}, snapshot.get("indexed_db") or {}
+    return [(origem, {"local": local.get(origem) or {}, "sessao": sessao.get(origem) or {}, "bancos": idb.get(origem) or []})
+            for origem in sorted(set(local) | set(sessao) | set(idb)) if origem and origem.startswith("http")]
+
+
+def _servir_preparo(route):
+    return route.fulfill(status=200, content_type="text/html", body="<!doctype html><html></html>")
+
+
+def _preparar_origens(page: Page, snapshot: Dict) -> None:
+    """
+    Grava localStorage, sessionStorage e IndexedDB de cada origem numa página vazia da própria origem
+    (servida por route, sem ir à rede), antes do app carregar. Nada fica instalado na página depois.
+    """
+    for origem, dados in _dados_origens(snapshot):
+        url = origem + CAMINHO_PREPARO
+        try:
+            page.route(url, _servir_preparo)
+            page.goto(url, wait_until="domcontentloaded", timeout=15000)
+            page.evaluate(JS_PREPARAR_ORIGEM, dados)
+        except Exception as e:
+            print(f"[AVISO] Storage de {origem} não restaurado: {e}")
+        finally:
+            try:
+                page.unroute(url, _servir_preparo)
+            except Exception:
+                pass
+
+
+async def preparar_origens_async(page, snapshot: Dict) -> None:
+    """_preparar_origens() para uma page da API async (contextos paralelos criados com args_contexto)."""
+    for origem, dados in _dados_origens(snapshot):
+        url = origem + CAMINHO_PREPARO
+        try:
+            await page.route(url, _servir_preparo)
+            await page.goto(url, wait_until="domcontentloaded", timeout=15000)
+            await page.evaluate(JS_PREPARAR_ORIGEM, dados)
+        except Exception as e:
+            print(f"[AVISO] Storage de {origem} não restaurado: {e}")
+        finally:
+            try:
+                await page.unroute(url, _servir_preparo)
+            except Exception:
+                pass
+
+
+def restaurar_snapshot(page: Page, etapa: str, validar: Callable[[Page], bool], timeout_ms: int = 45000) -> bool:
+    """
+    Coloca a página na etapa a partir do snapshot: cookies, storage/IndexedDB por origem e uma navegação.
+    `validar(page)` confirma que a etapa abriu; se não abrir, o snapshot é descartado e retorna False
+    (o chamador segue pelo caminho completo e salva um snapshot novo).
+    """
+    snapshot = carregar_snapshot(etapa, _navegador(page))
+    if not snapshot or not snapshot.get("url"):
+        return False
+    t0 = time.time()
+    try:
+        cookies = (snapshot.get("storage_state") or {}).get("cookies") or []
+        if cookies:
+            page.context.add_cookies(cookies)
+        _preparar_origens(page, snapshot)
+        page.goto(snapshot["url"], wait_until="domcontentloaded", timeout=timeout_ms)
+        if validar(page):
+            print(f"[INFO] Etapa '{etapa}' restaurada do snapshot em {time.time() - t0:.1f}s ({urlsplit(snapshot['url']).path})")
+            return True
+    except Exception as e:
+        print(f"[AVISO] Falha ao restaurar snapshot da etapa '{etapa}': {e}")
+    print(f"[AVISO] Snapshot da etapa '{etapa}' não levou à etapa; descartando e seguindo pelo caminho completo")
+    descartar_snapshot(etapa, _navegador(page))
+    return False
@@ -0,0 +1,136 @@
+import base64
+import json
+import os
+import re
+from typing import Dict
+from urllib.parse import parse_qs, urlsplit
+
+# Stub de mapas (opcional, STUB_MAPAS=1): o SDK do Google Maps, o iframe de embed e os tiles são
+# servidos por route, então o container do mapa renderiza na hora e a lista de dealers não espera
+# dezenas de tiles. Testes marcados com @pytest.mark.mapa_real carregam o mapa de verdade.
+STUB_MAPAS = os.getenv("STUB_MAPAS", "").lower() in ("1", "true", "yes", "on")
+
+URL_SDK_GOOGLE_REGEX = re.compile(r"maps\.googleapis\.com/maps/api/js(\?|$)", re.I)
+URL_EMBED_REGEX = re.compile(r"google\.[^/]+/maps/embed", re.I)
+URL_TILES_REGEX = re.compile(
+    r"maps\.googleapis\.com/maps/(vt|api/staticmap)|khms?\d*\.google(apis)?\.com|mts?\d*\.google(apis)?\.com/(vt|maps)"
+    r"|maps\.gstatic\.com/|tile\.openstreetmap\.org|tiles?\.[^/]*mapbox\.com|api\.mapbox\.com/v4/|basemaps\.cartocdn\.com",
+    re.I,
+)
+# Só os tiles em si (o mapa real renderizou): raster/vetor do Google (/vt, /maps/vt, /kh) e z/x/y dos
+# demais provedores; ícones, fontes e scripts de maps.gstatic.com não contam
+URL_TILE_CARREGADO_REGEX = re.compile(
+    r"/maps/vt[?/]|/vt[?/]|/vt/pb=|/kh[?/]|khms?\d*\.google(apis)?\.com/kh"
+    r"|/\d+/\d+/\d+(@2x)?\.(png|jpe?g|webp|pbf|mvt|vector\.pbf)(\?|$)",
+    re.I,
+)
+URL_STUB_REGEX = re.compile("|".join(r.pattern for r in (URL_SDK_GOOGLE_REGEX, URL_EMBED_REGEX, URL_TILES_REGEX)), re.I)
+
+PNG_1X1 = base64.b64decode("iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAQAAAC1HAwCAAAAC0lEQVR42mNkYAAAAAYAAjCB0C8AAAAASUVORK5CYII=")
+
+HTML_EMBED = "<!doctype html><html><body style='margin:0'><div class='gm-style' data-stub-mapas='true' style='position:absolute;inset:0;background:#e5e3df'></div></body></html>"
+
+# google.maps falso: qualquer membro é um construtor/função no-op (Proxy); Map desenha um .gm-style
+# no container e eventos de "mapa pronto" (idle/tilesloaded) disparam logo em seguida.
+JS_STUB_GOOGLE_MAPS = """
+(function (callback) {
+  const PRONTO = /^(idle|tilesloaded|bounds_changed|zoom_changed|center_changed)$/;
+  const ouvir = (nome, fn) => {
+    if (typeof fn === 'function' && PRONTO.test(String(nome))) setTimeout(fn, 0);
+    return { remove() {} };
+  };
+  const instancia = (nome, args) => {
+    const base = { addListener: ouvir };
+    if (/\\.Map$/.test(nome) && args[0] instanceof Element) {
+      const el = args[0];
+      const div = document.createElement('div');
+      div.className = 'gm-style';
+      div.setAttribute('data-stub-mapas', 'true');
+      div.style.cssText = 'position:absolute;inset:0;background:#e5e3df';
+      if (getComputedStyle(el).position === 'static') el.style.position = 'relative';
+      el.appendChild(div);
+      base.getDiv = () => el;
+    }
+    if (/\\.LatLng$/.test(nome)) {
+      const [a, b] = args;
+      const lat = a && typeof a === 'object' ? (typeof a.lat === 'function' ? a.lat() : a.lat) : a;
+      const lng = a && typeof a === 'object' ? (typeof a.lng === 'function' ? a.lng() : a.lng) : b;
+      Object.assign(base, { lat: () => lat, lng: () => lng, toJSON: () => ({ lat, lng }) });
+    }
+    return new Proxy(base, {
+      get(o, p) {
+        if (p in o || typeof p === 'symbol' || p === 'then') return o[p];
+        return (o[p] = falso(nome + '#' + p));
+      },
+    });
+  };
+  const falso = (nome) => new Proxy(function () {}, {
+    get(alvo, p) {
+      if (p in alvo || typeof p === 'symbol' || p === 'then') return alvo[p];
+      return (alvo[p] = falso(nome + '.' + p));
+    },
+    apply() { return falso(nome + '()'); },
+    construct(alvo, args) { return instancia(nome, args); },
+  });
+
+  const resolver = (caminho) => String(caminho || '').split('.').reduce((o, k) => (o ? o[k] : undefined), window);
+  const cb = resolver(callback);
+
+  const maps = falso('google.maps');
+  maps.event = { addListener: (obj, nome, fn) => ouvir(nome, fn), addListenerOnce: (obj, nome, fn) => ouvir(nome, fn),
+                 addDomListener: () => ({ remove() {} }), removeListener() {}, clearListeners() {}, trigger() {} };
+  maps.importLibrary = async () => maps;
+  window.google = window.google || {};
+  window.google.maps = maps;
+  if (typeof cb === 'function') setTimeout(() => cb(), 0);
+})(__CALLBACK__);
+"""
+
+
+def resposta_stub(url: str) -> Dict:
+    """Argumentos de route.fulfill para a URL de mapa interceptada."""
+    if URL_SDK_GOOGLE_REGEX.search(url):
+        callback = (parse_qs(urlsplit(url).query).get("callback") or [""])[0]
+        return {"status": 200, "content_type": "application/javascript",
+                "body": JS_STUB_GOOGLE_MAPS.replace("__CALLBACK__", json.dumps(callback))}
+    if URL_EMBED_REGEX.search(url):
+        return {"status": 200, "content_type": "text/html", "body": HTML_EMBED}
+    return {"status": 200, "content_type": "image/png", "body": PNG_1X1}
+
+
+def instalar_stub_mapas(alvo) -> None:
+    """Intercepta SDK/embed/tiles de mapa na Page ou no BrowserContext (API sync)."""
+    if getattr(alvo, "_stub_mapas", False):
+        return
+
+    def _servir(route):
+        try:
+            route.fulfill(**resposta_stub(route.request.url))
+        except Exception:
+            try:
+                route.continue_()
+            except Exception:
+                pass
+
+    try:
+        alvo.route(URL_STUB_REGEX, _servir)
+        setattr(alvo, "_stub_mapas", True)
+    except Exception as e:
+        print(f"[AVISO] Stub de mapas não instalado: {e}")
+
+
+async def instalar_stub_mapas_async(alvo) -> None:
+    """instalar_stub_mapas() para Page/BrowserContext da API async."""
+    async def _servir(route):
+        try:
+            await route.fulfill(**resposta_stub(route.request.url))
+        except Exception:
+            try:
+                await route.continue_()
+            except Exception:
+                pass
+
+    try:
+        await alvo.route(URL_STUB_REGEX, _servir)
+    except Exception as e:
+        print(f"[AVISO] Stub de mapas não instalado: {e}")
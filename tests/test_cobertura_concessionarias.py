@@ -0,0 +1,166 @@
+import os
+import json
+import time
+import asyncio
+import pytest
+from pathlib import Path
+from playwright.sync_api import Page
+
+from execucao_paralela import executar_contextos_paralelos, PARALELO_CONTEXTOS
+from helpers_contexto import preparar_contexto_async
+from helpers_cep import predicado_busca_cep, SELETOR_CEP, SELETOR_LISTA, BOTAO_BUSCAR_REGEX, CEP_RESPOSTA_TIMEOUT_MS, CEP_LISTA_TIMEOUT_MS
+from helpers_concessionaria import JS_VARRER_LISTA, ATRIBUTO_LISTA, chegar_na_concessionaria
+from helpers_arquivos import gravar_json_atomico
+from historico_execucoes import percentil
+from fluxo_resultados import anexar_evidencia, marcar_etapa
+from helpers_relatorio import anexar_tabela_html
+
+from snapshot_jornada import capturar_snapshot, args_contexto, script_restauracao
+
+# =============================
+# Constantes e configurações
+# =============================
+# Modo de cobertura: liga com COBERTURA_CONCESSIONARIAS=1 (varre todas as regiões do arquivo)
+COBERTURA_ATIVA = os.getenv("COBERTURA_CONCESSIONARIAS", "").lower() in ("1", "true", "yes", "on")
+COBERTURA_REGIOES = Path(os.getenv("COBERTURA_REGIOES", "") or (Path(__file__).resolve().parent.parent / "regioes_cobertura.json"))
+COBERTURA_LIMITE = int(os.getenv("COBERTURA_LIMITE", "0") or "0")
+COBERTURA_MODELO = int(os.getenv("COBERTURA_MODELO", "0") or "0")
+
+def _carregar_regioes():
+    with open(COBERTURA_REGIOES, "r", encoding="utf-8") as f:
+        dados = json.load(f)
+    regioes = list(dados.get("regioes") or []) if isinstance(dados, dict) else list(dados or [])
+    return regioes[:COBERTURA_LIMITE] if COBERTURA_LIMITE > 0 else regioes
+
+
+def _maior_lista(dados) -> int:
+    """Tamanho da maior lista de objetos na resposta da busca (a lista de concessionárias)."""
+    if isinstance(dados, list):
+        proprio = len(dados) if dados and all(isinstance(x, dict) for x in dados) else 0
+        return max([proprio] + [_maior_lista(x) for x in dados])
+    if isinstance(dados, dict):
+        return max([0] + [_maior_lista(v) for v in dados.values()])
+    return 0
+
+
+async def _campo_cep(page, timeout_s: float = 20.0):
+    """Frame (página ou iframe do configurador) que tem o campo de CEP visível."""
+    fim = time.time() + timeout_s
+    while time.time() < fim:
+        for frame in page.frames:
+            try:
+                campo = frame.locator(SELETOR_CEP).first
+                if await campo.count() > 0 and await campo.is_visible():
+                    return frame, campo
+            except Exception:
+                pass
+        await asyncio.sleep(0.25)
+    return None, None
+
+
+def _trabalho_regiao(url: str):
+    async def _cobrir(page, regiao) -> dict:
+        await page.goto(url, wait_until="domcontentloaded", timeout=45000)
+        frame, campo = await _campo_cep(page)
+        if frame is None:
+            return {"erro": "Campo de CEP não encontrado na concessionária"}
+
+        t0 = time.time()
+        async with page.expect_response(predicado_busca_cep(), timeout=CEP_RESPOSTA_TIMEOUT_MS) as info:
+            await campo.fill(regiao["cep"])
+            btn = frame.get_by_role("button", name=BOTAO_BUSCAR_REGEX).first
+            if await btn.count() > 0 and await btn.is_visible():
+                await btn.click(force=True, timeout=3000)
+            else:
+                await campo.press("Enter")
+        resposta = await info.value
+        latencia_ms = int((time.time() - t0) * 1000)
+
+        total_api = None
+        try:
+            total_api = _maior_lista(await resposta.json())
+        except Exception:
+            pass
+        try:
+            await frame.locator(SELETOR_LISTA).first.wait_for(state="visible", timeout=CEP_LISTA_TIMEOUT_MS)
+        except Exception:
+            pass
+        varredura = await frame.evaluate(JS_VARRER_LISTA, ATRIBUTO_LISTA) or {}
+        cards = varredura.get("cards") or 0
+        return {
+            "concessionarias": total_api if total_api else cards,
+            "cards": cards,
+            "latencia_ms": latencia_ms,
+            "status": resposta.status,
+        }
+    return _cobrir
+
+
+@pytest.mark.concessionaria
+@pytest.mark.cobertura
+@pytest.mark.skipif(not COBERTURA_ATIVA, reason="Cobertura de concessionárias desligada (COBERTURA_CONCESSIONARIAS=1)")
+def test_cobertura_concessionarias_por_regiao(page: Page, request, browser_name, browser_context_args, browser_type_launch_args):
+    regioes = _carregar_regioes()
+    assert regioes, f"Nenhuma região em {COBERTURA_REGIOES}"
+
+    # 1) Configurador percorrido uma vez; o estado vira o ponto de partida de todos os contextos
+    marcar_etapa(request, "configurador")
+    chegar_na_concessionaria(page, COBERTURA_MODELO)
+    anexar_evidencia(request, page, "Cobertura - Concessionária (estado capturado)")
+    estado = capturar_snapshot(page, "concessionaria")
+
+    # 2) Uma região por contexto (geolocalização própria), PARALELO_CONTEXTOS ao mesmo tempo
+    marcar_etapa(request, "cobertura", regioes=len(regioes), paralelo=PARALELO_CONTEXTOS)
+
+    async def _preparar(contexto):
+        await preparar_contexto_async(contexto)
+        await contexto.add_init_script(script_restauracao(estado))
+
+    launch = {k: v for k, v in (browser_type_launch_args or {}).items() if k != "slow_mo"}
+    t0 = time.time()
+    resultados = executar_contextos_paralelos(
+        browser_name, regioes, _trabalho_regiao(estado["url"]),
+        context_args={**browser_context_args, **args_contexto(estado)},
+        args_do_item=lambda r: {"geolocation": {"latitude": r["latitude"], "longitude": r["longitude"]}},
+        launch_args={**launch, "headless": True},
+        preparar=_preparar,
+    )
+    duracao_s = time.time() - t0
+
+    # 3) Relatório por região
+    linhas, falhas, latencias, total = [], [], [], 0
+    for regiao, r in zip(regioes, resultados):
+        r.update({k: regiao.get(k) for k in ("uf", "cidade", "cep", "latitude", "longitude")})
+        if r.get("erro"):
+            resultado = f"❌ {str(r['erro'])[:80]}"
+            falhas.append(f"{regiao.get('uf')} {regiao.get('cep')}: {r['erro']}")
+        elif not r.get("concessionarias"):
+            resultado = "❌ nenhuma concessionária"
+            falhas.append(f"{regiao.get('uf')} {regiao.get('cep')}: nenhuma concessionária")
+        else:
+            resultado = "✅ OK"
+        if r.get("latencia_ms") is not None:
+            latencias.append(r["latencia_ms"])
+        total += r.get("concessionarias") or 0
+        print(f"[INFO] Cobertura {regiao.get('uf')} {regiao.get('cep')}: {r.get('concessionarias')} concessionária(s), "
+              f"busca {r.get('latencia_ms')} ms{' - ' + r['erro'] if r.get('erro') else ''}")
+        linhas.append([regiao.get("uf"), regiao.get("cidade"), regiao.get("cep"), r.get("concessionarias", "-"),
+                       r.get("cards", "-"), r.get("latencia_ms", "-"), resultado])
+
+    resumo = (f"Regiões: {len(regioes)} | Concessionárias: {total} | Falhas: {len(falhas)} | "
+              f"Busca p50/p95: {percentil(latencias, 50)}/{percentil(latencias, 95)} ms | "
+              f"Total: {duracao_s:.1f}s com {PARALELO_CONTEXTOS} contextos")
+    print(f"[INFO] {resumo}")
+    anexar_tabela_html(request, f"🗺️ Cobertura de Concessionárias ({browser_name})",
+                       ["UF", "Cidade", "CEP", "Concessionárias", "Cards renderizados", "Latência da busca (ms)", "Resultado"],
+                       linhas, resumo)
+
+    base = os.getenv("REPORTS_DIR")
+    if base:
+        try:
+            gravar_json_atomico(Path(base) / f"cobertura_concessionarias_{browser_name}.json",
+                                {"resumo": resumo, "regioes": resultados})
+        except Exception as e:
+            print(f"[AVISO] Falha ao gravar cobertura: {e}")
+
+    assert not falhas, f"{resumo}\nFALHAS:\n" + "\n".join(falhas)
@@ -1,10 +1,19 @@
 import re
 import os
 import time
-import base64
 import pytest
 import pytest_html
 from playwright.sync_api import Page, expect
+from helpers_frames import get_configurator_ctx
+from fluxo_resultados import anexar_evidencia
+from helpers_seletores import resolver_seletores
+from helpers_catalogo import (
+    catalogo_site, slug_da_pagina, divergencias_preco, registrar_divergencia_preco,
+    CATALOGO_VALIDAR_PRECOS, CATALOGO_FALHAR_PRECOS,
+)
+from helpers_estrategias import executar_estrategias
+from vigia_fatal import celula_vigiada, tolerar_erros_documento
+from orcamento_execucao import orcamento, prazo_celula, MOTIVO_ORCAMENTO
 
 # Padrões e URLs
 KNOWN_TITLE_PATTERN = re.compile(r"Renault", re.IGNORECASE)
@@ -111,34 +120,16 @@ def _carregar_toda_pagina(page: Page):
 
 
 def _anexar_screenshot(request, page_or_frame, titulo: str):
-    """Anexa screenshot ao relatório HTML."""
-    try:
-        # page_or_frame pode ser Page ou Frame; screenshot só existe em Page
-        page = page_or_frame if hasattr(page_or_frame, "screenshot") else None
-        if not page:
-            return
-        shot = page.screenshot(full_page=False)
-        b64 = base64.b64encode(shot).decode("utf-8")
-        html = f"<details><summary>{titulo}</summary><img src='data:image/png;base64,{b64}' style='max-width:640px;border:1px solid #ccc'/></details>"
-        if hasattr(request.node, "rep_call"):
-            extra = getattr(request.node.rep_call, "extra", [])
-            extra.append(pytest_html.extras.html(html))
-            request.node.rep_call.extra = extra
-    except Exception:
-        pass
+    """Salva screenshot em evidencias/ e anexa ao relatório só a referência (fluxo de resultados)."""
+    anexar_evidencia(request, page_or_frame, titulo)
 
 
 def _get_configurator_ctx(page: Page):
     """
     Retorna o contexto do configurador: frame com /configurador/ quando existir; senão a própria page.
+    Consulta o índice de frames mantido por eventos (helpers_frames), sem varrer page.frames.
     """
-    for f in page.frames:
-        try:
-            if re.search(r"/configurador/", f.url or ""):
-                return f
-        except Exception:
-            pass
-    return page
+    return get_configurator_ctx(page)
 
 
 def _is_versoes_page(ctx) -> bool:
@@ -311,13 +302,8 @@ def _validar_valores(ctx, contexto: str):
     Valida presença de valores/indicadores (ex.: 'R$' ou elementos de preço).
     """
     seletores = ["text=R$", ".price", "[class*=price]", ".valor", "[data-testid*=price]"]
-    for sel in seletores:
-        try:
-            loc = ctx.locator(sel).first
-            if loc and loc.count() > 0 and loc.is_visible():
-                return
-        except Exception:
-            pass
+    if resolver_seletores(ctx, seletores):
+        return
     # Fallback: regex no body
     try:
         body = ctx.evaluate("() => document.body.innerText || ''")
@@ -328,6 +314,22 @@ def _validar_valores(ctx, contexto: str):
     raise AssertionError(f"[{contexto}] Nenhum indicador de preço/valor encontrado.")
 
 
+def _validar_precos_catalogo(page: Page, ctx, contexto: str):
+    """
+    Confere os preços exibidos com os do catálogo (JSON da loja) para o modelo atual.
+    Sem base de comparação (catálogo sem preços), não valida. Divergência vira aviso registrado;
+    só falha com CATALOGO_FALHAR_PRECOS=true.
+    """
+    if not CATALOGO_VALIDAR_PRECOS:
+        return
+    divergentes = divergencias_preco(page, ctx)
+    if divergentes:
+        mensagem = registrar_divergencia_preco(page, contexto, divergentes)
+        if CATALOGO_FALHAR_PRECOS:
+            raise AssertionError(mensagem)
+        print(f"[AVISO] {mensagem}")
+
+
 def _garantir_ctx_configurador(page: Page):
     """
     Garante que estamos em /configurador/... (versoes|design|cores|rodas|interior).
@@ -353,7 +355,12 @@ def _contar_versoes(page, ctx) -> int:
     - Se houver combobox 'Versão', conta options (mais fidedigno)
     - Caso contrário, se estiver na rota /versoes, conta botões/cards 'Configurar/Selecionar'
     - Fallback: 1 (versão default)
+    O catálogo capturado do JSON da loja é consultado antes (sem abrir combobox).
     """
+    qtd_catalogo = catalogo_site(page).qtd_versoes(slug_da_pagina(page))
+    if qtd_catalogo > 0:
+        return qtd_catalogo
+
     # Combobox tem prioridade quando existir
     combo, cid = _combo_versao_info(ctx)
     if combo:
@@ -495,15 +502,21 @@ def _coletar_opcoes(ctx, tipo: str):
             '[role="radiogroup"] [role="radio"]',
         ],
     }
-    seletores = seletores_map.get(tipo, [])
-    for sel in seletores:
-        try:
+    fallback = '[role="radiogroup"] [role="radio"]'
+    # O fallback genérico fica fora do aprendizado: ele casa com qualquer radiogroup
+    seletores = [sel for sel in seletores_map.get(tipo, []) if sel != fallback]
+
+    def _por_seletor(sel):
+        def tentar():
             loc = ctx.locator(sel)
-            if loc and loc.count() > 0:
-                return loc
-        except Exception:
-            pass
-    return ctx.locator('[role="radiogroup"] [role="radio"]')  # último fallback
+            return loc if loc.count() > 0 else None
+        return tentar
+
+    # Ordem aprendida por build do site (cache de estratégias compartilhado)
+    _, loc = executar_estrategias(f"_coletar_opcoes:{tipo}", ctx, [(sel, _por_seletor(sel)) for sel in seletores])
+    if loc is not None:
+        return loc
+    return ctx.locator(fallback)  # último fallback
 
 
 def _selecionar_todas_opcoes(ctx, tipo: str, contexto: str, limit: int = 0):
@@ -752,7 +765,8 @@ def _goto_concessionaria_por_url(page: Page):
     modelo = m.group(1)
     destino = f"https://loja.renault.com.br/configurador/{modelo}/concessionaria/"
     try:
-        page.goto(destino, wait_until="domcontentloaded", timeout=35000)
+        with tolerar_erros_documento(page):
+            page.goto(destino, wait_until="domcontentloaded", timeout=35000)
         try:
             page.wait_for_load_state("networkidle", timeout=4000)
         except Exception:
@@ -856,8 +870,13 @@ def test_configuracao_veiculo_para_todos_modelos_e_versoes(page: Page, request):
 
     erros = []
     sucessos = 0
+    nao_executadas = []
 
     for m_idx in range(modelos_iter):
+        # Orçamento de tempo esgotado: o que falta é relatado, não perdido
+        if orcamento().esgotado():
+            nao_executadas.append(f"Modelo {m_idx} (todas as versões)")
+            continue
         try:
             # Garante HOME limpo por iteração
             page.goto("/", wait_until="domcontentloaded", timeout=35000)
@@ -890,65 +909,71 @@ def test_configuracao_veiculo_para_todos_modelos_e_versoes(page: Page, request):
             versoes_iter = qtd_versoes if VERSOES_LIMIT == 0 else min(qtd_versoes, VERSOES_LIMIT)
 
             for v_idx in range(versoes_iter):
+                if orcamento().esgotado():
+                    nao_executadas.append(f"Modelo {m_idx} | Versão {v_idx}")
+                    continue
+                pendentes = (versoes_iter - v_idx) + (modelos_iter - m_idx - 1) * max(1, versoes_iter)
                 try:
-                    # Guarda URL para retorno (se for Page)
-                    versoes_url = page.url
+                    with celula_vigiada(page, f"Modelo {m_idx} | Versão {v_idx}"), prazo_celula(page, pendentes):
+                        # Guarda URL para retorno (se for Page)
+                        versoes_url = page.url
 
-                    # Seleciona a versão (no-op se só existir 1 e v_idx=0)
-                    _selecionar_versao(page, ctx, v_idx)
-                    # Dá um respiro para assets pesados (3D) começarem a baixar
-                    try:
-                        page.wait_for_load_state("networkidle", timeout=5000)
-                    except Exception:
-                        pass
-                    # Aguarda imagens e validações iniciais
-                    _forcar_carregamento_imagens_lazy(ctx)
-                    _esperar_imagens_visiveis(ctx, f"Modelo {m_idx} | Versão {v_idx} | Inicial")
-                    _validar_textos(ctx, f"Modelo {m_idx} | Versão {v_idx} | Inicial")
-                    _validar_valores(ctx, f"Modelo {m_idx} | Versão {v_idx} | Inicial")
-                    _anexar_screenshot(request, page, f"Modelo #{m_idx} - Versão #{v_idx} - Inicial")
-
-                    contexto_base = f"Modelo {m_idx} | Versão {v_idx}"
-
-                    # Cores (todas)
-                    _selecionar_todas_opcoes_com_diagnostico(page, ctx, request, erros_console, resp_ruins, "cor", contexto_base, CORES_LIMIT)
-
-                    # Rodas (todas)
-                    _selecionar_todas_opcoes_com_diagnostico(page, ctx, request, erros_console, resp_ruins, "rodas", contexto_base, RODAS_LIMIT)
-
-                    # Interior (todas)
-                    _selecionar_todas_opcoes_com_diagnostico(page, ctx, request, erros_console, resp_ruins, "interior", contexto_base, INTERIOR_LIMIT)
-
-                    # Avançar para Concessionária
-                    _clicar_avancar(ctx, f"Modelo {m_idx} | Versão {v_idx} | Final")
-
-                    # 1) URL/ctx
-                    if not _esperar_concessionaria(page, ctx, 35000):
-                        # 2) Stepper/tab
-                        abriu = _abrir_concessionaria_via_stepper(ctx, page)
-                        if not abriu or not _esperar_concessionaria(page, ctx, 25000):
-                            # 3) Navegação direta
-                            foi = _goto_concessionaria_por_url(page)
-                            if not foi or not _esperar_concessionaria(page, ctx, 25000):
-                                raise AssertionError(
-                                    f"[MODELO {m_idx} | VERSÃO {v_idx}] Não chegou à página de concessionária. URL atual: {page.url}"
-                                )
-
-                    _anexar_screenshot(request, page, f"Modelo #{m_idx} - Versão #{v_idx} - Concessionária")
-
-                    # Retorna para seleção de versões (se possível) ou volta para URL de versões/design
-                    try:
-                        voltar = page.get_by_role("link", name=re.compile(r"Vers(ões|oes)|Voltar", re.I)).first
-                        if voltar and voltar.count() > 0 and voltar.is_visible():
-                            voltar.click(timeout=8000)
-                            page.wait_for_url(URL_VERSOES_REGEX, timeout=30000)
-                        else:
+                        # Seleciona a versão (no-op se só existir 1 e v_idx=0)
+                        _selecionar_versao(page, ctx, v_idx)
+                        # Dá um respiro para assets pesados (3D) começarem a baixar
+                        try:
+                            page.wait_for_load_state("networkidle", timeout=5000)
+                        except Exception:
+                            pass
+                        # Aguarda imagens e validações iniciais
+                        _forcar_carregamento_imagens_lazy(ctx)
+                        _esperar_imagens_visiveis(ctx, f"Modelo {m_idx} | Versão {v_idx} | Inicial")
+                        _validar_textos(ctx, f"Modelo {m_idx} | Versão {v_idx} | Inicial")
+                        _validar_valores(ctx, f"Modelo {m_idx} | Versão {v_idx} | Inicial")
+                        _validar_precos_catalogo(page, ctx, f"Modelo {m_idx} | Versão {v_idx} | Inicial")
+                        _anexar_screenshot(request, page, f"Modelo #{m_idx} - Versão #{v_idx} - Inicial")
+
+                        contexto_base = f"Modelo {m_idx} | Versão {v_idx}"
+
+                        # Cores (todas)
+                        _selecionar_todas_opcoes_com_diagnostico(page, ctx, request, erros_console, resp_ruins, "cor", contexto_base, CORES_LIMIT)
+
+                        # Rodas (todas)
+                        _selecionar_todas_opcoes_com_diagnostico(page, ctx, request, erros_console, resp_ruins, "rodas", contexto_base, RODAS_LIMIT)
+
+                        # Interior (todas)
+                        _selecionar_todas_opcoes_com_diagnostico(page, ctx, request, erros_console, resp_ruins, "interior", contexto_base, INTERIOR_LIMIT)
+
+                        # Avançar para Concessionária
+                        _clicar_avancar(ctx, f"Modelo {m_idx} | Versão {v_idx} | Final")
+
+                        # 1) URL/ctx (estado fatal da página interrompe a cadeia na hora, ver vigia_fatal)
+                        if not _esperar_concessionaria(page, ctx, 35000):
+                            # 2) Stepper/tab
+                            abriu = _abrir_concessionaria_via_stepper(ctx, page)
+                            if not abriu or not _esperar_concessionaria(page, ctx, 25000):
+                                # 3) Navegação direta
+                                foi = _goto_concessionaria_por_url(page)
+                                if not foi or not _esperar_concessionaria(page, ctx, 25000):
+                                    raise AssertionError(
+                                        f"[MODELO {m_idx} | VERSÃO {v_idx}] Não chegou à página de concessionária. URL atual: {page.url}"
+                                    )
+
+                        _anexar_screenshot(request, page, f"Modelo #{m_idx} - Versão #{v_idx} - Concessionária")
+
+                        # Retorna para seleção de versões (se possível) ou volta para URL de versões/design
+                        try:
+                            voltar = page.get_by_role("link", name=re.compile(r"Vers(ões|oes)|Voltar", re.I)).first
+                            if voltar and voltar.count() > 0 and voltar.is_visible():
+                                voltar.click(timeout=8000)
+                                page.wait_for_url(URL_VERSOES_REGEX, timeout=30000)
+                            else:
+                                page.goto(versoes_url, wait_until="domcontentloaded", timeout=35000)
+                        except Exception:
                             page.goto(versoes_url, wait_until="domcontentloaded", timeout=35000)
-                    except Exception:
-                        page.goto(versoes_url, wait_until="domcontentloaded", timeout=35000)
 
-                    sucessos += 1
-                    print(f"[OK] Modelo {m_idx} | Versão {v_idx} configurada (cores/rodas/interior) e navegou à concessionária.")
+                        sucessos += 1
+                        print(f"[OK] Modelo {m_idx} | Versão {v_idx} configurada (cores/rodas/interior) e navegou à concessionária.")
 
                 except Exception as e:
                     _anexar_screenshot(request, page, f"Erro - Modelo #{m_idx} | Versão #{v_idx}")
@@ -960,5 +985,7 @@ def test_configuracao_veiculo_para_todos_modelos_e_versoes(page: Page, request):
             _anexar_screenshot(request, page, f"Erro - Modelo #{m_idx}")
             erros.append(f"[MODELO {m_idx}] {str(e)}")
 
-    msg = f"Sucessos: {sucessos} | Erros: {len(erros)}" + ("\n" + "\n".join(erros) if erros else "")
+    if nao_executadas:
+        print(f"[AVISO] {len(nao_executadas)} célula(s) {MOTIVO_ORCAMENTO} ({orcamento().resumo()}): {', '.join(nao_executadas)}")
+    msg = f"Sucessos: {sucessos} | Erros: {len(erros)} | Não executadas (orçamento): {len(nao_executadas)}" + ("\n" + "\n".join(erros) if erros else "")
     assert len(erros) == 0, msg
@@ -1,10 +1,17 @@
 import re
 import os
 import time
-import base64
 import pytest
 import pytest_html
 from playwright.sync_api import Page, expect
+from helpers_frames import get_configurator_ctx
+from fluxo_resultados import anexar_evidencia
+from helpers_seletores import resolver_seletores
+from helpers_catalogo import (
+    catalogo_site, slug_da_pagina, divergencias_preco, registrar_divergencia_preco,
+    CATALOGO_VALIDAR_PRECOS, CATALOGO_FALHAR_PRECOS,
+)
+from helpers_estrategias import executar_estrategias
 
 # Padrões e URLs
 KNOWN_TITLE_PATTERN = re.compile(r"Renault", re.IGNORECASE)
@@ -16,8 +23,9 @@ URL_JORNADA_REGEX = re.compile(r"/jornada-de-reserva")
 URL_CONCESSIONARIA_REGEX = re.compile(r"/concessionari(a|as)|/dealers|/lojas|/ponto-de-venda|/r-pass/pre-venda/concessionaria", re.I)
 
 # Limites opcionais (0 = sem limite)
-MODELOS_LIMIT = int(os.getenv("MODELOS_LIMIT", "0") or "0")
-VERSOES_LIMIT = int(os.getenv("VERSOES_LIMIT", "0") or "0")
+# Teste smoke: na execução em ondas (mesma sessão da regressão) os limites do smoke vêm de SMOKE_*
+MODELOS_LIMIT = int(os.getenv("SMOKE_MODELOS_LIMIT") or os.getenv("MODELOS_LIMIT", "0") or "0")
+VERSOES_LIMIT = int(os.getenv("SMOKE_VERSOES_LIMIT") or os.getenv("VERSOES_LIMIT", "0") or "0")
 CORES_LIMIT = int(os.getenv("CORES_LIMIT", "0") or "0")
 RODAS_LIMIT = int(os.getenv("RODAS_LIMIT", "0") or "0")
 INTERIOR_LIMIT = int(os.getenv("INTERIOR_LIMIT", "0") or "0")
@@ -111,34 +119,16 @@ def _carregar_toda_pagina(page: Page):
 
 
 def _anexar_screenshot(request, page_or_frame, titulo: str):
-    """Anexa screenshot ao relatório HTML."""
-    try:
-        # page_or_frame pode ser Page ou Frame; screenshot só existe em Page
-        page = page_or_frame if hasattr(page_or_frame, "screenshot") else None
-        if not page:
-            return
-        shot = page.screenshot(full_page=False)
-        b64 = base64.b64encode(shot).decode("utf-8")
-        html = f"<details><summary>{titulo}</summary><img src='data:image/png;base64,{b64}' style='max-width:640px;border:1px solid #ccc'/></details>"
-        if hasattr(request.node, "rep_call"):
-            extra = getattr(request.node.rep_call, "extra", [])
-            extra.append(pytest_html.extras.html(html))
-            request.node.rep_call.extra = extra
-    except Exception:
-        pass
+    """Salva screenshot em evidencias/ e anexa ao relatório só a referência (fluxo de resultados)."""
+    anexar_evidencia(request, page_or_frame, titulo)
 
 
 def _get_configurator_ctx(page: Page):
     """
     Retorna o contexto do configurador: frame com /configurador/ quando existir; senão a própria page.
+    Consulta o índice de frames mantido por eventos (helpers_frames), sem varrer page.frames.
     """
-    for f in page.frames:
-        try:
-            if re.search(r"/configurador/", f.url or ""):
-                return f
-        except Exception:
-            pass
-    return page
+    return get_configurator_ctx(page)
 
 
 def _is_versoes_page(ctx) -> bool:
@@ -311,13 +301,8 @@ def _validar_valores(ctx, contexto: str):
     Valida presença de valores/indicadores (ex.: 'R$' ou elementos de preço).
     """
     seletores = ["text=R$", ".price", "[class*=price]", ".valor", "[data-testid*=price]"]
-    for sel in seletores:
-        try:
-            loc = ctx.locator(sel).first
-            if loc and loc.count() > 0 and loc.is_visible():
-                return
-        except Exception:
-            pass
+    if resolver_seletores(ctx, seletores):
+        return
     # Fallback: regex no body
     try:
         body = ctx.evaluate("() => document.body.innerText || ''")
@@ -328,6 +313,22 @@ def _validar_valores(ctx, contexto: str):
     raise AssertionError(f"[{contexto}] Nenhum indicador de preço/valor encontrado.")
 
 
+def _validar_precos_catalogo(page: Page, ctx, contexto: str):
+    """
+    Confere os preços exibidos com os do catálogo (JSON da loja) para o modelo atual.
+    Sem base de comparação (catálogo sem preços), não valida. Divergência vira aviso registrado;
+    só falha com CATALOGO_FALHAR_PRECOS=true.
+    """
+    if not CATALOGO_VALIDAR_PRECOS:
+        return
+    divergentes = divergencias_preco(page, ctx)
+    if divergentes:
+        mensagem = registrar_divergencia_preco(page, contexto, divergentes)
+        if CATALOGO_FALHAR_PRECOS:
+            raise AssertionError(mensagem)
+        print(f"[AVISO] {mensagem}")
+
+
 def _garantir_ctx_configurador(page: Page):
     """
     Garante que estamos em /configurador/... (versoes|design|cores|rodas|interior).
@@ -353,7 +354,12 @@ def _contar_versoes(page, ctx) -> int:
     - Se houver combobox 'Versão', conta options (mais fidedigno)
     - Caso contrário, se estiver na rota /versoes, conta botões/cards 'Configurar/Selecionar'
     - Fallback: 1 (versão default)
+    O catálogo capturado do JSON da loja é consultado antes (sem abrir combobox).
     """
+    qtd_catalogo = catalogo_site(page).qtd_versoes(slug_da_pagina(page))
+    if qtd_catalogo > 0:
+        return qtd_catalogo
+
     # Combobox tem prioridade quando existir
     combo, cid = _combo_versao_info(ctx)
     if combo:
@@ -493,15 +499,21 @@ def _coletar_opcoes(ctx, tipo: str):
             '[role="radiogroup"] [role="radio"]',
         ],
     }
-    seletores = seletores_map.get(tipo, [])
-    for sel in seletores:
-        try:
+    fallback = '[role="radiogroup"] [role="radio"]'
+    # O fallback genérico fica fora do aprendizado: ele casa com qualquer radiogroup
+    seletores = [sel for sel in seletores_map.get(tipo, []) if sel != fallback]
+
+    def _por_seletor(sel):
+        def tentar():
             loc = ctx.locator(sel)
-            if loc and loc.count() > 0:
-                return loc
-        except Exception:
-            pass
-    return ctx.locator('[role="radiogroup"] [role="radio"]')  # último fallback
+            return loc if loc.count() > 0 else None
+        return tentar
+
+    # Ordem aprendida por build do site (cache de estratégias compartilhado)
+    _, loc = executar_estrategias(f"_coletar_opcoes:{tipo}", ctx, [(sel, _por_seletor(sel)) for sel in seletores])
+    if loc is not None:
+        return loc
+    return ctx.locator(fallback)  # último fallback
 
 
 def _selecionar_todas_opcoes(ctx, tipo: str, contexto: str, limit: int = 0):
@@ -678,6 +690,7 @@ def test_configuracao_veiculo_para_todos_modelos_e_versoes(page: Page, request):
                     _esperar_imagens_visiveis(ctx, f"Modelo {m_idx} | Versão {v_idx} | Inicial")
                     _validar_textos(ctx, f"Modelo {m_idx} | Versão {v_idx} | Inicial")
                     _validar_valores(ctx, f"Modelo {m_idx} | Versão {v_idx} | Inicial")
+                    _validar_precos_catalogo(page, ctx, f"Modelo {m_idx} | Versão {v_idx} | Inicial")
                     _anexar_screenshot(request, page, f"Modelo #{m_idx} - Versão #{v_idx} - Inicial")
 
                     # Cores (todas)
@@ -1,5 +1,6 @@
-import re, os, base64, pytest, pytest_html, time
+import re, os, pytest, time
 from playwright.sync_api import Page, expect
+from fluxo_resultados import anexar_evidencia, fluxo_resultados, marcar_etapa, EVENTO_CELULA
 
 # =============================
 # CONSTANTES E CONFIGURAÇÕES
@@ -14,81 +15,86 @@ CORES_LIMIT = int(os.getenv("CORES_LIMIT", "0") or "0")
 RODAS_LIMIT = int(os.getenv("RODAS_LIMIT", "0") or "0")
 INTERIOR_LIMIT = int(os.getenv("INTERIOR_LIMIT", "0") or "0")
 
+# Retentativa por célula (modelo × versão) em contexto novo; espera CELULA_BACKOFF_S × tentativa anterior
+CELULA_TENTATIVAS = max(1, int(os.getenv("CELULA_TENTATIVAS", "2") or "2"))
+CELULA_BACKOFF_S = float(os.getenv("CELULA_BACKOFF_S", "5") or "5")
+
 # Importações do projeto existente
 from tests.test_configuracao_veiculo_v3 import (
     _aceitar_cookies, _carregar_toda_pagina, _get_configurator_ctx,
     _contar_versoes, _selecionar_versao, _forcar_carregamento_imagens_lazy,
     _esperar_imagens_visiveis, _validar_textos, _validar_valores,
-    _coletar_opcoes, _ir_para_etapa, _garantir_ctx_configurador
+    _coletar_opcoes, _ir_para_etapa, _garantir_ctx_configurador,
+    _validar_precos_catalogo
+)
+from helpers_catalogo import catalogo_site, slug_da_pagina, descoberta_compartilhada
+from helpers_estrategias import build_do_site, id_execucao
+from estado_execucao import (
+    EstadoExecucao, impressao_modelo, STATUS_PASSOU, STATUS_FALHOU, STATUS_BUG_CONHECIDO, STATUS_FLAKY
 )
+from helpers_contexto import contexto_novo
+from registro_bugs import registro_bugs, bug_conhecido, POLITICA_PULAR, POLITICA_SONDAR
+from vigia_fatal import EstadoFatalPagina, celula_vigiada, tolerar_erros_documento
+from orcamento_execucao import orcamento, prazo_celula, MOTIVO_ORCAMENTO
+from helpers_relatorio import anexar_tabela_html
 
 # =============================
 # FUNÇÕES AUXILIARES DE RELATÓRIO E UTILITÁRIOS
 # =============================
 
 def _anexar_screenshot(request, page_or_frame, titulo: str):
-    """Anexa screenshot ao relatório HTML de forma segura."""
-    try:
-        # Garante que temos um objeto capaz de tirar screenshot
-        page = page_or_frame if hasattr(page_or_frame, "screenshot") else None
-        if not page:
-            return
-
-        shot = page.screenshot(full_page=False)
-        b64 = base64.b64encode(shot).decode("utf-8")
-        html = f"<details><summary>{titulo}</summary><img src='data:image/png;base64,{b64}' style='max-width:640px;border:1px solid #ccc'/></details>"
-        
-        # Compatibilidade com pytest-html
-        if hasattr(request.node, "rep_call"):
-            extra = getattr(request.node.rep_call, "extra", [])
-            extra.append(pytest_html.extras.html(html))
-            request.node.rep_call.extra = extra
-        elif hasattr(request.node, "extras"):
-            request.node.extras.append(pytest_html.extras.html(html))
-    except Exception:
-        pass
-
-def _eh_bug_conhecido(modelo: str, versao: str, etapa: str, erro: str) -> bool:
-    """Filtra bugs conhecidos para não falhar o pipeline desnecessariamente."""
-    erro_lower = erro.lower()
-    modelo_upper = modelo.upper() if modelo else ""
-    
-    # Exemplo: KWID Versão #1 (Iconic) travando em design
-    if "KWID" in modelo_upper and ("#1" in str(versao) or "1" == str(versao)):
-        if "não chegou" in erro_lower and "concession" in erro_lower:
-            return True
-        if "design" in erro_lower:
-            return True
-            
-    return False
+    """Salva screenshot em evidencias/ e anexa ao relatório só a referência (fluxo de resultados)."""
+    anexar_evidencia(request, page_or_frame, titulo)
 
-def _status_badge(ok: bool, msg: str = "", modelo: str = "", versao: str = "", etapa: str = "") -> str:
+def _status_badge(ok: bool, msg: str = "", modelo: str = "", versao: str = "", etapa: str = "", navegador: str = "") -> str:
     if ok:
         return "✅ OK"
     else:
-        safe = (msg or "").replace("<","&lt;").replace(">","&gt;")
-        if _eh_bug_conhecido(modelo, versao, etapa, msg):
-            return f"⚠️ BUG CONHECIDO: {safe[:80]}"
-        return f"❌ {safe[:80]}"
-
-def _adicionar_resumo_html(request, rows, bugs_conhecidos: int = 0, erros_reais: int = 0):
-    headers = ["Modelo", "Versão", "Seleção", "Inicial", "Cores", "Rodas", "Interior", "Concessionária"]
-    th = "".join([f"<th style='padding:6px;border-bottom:1px solid #ccc;text-align:left'>{h}</th>" for h in headers])
-    trs = []
-    for r in rows:
-        tds = "".join([f"<td style='padding:6px;border-bottom:1px solid #eee'>{c}</td>" for c in r])
-        trs.append(f"<tr>{tds}</tr>")
-    
+        if bug_conhecido(modelo, versao, etapa, msg, navegador):
+            return f"⚠️ BUG CONHECIDO: {(msg or '')[:80]}"
+        return f"❌ {(msg or '')[:80]}"
+
+def _linha_nao_executada(modelo: str, versao: str, motivo: str = "não executado (inalterado)") -> list:
+    """Linha da matriz para célula pulada no modo incremental (passou antes e nada mudou) ou sem orçamento."""
+    return [modelo, versao] + [f"⏭️ {motivo}"] * 7
+
+def _badge_resultado(status: str, tentativas: int) -> str:
+    """Coluna 'Resultado' da matriz: distingue célula que só passou na retentativa (flaky) de falha."""
+    if status == STATUS_PASSOU:
+        return "✅ passou"
+    if status == STATUS_FLAKY:
+        return f"🔁 flaky (passou na tentativa {tentativas}/{CELULA_TENTATIVAS})"
+    if status == STATUS_BUG_CONHECIDO:
+        return "⚠️ bug conhecido"
+    return f"❌ falhou ({tentativas} tentativa{'s' if tentativas > 1 else ''})"
+
+def _linha_bug_pulado(modelo: str, versao: str, bug: dict) -> list:
+    """Linha da matriz para célula não executada por ser bug conhecido (política 'pular')."""
+    return [modelo, versao] + [f"⚠️ BUG CONHECIDO (pulado): {bug.get('id', '')}"] * 6 + ["⚠️ bug conhecido (pulado)"]
+
+def _status_celula(fase: dict, modelo: str, versao: str, navegador: str = "") -> str:
+    if all(ok for ok, _ in fase.values()):
+        return STATUS_PASSOU
+    ok_conc, msg_conc = fase["concessionaria"]
+    if not ok_conc and bug_conhecido(modelo, versao, "concessionaria", msg_conc, navegador):
+        return STATUS_BUG_CONHECIDO
+    return STATUS_FALHOU
+
+def _adicionar_resumo_html(request, rows, bugs_conhecidos: int = 0, erros_reais: int = 0, nao_executadas: int = 0, navegador: str = "", flaky: int = 0, sem_orcamento: int = 0):
+    headers = ["Modelo", "Versão", "Seleção", "Inicial", "Cores", "Rodas", "Interior", "Concessionária", "Resultado"]
     stats = ""
-    if bugs_conhecidos > 0 or erros_reais > 0:
-        stats = f"<div style='margin:10px 0;padding:10px;background:#f0f0f0'>⚠️ Bugs Conhecidos: {bugs_conhecidos} | ❌ Erros Reais: {erros_reais}</div>"
-    
-    table = f"<details open><summary>📋 Matriz de Resultados</summary>{stats}<table style='width:100%;border-collapse:collapse'><thead><tr>{th}</tr></thead><tbody>{''.join(trs)}</tbody></table></details>"
-    
-    if hasattr(request.node, "rep_call"):
-        extra = getattr(request.node.rep_call, "extra", [])
-        extra.append(pytest_html.extras.html(table))
-        request.node.rep_call.extra = extra
+    if bugs_conhecidos > 0 or erros_reais > 0 or nao_executadas > 0 or flaky > 0 or sem_orcamento > 0:
+        stats = f"⚠️ Bugs Conhecidos: {bugs_conhecidos} | ❌ Erros Reais: {erros_reais} | 🔁 Flaky: {flaky} | ⏭️ Não executadas (inalteradas): {nao_executadas} | ⏳ Não executadas (orçamento): {sem_orcamento}"
+    titulo = f"📋 Matriz de Resultados ({navegador})" if navegador else "📋 Matriz de Resultados"
+    anexar_tabela_html(request, titulo, headers, rows, stats)
+
+def _registrar_linha(request, navegador: str, linha: list, duracoes: list = None):
+    """
+    Grava a linha da matriz no fluxo de resultados assim que a célula termina (nada acumula em memória).
+    duracoes: uma entrada por tentativa, {etapa: [segundos, ok]} (lida pelo histórico de execuções).
+    """
+    fluxo_resultados().emitir(EVENTO_CELULA, teste=request.node.nodeid, navegador=navegador,
+                              modelo=linha[0], versao=linha[1], colunas=linha, duracoes=duracoes or [])
 
 # =============================
 # FUNÇÕES ROBUSTAS (BASEADAS NO SCRIPT QUE FUNCIONA)
@@ -172,150 +178,299 @@ def _goto_concessionaria_por_url(page: Page) -> bool:
     ]
     for destino in destinos:
         try:
-            page.goto(destino, wait_until="domcontentloaded", timeout=15000)
+            with tolerar_erros_documento(page):
+                page.goto(destino, wait_until="domcontentloaded", timeout=15000)
             if _esperar_concessionaria_robusta(page, None, 5000):
                 return True
         except: pass
     return False
 
+def _abrir_modelo(page: Page, m_idx: int, slugs: list):
+    """Entra no configurador do modelo (slug do catálogo ou CTA da home) e retorna o contexto."""
+    if slugs:
+        # Direto para as versões do modelo (sem passar pela home)
+        page.goto(f"/configurador/{slugs[m_idx]}/versoes", wait_until="domcontentloaded", timeout=35000)
+        _aceitar_cookies(page)
+    else:
+        # Reset para Home
+        page.goto("/", wait_until="domcontentloaded", timeout=35000)
+        _aceitar_cookies(page)
+
+        # Seleção do Modelo
+        btns = page.get_by_role("button", name=CTA_CONFIGURE_RESERVA_REGEX)
+        links = page.get_by_role("link", name=CTA_CONFIGURE_RESERVA_REGEX)
+        if btns.count() > m_idx:
+            target = btns.nth(m_idx)
+        elif links.count() > (m_idx - btns.count()):
+            target = links.nth(m_idx - btns.count())
+        else:
+            target = page.get_by_text(CTA_CONFIGURE_RESERVA_REGEX).nth(m_idx)
+
+        target.scroll_into_view_if_needed()
+        target.click(force=True, timeout=10000)
+
+    # Espera entrar no configurador
+    page.wait_for_url(re.compile(r"/jornada-de-reserva|/configurador/.+"), timeout=35000)
+    _garantir_ctx_configurador(page)
+
+    return _get_configurator_ctx(page)
+
+def _executar_celula(page: Page, ctx, request, m_idx: int, v_idx: int, progresso: dict, duracoes: dict):
+    """
+    Seleção da versão, etapas visuais e avanço até a concessionária. Retorna (fase, modelo_nome);
+    a duração de cada etapa (s) vai para `duracoes`.
+    """
+    fase = {k: (False, "") for k in ["sel_versao", "inicial", "cores", "rodas", "interior", "concessionaria"]}
+    modelo_nome = "DESCONHECIDO"
+
+    # 1. Seleção de Versão
+    marcar_etapa(request, "sel_versao", **progresso)
+    inicio = time.monotonic()
+    try:
+        _selecionar_versao(page, ctx, v_idx)
+        fase["sel_versao"] = (True, "")
+    except Exception as e:
+        fase["sel_versao"] = (False, str(e))
+    duracoes["sel_versao"] = time.monotonic() - inicio
+
+    # Tenta pegar o nome do modelo
+    try:
+        m = re.search(r"/configurador/([^/]+)/", page.url, re.I)
+        if m: modelo_nome = m.group(1).upper()
+    except: pass
+
+    # 2. Loop de Etapas Visuais (Inicial, Cores, Rodas, Interior)
+    etapas_config = [
+        ("inicial", lambda: (_forcar_carregamento_imagens_lazy(ctx), _esperar_imagens_visiveis(ctx, "inicial"), _validar_textos(ctx, "inicial"), _validar_precos_catalogo(page, ctx, "inicial"))),
+        ("cores", lambda: _ir_para_etapa(ctx, "cor")), # Simplificado para brevidade
+        ("rodas", lambda: _ir_para_etapa(ctx, "rodas")),
+        ("interior", lambda: _ir_para_etapa(ctx, "interior"))
+    ]
+
+    for nome_etapa, acao in etapas_config:
+        if fase["sel_versao"][0]: # Só tenta se selecionou a versão
+            marcar_etapa(request, nome_etapa, **progresso)
+            inicio = time.monotonic()
+            try:
+                acao() 
+                # Aqui você pode reinserir a lógica de loop de opções se quiser (Cores/Rodas), 
+                # mantive simplificado para focar na Concessionária que é o erro.
+                fase[nome_etapa] = (True, "")
+            except Exception as e:
+                fase[nome_etapa] = (False, str(e))
+            duracoes[nome_etapa] = time.monotonic() - inicio
+
+    # 3. CONCESSIONÁRIA - O FIX PRINCIPAL
+    # Se chegamos até aqui (ou mesmo se falhou algo antes mas queremos tentar avançar)
+    marcar_etapa(request, "concessionaria", **progresso)
+    inicio = time.monotonic()
+    try:
+        _clicar_avancar_robusto(ctx, f"Modelo {m_idx}|Versão {v_idx}")
+
+        # Pausa para SPA reagir
+        page.wait_for_timeout(2000)
+
+        chegou = False
+        ctx_atual = _get_configurator_ctx(page)
+
+        # Estratégia A: Espera Inteligente (URL + Visual)
+        chegou = _esperar_concessionaria_robusta(page, ctx_atual, timeout_ms=15000)
+
+        # Estratégia B: Se não chegou, tenta clicar na Tab 'Concessionária'
+        if not chegou:
+            try:
+                tab = ctx_atual.get_by_role("tab", name=re.compile(r"Concession[aá]ria", re.I)).first
+                if tab.is_visible():
+                    tab.click(timeout=5000)
+                    chegou = _esperar_concessionaria_robusta(page, ctx_atual, timeout_ms=10000)
+            except: pass
+
+        # Estratégia C: Force URL
+        if not chegou:
+            if _goto_concessionaria_por_url(page):
+                chegou = True
+
+        if chegou:
+            fase["concessionaria"] = (True, "")
+        else:
+            raise AssertionError(f"Falha ao transicionar para Concessionária. URL final: {page.url}")
+
+    except Exception as e:
+        fase["concessionaria"] = (False, str(e))
+    duracoes["concessionaria"] = time.monotonic() - inicio
+
+    return fase, modelo_nome
+
+def _executar_celula_vigiada(page: Page, ctx, request, m_idx: int, v_idx: int, progresso: dict, tentativas: list):
+    """
+    _executar_celula sob o vigia de estado fatal: página quebrada (HTTP 4xx/5xx, página de erro, crash)
+    encerra a célula em segundos e o diagnóstico vai para a coluna Concessionária.
+    Acrescenta em `tentativas` as durações desta tentativa ({etapa: [segundos, ok]}).
+    """
+    fase, modelo_nome = None, progresso.get("modelo") or "DESCONHECIDO"
+    duracoes = {}
+    try:
+        with celula_vigiada(page, f"{progresso.get('modelo')} {progresso.get('versao')}"):
+            fase, modelo_nome = _executar_celula(page, ctx, request, m_idx, v_idx, progresso, duracoes)
+    except EstadoFatalPagina as e:
+        fase = fase or {k: (False, "não executado (estado fatal)") for k in ["sel_versao", "inicial", "cores", "rodas", "interior"]}
+        fase["concessionaria"] = (False, str(e))
+    tentativas.append({etapa: [round(d, 3), fase[etapa][0]] for etapa, d in duracoes.items() if etapa in fase})
+    return fase, modelo_nome
+
 # =============================
 # TESTE PRINCIPAL
 # =============================
 
 @pytest.mark.jornada
 @pytest.mark.regressao
-def test_e2e_matriz_jornadas(page: Page, request):
+@pytest.mark.flaky(reruns=0)  # a retentativa é por célula (CELULA_TENTATIVAS), não do teste inteiro
+def test_e2e_matriz_jornadas(page: Page, request, browser_name, browser, browser_context_args):
     page.set_default_timeout(25000)
     page.set_default_navigation_timeout(45000)
 
     # --- HOME ---
-    page.goto("/", wait_until="domcontentloaded", timeout=35000)
-    _aceitar_cookies(page)
-    _carregar_toda_pagina(page)
-
-    btns = page.get_by_role("button", name=CTA_CONFIGURE_RESERVA_REGEX)
-    links = page.get_by_role("link", name=CTA_CONFIGURE_RESERVA_REGEX)
-    total_ctas = btns.count() + links.count()
-    if total_ctas == 0:
-        total_ctas = page.get_by_text(CTA_CONFIGURE_RESERVA_REGEX).count()
+    def _descobrir_home():
+        page.goto("/", wait_until="domcontentloaded", timeout=35000)
+        _aceitar_cookies(page)
+        _carregar_toda_pagina(page)
+
+    # Descoberta (home + catálogo) uma única vez por execução, compartilhada entre navegadores/workers;
+    # se o catálogo não trouxe modelos, a contagem de CTAs precisa da home neste navegador
+    catalogo = catalogo_site(page)
+    if not descoberta_compartilhada(page, _descobrir_home) and not catalogo.modelos():
+        _descobrir_home()
+
+    # Estado entre execuções (modo incremental pula células que passaram e não mudaram)
+    estado = EstadoExecucao(id_execucao(), browser_name)
+    estado.iniciar()
+    build_site = catalogo.build or build_do_site(page)
+
+    # Modelos: catálogo capturado do JSON da home (slugs) ou, na falta dele, contagem de CTAs
+    slugs = catalogo.modelos()
+    if slugs:
+        total_ctas = len(slugs)
+        print(f"[INFO] Modelos via catálogo: {slugs}")
+    else:
+        btns = page.get_by_role("button", name=CTA_CONFIGURE_RESERVA_REGEX)
+        links = page.get_by_role("link", name=CTA_CONFIGURE_RESERVA_REGEX)
+        total_ctas = btns.count() + links.count()
+        if total_ctas == 0:
+            total_ctas = page.get_by_text(CTA_CONFIGURE_RESERVA_REGEX).count()
     assert total_ctas > 0, "Nenhum CTA encontrado na home."
 
     modelos_iter = total_ctas if MODELOS_LIMIT == 0 else min(total_ctas, MODELOS_LIMIT)
     
-    rows = []
     houve_erro_real = False
     erros_reais_count = 0
     bugs_conhecidos_count = 0
+    nao_executadas_count = 0
+    sem_orcamento_count = 0
+    flaky_count = 0
 
     for m_idx in range(modelos_iter):
-        # Reset para Home
-        page.goto("/", wait_until="domcontentloaded", timeout=35000)
-        _aceitar_cookies(page)
-        
-        # Seleção do Modelo
-        btns = page.get_by_role("button", name=CTA_CONFIGURE_RESERVA_REGEX)
-        links = page.get_by_role("link", name=CTA_CONFIGURE_RESERVA_REGEX)
-        if btns.count() > m_idx:
-            target = btns.nth(m_idx)
-        elif links.count() > (m_idx - btns.count()):
-            target = links.nth(m_idx - btns.count())
-        else:
-            target = page.get_by_text(CTA_CONFIGURE_RESERVA_REGEX).nth(m_idx)
+        # Impressão digital calculada uma vez por modelo, antes da navegação (que enriquece o catálogo),
+        # e usada tanto para decidir quanto para registrar as células
+        impressao = impressao_modelo(catalogo, slugs[m_idx], build_site) if slugs else None
 
-        target.scroll_into_view_if_needed()
-        target.click(force=True, timeout=10000)
-        
-        # Espera entrar no configurador
-        page.wait_for_url(re.compile(r"/jornada-de-reserva|/configurador/.+"), timeout=35000)
-        _garantir_ctx_configurador(page)
-        
-        ctx = _get_configurator_ctx(page)
+        # Modo incremental: pula o modelo inteiro (sem navegar) quando o catálogo conhece as versões
+        # e todas passaram na última execução com a mesma impressão digital
+        if slugs and estado.incremental:
+            qtd_catalogo = catalogo.qtd_versoes(slugs[m_idx])
+            qtd_catalogo = qtd_catalogo if VERSOES_LIMIT == 0 else min(qtd_catalogo, VERSOES_LIMIT)
+            if qtd_catalogo > 0 and not estado.deve_executar_modelo(slugs[m_idx], qtd_catalogo, impressao):
+                for v_idx in range(qtd_catalogo):
+                    _registrar_linha(request, browser_name, _linha_nao_executada(slugs[m_idx].upper(), f"#{v_idx}"))
+                nao_executadas_count += qtd_catalogo
+                print(f"[INFO] Modelo {slugs[m_idx]} inalterado desde a última execução verde; pulando.")
+                continue
+
+        # Orçamento de tempo esgotado: o modelo entra na matriz como não executado (sem navegar)
+        if orcamento().esgotado():
+            qtd_catalogo = catalogo.qtd_versoes(slugs[m_idx]) if slugs else 0
+            qtd_catalogo = qtd_catalogo if VERSOES_LIMIT == 0 else min(qtd_catalogo, VERSOES_LIMIT)
+            versoes = [f"#{v}" for v in range(qtd_catalogo)] or ["todas"]
+            for versao in versoes:
+                _registrar_linha(request, browser_name, _linha_nao_executada(slugs[m_idx].upper() if slugs else f"MODELO {m_idx}", versao, MOTIVO_ORCAMENTO))
+            sem_orcamento_count += len(versoes)
+            continue
+
+        ctx = _abrir_modelo(page, m_idx, slugs)
         _anexar_screenshot(request, page, f"Modelo #{m_idx} - Configurador")
 
         qtd_versoes = _contar_versoes(page, ctx)
         versoes_iter = qtd_versoes if VERSOES_LIMIT == 0 else min(qtd_versoes, VERSOES_LIMIT)
 
+        slug = slug_da_pagina(page) or (slugs[m_idx] if slugs else None)
+        if impressao is None or slug != slugs[m_idx]:
+            impressao = impressao_modelo(catalogo, slug, build_site)
+
         for v_idx in range(versoes_iter):
-            fase = {k: (False, "") for k in ["sel_versao", "inicial", "cores", "rodas", "interior", "concessionaria"]}
-            modelo_nome = "DESCONHECIDO"
+            if not estado.deve_executar(slug, f"#{v_idx}", impressao):
+                _registrar_linha(request, browser_name, _linha_nao_executada((slug or "").upper(), f"#{v_idx}"))
+                nao_executadas_count += 1
+                continue
 
-            # 1. Seleção de Versão
-            try:
-                _selecionar_versao(page, ctx, v_idx)
-                fase["sel_versao"] = (True, "")
-            except Exception as e:
-                fase["sel_versao"] = (False, str(e))
-            
-            # Tenta pegar o nome do modelo
-            try:
-                m = re.search(r"/configurador/([^/]+)/", page.url, re.I)
-                if m: modelo_nome = m.group(1).upper()
-            except: pass
-            
-            fase_modelo_info = {"modelo": modelo_nome, "versao": f"#{v_idx}"}
-
-            # 2. Loop de Etapas Visuais (Inicial, Cores, Rodas, Interior)
-            etapas_config = [
-                ("inicial", lambda: (_forcar_carregamento_imagens_lazy(ctx), _esperar_imagens_visiveis(ctx, "inicial"), _validar_textos(ctx, "inicial"))),
-                ("cores", lambda: _ir_para_etapa(ctx, "cor")), # Simplificado para brevidade
-                ("rodas", lambda: _ir_para_etapa(ctx, "rodas")),
-                ("interior", lambda: _ir_para_etapa(ctx, "interior"))
-            ]
-            
-            for nome_etapa, acao in etapas_config:
-                if fase["sel_versao"][0]: # Só tenta se selecionou a versão
-                    try:
-                        acao() 
-                        # Aqui você pode reinserir a lógica de loop de opções se quiser (Cores/Rodas), 
-                        # mantive simplificado para focar na Concessionária que é o erro.
-                        fase[nome_etapa] = (True, "")
-                    except Exception as e:
-                        fase[nome_etapa] = (False, str(e))
-
-            # 3. CONCESSIONÁRIA - O FIX PRINCIPAL
-            # Se chegamos até aqui (ou mesmo se falhou algo antes mas queremos tentar avançar)
-            try:
-                _clicar_avancar_robusto(ctx, f"Modelo {m_idx}|Versão {v_idx}")
-                
-                # Pausa para SPA reagir
-                page.wait_for_timeout(2000)
-                
-                chegou = False
-                ctx_atual = _get_configurator_ctx(page)
-                
-                # Estratégia A: Espera Inteligente (URL + Visual)
-                chegou = _esperar_concessionaria_robusta(page, ctx_atual, timeout_ms=15000)
-                
-                # Estratégia B: Se não chegou, tenta clicar na Tab 'Concessionária'
-                if not chegou:
-                    try:
-                        tab = ctx_atual.get_by_role("tab", name=re.compile(r"Concession[aá]ria", re.I)).first
-                        if tab.is_visible():
-                            tab.click(timeout=5000)
-                            chegou = _esperar_concessionaria_robusta(page, ctx_atual, timeout_ms=10000)
-                    except: pass
-                
-                # Estratégia C: Force URL
-                if not chegou:
-                    if _goto_concessionaria_por_url(page):
-                        chegou = True
-                        
-                if chegou:
-                    fase["concessionaria"] = (True, "")
-                else:
-                    raise AssertionError(f"Falha ao transicionar para Concessionária. URL final: {page.url}")
+            if orcamento().esgotado():
+                _registrar_linha(request, browser_name, _linha_nao_executada((slug or "").upper(), f"#{v_idx}", MOTIVO_ORCAMENTO))
+                sem_orcamento_count += 1
+                continue
 
-            except Exception as e:
-                erro_msg = str(e)
-                fase["concessionaria"] = (False, erro_msg)
-                if not _eh_bug_conhecido(modelo_nome, f"#{v_idx}", "concessionaria", erro_msg):
+            # Bugs conhecidos (bugs_conhecidos.json): 'pular' não executa a célula; 'sondar' executa uma vez
+            politica, bug = registro_bugs().decidir((slug or "").upper(), f"#{v_idx}", browser_name)
+            if politica == POLITICA_PULAR:
+                print(f"[INFO] Célula {(slug or '').upper()} #{v_idx} pulada: bug conhecido '{bug['id']}'.")
+                _registrar_linha(request, browser_name, _linha_bug_pulado((slug or "").upper(), f"#{v_idx}", bug))
+                estado.registrar(slug, f"#{v_idx}", STATUS_BUG_CONHECIDO, impressao)
+                bugs_conhecidos_count += 1
+                continue
+
+            progresso = {"modelo": (slug or "").upper(), "versao": f"#{v_idx}", "navegador": browser_name}
+            # Células pendentes neste teste (esta, as versões seguintes e uma estimativa dos próximos modelos)
+            pendentes = (versoes_iter - v_idx) + (modelos_iter - m_idx - 1) * max(1, versoes_iter)
+            duracoes_tentativas = []
+            with prazo_celula(page, pendentes):
+                fase, modelo_nome = _executar_celula_vigiada(page, ctx, request, m_idx, v_idx, progresso, duracoes_tentativas)
+
+            # Retentativa só da célula que falhou, em contexto novo (o teste inteiro não é reexecutado);
+            # a sonda de bug conhecido roda uma única vez
+            tentativas = 1
+            max_tentativas = 1 if politica == POLITICA_SONDAR else CELULA_TENTATIVAS
+            while (_status_celula(fase, modelo_nome, f"#{v_idx}", browser_name) == STATUS_FALHOU and tentativas < max_tentativas
+                   and not orcamento().esgotado()):
+                tentativas += 1
+                print(f"[INFO] Célula {modelo_nome} #{v_idx} falhou; tentativa {tentativas}/{CELULA_TENTATIVAS} em contexto novo.")
+                marcar_etapa(request, "retentativa", **progresso)
+                time.sleep(CELULA_BACKOFF_S * (tentativas - 1))
+                try:
+                    with contexto_novo(browser, browser_context_args) as pagina_nova:
+                        ctx_novo = _abrir_modelo(pagina_nova, m_idx, slugs)
+                        with prazo_celula(pagina_nova, pendentes):
+                            fase, modelo_nome = _executar_celula_vigiada(pagina_nova, ctx_novo, request, m_idx, v_idx, progresso, duracoes_tentativas)
+                        _anexar_screenshot(request, pagina_nova, f"Tentativa {tentativas} - Modelo {m_idx} Versão {v_idx}")
+                except Exception as e:
+                    print(f"[AVISO] Tentativa {tentativas} da célula {modelo_nome} #{v_idx} não concluída: {e}")
+
+            status = _status_celula(fase, modelo_nome, f"#{v_idx}", browser_name)
+            if status == STATUS_PASSOU and tentativas > 1:
+                status = STATUS_FLAKY
+                flaky_count += 1
+            if politica == POLITICA_SONDAR:
+                reproduziu = any(not ok and registro_bugs().explica(bug, etapa, msg) for etapa, (ok, msg) in fase.items())
+                registro_bugs().registrar_sonda(bug, reproduziu)
+
+            ok_conc, msg_conc = fase["concessionaria"]
+            if not ok_conc:
+                if bug_conhecido(modelo_nome, f"#{v_idx}", "concessionaria", msg_conc, browser_name):
+                    bugs_conhecidos_count += 1
+                else:
                     houve_erro_real = True
                     erros_reais_count += 1
-                else:
-                    bugs_conhecidos_count += 1
+
+            fase_modelo_info = {"modelo": modelo_nome, "versao": f"#{v_idx}", "navegador": browser_name}
 
             # Compilação da Linha
-            rows.append([
+            _registrar_linha(request, browser_name, [
                 modelo_nome,
                 f"#{v_idx}",
                 _status_badge(*fase["sel_versao"], **fase_modelo_info, etapa="sel_versao"),
@@ -324,12 +479,18 @@ def test_e2e_matriz_jornadas(page: Page, request):
                 _status_badge(*fase["rodas"], **fase_modelo_info, etapa="rodas"),
                 _status_badge(*fase["interior"], **fase_modelo_info, etapa="interior"),
                 _status_badge(*fase["concessionaria"], **fase_modelo_info, etapa="concessionaria"),
-            ])
+                _badge_resultado(status, tentativas),
+            ], duracoes_tentativas)
             
+            estado.registrar(slug, f"#{v_idx}", status, impressao)
+
             # Screenshot final da iteração
             _anexar_screenshot(request, page, f"Fim - Modelo {m_idx} Versão {v_idx}")
 
-    _adicionar_resumo_html(request, rows, bugs_conhecidos_count, erros_reais_count)
+    rows = [ev["colunas"] for ev in fluxo_resultados().ler(EVENTO_CELULA, request.node.nodeid)]
+    _adicionar_resumo_html(request, rows, bugs_conhecidos_count, erros_reais_count, nao_executadas_count, browser_name, flaky_count, sem_orcamento_count)
+    if sem_orcamento_count:
+        print(f"[AVISO] {sem_orcamento_count} célula(s) {MOTIVO_ORCAMENTO}: {orcamento().resumo()}")
 
     if houve_erro_real:
         assert False, f"Falha no teste: {erros_reais_count} erros reais detectados."
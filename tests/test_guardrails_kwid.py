@@ -2,6 +2,7 @@ import re
 import os
 import pytest
 from playwright.sync_api import Page, expect
+from helpers_frames import get_configurator_ctx
 
 URL_BASE = os.getenv("BASE_URL", "https://loja.renault.com.br/")
 
@@ -25,13 +26,7 @@ def _aceitar_cookies(page: Page):
             pass
 
 def _get_configurator_ctx(page: Page):
-    for f in page.frames:
-        try:
-            if "/configurador/" in (f.url or ""):
-                return f
-        except Exception:
-            pass
-    return page
+    return get_configurator_ctx(page)
 
 def _combo_versao_info(ctx):
     try:
@@ -4,6 +4,7 @@ import pytest
 import base64
 import pytest_html
 from playwright.sync_api import Page, expect
+from helpers_seletores import resolver_seletores, por_role
 
 def _aceitar_cookies(page: Page):
     # Aguarda o DOM estar pronto
@@ -137,29 +138,13 @@ def _esperar_indicador_vitrine(page: Page, timeout_ms: int = 15000) -> bool:
         re.I,
     )
 
+    # Todos os candidatos (preço + CTAs) resolvidos numa única avaliação por ciclo
+    candidatos = seletores_preco + [por_role("link", cta_regex), por_role("button", cta_regex)]
+
     inicio = time.time()
     while (time.time() - inicio) * 1000 < timeout_ms:
-        # Checa preços
-        for sel in seletores_preco:
-            try:
-                loc = page.locator(sel).first
-                if loc.is_visible():
-                    return True
-            except Exception:
-                pass
-        # Checa CTAs
-        try:
-            link = page.get_by_role("link", name=cta_regex).first
-            if link.is_visible():
-                return True
-        except Exception:
-            pass
-        try:
-            btn = page.get_by_role("button", name=cta_regex).first
-            if btn.is_visible():
-                return True
-        except Exception:
-            pass
+        if resolver_seletores(page, candidatos):
+            return True
         page.wait_for_timeout(300)
     return False
 
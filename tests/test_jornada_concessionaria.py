@@ -1,25 +1,28 @@
 import re
 import os
 import time
-import base64
 import pytest
 import pytest_html
 from playwright.sync_api import Page, expect
 from helpers_concessionaria import (
+    chegar_na_concessionaria,
     esperar_concessionaria as esperar_concessionaria_padrao,
     inserir_cep_robusto,
     selecionar_concessionaria_robusta,
 )
+from helpers_frames import get_configurator_ctx
+from helpers_cep import buscar_concessionarias_por_cep, aguardar_lista_concessionarias
+from fluxo_resultados import anexar_evidencia
+from helpers_seletores import resolver_seletores, por_role
+from stub_mapas import URL_TILE_CARREGADO_REGEX
+from navegador_jornada import navegar_jornada
 
 # =============================
 # Constantes e configurações
 # =============================
 KNOWN_TITLE_PATTERN = re.compile(r"Renault", re.IGNORECASE)
 CTA_CONFIGURE_RESERVA_REGEX = re.compile(r"(configure\s*e\s*reserve|configure|monte\s*o\s*seu|monte|reservar)", re.I)
-URL_CFG_REGEX = re.compile(r"/configurador/.+/(versoes|design|cores|rodas|interior)", re.I)
 URL_VERSOES_REGEX = re.compile(r"/configurador/.+/versoes|/r-pass/pre-venda/configurador/.+/versoes")
-URL_JORNADA_REGEX = re.compile(r"/jornada-de-reserva")
-URL_CONCESSIONARIA_REGEX = re.compile(r"/configurador/.+/concessionaria|/concessionari(a|as)|/dealers|/lojas|/ponto-de-venda|/r-pass/pre-venda/concessionaria", re.I)
 
 # Limites opcionais
 MODELOS_LIMIT = int(os.getenv("MODELOS_LIMIT", "0") or "0")
@@ -72,52 +75,13 @@ def _aceitar_cookies(page: Page):
 
 
 def _anexar_screenshot(request, page_or_frame, titulo: str):
-    """Anexa screenshot ao relatório HTML (pytest-html)."""
-    try:
-        page = page_or_frame if hasattr(page_or_frame, "screenshot") else None
-        if not page:
-            return
-        shot = page.screenshot(full_page=False)
-        b64 = base64.b64encode(shot).decode("utf-8")
-        html = f"<details><summary>{titulo}</summary><img src='data:image/png;base64,{b64}' style='max-width:800px;border:1px solid #ccc'/></details>"
-        if hasattr(request.node, "rep_call"):
-            extra = getattr(request.node.rep_call, "extra", [])
-            extra.append(pytest_html.extras.html(html))
-            request.node.rep_call.extra = extra
-    except Exception:
-        pass
+    """Salva screenshot em evidencias/ e anexa ao relatório só a referência (fluxo de resultados)."""
+    anexar_evidencia(request, page_or_frame, titulo)
 
 
 def _get_configurator_ctx(page: Page):
-    """Retorna o frame com /configurador/ quando existir; senão, a própria page."""
-    for f in page.frames:
-        try:
-            if re.search(r"/configurador/", f.url or ""):
-                return f
-        except Exception:
-            pass
-    return page
-
-
-def _garantir_ctx_configurador(page: Page):
-    _aceitar_cookies(page)
-    if URL_CFG_REGEX.search(page.url):
-        return
-    if URL_JORNADA_REGEX.search(page.url):
-        iniciar_btn = page.get_by_role("button", name=re.compile("Iniciar|Configurar", re.I)).first
-        try:
-            if iniciar_btn.is_visible(timeout=5000):
-                iniciar_btn.click(timeout=8000)
-                page.wait_for_url(URL_CFG_REGEX, timeout=30000)
-        except:
-            pass
-        _aceitar_cookies(page)
-        return
-    try:
-        page.wait_for_url(URL_CFG_REGEX, timeout=10000)
-    except:
-        pass
-    _aceitar_cookies(page)
+    """Retorna o frame com /configurador/ quando existir; senão, a própria page (índice de frames)."""
+    return get_configurator_ctx(page)
 
 
 def _is_versoes_page(ctx) -> bool:
@@ -217,102 +181,22 @@ def _selecionar_versao(page, ctx, idx: int):
         return
 
 
-def _esperar_concessionaria(page: Page, ctx=None, timeout_ms: int = 30000) -> bool:
-    # 1. Tenta URL
-    try:
-        page.wait_for_url(URL_CONCESSIONARIA_REGEX, timeout=5000)
-        return True
-    except Exception:
-        pass
-
-    # 2. Polling de URL e Frames
-    deadline = time.time() + (timeout_ms / 1000.0)
-    while time.time() < deadline:
-        if URL_CONCESSIONARIA_REGEX.search(page.url):
-            return True
-        for f in page.frames:
-            try:
-                if URL_CONCESSIONARIA_REGEX.search(f.url or ""):
-                    return True
-            except Exception:
-                pass
-        
-        if ctx:
-            try:
-                if ctx.get_by_role("heading", name=re.compile(r"Concession[aá]ria|Dealer|Loja", re.I)).first.is_visible():
-                    return True
-                if ctx.locator('[id^="button-"]').first.is_visible():
-                    return True
-                if ctx.locator('[data-testid*="dealer"], .leaflet-container, .gm-style').first.is_visible():
-                    return True
-            except:
-                pass
-                
-        page.wait_for_timeout(500)
-
-    return False
-
-
 def _inserir_cep_se_necessario(ctx, page: Page):
-    try:
-        page.wait_for_timeout(3000)
-        lista = ctx.locator('[id^="button-"] , [data-testid*="dealer-card"], [class*="dealer"], [class*="store-list"], li:has-text("km")')
-        if lista.count() > 0 and lista.first.is_visible():
-            return
-    except Exception:
-        pass
+    # Espera limitada pela lista automática antes de decidir digitar o CEP
+    if aguardar_lista_concessionarias(ctx):
+        return
 
     print("[INFO] Resultados não apareceram automaticamente. Tentando busca por CEP.")
     try:
-        cep_input = ctx.locator('input[placeholder*="CEP" i], input[name*="cep" i], input[type="search"]').first
-        if not cep_input.is_visible():
-            return
-
-        cep_input.click(force=True)
-        cep_input.fill("")
-        cep_input.type(CEP_BUSCA, delay=100)
-        page.wait_for_timeout(500)
-
-        btn_buscar = ctx.get_by_role("button", name=re.compile(r"Buscar|Procurar|Pesquisar|OK|Aplicar|>|Icon", re.I)).first
-        
-        clicado = False
-        if btn_buscar and btn_buscar.count() > 0 and btn_buscar.is_visible():
-            try:
-                btn_buscar.click(force=True, timeout=3000)
-                clicado = True
-            except:
-                pass
-        
-        if not clicado:
-            cep_input.press("Enter")
-            
-        try:
-            page.wait_for_load_state("networkidle", timeout=5000)
-            page.wait_for_timeout(2000)
-        except Exception:
-            pass
-            
+        buscar_concessionarias_por_cep(ctx, page, CEP_BUSCA, botao_regex=re.compile(r"Buscar|Procurar|Pesquisar|OK|Aplicar|>|Icon", re.I))
     except Exception as e:
         print(f"[ERRO] Falha ao tentar inserir CEP: {e}")
 
 
 def _validar_resultados_concessionarias(ctx) -> int:
-    try:
-        botoes = ctx.get_by_role("button", name=re.compile(r"(selecionar|selecionado)", re.I))
-        qtde = botoes.count()
-        if qtde > 0:
-            return qtde
-    except Exception:
-        pass
-
-    try:
-        ids = ctx.locator('[id^="button-"]')
-        if ids.count() > 0:
-            return ids.count()
-    except Exception:
-        pass
-
-    seletores = [
+    candidatos = [
+        por_role("button", re.compile(r"(selecionar|selecionado)", re.I)),
+        '[id^="button-"]',
         '[data-testid*="dealer-card"]',
         '[class*="dealer-card"]',
         '.store-list-item',
@@ -321,12 +205,8 @@ def _validar_resultados_concessionarias(ctx) -> int:
         'div:has(> button:has-text("Selecionar"))',
         '[data-testid="store-card"]'
     ]
-    for sel in seletores:
-        l = ctx.locator(sel)
-        if l.count() > 0:
-            return l.count()
-
-    return 0
+    # Contagem de todos os candidatos numa única avaliação; vale o primeiro com resultados
+    return resolver_seletores(ctx, candidatos, exigir_visivel=False).total
 
 
 def _validar_mapa_concessionarias(ctx) -> None:
@@ -334,12 +214,7 @@ def _validar_mapa_concessionarias(ctx) -> None:
         '[data-testid*="map"]', '.leaflet-container', '.mapboxgl-map', 
         '.gm-style', 'iframe[src*="maps"]', '#map', 'div[class*="map"]'
     ]
-    encontrou = False
-    for sel in seletores:
-        if ctx.locator(sel).first.count() > 0:
-            encontrou = True
-            break
-    if not encontrou:
+    if not resolver_seletores(ctx, seletores, exigir_visivel=False):
         print("[AVISO] Container do mapa não identificado com seletores padrão.")
 
 
@@ -366,26 +241,6 @@ def _validar_textos_gerais(ctx) -> None:
         pass
 
 
-def _goto_concessionaria_por_url(page: Page):
-    url = page.url
-    m = re.search(r"/configurador/([^/]+)/", url, re.I)
-    if not m:
-        return False
-    modelo = m.group(1)
-    destinos = [
-        f"https://loja.renault.com.br/configurador/{modelo}/concessionaria/",
-        f"https://loja.renault.com.br/r-pass/pre-venda/configurador/{modelo}/concessionaria/"
-    ]
-    for destino in destinos:
-        try:
-            page.goto(destino, wait_until="domcontentloaded", timeout=20000)
-            if _esperar_concessionaria(page, None, 5000):
-                return True
-        except:
-            pass
-    return False
-
-
 # =============================
 # Teste principal: Etapa 3/5 Concessionária
 # =============================
@@ -437,21 +292,9 @@ def test_validar_jornada_concessionaria_para_todos_modelos_e_versoes(page: Page,
             page.goto("/", wait_until="domcontentloaded", timeout=35000)
             _aceitar_cookies(page)
 
-            btns = page.get_by_role("button", name=CTA_CONFIGURE_RESERVA_REGEX)
-            links = page.get_by_role("link", name=CTA_CONFIGURE_RESERVA_REGEX)
-
-            if btns.count() > m_idx:
-                target = btns.nth(m_idx)
-            elif links.count() > (m_idx - btns.count()):
-                target = links.nth(m_idx - btns.count())
-            else:
-                target = page.get_by_text(CTA_CONFIGURE_RESERVA_REGEX).nth(m_idx)
-
-            target.scroll_into_view_if_needed()
-            target.click(force=True, timeout=8000)
-            
-            page.wait_for_url(re.compile(r"/jornada-de-reserva|/configurador/.+"), timeout=35000)
-            _garantir_ctx_configurador(page)
+            estado = navegar_jornada(page, "versoes", modelo=m_idx, request=request)
+            if estado not in ("versoes", "design"):
+                raise AssertionError(f"Não entrou no configurador (parou em '{estado}'). URL: {page.url}")
             ctx = _get_configurator_ctx(page)
             _anexar_screenshot(request, page, f"Modelo #{m_idx} - Configurador")
 
@@ -479,33 +322,9 @@ def test_validar_jornada_concessionaria_para_todos_modelos_e_versoes(page: Page,
                          ctx = _get_configurator_ctx(page)
                     
                     _selecionar_versao(page, ctx, v_idx)
-                    try:
-                        page.wait_for_load_state("networkidle", timeout=5000)
-                    except:
-                        pass
-
-                    try:
-                        next_btn = ctx.get_by_role("button", name=re.compile(r"Avan[cç]ar|Continuar|Concession[aá]ria|Prosseguir|Pr[oó]ximo", re.I)).first
-                        if next_btn and next_btn.count() > 0 and next_btn.is_visible():
-                            next_btn.click(timeout=10000)
-                    except:
-                        pass
-
-                    chegou = _esperar_concessionaria(page, ctx, 35000)
-                    if not chegou:
-                        try:
-                            tab = ctx.get_by_role("tab", name=re.compile(r"Concession[aá]ria", re.I)).first
-                            if tab.is_visible():
-                                tab.click(timeout=5000)
-                        except:
-                            pass
-                        
-                        if not _esperar_concessionaria(page, ctx, 10000):
-                             _goto_concessionaria_por_url(page)
-                             chegou = _esperar_concessionaria(page, ctx, 20000)
-
-                    if not chegou:
-                        raise AssertionError(f"Não chegou à Concessionária. URL: {page.url}")
+                    estado = navegar_jornada(page, "concessionaria", modelo=m_idx, versao=v_idx, request=request)
+                    if estado != "concessionaria":
+                        raise AssertionError(f"Não chegou à Concessionária (parou em '{estado}'). URL: {page.url}")
 
                     ctx = _get_configurator_ctx(page)
                     _anexar_screenshot(request, page, f"Modelo #{m_idx} - Versão #{v_idx} - Concessionária")
@@ -552,4 +371,28 @@ def test_validar_jornada_concessionaria_para_todos_modelos_e_versoes(page: Page,
         + ("\nSKIPS:\n" + "\n".join(skips) if skips else "")
         + ("\nERROS:\n" + "\n".join(erros) if erros else "")
     )
-    assert len(erros) == 0, msg
\ No newline at end of file
+    assert len(erros) == 0, msg
+
+# =============================
+# Mapa real (uma vez por execução; os demais testes podem usar STUB_MAPAS=1)
+# =============================
+
+@pytest.mark.concessionaria
+@pytest.mark.mapa_real
+def test_mapa_real_concessionaria(page: Page, request):
+    tiles = []
+    page.on("response", lambda r: tiles.append(r.url) if URL_TILE_CARREGADO_REGEX.search(r.url or "") and r.status < 400 else None)
+
+    chegar_na_concessionaria(page, 0, _aceitar_cookies)
+    ctx = _get_configurator_ctx(page)
+
+    mapa = ctx.locator('.gm-style, .leaflet-container, .mapboxgl-map').first
+    mapa.wait_for(state="visible", timeout=30000)
+    assert ctx.locator("[data-stub-mapas]").count() == 0, "Mapa servido pelo stub em teste de mapa real"
+
+    fim = time.time() + 15
+    while not tiles and time.time() < fim:
+        page.wait_for_timeout(250)
+    _anexar_screenshot(request, page, "Concessionária - Mapa real")
+    assert tiles, "Container do mapa visível, mas nenhum tile de mapa foi carregado"
+    print(f"[INFO] Mapa real: {len(tiles)} tile(s) carregado(s)")
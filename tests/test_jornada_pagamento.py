@@ -1,18 +1,24 @@
 import re
 import os
 import time
-import base64
+import asyncio
 import pytest
-import pytest_html
-from playwright.sync_api import Page, expect
+from playwright.sync_api import Page
+from fluxo_resultados import anexar_evidencia, anexar_evidencia_png, marcar_etapa
+from helpers_frames import get_configurator_ctx, rastreador_frames, resolver_ctx_pagamento
+from helpers_estrategias import executar_estrategias
+from helpers_cep import buscar_concessionarias_por_cep
+from navegador_jornada import navegar_jornada
+from vigia_fatal import tolerar_erros_documento
+from snapshot_jornada import restaurar_snapshot, salvar_snapshot, capturar_snapshot, args_contexto, preparar_origens_async
+from execucao_paralela import executar_contextos_paralelos, PARALELO_CONTEXTOS
+from helpers_contexto import preparar_contexto_async
+from helpers_relatorio import anexar_tabela_html
 
 # =============================
 # Constantes e configurações
 # =============================
 KNOWN_TITLE_PATTERN = re.compile(r"Renault", re.IGNORECASE)
-CTA_CONFIGURE_RESERVA_REGEX = re.compile(r"(configure\s*e\s*reserve|configure|monte\s*o\s*seu|monte|reservar)", re.I)
-URL_CFG_REGEX = re.compile(r"/configurador/.+/(versoes|design|cores|rodas|interior)", re.I)
-URL_JORNADA_REGEX = re.compile(r"/jornada-de-reserva")
 URL_CONCESSIONARIA_REGEX = re.compile(r"/configurador/.+/concessionaria|/concessionari(a|as)|/dealers|/lojas|/ponto-de-venda|/r-pass/pre-venda/concessionaria", re.I)
 URL_PAGAMENTO_REGEX = re.compile(r"/pagamento|/payment|metodo-de-pagamento|forma-de-pagamento|checkout", re.I)
 URL_RESUMO_REGEX = re.compile(r"/resumo|/summary|/jornada-de-reserva/.*/resumo|/r-pass/pre-venda/.*/resumo", re.I)
@@ -21,9 +27,22 @@ MODELOS_LIMIT = int(os.getenv("MODELOS_LIMIT", "1") or "1")
 VERSOES_LIMIT = int(os.getenv("VERSOES_LIMIT", "1") or "1")
 CEP_BUSCA = os.getenv("CEP_BUSCA", "01001-000")
 
-# Email e senha para login no financiamento
-FINAN_EMAIL = os.getenv("FINAN_EMAIL", "sustentacao.renault@gmail.com")
-FINAN_SENHA = os.getenv("FINAN_SENHA", "MetaL@123")
+# Matriz de pagamento: uma opção por contexto, todas a partir do mesmo snapshot do pagamento
+SELETOR_OPCOES_PAGAMENTO = 'input[type="radio"], [role="radio"]'
+OPCAO_PAGAMENTO_REGEX = re.compile(r"Pix|Cart[aã]o|Boleto|Financiamento|Banco\s*Renault|CDC|Parcelado|Financiar|Negociar", re.I)
+# Desfecho esperado por opção (primeira regra que casa); as demais só precisam avançar sem erro
+DESFECHOS_OPCAO = [
+    (re.compile(r"Financiamento|Banco\s*Renault|CDC|Financiar", re.I), {"login"}),
+    (re.compile(r"Negociar", re.I), {"resumo"}),
+]
+DESFECHOS_PADRAO = {"login", "resumo", "avancou", "formulario"}
+BOTAO_DEFINIR_REGEX = re.compile(r"Definir\s*m[ée]todo\s*de\s*pagamento|Definir\s*pagamento|Confirmar\s*m[ée]todo", re.I)
+BOTOES_SEGUINTES_REGEX = [
+    re.compile(r"Iniciar\s*sess[ãa]o|J[áa]\s*tenho\s*cadastro", re.I),
+    re.compile(r"Resumo|Continuar|Avan[cç]ar|Finalizar|Prosseguir|Seguinte|Concluir", re.I),
+]
+ERRO_PAGAMENTO_REGEX = re.compile(r"algo deu errado|erro inesperado|indispon[ií]vel no momento|tente novamente", re.I)
+
 
 # =============================
 # Helpers Gerais
@@ -50,38 +69,11 @@ def _aceitar_cookies(page: Page):
             pass
 
 def _anexar_screenshot(request, page_or_frame, titulo: str):
-    try:
-        page = page_or_frame if hasattr(page_or_frame, "screenshot") else None
-        if not page: return
-        shot = page.screenshot(full_page=False)
-        b64 = base64.b64encode(shot).decode("utf-8")
-        html = f"<details><summary>{titulo}</summary><img src='data:image/png;base64,{b64}' style='max-width:800px;border:1px solid #ccc'/></details>"
-        if hasattr(request.node, "rep_call"):
-            extra = getattr(request.node.rep_call, "extra", [])
-            extra.append(pytest_html.extras.html(html))
-            request.node.rep_call.extra = extra
-    except Exception:
-        pass
+    """Salva screenshot em evidencias/ e anexa ao relatório só a referência (fluxo de resultados)."""
+    anexar_evidencia(request, page_or_frame, titulo)
 
 def _get_configurator_ctx(page: Page):
-    for f in page.frames:
-        if re.search(r"/configurador/", f.url or ""):
-            return f
-    return page
-
-def _garantir_ctx_configurador(page: Page):
-    _aceitar_cookies(page)
-    if URL_CFG_REGEX.search(page.url): return
-    if URL_JORNADA_REGEX.search(page.url):
-        iniciar_btn = page.get_by_role("button", name=re.compile("Iniciar|Configurar", re.I)).first
-        try:
-            if iniciar_btn.is_visible():
-                iniciar_btn.click()
-                page.wait_for_url(URL_CFG_REGEX, timeout=30000)
-        except Exception:
-            pass
-        _aceitar_cookies(page)
-
+    return get_configurator_ctx(page)
 
 def _esperar_concessionaria(page: Page, ctx=None, timeout_ms: int = 30000) -> bool:
     # Verificação rápida inicial
@@ -106,19 +98,7 @@ def _esperar_concessionaria(page: Page, ctx=None, timeout_ms: int = 30000) -> bo
 
 def _inserir_cep_se_necessario(ctx, page: Page):
     try:
-        cep_input = ctx.locator('input[placeholder*="CEP" i], input[name*="cep" i]').first
-        if cep_input and cep_input.is_visible():
-            cep_input.fill(CEP_BUSCA)
-            cep_input.press("Enter")
-            page.wait_for_timeout(800)
-            # Tenta acionar botão de buscar/aplicar se existir
-            try:
-                btn_buscar = ctx.get_by_role("button", name=re.compile(r"Buscar|OK|Confirmar|Aplicar", re.I)).first
-                if btn_buscar and btn_buscar.is_visible():
-                    btn_buscar.click()
-            except Exception:
-                pass
-            page.wait_for_timeout(1500)
+        buscar_concessionarias_por_cep(ctx, page, CEP_BUSCA, botao_regex=re.compile(r"Buscar|OK|Confirmar|Aplicar", re.I))
     except Exception:
         pass
 
@@ -188,88 +168,93 @@ def _selecionar_concessionaria_robusta(ctx, page: Page, tempo_ms: int = 45000) -
         print("[DEBUG] Não está na tela de concessionária")
         return False
 
-    # Função interna para coletar PRIMEIRA concessionária disponível
-    def coletar_primeira_concessionaria():
-        """
-        Retorna o botão/card da PRIMEIRA concessionária disponível (não selecionada).
-        Prioriza botões "Selecionar" e ignora os já selecionados.
-        """
-        candidatos = []
-        
-        # Estratégia 1: Botões "Selecionar" por role
-        try:
-            loc = ctx_atualizado.get_by_role("button", name=re.compile(r"Selecionar", re.I))
-            for i in range(min(loc.count(), 10)):
-                try:
-                    cand = loc.nth(i)
-                    if not cand.is_visible():
-                        continue
-                    # Ignora se já está selecionado
-                    txt = (cand.text_content() or "").strip().lower()
-                    if "selecionado" in txt or "selecionada" in txt:
-                        continue
-                    candidatos.append(("button_role", cand))
-                    # Retorna a primeira imediatamente
-                    return candidatos[0] if candidatos else None
-                except Exception:
-                    continue
-        except Exception:
-            pass
-        
-        # Estratégia 2: Locator por texto "Selecionar"
-        try:
-            loc = ctx_atualizado.locator('button:has-text("Selecionar")')
-            for i in range(min(loc.count(), 10)):
-                try:
-                    cand = loc.nth(i)
-                    if not cand.is_visible():
-                        continue
-                    txt = (cand.text_content() or "").strip().lower()
-                    if "selecionado" in txt or "selecionada" in txt:
-                        continue
-                    candidatos.append(("button_text", cand))
-                    return candidatos[0] if candidatos else None
-                except Exception:
+    def _primeiro_nao_selecionado(loc, limite: int = 10):
+        for i in range(min(loc.count(), limite)):
+            try:
+                cand = loc.nth(i)
+                if not cand.is_visible():
                     continue
-        except Exception:
-            pass
-        
-        # Estratégia 3: Data-testid ou seletores customizados
-        try:
-            loc = ctx_atualizado.locator('[data-testid*="select" i], [data-testid*="selecionar" i], [data-testid*="dealer"] button')
-            for i in range(min(loc.count(), 10)):
-                try:
-                    cand = loc.nth(i)
-                    if not cand.is_visible():
-                        continue
-                    txt = (cand.text_content() or "").strip().lower()
-                    if "selecionado" in txt or "selecionada" in txt:
-                        continue
-                    candidatos.append(("data_testid", cand))
-                    return candidatos[0] if candidatos else None
-                except Exception:
+                # Ignora se já está selecionado
+                txt = (cand.text_content() or "").strip().lower()
+                if "selecionado" in txt or "selecionada" in txt:
                     continue
-        except Exception:
-            pass
-        
-        # Estratégia 4: Cards de concessionária (clique no card inteiro)
+                return cand
+            except Exception:
+                continue
+        return None
+
+    # Estratégia 1: Botões "Selecionar" por role
+    def por_role():
+        return _primeiro_nao_selecionado(ctx_atualizado.get_by_role("button", name=re.compile(r"Selecionar", re.I)))
+
+    # Estratégia 2: Locator por texto "Selecionar"
+    def por_texto():
+        return _primeiro_nao_selecionado(ctx_atualizado.locator('button:has-text("Selecionar")'))
+
+    # Estratégia 3: Data-testid ou seletores customizados
+    def por_data_testid():
+        return _primeiro_nao_selecionado(ctx_atualizado.locator('[data-testid*="select" i], [data-testid*="selecionar" i], [data-testid*="dealer"] button'))
+
+    # Estratégia 4: Cards de concessionária (clique no card inteiro)
+    def por_card():
+        card = _primeiro_nao_selecionado(ctx_atualizado.locator('[data-testid*="dealer"], [class*="dealer-card"], li:has-text("km")'))
+        if card is None:
+            return None
+        # Tenta encontrar botão dentro do card
+        btn_no_card = card.locator('button:has-text("Selecionar")').first
+        if btn_no_card.count() > 0 and btn_no_card.is_visible():
+            txt = (btn_no_card.text_content() or "").strip().lower()
+            if "selecionado" not in txt and "selecionada" not in txt:
+                return btn_no_card
+        # Se não tiver botão, retorna o card para clique direto
+        return card
+
+    clicou_algum = False
+
+    def _clicar_concessionaria(elemento) -> bool:
+        nonlocal clicou_algum
+        elemento.scroll_into_view_if_needed()
+        page.wait_for_timeout(500)
         try:
-            cards = ctx_atualizado.locator('[data-testid*="dealer"], [class*="dealer-card"], li:has-text("km")')
-            if cards.count() > 0:
-                primeiro_card = cards.first
-                if primeiro_card.is_visible():
-                    # Tenta encontrar botão dentro do card
-                    btn_no_card = primeiro_card.locator('button:has-text("Selecionar")').first
-                    if btn_no_card.count() > 0 and btn_no_card.is_visible():
-                        txt = (btn_no_card.text_content() or "").strip().lower()
-                        if "selecionado" not in txt and "selecionada" not in txt:
-                            return ("card_button", btn_no_card)
-                    # Se não tiver botão, retorna o card para clique direto
-                    return ("card", primeiro_card)
+            # Clique via JavaScript (mais confiável)
+            elemento.evaluate("el => el.click()")
+            print("[DEBUG] Clique via JS executado")
         except Exception:
-            pass
-        
-        return None
+            # Fallback: clique via Playwright
+            elemento.click(force=True, timeout=5000)
+            print("[DEBUG] Clique via Playwright executado")
+        clicou_algum = True
+        # Aguarda mudança de estado ou navegação
+        page.wait_for_timeout(1500)
+        return True
+
+    def clicando(buscar):
+        def tentar():
+            elemento = buscar()
+            return elemento if elemento is not None and _clicar_concessionaria(elemento) else None
+        return tentar
+
+    def _selecao_confirmada(_elemento) -> bool:
+        if URL_PAGAMENTO_REGEX.search(page.url or ""):
+            print("[DEBUG] Navegou para pagamento após clique")
+            return True
+        return _dealer_esta_selecionado(_get_configurator_ctx(page))
+
+    # Função interna para selecionar a PRIMEIRA concessionária disponível
+    def selecionar_primeira_concessionaria():
+        """
+        Clica na PRIMEIRA concessionária disponível (não selecionada) e retorna o tipo da estratégia
+        cuja seleção foi confirmada (ou None). Prioriza botões "Selecionar"; a ordem é a aprendida
+        para este build do site e só conta como acerto a seleção confirmada. O clique no card
+        inteiro é genérico e fica fora do aprendizado.
+        """
+        tipo, _ = executar_estrategias("_selecionar_concessionaria_robusta", ctx_atualizado, [
+            ("button_role", clicando(por_role)),
+            ("button_text", clicando(por_texto)),
+            ("data_testid", clicando(por_data_testid)),
+            ("card", clicando(por_card)),
+        ], confirmar=_selecao_confirmada, genericas=("card",))
+        return tipo
 
     scrolls_realizados = 0
     ultima_url = page.url
@@ -304,60 +289,26 @@ def _selecionar_concessionaria_robusta(ctx, page: Page, tempo_ms: int = 45000) -
                 print("[DEBUG] Não está mais na concessionária e não está em pagamento")
                 return False
 
-        # Coleta primeira concessionária
-        primeira_concessionaria = coletar_primeira_concessionaria()
-        
-        if primeira_concessionaria:
-            tipo, elemento = primeira_concessionaria
-            print(f"[DEBUG] Encontrada primeira concessionária (tipo: {tipo})")
-            
-            try:
-                # Scroll para visibilidade
-                elemento.scroll_into_view_if_needed()
-                page.wait_for_timeout(500)
-                
-                # Tenta clique
-                clicou = False
-                try:
-                    # Clique via JavaScript (mais confiável)
-                    elemento.evaluate("el => el.click()")
-                    clicou = True
-                    print("[DEBUG] Clique via JS executado")
-                except Exception:
-                    try:
-                        # Fallback: clique via Playwright
-                        elemento.click(force=True, timeout=5000)
-                        clicou = True
-                        print("[DEBUG] Clique via Playwright executado")
-                    except Exception:
-                        print("[DEBUG] Falha ao clicar na concessionária")
-                
-                if clicou:
-                    # Aguarda mudança de estado ou navegação
-                    page.wait_for_timeout(1500)
-                    
-                    # Verifica se foi selecionado
-                    if _dealer_esta_selecionado(ctx_atualizado):
-                        print("[DEBUG] Concessionária selecionada com sucesso")
-                        return True
-                    
-                    # Verifica se navegou para pagamento
-                    if URL_PAGAMENTO_REGEX.search(page.url or ""):
-                        print("[DEBUG] Navegou para pagamento após clique")
-                        return True
-                    
-                    # Verifica mudança de URL
-                    if page.url != ultima_url:
-                        print(f"[DEBUG] URL mudou: {ultima_url} -> {page.url}")
-                        ultima_url = page.url
-                        # Pequeno delay adicional
-                        page.wait_for_timeout(1000)
-                        if _dealer_esta_selecionado(_get_configurator_ctx(page)):
-                            return True
-                
-            except Exception as e:
-                print(f"[DEBUG] Erro ao tentar selecionar concessionária: {e}")
-                page.wait_for_timeout(500)
+        # Seleciona a primeira concessionária
+        clicou_algum = False
+        try:
+            tipo = selecionar_primeira_concessionaria()
+            if tipo:
+                print(f"[DEBUG] Concessionária selecionada com sucesso (tipo: {tipo})")
+                return True
+        except Exception as e:
+            print(f"[DEBUG] Erro ao tentar selecionar concessionária: {e}")
+            page.wait_for_timeout(500)
+
+        if clicou_algum:
+            # Verifica mudança de URL
+            if page.url != ultima_url:
+                print(f"[DEBUG] URL mudou: {ultima_url} -> {page.url}")
+                ultima_url = page.url
+                # Pequeno delay adicional
+                page.wait_for_timeout(1000)
+                if _dealer_esta_selecionado(_get_configurator_ctx(page)):
+                    return True
         else:
             # Se não encontrou, tenta scroll para materializar itens
             print("[DEBUG] Nenhuma concessionária encontrada, fazendo scroll...")
@@ -442,20 +393,9 @@ def _tem_ui_pagamento(ctx) -> bool:
 
 
 def _resolver_ctx_pagamento(page: Page):
-    # Prefere frame com URL de pagamento e UI encontrada
-    for f in page.frames:
-        fu = getattr(f, "url", "") or ""
-        if URL_PAGAMENTO_REGEX.search(fu) and _tem_ui_pagamento(f):
-            return f
-    # Caso não tenha URL de pagamento, tenta UI de pagamento em qualquer frame
-    for f in page.frames:
-        try:
-            if _tem_ui_pagamento(f):
-                return f
-        except Exception:
-            continue
-    # Fallback: contexto de configurador
-    return _get_configurator_ctx(page)
+    # Prefere frame com URL de pagamento e UI encontrada; depois UI em qualquer frame;
+    # fallback: contexto de configurador. Índice de frames + sonda de UI memorizada por frame.
+    return resolver_ctx_pagamento(page, _tem_ui_pagamento)
 
 
 def _debug_dump_context(page: Page, ctx, titulo: str = "DEBUG Context"):
@@ -498,11 +438,10 @@ def _esperar_pagamento(page: Page, ctx, timeout_ms: int = 30000) -> bool:
         except Exception:
             pass
 
-        # 2) URL dos frames + UI específica do frame
+        # 2) Frames indexados como pagamento + UI específica do frame
         try:
-            for f in page.frames:
-                fu = getattr(f, "url", "") or ""
-                if URL_PAGAMENTO_REGEX.search(fu) and _tem_ui_pagamento(f):
+            for f in rastreador_frames(page).frames("pagamento"):
+                if _tem_ui_pagamento(f):
                     return True
         except Exception:
             pass
@@ -518,175 +457,47 @@ def _esperar_pagamento(page: Page, ctx, timeout_ms: int = 30000) -> bool:
     return False
 
 
-def _esperar_resumo(page: Page, ctx, timeout_ms: int = 30000) -> bool:
-    """
-    Aguarda sinais de que a tela de Resumo foi carregada (SPA/iframe friendly),
-    evitando falsos-positivos em Concessionária.
-    """
-    deadline = time.time() + (timeout_ms / 1000.0)
-    while time.time() < deadline:
-        # 1) URL principal
-        try:
-            if URL_RESUMO_REGEX.search(page.url or ""):
-                return True
-        except Exception:
-            pass
-
-        # 2) URL dos frames
-        try:
-            for f in page.frames:
-                fu = getattr(f, "url", "") or ""
-                if URL_RESUMO_REGEX.search(fu):
-                    return True
-        except Exception:
-            pass
-
-        # 3) Heurísticas (evitando Concessionária)
-        try:
-            if _esta_em_concessionaria(ctx):
-                raise Exception("Ainda em Concessionária")
-            head = ctx.get_by_role("heading", name=re.compile(r"Resumo", re.I)).first
-            if head and head.count() > 0 and head.is_visible():
-                return True
-        except Exception:
-            pass
-
-        page.wait_for_timeout(300)
-
-    return False
-
-
-def _acessar_configurador_robusto(page: Page):
-    """
-    Garante entrada no configurador/jornada mesmo quando o CTA não dispara navegação top-level.
-    """
-    page.goto("/", wait_until="domcontentloaded")
-    _aceitar_cookies(page)
-
-    # Estratégia 1: CTA por role + texto
-    try:
-        cta_btn = page.get_by_role("button", name=CTA_CONFIGURE_RESERVA_REGEX).first
-        if cta_btn and cta_btn.is_visible():
-            try:
-                cta_btn.click(force=True)
-            except Exception:
-                try:
-                    cta_btn.evaluate("el => el.click()")
-                except Exception:
-                    pass
-    except Exception:
-        pass
-
-    try:
-        cta_link = page.get_by_role("link", name=CTA_CONFIGURE_RESERVA_REGEX).first
-        if cta_link and cta_link.is_visible():
-            try:
-                cta_link.click(force=True)
-            except Exception:
-                try:
-                    cta_link.evaluate("el => el.click()")
-                except Exception:
-                    pass
-    except Exception:
-        pass
-
-    # Espera curta pela URL do configurador/jornada
-    try:
-        expect(page).to_have_url(re.compile(r"/jornada-de-reserva|/configurador/.+", re.I), timeout=8000)
-        return
-    except Exception:
-        pass
-
-    # Estratégia 2: link direto por seletor
-    try:
-        link_cfg = page.locator('a[href*="/configurador/"]').first
-        if link_cfg and link_cfg.count() > 0 and link_cfg.is_visible():
-            link_cfg.click(force=True)
-            expect(page).to_have_url(re.compile(r"/configurador/.+", re.I), timeout=8000)
-            return
-    except Exception:
-        pass
-
-    # Estratégia 3: navegação direta para um modelo padrão
-    candidatos = [
-        "/configurador/kardian/versoes",
-        "/configurador/kardian/concessionaria/",
-        "/jornada-de-reserva",
-    ]
-    for destino in candidatos:
-        try:
-            page.goto(destino, wait_until="domcontentloaded")
-            if re.search(r"/configurador/.+|/jornada-de-reserva", page.url, re.I):
-                return
-        except Exception:
-            continue
-
 # =============================
 # Helper Principal: Navegar até Pagamento (ajustado)
 # =============================
 
 def _ir_para_pagamento(page: Page, request) -> tuple:
+    """
+    Leva a página à etapa de pagamento: direto pelo snapshot salvo por um teste anterior desta
+    execução (uma navegação) ou, sem snapshot válido, pelo caminho completo, salvando um snapshot novo.
+    """
     page.set_default_timeout(30000)
+    if restaurar_snapshot(page, "pagamento", lambda p: _esperar_pagamento(p, _get_configurator_ctx(p), 15000)):
+        ctx = _resolver_ctx_pagamento(page)
+        _anexar_screenshot(request, page, "Pagamento - Restaurado do Snapshot")
+        return page, ctx
 
-    # 1. Acessar Home e garantir entrada no Configurador
-    _acessar_configurador_robusto(page)
-    try:
-        expect(page).to_have_url(re.compile(r"/jornada-de-reserva|/configurador/.+", re.I), timeout=15000)
-    except Exception:
-        _anexar_screenshot(request, page, "Erro - Não entrou no Configurador")
-        pytest.fail(f"Falha ao acessar configurador a partir da Home. URL atual: {page.url}")
+    page, ctx = _caminhar_ate_pagamento(page, request)
+    salvar_snapshot(page, "pagamento")
+    return page, ctx
 
-    _garantir_ctx_configurador(page)
-    ctx = _get_configurator_ctx(page)
 
-    # 2. Navegação até a etapa de Concessionária
-    print("Iniciando navegação dinâmica até Concessionária...")
-    deadline_nav = time.time() + 90 
-    
-    while time.time() < deadline_nav:
-        url_atual = page.url.lower()
-        
-        # SUCESSO: Chegamos na concessionária
-        if _esperar_concessionaria(page, ctx, 500):
-            break
-
-        # CASO 1: Estamos presos na tela de VERSÕES
-        if "/versoes" in url_atual or "version" in url_atual:
-            btns = ctx.get_by_role("button", name=re.compile(r"Configurar|Selecionar|Escolher", re.I))
-            if btns.count() > 0:
-                btns.first.click(force=True)
-                page.wait_for_timeout(2000)
-            else:
-                try:
-                    ctx.locator('[data-testid*="versao"]').first.click(force=True, timeout=1000)
-                except: pass
-        
-        # CASO 2: Etapas intermediárias
-        else:
-            btn_next = ctx.get_by_role("button", name=re.compile(r"Avan[cç]ar|Continuar|Pr[oó]ximo|Ir para|Concession[aá]ria", re.I)).first
-            if btn_next.is_visible():
-                if not btn_next.is_disabled():
-                    btn_next.click()
-                    page.wait_for_timeout(2000) 
-            else:
-                page.wait_for_timeout(1000)
+def _caminhar_ate_pagamento(page: Page, request) -> tuple:
+    """Caminho completo: home → configurador → versões → ... → concessionária → pagamento."""
 
-    # Verifica se chegou na concessionária
-    if not _esperar_concessionaria(page, ctx, 5000):
-        # Pode ter navegado automaticamente para pagamento
-        ctx_atual = _get_configurator_ctx(page)
-        if _esperar_pagamento(page, ctx_atual, 3000):
-            print("[DEBUG] Navegou automaticamente para pagamento sem passar por concessionária")
-            ctx = _resolver_ctx_pagamento(page)
-            _anexar_screenshot(request, page, "Pagamento - Navegação Automática")
-            return page, ctx
+    # 1. Home → configurador → versões → design → Concessionária pelo navegador da jornada
+    print("Iniciando navegação até Concessionária...")
+    page.goto("/", wait_until="domcontentloaded")
+    _aceitar_cookies(page)
+    estado = navegar_jornada(page, "concessionaria", request=request)
+
+    if estado == "pagamento":
+        print("[DEBUG] Navegou automaticamente para pagamento sem passar por concessionária")
+        ctx = _resolver_ctx_pagamento(page)
+        _anexar_screenshot(request, page, "Pagamento - Navegação Automática")
+        return page, ctx
+    if estado != "concessionaria":
         _anexar_screenshot(request, page, "Erro - Falha ao Chegar na Concessionária")
-        raise AssertionError(f"Não foi possível chegar à etapa de Concessionária. O script ficou preso em: {page.url}")
-    
+        raise AssertionError(f"Não foi possível chegar à etapa de Concessionária (parou em '{estado}'). URL: {page.url}")
+
     # Atualiza contexto e insere CEP
     ctx = _get_configurator_ctx(page)
-    _inserir_cep_se_necessario(ctx, page)
-    page.wait_for_timeout(2000)  # Aguarda carregamento após CEP
+    _inserir_cep_se_necessario(ctx, page)  # espera a resposta da busca / a lista, sem sleep fixo
 
     # Verificação crítica: Re-verifica se ainda está na concessionária
     # Pode ter navegado automaticamente após inserir CEP
@@ -751,125 +562,18 @@ def _ir_para_pagamento(page: Page, request) -> tuple:
         _anexar_screenshot(request, page, "Pagamento - Tela Inicial")
         return page, ctx
     
-    regex_btn_pagamento = re.compile(r"Pagamento|Ir para pagamento|Continuar|Avan[cç]ar|Finalizar|Pr[oó]ximo", re.I)
-
-    avancou_sucesso = False
-    start_time = time.time()
-    
-    while time.time() - start_time < 45:
-        # Atualiza contexto a cada iteração
-        ctx_atual = _get_configurator_ctx(page)
-        
-        # Verifica se já chegou em pagamento
-        if _esperar_pagamento(page, ctx_atual, 800):
-            print("[DEBUG] Detectado navegação para pagamento")
-            avancou_sucesso = True
-            break
-        
-        # Busca botão de avançar/pagamento
-        try:
-            # Tenta botão "Ir para pagamento" ou similar
-            btn_pag = ctx_atual.get_by_role("button", name=regex_btn_pagamento).last
-            if btn_pag and btn_pag.count() > 0 and btn_pag.is_visible():
-                # Verifica se está habilitado
-                try:
-                    if btn_pag.is_disabled():
-                        print("[DEBUG] Botão de pagamento está desabilitado, aguardando...")
-                        page.wait_for_timeout(1000)
-                        continue
-                except Exception:
-                    pass
-                
-                try:
-                    # Tenta habilitar esperando
-                    expect(btn_pag).not_to_be_disabled(timeout=3000)
-                except Exception:
-                    pass
-                
-                # Tenta clicar
-                try:
-                    btn_pag.scroll_into_view_if_needed()
-                    btn_pag.click(timeout=8000)
-                    print("[DEBUG] Clique no botão de pagamento executado")
-                    page.wait_for_timeout(2000)  # Aguarda navegação
-                    
-                    # Verifica se navegou
-                    if _esperar_pagamento(page, _get_configurator_ctx(page), 2000):
-                        avancou_sucesso = True
-                        break
-                except Exception:
-                    try:
-                        # Fallback: clique via JS
-                        btn_pag.evaluate("el => el.click()")
-                        print("[DEBUG] Clique via JS no botão de pagamento")
-                        page.wait_for_timeout(2000)
-                        
-                        if _esperar_pagamento(page, _get_configurator_ctx(page), 2000):
-                            avancou_sucesso = True
-                            break
-                    except Exception:
-                        print("[DEBUG] Falha ao clicar no botão de pagamento")
-        except Exception:
-            pass
+    navegar_jornada(page, "pagamento", timeout_s=60, request=request)
 
-        # Pequeno scroll para materializar botões
-        try:
-            ctx_atual.evaluate("() => { window.scrollBy(0, 400); }")
-        except Exception:
-            pass
-        page.wait_for_timeout(800)
-
-    # Fallbacks de URL (mantidos porém menos agressivos)
-    if not avancou_sucesso:
-        print("[DEBUG] Tentando fallback via URL direta...")
-        atual = page.url
-        destinos = []
-        
-        # Extrai modelo da URL
-        modelo_match = re.search(r"/configurador/([^/]+)/", atual, re.I)
-        modelo = modelo_match.group(1) if modelo_match else None
-        
-        if "/concessionaria" in atual.lower():
-            destinos.append(atual.replace("/concessionaria", "/metodo-de-pagamento"))
-            destinos.append(atual.replace("/concessionaria", "/pagamento"))
-            destinos.append(atual.replace("/concessionaria", "/checkout"))
-        
-        if modelo:
-            destinos.append(f"https://loja.renault.com.br/configurador/{modelo}/metodo-de-pagamento")
-            destinos.append(f"https://loja.renault.com.br/configurador/{modelo}/pagamento")
-
-        print(f"[DEBUG] Tentando {len(destinos)} URLs de fallback...")
-        for url_dest in destinos:
-            try:
-                print(f"[DEBUG] Navegando para: {url_dest}")
-                page.goto(url_dest, wait_until="domcontentloaded", timeout=15000)
-                ctx_fallback = _get_configurator_ctx(page)
-                if _esperar_pagamento(page, ctx_fallback, 10000):
-                    print(f"[DEBUG] Sucesso via fallback: {url_dest}")
-                    avancou_sucesso = True
-                    break
-            except Exception as e:
-                print(f"[DEBUG] Falha no fallback {url_dest}: {e}")
-                continue
+    # Verificação final: a URL sozinha não basta, a UI de pagamento precisa ter renderizado
+    ctx_final = _get_configurator_ctx(page)
+    if not _esperar_pagamento(page, ctx_final, 15000):
+        _anexar_screenshot(request, page, "Erro - Pagamento não detectado")
+        print(f"[DEBUG] URL final: {page.url}")
+        print(f"[DEBUG] Tem UI pagamento: {_tem_ui_pagamento(ctx_final)}")
+        raise AssertionError(f"Falha ao detectar tela de Pagamento após selecionar concessionária. URL: {page.url}")
 
-    # Resolve contexto final de pagamento
     ctx = _resolver_ctx_pagamento(page)
     _anexar_screenshot(request, page, "Pagamento - Tela Inicial")
-
-    # Verificação final
-    if not avancou_sucesso:
-        # Última tentativa de verificação
-        ctx_final = _get_configurator_ctx(page)
-        if _esperar_pagamento(page, ctx_final, 5000):
-            print("[DEBUG] Pagamento detectado na verificação final")
-            avancou_sucesso = True
-        else:
-            _anexar_screenshot(request, page, "Erro - Pagamento não detectado")
-            # Logs detalhados para debug
-            print(f"[DEBUG] URL final: {page.url}")
-            print(f"[DEBUG] Tem UI pagamento: {_tem_ui_pagamento(ctx_final)}")
-            raise AssertionError(f"Falha ao detectar tela de Pagamento após selecionar concessionária. URL: {page.url}")
-
     print("[DEBUG] Navegação para pagamento concluída com sucesso")
     return page, ctx
 
@@ -882,485 +586,184 @@ def candidates_to_try(all_btns):
 # Helper de Seleção Robusta (Radio Button)
 # =============================
 
-def _marcar_radio_robusto(ctx, regex_texto: re.Pattern):
-    """
-    Tenta encontrar o radio button associado ao texto e marca-lo explicitamente.
-    Resolve problemas onde o clique no texto não propaga para o input.
-    """
-    # Estratégia 1: Label contendo texto -> Input Radio
-    label = ctx.locator("label").filter(has_text=regex_texto).first
-    if label.count() > 0:
-        inp = label.locator('input[type="radio"]').first
-        if inp.count() > 0:
-            inp.check(force=True)
-            return
-        
-        try:
-            for_attr = label.get_attribute("for")
-            if for_attr:
-                ctx.locator(f"#{for_attr}").check(force=True)
-                return
-        except: pass
-        
-        label.click(force=True)
-        return
-
-    # Estratégia 2: Texto solto -> Radio próximo
-    text_el = ctx.get_by_text(regex_texto).first
-    if text_el.is_visible():
-        parent = text_el.locator("..")
-        radio = parent.locator('input[type="radio"]').first
-        if radio.count() > 0:
-            radio.check(force=True)
-            return
-        else:
-            text_el.click(force=True)
-            return
-
-    # Estratégia 3: Botão/Option com mesmo texto
-    try:
-        btn = ctx.get_by_role("button", name=regex_texto).first
-        if btn and btn.is_visible():
-            btn.click(force=True)
-            return
-    except Exception:
-        pass
-    try:
-        opt = ctx.get_by_role("option", name=regex_texto).first
-        if opt and opt.is_visible():
-            opt.click(force=True)
-            return
-    except Exception:
-        pass
-    # Estratégia 4: Qualquer bloco com texto
-    try:
-        bloco = ctx.locator('div, span, p').filter(has_text=regex_texto).first
-        if bloco and bloco.is_visible():
-            bloco.click(force=True)
-            return
-    except Exception:
-        pass
-
-# =============================
-# Helper de Login visível em qualquer frame
-# =============================
+# Textos ao redor das opções marcadas (radio nativo, role=radio/option e estados de seleção comuns)
 
-def _password_visible_em_qualquer_frame(page: Page, ctx, timeout_ms: int = 10000) -> bool:
-    deadline = time.time() + (timeout_ms / 1000.0)
-    while time.time() < deadline:
-        try:
-            # No contexto atual
-            pw = ctx.locator('input[type="password"]').first
-            if pw and pw.count() > 0 and pw.is_visible():
-                return True
-        except Exception:
-            pass
-        try:
-            # Em outros frames
-            for f in page.frames:
-                try:
-                    pwf = f.locator('input[type="password"]').first
-                    if pwf and pwf.count() > 0 and pwf.is_visible():
-                        return True
-                except Exception:
-                    continue
-        except Exception:
-            pass
-        try:
-            # Scroll para destravar renderizações preguiçosas
-            ctx.evaluate("() => { window.scrollBy(0, 400); }")
-        except Exception:
-            pass
-        page.wait_for_timeout(300)
-    return False
 
 # =============================
-# Testes
+# Matriz de opções de pagamento (contextos paralelos a partir de um snapshot)
 # =============================
 
-def _clicar_definir_metodo_pagamento(ctx, page: Page, timeout_ms: int = 10000) -> bool:
-    """
-    Clica no botão "Definir método de pagamento" após selecionar uma opção de pagamento.
-    Retorna True se clicou com sucesso.
-    """
-    print("[DEBUG] Tentando clicar em 'Definir método de pagamento'...")
-    
-    deadline = time.time() + (timeout_ms / 1000.0)
-    
-    while time.time() < deadline:
-        # Estratégia 1: Botão por texto exato
-        try:
-            btn = ctx.get_by_role("button", name=re.compile(r"Definir\s*m[ée]todo\s*de\s*pagamento|Definir\s*pagamento|Confirmar\s*m[ée]todo", re.I)).first
-            if btn and btn.count() > 0 and btn.is_visible() and not btn.is_disabled():
-                btn.scroll_into_view_if_needed()
-                btn.click(timeout=5000)
-                print("[DEBUG] Clicou em 'Definir método de pagamento' via role")
-                page.wait_for_timeout(1500)
-                return True
-        except Exception:
-            pass
-        
-        # Estratégia 2: Locator por texto
-        try:
-            btn = ctx.locator('button:has-text("Definir método"), button:has-text("Definir pagamento"), button:has-text("Confirmar método")').first
-            if btn and btn.count() > 0 and btn.is_visible():
-                if not btn.is_disabled():
-                    btn.scroll_into_view_if_needed()
-                    btn.click(timeout=5000)
-                    print("[DEBUG] Clicou em 'Definir método de pagamento' via locator")
-                    page.wait_for_timeout(1500)
-                    return True
-        except Exception:
-            pass
-        
-        # Estratégia 3: Botão de submit ou continuar genérico
-        try:
-            btn = ctx.locator('button[type="submit"]').first
-            if btn and btn.count() > 0 and btn.is_visible() and not btn.is_disabled():
-                # Verifica se o texto faz sentido
-                txt = (btn.text_content() or "").strip().lower()
-                if any(palavra in txt for palavra in ["definir", "confirmar", "continuar", "próximo", "seguir"]):
-                    btn.scroll_into_view_if_needed()
-                    btn.click(timeout=5000)
-                    print("[DEBUG] Clicou em botão submit genérico")
-                    page.wait_for_timeout(1500)
-                    return True
-        except Exception:
-            pass
-        
-        page.wait_for_timeout(500)
-    
-    print("[DEBUG] Não encontrou botão 'Definir método de pagamento'")
-    return False
+JS_NOMES_OPCOES = """
+(els) => els.map((el) => {
+  const rotulo = el.getAttribute('aria-label')
+    || (el.labels && el.labels.length ? Array.from(el.labels).map((l) => l.textContent).join(' ') : '')
+    || (el.closest('label') ? el.closest('label').textContent : '')
+    || el.textContent || '';
+  return rotulo.replace(/\\s+/g, ' ').trim();
+})
+"""
 
+JS_CLICAR_OPCAO = "(el) => ((el.labels && el.labels[0]) || el.closest('label') || el).click()"
 
-def _iniciar_sessao_financiamento(ctx, page: Page, request, timeout_ms: int = 20000) -> bool:
-    """
-    Trata o fluxo de login após selecionar financiamento:
-    1. Aguarda navegação para /sessao/criar-conta/
-    2. Clica em "Iniciar sessão" quando estiver nessa URL
-    3. Preenche email e senha
-    Retorna True se login foi preenchido com sucesso.
-    """
-    print("[DEBUG] Iniciando fluxo de login para financiamento...")
-    
-    # URL esperada para a tela de criar conta/iniciar sessão
-    URL_SESSAO_REGEX = re.compile(r"/sessao/criar-conta", re.I)
-    
-    # Passo 1: Aguardar navegação para /sessao/criar-conta/
-    print("[DEBUG] Aguardando navegação para /sessao/criar-conta/...")
-    deadline = time.time() + (timeout_ms / 1000.0)
-    
-    chegou_sessao = False
-    while time.time() < deadline:
-        url_atual = page.url or ""
-        if URL_SESSAO_REGEX.search(url_atual):
-            print(f"[DEBUG] Chegou na URL de sessão: {url_atual}")
-            chegou_sessao = True
-            break
-        page.wait_for_timeout(500)
-    
-    if not chegou_sessao:
-        # Verifica se já está em outra página de login
-        if "/sessao/" in (page.url or ""):
-            print(f"[DEBUG] Está em página de sessão: {page.url}")
-            chegou_sessao = True
-        else:
-            raise AssertionError(f"Falha ao navegar para /sessao/criar-conta/. URL atual: {page.url}")
-    
-    # Aguarda carregamento da página
-    page.wait_for_timeout(2000)
-    ctx_atual = _get_configurator_ctx(page)
-    
-    # Passo 2: Clicar em "Iniciar sessão" quando estiver em /sessao/criar-conta/
-    print("[DEBUG] Procurando botão/link 'Iniciar sessão'...")
-    
-    clicou_iniciar = False
-    deadline_clique = time.time() + 10000  # 10 segundos para encontrar e clicar
-    
-    while time.time() < deadline_clique and not clicou_iniciar:
-        # Estratégia 1: Botão "Iniciar sessão"
-        try:
-            btn_iniciar = ctx_atual.get_by_role("button", name=re.compile(r"Iniciar\s*sess[ãa]o|Iniciar\s*sessão|Já\s*tenho\s*cadastro|Entrar", re.I)).first
-            if btn_iniciar and btn_iniciar.count() > 0 and btn_iniciar.is_visible():
-                print("[DEBUG] Encontrou botão 'Iniciar sessão', clicando...")
-                btn_iniciar.scroll_into_view_if_needed()
-                btn_iniciar.click(timeout=5000)
-                page.wait_for_timeout(2000)
-                clicou_iniciar = True
-                break
-        except Exception:
-            pass
-        
-        # Estratégia 2: Link "Iniciar sessão"
-        try:
-            link_iniciar = ctx_atual.get_by_role("link", name=re.compile(r"Iniciar\s*sess[ãa]o|Já\s*tenho\s*cadastro|Entrar", re.I)).first
-            if link_iniciar and link_iniciar.count() > 0 and link_iniciar.is_visible():
-                print("[DEBUG] Encontrou link 'Iniciar sessão', clicando...")
-                link_iniciar.click(timeout=5000)
-                page.wait_for_timeout(2000)
-                clicou_iniciar = True
-                break
-        except Exception:
-            pass
-        
-        # Estratégia 3: Locator por texto
-        try:
-            loc_iniciar = ctx_atual.locator('button:has-text("Iniciar sessão"), a:has-text("Iniciar sessão"), button:has-text("Já tenho cadastro"), a:has-text("Já tenho cadastro")').first
-            if loc_iniciar and loc_iniciar.count() > 0 and loc_iniciar.is_visible():
-                print("[DEBUG] Encontrou elemento 'Iniciar sessão' via locator, clicando...")
-                loc_iniciar.click(timeout=5000)
-                page.wait_for_timeout(2000)
-                clicou_iniciar = True
-                break
-        except Exception:
-            pass
-        
-        page.wait_for_timeout(500)
-    
-    if not clicou_iniciar:
-        print("[DEBUG] Não encontrou botão 'Iniciar sessão', tentando prosseguir mesmo assim...")
-        # Pode já estar no formulário de login
-    
-    # Aguarda formulário de login aparecer
-    page.wait_for_timeout(2000)
-    ctx_atual = _get_configurator_ctx(page)
-    
-    # Passo 3: Preencher email e senha
-    print("[DEBUG] Preenchendo email e senha...")
-    try:
-        # Email
-        email_input = None
-        # Tenta primeiro no contexto atual
-        try:
-            email_input = ctx_atual.locator('input[type="email"], input[name*="email"], input[placeholder*="email" i]').first
-            if email_input.count() > 0 and email_input.is_visible():
-                pass
-            else:
-                email_input = None
-        except Exception:
-            pass
-        
-        # Se não encontrou, tenta em todos os frames
-        if not email_input or email_input.count() == 0:
-            for f in page.frames:
-                try:
-                    email_input = f.locator('input[type="email"], input[name*="email"], input[placeholder*="email" i]').first
-                    if email_input.count() > 0 and email_input.is_visible():
-                        ctx_atual = f
-                        print(f"[DEBUG] Campo de email encontrado no frame: {getattr(f, 'url', 'N/A')}")
-                        break
-                except Exception:
-                    continue
-        
-        if not email_input or email_input.count() == 0:
-            raise AssertionError("Campo de email não encontrado após clicar em 'Iniciar sessão'")
-        
-        email_input.fill(FINAN_EMAIL)
-        print(f"[DEBUG] Email preenchido: {FINAN_EMAIL}")
-        page.wait_for_timeout(500)
-        
-        # Senha
-        password_input = None
-        try:
-            password_input = ctx_atual.locator('input[type="password"]').first
-            if password_input.count() > 0 and password_input.is_visible():
-                pass
-            else:
-                password_input = None
-        except Exception:
-            pass
-        
-        # Se não encontrou, tenta em todos os frames
-        if not password_input or password_input.count() == 0:
-            for f in page.frames:
-                try:
-                    password_input = f.locator('input[type="password"]').first
-                    if password_input.count() > 0 and password_input.is_visible():
-                        ctx_atual = f
-                        print(f"[DEBUG] Campo de senha encontrado no frame: {getattr(f, 'url', 'N/A')}")
-                        break
-                except Exception:
-                    continue
-        
-        if not password_input or password_input.count() == 0:
-            raise AssertionError("Campo de senha não encontrado")
-        
-        password_input.fill(FINAN_SENHA)
-        print("[DEBUG] Senha preenchida")
-        page.wait_for_timeout(500)
-        
-        # Submeter formulário
-        btn_entrar = ctx_atual.get_by_role("button", name=re.compile(r"Entrar|Acessar|Login|Iniciar\s*sess[ãa]o|Confirmar", re.I)).first
-        if btn_entrar.count() > 0 and btn_entrar.is_visible():
-            btn_entrar.scroll_into_view_if_needed()
-            btn_entrar.click(timeout=5000)
-            print("[DEBUG] Botão 'Entrar' clicado")
-        else:
-            password_input.press("Enter")
-            print("[DEBUG] Login submetido via Enter")
-        
-        page.wait_for_timeout(2000)
-        return True
-        
-    except Exception as e:
-        print(f"[DEBUG] Erro ao preencher login: {e}")
-        _anexar_screenshot(request, page, "Erro - Falha ao Preencher Login")
-        raise
-
-
-@pytest.mark.jornada
-@pytest.mark.pagamento
-@pytest.mark.regressao
-def test_pagamento_opcao_financiamento_requer_login(page: Page, request):
-    page, ctx = _ir_para_pagamento(page, request)
+SELETOR_CAMPOS_VISIVEIS = "input:visible, select:visible, iframe:visible"
 
-    # Ação 1: Selecionar Financiamento (radio button)
-    print("[DEBUG] Selecionando opção Financiamento...")
-    _marcar_radio_robusto(ctx, re.compile(r"Financiamento", re.I))
-    _anexar_screenshot(request, page, "Pagamento - Financiamento Selecionado")
-    page.wait_for_timeout(1500)  # Aguarda UI atualizar
 
-    # Ação 2: Clicar no botão "Definir método de pagamento"
-    print("[DEBUG] Clicando em 'Definir método de pagamento'...")
-    clicou_definir = _clicar_definir_metodo_pagamento(ctx, page, 15000)
-    
-    if not clicou_definir:
-        print("[DEBUG] Tentando fallback: botão pode ter texto diferente...")
-        # Fallback: tenta botões genéricos de continuar/confirmar
-        try:
-            btn_continuar = ctx.get_by_role("button", name=re.compile(r"Continuar|Confirmar|Avançar|Próximo|Definir", re.I)).first
-            if btn_continuar and btn_continuar.count() > 0 and btn_continuar.is_visible() and not btn_continuar.is_disabled():
-                btn_continuar.click(timeout=5000)
-                page.wait_for_timeout(1500)
-                clicou_definir = True
-        except Exception:
-            pass
-    
-    _anexar_screenshot(request, page, "Pagamento - Após Clicar Definir Método")
-    page.wait_for_timeout(2000)  # Aguarda modal/formulário aparecer
-
-    # Ação 3: Verificar se aparece opção de criar conta ou iniciar sessão
-    print("[DEBUG] Verificando se aparece opção de login...")
-    
-    # Aguarda formulário de login aparecer
-    ctx_atual = _get_configurator_ctx(page)
-    login_visible = _password_visible_em_qualquer_frame(page, ctx_atual, 16000)
-
-    if not login_visible:
-        # Pode precisar clicar em "Iniciar sessão" primeiro
-        print("[DEBUG] Formulário não visível, tentando clicar em 'Iniciar sessão'...")
-        try:
-            btn_iniciar = ctx_atual.get_by_role("button", name=re.compile(r"Iniciar\s*sess[ãa]o|Já\s*tenho\s*cadastro", re.I)).first
-            if btn_iniciar and btn_iniciar.count() > 0 and btn_iniciar.is_visible():
-                btn_iniciar.click(timeout=5000)
-                page.wait_for_timeout(2000)
-                ctx_atual = _get_configurator_ctx(page)
-                login_visible = _password_visible_em_qualquer_frame(page, ctx_atual, 8000)
-        except Exception:
-            pass
+def _filtrar_opcoes(nomes) -> list:
+    """Opções de pagamento (índice no DOM + rótulo) entre os radios do frame, sem repetir rótulo."""
+    opcoes, vistos = [], set()
+    for i, nome in enumerate(nomes or []):
+        if nome and OPCAO_PAGAMENTO_REGEX.search(nome) and nome.lower() not in vistos:
+            vistos.add(nome.lower())
+            opcoes.append({"indice": i, "nome": nome})
+    return opcoes
 
-    if not login_visible:
-        _anexar_screenshot(request, page, "Erro - Formulário de login não apareceu")
-        pytest.fail("O formulário de login não apareceu após selecionar Financiamento e definir método de pagamento.")
 
-    # Ação 4: Preencher login usando helper específico
-    print("[DEBUG] Iniciando preenchimento de login...")
-    _iniciar_sessao_financiamento(ctx_atual, page, request, 15000)
-    
-    _anexar_screenshot(request, page, "Pagamento - Login Submetido")
-    
-    # Validar ausência de erro imediato
-    ctx_final = _get_configurator_ctx(page)
-    expect(ctx_final.get_by_text(re.compile(r"inv[aá]lid|incorret", re.I))).to_have_count(0)
+def _opcoes_pagamento(ctx) -> list:
+    try:
+        return _filtrar_opcoes(ctx.locator(SELETOR_OPCOES_PAGAMENTO).evaluate_all(JS_NOMES_OPCOES))
+    except Exception as e:
+        print(f"[AVISO] Opções de pagamento não lidas: {e}")
+        return []
 
 
-@pytest.mark.jornada
-@pytest.mark.pagamento
-@pytest.mark.regressao
-def test_pagamento_opcao_negociar_leva_para_resumo(page: Page, request):
-    page, ctx = _ir_para_pagamento(page, request)
+def _desfechos_esperados(nome: str) -> set:
+    for regex, esperados in DESFECHOS_OPCAO:
+        if regex.search(nome):
+            return esperados
+    return DESFECHOS_PADRAO
 
-    # Ação 1: Selecionar Negociar na Concessionária (radio button)
-    print("[DEBUG] Selecionando opção 'Negociar na concessionária'...")
-    _marcar_radio_robusto(ctx, re.compile(r"Negociar\s+na\s+concession[aá]ria", re.I))
-    _anexar_screenshot(request, page, "Pagamento - Negociar Selecionado")
-    page.wait_for_timeout(1500)  # Aguarda UI atualizar
-
-    # Ação 2: Clicar no botão "Definir método de pagamento" (se necessário)
-    print("[DEBUG] Verificando se precisa clicar em 'Definir método de pagamento'...")
-    clicou_definir = _clicar_definir_metodo_pagamento(ctx, page, 10000)
-    
-    if clicou_definir:
-        _anexar_screenshot(request, page, "Pagamento - Após Clicar Definir Método (Negociar)")
-        page.wait_for_timeout(1500)
 
-    # Botão Continuar/Resumo (robusto)
-    btn_cont = ctx.get_by_role("button", name=re.compile(r"Resumo|Continuar|Avan[cç]ar|Finalizar|Prosseguir|Seguinte|Concluir|Ir para Resumo", re.I)).first
-    if not (btn_cont and btn_cont.is_visible()):
-        # Fallbacks de busca
-        try:
-            btn_cont = ctx.locator('button:has-text("Resumo"), button:has-text("Continuar"), button[type="submit"]').first
-        except Exception:
-            pass
-        if not (btn_cont and btn_cont.is_visible()):
+async def _frame_opcoes_async(page, opcao: dict, timeout_s: float = 20.0):
+    """Frame cujo radio no índice da opção tem o mesmo rótulo visto na página original."""
+    fim = time.time() + timeout_s
+    while time.time() < fim:
+        for frame in page.frames:
             try:
-                link_resumo = ctx.locator('a[href*="resumo"]').first
-                if link_resumo and link_resumo.is_visible():
-                    link_resumo.click()
+                nomes = await frame.locator(SELETOR_OPCOES_PAGAMENTO).evaluate_all(JS_NOMES_OPCOES)
+                if len(nomes) > opcao["indice"] and nomes[opcao["indice"]] == opcao["nome"]:
+                    return frame
             except Exception:
                 pass
+        await asyncio.sleep(0.25)
+    return None
 
-    # Espera botão habilitar
-    try:
-        expect(btn_cont).not_to_be_disabled(timeout=10000)
-    except AssertionError:
-        _marcar_radio_robusto(ctx, re.compile(r"Negociar", re.I))
-        try:
-            expect(btn_cont).not_to_be_disabled(timeout=8000)
-        except Exception:
-            pass
 
-    # Clica com estratégia híbrida
-    clicou = False
+async def _clicar_botao_async(frame, regex: re.Pattern) -> bool:
     try:
-        btn_cont.click(timeout=12000)
-        clicou = True
+        btn = frame.get_by_role("button", name=regex).first
+        if await btn.count() > 0 and await btn.is_visible() and await btn.is_enabled():
+            await btn.click(timeout=5000)
+            return True
     except Exception:
-        try:
-            btn_cont.evaluate("el => el.click()")
-            clicou = True
-        except Exception:
-            pass
+        pass
+    return False
 
-    # Validar navegação/Renderização para Resumo
-    chegou_resumo = _esperar_resumo(page, ctx, 30000)
 
-    # Fallback de navegação direta para Resumo se necessário
-    if not chegou_resumo:
-        print("⚠️ Resumo não detectado automaticamente; tentando fallback de URL…")
-        candidatos = []
-        try:
-            if hasattr(ctx, 'url') and ctx.url:
-                candidatos.append(re.sub(r"/pagamento/?", "/resumo/", ctx.url, flags=re.I))
-        except Exception:
-            pass
-        try:
-            if re.search(r"/configurador/.+", page.url, re.I):
-                candidatos.append(re.sub(r"/pagamento/?", "/resumo/", page.url, flags=re.I))
-                candidatos.append(re.sub(r"/concessionaria/?", "/resumo/", page.url, flags=re.I))
-        except Exception:
-            pass
-        candidatos.append("/configurador/kardian/resumo/")
-        for destino in candidatos:
+async def _observar_desfecho_async(page, frame, opcao: dict, antes: dict, timeout_s: float) -> str:
+    """
+    O que aconteceu depois de definir a opção: resumo (URL), login (senha visível), erro (mensagem),
+    avancou (a página/frame saiu da lista de opções) ou formulario (campos novos na mesma tela).
+    """
+    fim = time.time() + timeout_s
+    while time.time() < fim:
+        frames = page.frames
+        if any(URL_RESUMO_REGEX.search(f.url or "") for f in frames):
+            return "resumo"
+        for f in frames:
             try:
-                page.goto(destino, wait_until="domcontentloaded")
-                if _esperar_resumo(page, ctx, 12000):
-                    chegou_resumo = True
-                    print(f"✅ Resumo detectado via fallback de URL: {destino}")
-                    break
+                if await f.locator('input[type="password"]').first.is_visible():
+                    return "login"
+                if await f.get_by_text(ERRO_PAGAMENTO_REGEX).first.is_visible():
+                    return "erro"
             except Exception:
                 continue
+        try:
+            if page.url != antes["url"] or frame.is_detached() or frame.url != antes["url_frame"]:
+                return "avancou"
+            if await frame.get_by_text(opcao["nome"], exact=True).count() == 0:
+                return "avancou"
+            if await frame.locator(SELETOR_CAMPOS_VISIVEIS).count() > antes["campos"]:
+                return "formulario"
+        except Exception:
+            return "avancou"
+        await asyncio.sleep(0.3)
+    return "sem resposta"
+
+
+def _ramo_pagamento(snapshot: dict):
+    async def _validar(page, opcao) -> dict:
+        esperados = _desfechos_esperados(opcao["nome"])
+        await preparar_origens_async(page, snapshot)
+        await page.goto(snapshot["url"], wait_until="domcontentloaded", timeout=45000)
+        frame = await _frame_opcoes_async(page, opcao)
+        if frame is None:
+            return {"erro": "Opção não encontrada após restaurar o snapshot", "esperado": esperados}
+
+        radio = frame.locator(SELETOR_OPCOES_PAGAMENTO).nth(opcao["indice"])
+        try:
+            await radio.check(force=True, timeout=5000)
+        except Exception:
+            await radio.evaluate(JS_CLICAR_OPCAO)
+        antes = {"url": page.url, "url_frame": frame.url, "campos": await frame.locator(SELETOR_CAMPOS_VISIVEIS).count()}
+
+        await _clicar_botao_async(frame, BOTAO_DEFINIR_REGEX)
+        desfecho = await _observar_desfecho_async(page, frame, opcao, antes, 10)
+        # Login e resumo às vezes ficam atrás de mais um botão (Iniciar sessão / Continuar)
+        if desfecho not in esperados and desfecho != "erro" and not frame.is_detached():
+            for regex in BOTOES_SEGUINTES_REGEX:
+                if await _clicar_botao_async(frame, regex):
+                    desfecho = await _observar_desfecho_async(page, frame, opcao, antes, 15)
+                    break
+        return {"desfecho": desfecho, "esperado": esperados, "url": page.url, "png": await page.screenshot()}
+    return _validar
+
 
-    _anexar_screenshot(request, page, "Resumo - Tela Final")
-    assert chegou_resumo, f"Falha ao navegar para Resumo. URL atual: {page.url}"
\ No newline at end of file
+@pytest.mark.jornada
+@pytest.mark.pagamento
+@pytest.mark.regressao
+def test_matriz_opcoes_pagamento(page: Page, request, browser_name, browser_context_args, browser_type_launch_args):
+    # 1) Uma jornada até o pagamento (ou restauração do snapshot); o estado vira o ponto de partida dos ramos
+    page, ctx = _ir_para_pagamento(page, request)
+    opcoes = _opcoes_pagamento(ctx)
+    if not opcoes:
+        _anexar_screenshot(request, page, "Erro - Nenhuma opção de pagamento")
+        pytest.fail(f"Nenhuma opção de pagamento encontrada. URL atual: {page.url}")
+    snapshot = capturar_snapshot(page, "pagamento")
+    _anexar_screenshot(request, page, "Matriz - Pagamento (estado capturado)")
+
+    # 2) Um contexto por opção, PARALELO_CONTEXTOS ao mesmo tempo
+    marcar_etapa(request, "matriz_pagamento", opcoes=len(opcoes), paralelo=PARALELO_CONTEXTOS)
+    launch = {k: v for k, v in (browser_type_launch_args or {}).items() if k != "slow_mo"}
+    t0 = time.time()
+    resultados = executar_contextos_paralelos(
+        browser_name, opcoes, _ramo_pagamento(snapshot),
+        context_args={**browser_context_args, **args_contexto(snapshot)},
+        launch_args={**launch, "headless": True},
+        preparar=preparar_contexto_async,
+    )
+    duracao_s = time.time() - t0
+
+    # 3) Relatório por opção
+    linhas, falhas = [], []
+    for opcao, r in zip(opcoes, resultados):
+        anexar_evidencia_png(request, r.pop("png", None), f"Matriz - {opcao['nome']}")
+        esperado = " ou ".join(sorted(r.get("esperado") or _desfechos_esperados(opcao["nome"])))
+        if r.get("erro"):
+            resultado = f"❌ {str(r['erro'])[:80]}"
+            falhas.append(f"{opcao['nome']}: {r['erro']}")
+        elif r.get("desfecho") not in (r.get("esperado") or set()):
+            resultado = "❌ desfecho inesperado"
+            falhas.append(f"{opcao['nome']}: {r.get('desfecho')} (esperado {esperado}) em {r.get('url')}")
+        else:
+            resultado = "✅ OK"
+        print(f"[INFO] Pagamento '{opcao['nome']}': {r.get('desfecho', '-')} em {r.get('duracao_ms')} ms"
+              f"{' - ' + r['erro'] if r.get('erro') else ''}")
+        linhas.append([opcao["nome"], r.get("desfecho", "-"), esperado, r.get("duracao_ms", "-"), resultado])
+
+    resumo = (f"Opções: {len(opcoes)} | Falhas: {len(falhas)} | "
+              f"Total: {duracao_s:.1f}s com {PARALELO_CONTEXTOS} contextos")
+    print(f"[INFO] {resumo}")
+    anexar_tabela_html(request, f"💳 Matriz de Pagamento ({browser_name})",
+                       ["Opção", "Desfecho", "Esperado", "Duração (ms)", "Resultado"], linhas, resumo)
+
+    assert not falhas, f"{resumo}\nFALHAS:\n" + "\n".join(falhas)
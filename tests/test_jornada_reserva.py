@@ -3,8 +3,12 @@ import time
 import pytest
 from playwright.sync_api import Page, expect
 
+from navegador_jornada import navegar_jornada, ARESTAS
+
 # Reutiliza padrão de título
 KNOWN_TITLE_PATTERN = re.compile(r"Renault", re.IGNORECASE)
+# Caminho que o teste valida: CTA da home e botão "Iniciar configuração" da Jornada de Reserva
+ARESTAS_CTA = [a for a in ARESTAS if a.nome in ("cta_configurar", "botao_iniciar")]
 
 
 def _aceitar_cookies(page: Page):
@@ -99,33 +103,12 @@ def test_fluxo_jornada_de_reserva(page: Page):
         except:
             pass # Se falhar aqui, o target.click vai falhar e cair no except abaixo
 
-        # SELEÇÃO SIMPLIFICADA
-        target = loc_ctas.nth(idx)
-
         try:
-            # Traz elemento para viewport
-            el = target.element_handle()
-            if el:
-                page.evaluate("(el) => el.scrollIntoView({behavior:'auto', block:'center', inline:'center'})", el)
-                page.wait_for_timeout(250)
-
-            # Clica CTA
-            target.click(force=True, timeout=5000)
-
-            # Espera redirecionar
-            page.wait_for_url(
-                re.compile(r"/jornada-de-reserva|/configurador/.+/versoes|/r-pass/pre-venda/configurador/.+/versoes"), 
-                timeout=60000, 
-                wait_until="domcontentloaded"
-            )
+            # CTA → Jornada de Reserva → "Iniciar configuração" → Versões: só essas arestas (sem URL direta
+            # nem link da home para o configurador, que chegariam a Versões com o CTA quebrado)
+            estado = navegar_jornada(page, "versoes", modelo=idx, cta_regex=cta_regex, arestas=ARESTAS_CTA)
             _aceitar_cookies(page)
-
-            # Se caiu na Jornada de Reserva, clica "Iniciar configuração"
-            if "/jornada-de-reserva" in page.url:
-                iniciar_btn = page.get_by_role("button", name=re.compile("Iniciar", re.I))
-                expect(iniciar_btn).to_be_visible(timeout=10000)
-                iniciar_btn.click()
-                page.wait_for_url(re.compile(r"/configurador/.+/versoes|/r-pass/pre-venda/configurador/.+/versoes"), timeout=30000)
+            assert estado == "versoes", f"Não chegou em Versões a partir do CTA (parou em '{estado}'). URL: {page.url}"
 
             # Valida que está na página de Versões
             assert re.search(r"/versoes", page.url), f"URL inesperada após iniciar configuração: {page.url}"
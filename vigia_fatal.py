@@ -0,0 +1,412 @@
+import os
+import re
+import time
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+from playwright.sync_api import Page, TimeoutError as PlaywrightTimeoutError
+
+from helpers_arquivos import trava_arquivo, ler_json, gravar_json_atomico
+from helpers_frames import URL_CONFIGURADOR_REGEX, rastreador_frames
+
+# Vigia de estado fatal da página: documento principal (ou do configurador) com 4xx/5xx, página de
+# erro conhecida, rajada de pageerror, crash do renderer ou frame do configurador em branco.
+# Detectado o estado fatal, as esperas da página (wait_for_timeout/url/load_state/selector/function)
+# param na hora com EstadoFatalPagina e o timeout padrão cai para VIGIA_TIMEOUT_FATAL_MS:
+# a célula falha em segundos com o diagnóstico, em vez de esgotar o timeout de cada fallback.
+# wait_for_event não é fatiado: um evento disparado entre duas fatias se perderia. Quem espera
+# evento chama verificar() no próprio laço (como o navegador da jornada).
+VIGIA_FATAL = os.getenv("VIGIA_FATAL", "true").lower() in ("1", "true", "yes", "on")
+VIGIA_PAGEERROR_RAJADA = int(os.getenv("VIGIA_PAGEERROR_RAJADA", "10") or "10")
+VIGIA_PAGEERROR_JANELA_S = float(os.getenv("VIGIA_PAGEERROR_JANELA_S", "5") or "5")
+VIGIA_FRAME_VAZIO_S = float(os.getenv("VIGIA_FRAME_VAZIO_S", "15") or "15")
+VIGIA_TIMEOUT_FATAL_MS = int(os.getenv("VIGIA_TIMEOUT_FATAL_MS", "1500") or "1500")
+# Disjuntor: depois de VIGIA_DISJUNTOR_LIMITE células seguidas com estado fatal (somando workers),
+# as próximas falham sem navegar; passada a pausa, uma célula de teste decide se ele fecha
+VIGIA_DISJUNTOR_LIMITE = int(os.getenv("VIGIA_DISJUNTOR_LIMITE", "3") or "3")
+VIGIA_DISJUNTOR_PAUSA_S = float(os.getenv("VIGIA_DISJUNTOR_PAUSA_S", "120") or "120")
+
+DISJUNTOR_ARQUIVO = "disjuntor_loja.json"
+
+# Fatia das esperas e intervalo mínimo entre sondas do DOM (a sonda roda entre as fatias)
+FATIA_ESPERA_MS = 500
+INTERVALO_SONDA_S = 1.0
+SONDA_TIMEOUT_MS = 1000
+# Páginas de erro são pequenas: o texto só é lido abaixo deste número de elementos
+ELEMENTOS_PAGINA_ERRO = 400
+
+PAGINA_ERRO_REGEX = re.compile(
+    r"\b50[0-4]\b[^\n]{0,40}(erro|error|server|servidor|gateway|indispon)|Internal Server Error|Service Unavailable"
+    r"|Bad Gateway|Gateway Time-?out|P[áa]gina n[ãa]o encontrada|Page not found|This page could not be found"
+    r"|Application error: a client-side exception|Ops!? Algo deu errado|Estamos em manuten[çc][ãa]o",
+    re.I,
+)
+
+# Título, texto (só em página pequena) e conteúdo do documento para a sonda de estado fatal
+JS_SINAIS_DOCUMENTO = """
+() => {
+  const b = document.body;
+  const elementos = b ? b.getElementsByTagName('*').length : 0;
+  const midia = b ? b.querySelectorAll('img,svg,canvas,video,iframe,picture').length : 0;
+  const texto = b && elementos < %d ? (b.innerText || '').trim().slice(0, 600) : '';
+  return { titulo: document.title || '', texto, elementos, midia, pronto: document.readyState };
+}
+""" % ELEMENTOS_PAGINA_ERRO
+
+
+class EstadoFatalPagina(AssertionError):
+    """Página em estado do qual a célula não se recupera esperando (mensagem = diagnóstico)."""
+
+
+class VigiaFatal:
+    """
+    Assina response/pageerror/crash/framenavigated da página e troca, na própria instância da Page,
+    os métodos de espera por versões fatiadas que consultam o vigia entre as fatias.
+    """
+
+    # Só esperas por estado (reavaliado a cada fatia); wait_for_event fica original
+    ESPERAS_TIMEOUT = ("wait_for_selector", "wait_for_function")
+    ESPERAS_NAVEGACAO = ("wait_for_url", "wait_for_load_state")
+
+    def __init__(self, page: Page):
+        self.page = page
+        self.motivo: Optional[str] = None
+        self.pageerrors: deque = deque(maxlen=max(1, VIGIA_PAGEERROR_RAJADA))
+        self._tolerar_4xx = 0
+        self._vazio_desde: Dict[object, float] = {}
+        self._ultima_sonda = 0.0
+        self._rebaixado = False
+        # Prazo (epoch) da célula no orçamento da execução: nenhuma espera passa dele (ver orcamento_execucao)
+        self.prazo: Optional[float] = None
+        # Timeouts padrão vigentes (a Page não os expõe): acompanhados pelos setters
+        self._timeout_ms = 30000.0
+        self._navegacao_ms: Optional[float] = None
+        self._set_timeout = page.set_default_timeout
+        self._set_navegacao = page.set_default_navigation_timeout
+        self._instalar_esperas()
+
+        page.on("response", self._na_resposta)
+        page.on("pageerror", self._no_pageerror)
+        page.on("crash", lambda _=None: self._marcar("crash do renderer da página"))
+        page.on("framenavigated", lambda frame: self._vazio_desde.pop(frame, None))
+
+    @property
+    def timeout_padrao_ms(self) -> float:
+        """Timeout padrão vigente da página (o último passado a set_default_timeout)."""
+        return self._timeout_ms
+
+    @property
+    def timeout_navegacao_ms(self) -> float:
+        """Timeout de navegação vigente (sem set_default_navigation_timeout, segue o padrão)."""
+        return self._navegacao_ms if self._navegacao_ms is not None else self._timeout_ms
+
+    @property
+    def fatal(self) -> bool:
+        return self.motivo is not None
+
+    # -------------------------------------------------------------------------
+    # Eventos
+    # -------------------------------------------------------------------------
+
+    def _marcar(self, motivo: str) -> None:
+        if self.motivo is None:
+            self.motivo = motivo
+            print(f"[AVISO] Estado fatal da página: {motivo}")
+
+    def _na_resposta(self, resposta) -> None:
+        try:
+            if resposta.request.resource_type != "document":
+                return
+            principal = resposta.frame == self.page.main_frame
+            if not principal and not URL_CONFIGURADOR_REGEX.search(resposta.url or ""):
+                return
+            status = resposta.status
+            if status >= 500 or (status >= 400 and not self._tolerar_4xx):
+                self._marcar(f"documento {'principal' if principal else 'do configurador'} com HTTP {status} ({resposta.url})")
+            elif principal and status < 400 and self.motivo and not self.motivo.startswith("crash"):
+                # Documento novo e sadio: a página se recuperou (ex.: navegação de fallback);
+                # o timeout padrão é restaurado na próxima verificação, fora do handler
+                self._esquecer()
+        except Exception:
+            pass
+
+    def _no_pageerror(self, erro) -> None:
+        if VIGIA_PAGEERROR_RAJADA <= 0:
+            return
+        agora = time.time()
+        self.pageerrors.append((agora, str(erro)[:200]))
+        if len(self.pageerrors) >= VIGIA_PAGEERROR_RAJADA and agora - self.pageerrors[0][0] <= VIGIA_PAGEERROR_JANELA_S:
+            self._marcar(f"rajada de {len(self.pageerrors)} pageerrors em {agora - self.pageerrors[0][0]:.1f}s")
+
+    # -------------------------------------------------------------------------
+    # Sonda do DOM (roda entre as fatias das esperas, na thread do teste)
+    # -------------------------------------------------------------------------
+
+    def _frames_vigiados(self) -> List:
+        principal = self.page.main_frame
+        return [principal] + [f for f in rastreador_frames(self.page).frames("configurador") if f != principal]
+
+    def _sondar(self) -> None:
+        agora = time.time()
+        if agora - self._ultima_sonda < INTERVALO_SONDA_S:
+            return
+        self._ultima_sonda = agora
+        for frame in self._frames_vigiados():
+            try:
+                sinais = frame.locator("html").evaluate(JS_SINAIS_DOCUMENTO, timeout=SONDA_TIMEOUT_MS) or {}
+            except Exception:
+                continue
+            conteudo = f"{sinais.get('titulo', '')}\n{sinais.get('texto', '')}"
+            achado = PAGINA_ERRO_REGEX.search(conteudo)
+            if achado and not self._tolerar_4xx:
+                self._marcar(f"página de erro '{achado.group(0)[:60]}' em {frame.url}")
+                return
+            if frame == self.page.main_frame and not URL_CONFIGURADOR_REGEX.search(frame.url or ""):
+                continue
+            vazio = (sinais.get("pronto") == "complete" and not sinais.get("texto") and not sinais.get("midia")
+                     and sinais.get("elementos", 0) < ELEMENTOS_PAGINA_ERRO)
+            if not vazio:
+                self._vazio_desde.pop(frame, None)
+            elif agora - self._vazio_desde.setdefault(frame, agora) >= VIGIA_FRAME_VAZIO_S:
+                self._marcar(f"frame do configurador em branco há {VIGIA_FRAME_VAZIO_S:.0f}s ({frame.url})")
+                return
+
+    def verificar(self) -> None:
+        """Levanta EstadoFatalPagina se a página está em estado fatal (sondando o DOM, no máximo 1x/s)."""
+        if self.motivo is None:
+            self._sondar()
+        if self.motivo is None:
+            if self._rebaixado:
+                self.rearmar()
+            return
+        if not self._rebaixado:
+            # Operações de locator seguintes também falham rápido, com o timeout padrão reduzido
+            self._rebaixado = True
+            try:
+                self._set_timeout(VIGIA_TIMEOUT_FATAL_MS)
+            except Exception:
+                pass
+        raise EstadoFatalPagina(self.diagnostico())
+
+    def diagnostico(self, celula: str = "") -> str:
+        partes = [f"Estado fatal da página{f' ({celula})' if celula else ''}: {self.motivo}"]
+        try:
+            partes.append(f"URL: {self.page.url}")
+        except Exception:
+            pass
+        if self.pageerrors:
+            partes.append("pageerrors: " + " | ".join(msg for _, msg in list(self.pageerrors)[-3:]))
+        return " | ".join(partes)
+
+    def _esquecer(self) -> None:
+        self.motivo = None
+        self.pageerrors.clear()
+        self._vazio_desde.clear()
+
+    def rearmar(self) -> None:
+        """Esquece o estado fatal (início de célula ou documento novo sadio) e restaura o timeout padrão."""
+        self._esquecer()
+        if self._rebaixado:
+            self._rebaixado = False
+            try:
+                self._set_timeout(self._timeout_ms)
+            except Exception:
+                pass
+
+    # -------------------------------------------------------------------------
+    # Esperas fatiadas
+    # -------------------------------------------------------------------------
+
+    def _instalar_esperas(self) -> None:
+        page = self.page
+
+        def _set_timeout(timeout: float) -> None:
+            self._timeout_ms = timeout
+            if not self._rebaixado:
+                self._set_timeout(timeout)
+
+        def _set_navegacao(timeout: float) -> None:
+            self._navegacao_ms = timeout
+            self._set_navegacao(timeout)
+
+        setattr(page, "set_default_timeout", _set_timeout)
+        setattr(page, "set_default_navigation_timeout", _set_navegacao)
+
+        original_timeout = page.wait_for_timeout
+
+        def _wait_for_timeout(timeout: float) -> None:
+            fim = self._limitar(time.time() + timeout / 1000.0)
+            while True:
+                self.verificar()
+                restante_ms = (fim - time.time()) * 1000
+                if restante_ms <= 0:
+                    return
+                original_timeout(min(restante_ms, FATIA_ESPERA_MS))
+
+        setattr(page, "wait_for_timeout", _wait_for_timeout)
+        for nome in self.ESPERAS_TIMEOUT:
+            setattr(page, nome, self._fatiar(getattr(page, nome), lambda: self._timeout_ms))
+        for nome in self.ESPERAS_NAVEGACAO:
+            setattr(page, nome, self._fatiar(getattr(page, nome), lambda: self._navegacao_ms or self._timeout_ms))
+
+    def _limitar(self, fim: Optional[float]) -> Optional[float]:
+        if self.prazo is None:
+            return fim
+        return self.prazo if fim is None else min(fim, self.prazo)
+
+    def _fatiar(self, original, timeout_padrao):
+        def _espera(*args, timeout: Optional[float] = None, **kwargs):
+            total = timeout_padrao() if timeout is None else timeout
+            fim = self._limitar(time.time() + total / 1000.0 if total else None)  # 0 = sem limite
+            while True:
+                self.verificar()
+                fatia = FATIA_ESPERA_MS if fim is None else max(1, min(FATIA_ESPERA_MS, (fim - time.time()) * 1000))
+                try:
+                    return original(*args, timeout=fatia, **kwargs)
+                except PlaywrightTimeoutError:
+                    if fim is not None and time.time() >= fim:
+                        raise
+        return _espera
+
+
+def vigia_fatal(page: Page) -> Optional[VigiaFatal]:
+    """Retorna (criando na primeira chamada) o vigia da página; None com VIGIA_FATAL=false."""
+    if not VIGIA_FATAL:
+        return None
+    vigia = getattr(page, "_vigia_fatal", None)
+    if vigia is None:
+        vigia = VigiaFatal(page)
+        setattr(page, "_vigia_fatal", vigia)
+    return vigia
+
+
+@contextmanager
+def tolerar_erros_documento(page: Page) -> Iterator[None]:
+    """URL adivinhada (candidatos de fallback): 404/página não encontrada não é estado fatal; 5xx continua sendo."""
+    vigia = getattr(page, "_vigia_fatal", None)
+    if vigia is None:
+        yield
+        return
+    vigia._tolerar_4xx += 1
+    try:
+        yield
+    finally:
+        vigia._tolerar_4xx -= 1
+
+
+# -----------------------------------------------------------------------------
+# Disjuntor da loja (compartilhado entre workers via REPORTS_DIR)
+# -----------------------------------------------------------------------------
+
+class DisjuntorLoja:
+    """
+    Conta células seguidas que terminaram em estado fatal. Aberto, as células falham sem navegar;
+    passada a pausa, a primeira célula que chega roda como teste (as demais seguem falhando rápido)
+    e o resultado dela fecha ou reabre o disjuntor.
+    """
+
+    def __init__(self):
+        self._memoria = {"seguidas": 0, "aberto_ate": 0.0, "motivo": ""}
+
+    def _caminho(self) -> Optional[Path]:
+        base = os.getenv("REPORTS_DIR")
+        return Path(base) / DISJUNTOR_ARQUIVO if base else None
+
+    def _atualizar(self, mudar) -> Dict:
+        caminho = self._caminho()
+        if caminho is None:
+            return mudar(self._memoria)
+        try:
+            with trava_arquivo(caminho):
+                dados = {**self._memoria, **(ler_json(caminho, {}) or {})}
+                resultado = mudar(dados)
+                gravar_json_atomico(caminho, dados)
+                return resultado
+        except Exception as e:
+            print(f"[AVISO] Falha ao atualizar o disjuntor da loja: {e}")
+            return {}
+
+    def liberar(self, celula: str = "") -> None:
+        """Levanta EstadoFatalPagina se o disjuntor está aberto (célula não executada)."""
+        if VIGIA_DISJUNTOR_LIMITE <= 0:
+            return
+
+        def _decidir(dados: Dict) -> Dict:
+            agora = time.time()
+            if dados["seguidas"] < VIGIA_DISJUNTOR_LIMITE:
+                return {}
+            if agora < dados["aberto_ate"]:
+                return dict(dados)
+            # Meio-aberto: esta célula testa a loja; as demais esperam mais uma pausa
+            dados["aberto_ate"] = agora + VIGIA_DISJUNTOR_PAUSA_S
+            print(f"[INFO] Disjuntor da loja meio-aberto: célula {celula} testa se a loja voltou.")
+            return {}
+
+        aberto = self._atualizar(_decidir)
+        if aberto:
+            raise EstadoFatalPagina(
+                f"Disjuntor da loja aberto ({aberto['seguidas']} células seguidas em estado fatal; último: "
+                f"{aberto.get('motivo', '')}): célula {celula} não executada, nova tentativa em "
+                f"{max(0, aberto['aberto_ate'] - time.time()):.0f}s"
+            )
+
+    def registrar(self, fatal: bool, motivo: str = "") -> None:
+        if VIGIA_DISJUNTOR_LIMITE <= 0:
+            return
+
+        def _contar(dados: Dict) -> Dict:
+            if not fatal:
+                if dados["seguidas"] >= VIGIA_DISJUNTOR_LIMITE:
+                    print("[INFO] Disjuntor da loja fechado: célula concluída sem estado fatal.")
+                dados.update(seguidas=0, aberto_ate=0.0, motivo="")
+                return {}
+            dados["seguidas"] += 1
+            dados["motivo"] = motivo
+            if dados["seguidas"] == VIGIA_DISJUNTOR_LIMITE:
+                dados["aberto_ate"] = time.time() + VIGIA_DISJUNTOR_PAUSA_S
+                print(f"[AVISO] Disjuntor da loja aberto após {dados['seguidas']} células em estado fatal "
+                      f"({motivo}); células seguintes falham sem navegar por {VIGIA_DISJUNTOR_PAUSA_S:.0f}s.")
+            return {}
+
+        self._atualizar(_contar)
+
+
+_DISJUNTOR: Optional[DisjuntorLoja] = None
+
+
+def disjuntor_loja() -> DisjuntorLoja:
+    global _DISJUNTOR
+    if _DISJUNTOR is None:
+        _DISJUNTOR = DisjuntorLoja()
+    return _DISJUNTOR
+
+
+@contextmanager
+def celula_vigiada(page: Page, celula: str = "") -> Iterator[Optional[VigiaFatal]]:
+    """
+    Uma célula (modelo × versão) sob o vigia: rearma no início, converte a falha em EstadoFatalPagina
+    com diagnóstico quando a página entrou em estado fatal e alimenta o disjuntor da loja.
+    """
+    vigia = vigia_fatal(page)
+    if vigia is None:
+        yield None
+        return
+    disjuntor_loja().liberar(celula)
+    vigia.rearmar()
+    fatal = False
+    try:
+        yield vigia
+        if vigia.fatal:
+            fatal = True
+            raise EstadoFatalPagina(vigia.diagnostico(celula))
+    except EstadoFatalPagina:
+        fatal = True
+        raise
+    except Exception as e:
+        if not vigia.fatal:
+            raise
+        fatal = True
+        raise EstadoFatalPagina(f"{vigia.diagnostico(celula)} | erro: {e}") from e
+    finally:
+        disjuntor_loja().registrar(fatal, vigia.motivo or "")